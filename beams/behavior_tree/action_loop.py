@@ -0,0 +1,177 @@
+"""
+An asyncio event loop shared by the work of many ActionNodes.
+
+Work functions made by ``wrapped_async_action_work`` are coroutines, which
+await PV reads and writes (see ``beams.behavior_tree.async_ca``) rather than
+blocking on them.  ActionNodes run with ``ActionExecution.ASYNC`` submit each
+activation as a task to the event loop of the process ticking their tree.
+The loop is run by a single thread, so that the actions of a process are
+multiplexed on one loop, and one Channel Access client context.
+
+Completion conditions are plain (blocking) callables, and are evaluated on
+the loop's executor, a small pool of CA-enabled threads.
+
+As with ``ThreadActionWorker``, the loop's thread does not survive forking.
+Each process starts its own loop, on its first activation.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent import futures
+from typing import Callable, Coroutine, Optional
+
+from epics.ca import use_initial_context
+
+from beams.behavior_tree.volatile_status import VolatileStatus
+from beams.typing_helper import Evaluatable
+
+logger = logging.getLogger(__name__)
+
+# threads evaluating completion conditions for the loop's actions
+EXECUTOR_WORKERS = 4
+# how long stopping the loop waits for its thread
+LOOP_STOP_TIMEOUT_SEC = 5.0
+
+# (name, volatile status, completion condition), see wrapped_async_action_work
+AsyncActionRunner = Callable[[str, VolatileStatus, Evaluatable], Coroutine]
+
+
+class ActionEventLoop:
+    """An event loop run by a thread of this process, see the module docstring"""
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(futures.ThreadPoolExecutor(
+            max_workers=EXECUTOR_WORKERS,
+            thread_name_prefix="ActionEventLoopExecutor",
+            initializer=use_initial_context,
+        ))
+        self.thread = threading.Thread(target=self._run, name="ActionEventLoop",
+                                       daemon=True)
+        self.pid = os.getpid()
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine) -> futures.Future:
+        """Run ``coro`` as a task of the loop, from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def is_running(self) -> bool:
+        return self.thread.is_alive()
+
+    def stop(self) -> None:
+        """
+        Stop the loop, cancelling the tasks still running on it.  The next
+        ``get_action_event_loop`` starts a new one
+        """
+        if not self.is_running():
+            return
+        self.submit(self._cancel_tasks()).result(timeout=LOOP_STOP_TIMEOUT_SEC)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=LOOP_STOP_TIMEOUT_SEC)
+        if not self.thread.is_alive():
+            self.loop.close()
+
+    async def _cancel_tasks(self) -> None:
+        tasks = [task for task in asyncio.all_tasks()
+                 if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_event_loop: Optional[ActionEventLoop] = None
+_event_loop_lock = threading.Lock()
+
+
+def get_action_event_loop() -> ActionEventLoop:
+    """The action event loop of this process, started on first use"""
+    global _event_loop
+    with _event_loop_lock:
+        # a loop inherited from the parent process has no thread running it
+        if (
+            _event_loop is None
+            or _event_loop.pid != os.getpid()
+            or not _event_loop.is_running()
+        ):
+            _event_loop = ActionEventLoop()
+        return _event_loop
+
+
+class AsyncActionWorker:
+    """
+    Runs an ActionNode's work as tasks of the process's ActionEventLoop, in
+    place of an ActionWorker's process.  ``work_func`` must come from
+    ``wrapped_async_action_work``.
+
+    Releasing the work while an activation is still running runs it once
+    more afterwards, as with the other workers.
+    """
+    def __init__(
+        self,
+        proc_name: str,
+        volatile_status: VolatileStatus,
+        work_func: Callable[..., None],
+        comp_cond: Evaluatable,
+    ):
+        self.proc_name = proc_name
+        self.volatile_status = volatile_status
+        self.run_async: AsyncActionRunner = work_func.run_async
+        self.comp_cond = comp_cond
+        self.do_work = False
+        self.lock = threading.Lock()
+        # whether an activation is running, and whether to run another after it
+        self.active = False
+        self.rerun = False
+        self.future: Optional[futures.Future] = None
+        # the process the activation was submitted from
+        self.future_pid: Optional[int] = None
+
+    def start_work(self) -> None:
+        if self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Already working, cannot start")
+            return
+        self.do_work = True
+
+    def stop_work(self) -> None:
+        if not self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Not working, not stopping work")
+            return
+        self.do_work = False
+        if self.future is not None and self.future_pid == os.getpid():
+            self.future.cancel()
+        self.future = None
+
+    def release_work(self) -> None:
+        """Run the work function once, as a task of the event loop"""
+        if not self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Not working, cannot run work")
+            return
+        with self.lock:
+            if self.active and self.future_pid == os.getpid():
+                self.rerun = True
+                return
+            self.active = True
+            self.rerun = False
+        self.future_pid = os.getpid()
+        self.future = get_action_event_loop().submit(self._run_releases())
+
+    async def _run_releases(self) -> None:
+        try:
+            while True:
+                await self.run_async(self.proc_name, self.volatile_status, self.comp_cond)
+                with self.lock:
+                    if not (self.rerun and self.do_work):
+                        break
+                    self.rerun = False
+        except Exception as ex:
+            logger.exception(f" <<-- ({self.proc_name}) async work failed: {ex}")
+        finally:
+            with self.lock:
+                self.active = False
+                self.rerun = False
@@ -1,23 +1,92 @@
 import atexit
 import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import Enum
 from multiprocessing import Event
+from typing import Iterator, Optional
 
 import py_trees
 
+from beams.behavior_tree.action_loop import AsyncActionWorker
+from beams.behavior_tree.action_pool import PooledActionWorker
 from beams.behavior_tree.action_worker import wrapped_action_work  # noqa: F401
-from beams.behavior_tree.action_worker import ActionWorker
+from beams.behavior_tree.action_worker import \
+    wrapped_async_action_work  # noqa: F401
+from beams.behavior_tree.action_worker import ActionWorker, ThreadActionWorker
 from beams.behavior_tree.volatile_status import VolatileStatus
 from beams.typing_helper import ActionNodeWorkLoop, Evaluatable
 
 logger = logging.getLogger(__name__)
 
 
+class ActionExecution(Enum):
+    """Where the work function of an ActionNode runs"""
+    # a process of the node's own
+    PROCESS = "PROCESS"
+    # the ActionWorkerPool shared by the process's ActionNodes
+    POOL = "POOL"
+    # a thread of the process ticking the tree, for IO-bound work
+    THREAD = "THREAD"
+    # the process's event loop, for work functions that are coroutines
+    ASYNC = "ASYNC"
+
+
+# the worker of each execution but PROCESS, and the attribute of the work
+# function it runs
+EXECUTION_WORKERS = {
+    ActionExecution.POOL: (PooledActionWorker, "run_once"),
+    ActionExecution.THREAD: (ThreadActionWorker, "run_once"),
+    ActionExecution.ASYNC: (AsyncActionWorker, "run_async"),
+}
+
+# used by ActionNodes that do not specify an execution
+_default_execution = ActionExecution.PROCESS
+# overrides _default_execution while a tree is built, see default_action_execution.
+# Trees may be built on several threads at once, each with its own value
+_tree_execution: ContextVar[Optional[ActionExecution]] = ContextVar(
+    "tree_execution", default=None
+)
+
+
+def set_default_action_execution(execution: ActionExecution) -> None:
+    """
+    Set the execution of ActionNodes that do not specify one, for this
+    process and those forked from it afterwards
+    """
+    global _default_execution
+    _default_execution = execution
+
+
+def get_default_action_execution() -> ActionExecution:
+    execution = _tree_execution.get()
+    return _default_execution if execution is None else execution
+
+
+@contextmanager
+def default_action_execution(execution: Optional[ActionExecution]) -> Iterator[None]:
+    """
+    Use ``execution`` as the default execution within the context, used to
+    build the ActionNodes of a tree.  Does nothing if ``execution`` is None.
+    Only applies to the current thread (or task)
+    """
+    if execution is None:
+        yield
+        return
+    token = _tree_execution.set(execution)
+    try:
+        yield
+    finally:
+        _tree_execution.reset(token)
+
+
 class ActionNode(py_trees.behaviour.Behaviour):
     def __init__(
         self,
         name: str,
         work_func: ActionNodeWorkLoop,
-        completion_condition: Evaluatable
+        completion_condition: Evaluatable,
+        execution: Optional[ActionExecution] = None,
     ):
         # TODO: can add failure condition argument...
         super().__init__(name)
@@ -27,14 +96,33 @@ class ActionNode(py_trees.behaviour.Behaviour):
         self.work_gate = Event()
         self.completion_condition = completion_condition
         self.work_func = work_func
-        self.worker = ActionWorker(
-            proc_name=name,
-            volatile_status=self.volatile_status,
-            work_gate=self.work_gate,
-            work_func=self.work_func,
-            comp_cond=completion_condition,
-            stop_func=None
-        )  # TODO: some standard notion of stop function could be valuable
+        self.execution = execution or get_default_action_execution()
+        if (
+            self.execution in EXECUTION_WORKERS
+            and not hasattr(work_func, EXECUTION_WORKERS[self.execution][1])
+        ):
+            logger.warning(f"Work function of {name} does not support "
+                           f"{self.execution.name} execution, running it in its "
+                           "own process")
+            self.execution = ActionExecution.PROCESS
+
+        if self.execution in EXECUTION_WORKERS:
+            worker_type, _ = EXECUTION_WORKERS[self.execution]
+            self.worker = worker_type(
+                proc_name=name,
+                volatile_status=self.volatile_status,
+                work_func=self.work_func,
+                comp_cond=completion_condition,
+            )
+        else:
+            self.worker = ActionWorker(
+                proc_name=name,
+                volatile_status=self.volatile_status,
+                work_gate=self.work_gate,
+                work_func=self.work_func,
+                comp_cond=completion_condition,
+                stop_func=None
+            )  # TODO: some standard notion of stop function could be valuable
         self.is_set_up = False
 
     def setup(self, **kwargs: int) -> None:
@@ -62,7 +150,7 @@ class ActionNode(py_trees.behaviour.Behaviour):
         """
         self.volatile_status.set_value(py_trees.common.Status.RUNNING)
         logger.debug(f"{self.name}.initialise [{self.status.name}->RUNNING]")
-        self.work_gate.set()
+        self.worker.release_work()
 
     def update(self) -> py_trees.common.Status:
         """Increment the counter, monitor and decide on a new status."""
@@ -0,0 +1,312 @@
+"""
+A fixed size pool of processes shared by the work of many ActionNodes.
+
+By default each ActionNode starts its own ``CAProcess``, which waits for the
+node to be initialised and then runs the node's work function.  Pooled
+ActionNodes instead register a job with the process's ``ActionWorkerPool``,
+and submit it each time they are initialised.  The job is run by whichever
+worker process of the pool is free, reporting its status through the node's
+VolatileStatus as before.  Processes, Channel Access contexts and PV
+connections thus scale with the pool size rather than the number of
+ActionNodes.
+
+Work functions are closures, which cannot be sent between processes.  Worker
+processes are instead forked with the jobs registered so far, and a job is
+sent to them as its id.  Jobs registered after the workers were forked are
+picked up by a new set of workers, started by ``sync`` (or the next
+``submit``), and the previous workers exit.  Every set of workers forked from
+a process takes jobs from the same queue, so processes forked before the
+workers were replaced (e.g. those ticking trees loaded earlier) keep
+submitting to the current workers.  A retired worker handed a job it does not
+know puts it back for the current ones.  ``sync`` should be called once a
+tree has been set up, so that the workers are forked from the process that
+set the tree up, and only once per tree.
+"""
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import os
+import queue
+import threading
+from ctypes import c_bool
+from dataclasses import dataclass, field
+from multiprocessing import Lock, Queue, Value
+from multiprocessing.sharedctypes import Synchronized
+from typing import Callable, Dict, List, Optional
+
+from epics.multiproc import CAProcess
+
+from beams.behavior_tree.volatile_status import VolatileStatus
+from beams.logging import LOGGER_QUEUE, worker_logging_configurer
+from beams.typing_helper import Evaluatable
+
+logger = logging.getLogger(__name__)
+
+# the number of worker processes of a pool, unless configured
+DEFAULT_POOL_SIZE = 4
+# how often idle workers check whether they have been retired
+POOL_POLL_SEC = 0.2
+# how long a pool waits for its workers' current jobs when shut down
+POOL_STOP_TIMEOUT_SEC = 5.0
+
+# (name, volatile status, completion condition), see wrapped_action_work
+ActionRunner = Callable[[str, VolatileStatus, Evaluatable], None]
+
+
+class ActionJob:
+    """
+    The work of a pooled ActionNode.  Each submission runs the work function
+    once, until its completion condition is met or it times out.
+    """
+    def __init__(
+        self,
+        name: str,
+        run_once: ActionRunner,
+        volatile_status: VolatileStatus,
+        completion_condition: Evaluatable,
+    ):
+        self.name = name
+        self.run_once = run_once
+        self.volatile_status = volatile_status
+        self.completion_condition = completion_condition
+        # set while the job waits to be run, so repeated submissions are
+        # coalesced
+        self.queued: Synchronized = Value(c_bool, False)
+        # held while the job runs, so it never runs twice at once
+        self.running = Lock()
+
+    def mark_queued(self) -> bool:
+        """Mark the job as waiting, returns False if it already was"""
+        with self.queued.get_lock():
+            if self.queued.value:
+                return False
+            self.queued.value = True
+            return True
+
+    def run(self) -> None:
+        with self.running:
+            # submissions from now on run the job again
+            self.queued.value = False
+            self.run_once(self.name, self.volatile_status, self.completion_condition)
+
+
+def pool_work_func(
+    do_work: Synchronized,
+    job_queue: Queue,
+    jobs: Dict[int, ActionJob],
+    log_queue: Queue,
+    log_configurer: Callable,
+) -> None:
+    """
+    Run the jobs whose ids arrive on ``job_queue``, until retired
+    """
+    log_configurer(log_queue)
+    while do_work.value:
+        try:
+            job_id = job_queue.get(timeout=POOL_POLL_SEC)
+        except queue.Empty:
+            continue
+        job = jobs.get(job_id)
+        if job is None:
+            if do_work.value:
+                logger.warning(f"Pool worker got unknown job ({job_id})")
+            else:
+                # registered after this worker was forked, for its successors
+                job_queue.put(job_id)
+            continue
+        try:
+            job.run()
+        except Exception as ex:
+            logger.exception(f"Pooled work of {job.name} failed: {ex}")
+
+
+@dataclass
+class PoolGeneration:
+    """Worker processes forked together, and the queue they take jobs from"""
+    job_queue: Queue
+    do_work: Synchronized = field(default_factory=lambda: Value(c_bool, True))
+    processes: List[CAProcess] = field(default_factory=list)
+    # the process the workers were forked from, the only one that may manage them
+    pid: int = field(default_factory=os.getpid)
+
+    def is_alive(self) -> bool:
+        return any(proc.is_alive() for proc in self.processes)
+
+
+class ActionWorkerPool:
+    """
+    ``n_workers`` CA-enabled processes running the jobs of pooled ActionNodes.
+
+    Jobs are added in the process that sets up the tree, and may be submitted
+    from processes forked from it afterwards.  See the module docstring.
+    """
+    def __init__(self, n_workers: int = DEFAULT_POOL_SIZE):
+        if n_workers < 1:
+            raise ValueError(f"n_workers must be positive, got ({n_workers})")
+        self.n_workers = n_workers
+        self.jobs: Dict[int, ActionJob] = {}
+        self._ids = itertools.count()
+        self.lock = threading.Lock()
+        self.generation: Optional[PoolGeneration] = None
+        # shared by the generations forked from the process owning the queue
+        self.job_queue: Queue = Queue()
+        self.queue_pid = os.getpid()
+        # retired generations whose workers may still be finishing jobs
+        self.retired: List[PoolGeneration] = []
+        # whether jobs were added since the current workers were forked
+        self.stale = False
+
+    def add(self, job: ActionJob) -> int:
+        """Register ``job``, returning the id it is submitted by"""
+        with self.lock:
+            job_id = next(self._ids)
+            self.jobs[job_id] = job
+            self.stale = True
+        return job_id
+
+    def remove(self, job_id: int) -> None:
+        with self.lock:
+            self.jobs.pop(job_id, None)
+
+    def submit(self, job_id: int) -> None:
+        """Queue the job for the next free worker"""
+        job = self.jobs[job_id]
+        self.sync()
+        if job.mark_queued():
+            self.generation.job_queue.put(job_id)
+
+    def sync(self) -> None:
+        """Fork new workers if jobs were added since the current ones were"""
+        with self.lock:
+            if not self.stale:
+                return
+            if self.generation is None:
+                atexit.register(self.shutdown)
+            elif self.generation.pid == os.getpid():
+                self._retire(self.generation)
+            self.generation = self._start_generation()
+            self.stale = False
+
+    def _start_generation(self) -> PoolGeneration:
+        if self.queue_pid != os.getpid():
+            # jobs added by a forked process are only known to workers it forks
+            self.job_queue = Queue()
+            self.queue_pid = os.getpid()
+        generation = PoolGeneration(job_queue=self.job_queue)
+        for idx in range(self.n_workers):
+            proc = CAProcess(
+                target=pool_work_func,
+                name=f"ActionWorkerPool{idx}",
+                args=(generation.do_work, generation.job_queue, self.jobs,
+                      LOGGER_QUEUE, worker_logging_configurer),
+                daemon=True,
+            )
+            proc.start()
+            generation.processes.append(proc)
+        logger.debug(f"Started {self.n_workers} pool workers for {len(self.jobs)} jobs")
+        return generation
+
+    def _retire(self, generation: PoolGeneration) -> None:
+        # workers exit once their current job is done, leaving queued jobs to
+        # the next generation
+        generation.do_work.value = False
+        self.retired = [gen for gen in self.retired if gen.is_alive()]
+        self.retired.append(generation)
+
+    def get_process_count(self) -> int:
+        """The number of worker processes alive, including retired ones"""
+        with self.lock:
+            generations = self.retired + ([self.generation] if self.generation else [])
+            return sum(proc.is_alive() for gen in generations for proc in gen.processes
+                       if gen.pid == os.getpid())
+
+    def shutdown(self) -> None:
+        """Stop every worker once its current job is done"""
+        with self.lock:
+            if self.generation is not None and self.generation.pid == os.getpid():
+                self._retire(self.generation)
+            self.generation = None
+            # workers are forked again if jobs are submitted afterwards
+            self.stale = bool(self.jobs)
+            generations, self.retired = self.retired, []
+        for generation in generations:
+            for proc in generation.processes:
+                proc.join(timeout=POOL_STOP_TIMEOUT_SEC)
+                if proc.is_alive():
+                    proc.terminate()
+                    proc.join()
+
+
+class PooledActionWorker:
+    """
+    Runs an ActionNode's work on an ActionWorkerPool, in place of the node's
+    own ActionWorker.  ``work_func`` must come from ``wrapped_action_work``.
+    The job is added to ``pool`` (by default the pool of the process setting
+    up the node) by ``start_work``
+    """
+    def __init__(
+        self,
+        proc_name: str,
+        volatile_status: VolatileStatus,
+        work_func: Callable[..., None],
+        comp_cond: Evaluatable,
+        pool: Optional[ActionWorkerPool] = None,
+    ):
+        self.job = ActionJob(proc_name, work_func.run_once, volatile_status, comp_cond)
+        self.pool = pool
+        self.job_id: Optional[int] = None
+
+    def start_work(self) -> None:
+        if self.job_id is not None:
+            logger.error(f"({self.job.name}) -->>: Already in the pool, cannot start")
+            return
+        if self.pool is None:
+            self.pool = get_action_worker_pool()
+        self.job_id = self.pool.add(self.job)
+
+    def stop_work(self) -> None:
+        if self.job_id is None:
+            return
+        self.pool.remove(self.job_id)
+        self.job_id = None
+
+    def release_work(self) -> None:
+        """Have a worker of the pool run the work function, once"""
+        if self.job_id is None:
+            logger.error(f"({self.job.name}) -->>: Not in the pool, cannot run work")
+            return
+        self.pool.submit(self.job_id)
+
+
+# the pool of this process, shared with the processes forked from it
+_pool: Optional[ActionWorkerPool] = None
+_pool_size = DEFAULT_POOL_SIZE
+
+
+def configure_action_pool(n_workers: int) -> None:
+    """
+    Set the size of this process's pool, which must not be started yet.
+    Applies to processes forked afterwards
+    """
+    global _pool_size
+    if _pool is not None and _pool.generation is not None:
+        raise RuntimeError("The action worker pool has already started")
+    _pool_size = n_workers
+    if _pool is not None:
+        _pool.n_workers = n_workers
+
+
+def get_action_worker_pool() -> ActionWorkerPool:
+    """The pool of this process, created on first use"""
+    global _pool
+    if _pool is None:
+        _pool = ActionWorkerPool(n_workers=_pool_size)
+    return _pool
+
+
+def sync_action_worker_pool() -> None:
+    """Fork workers for newly set up pooled ActionNodes, if there are any"""
+    if _pool is not None:
+        _pool.sync()
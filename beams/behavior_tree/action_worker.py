@@ -11,25 +11,166 @@ not required by work functions in general. The add_args are as follows:
 * LOGGER_QUEUE: instance of the logging queue
 * worker_logging_configurer: utility functuon to register log queue with handler
 """
+import asyncio
 import logging
+import os
+import threading
 import time
 from multiprocessing import Queue
 from multiprocessing.sharedctypes import Synchronized
 from multiprocessing.synchronize import Event as EventClass
-from typing import Callable, Optional
+from typing import Awaitable, Callable, Optional
 
 import py_trees
+from epics.ca import CAThread
 from epics.multiproc import CAProcess
 
+from beams.behavior_tree.action_loop import get_action_event_loop
 from beams.behavior_tree.volatile_status import VolatileStatus
 from beams.logging import LOGGER_QUEUE, worker_logging_configurer
 from beams.service.helpers.timer import Timer
 from beams.service.helpers.worker import Worker
 from beams.typing_helper import (ActionNodeWorkFunction, ActionNodeWorkLoop,
-                                 Evaluatable)
+                                 AsyncActionNodeWorkFunction, Evaluatable)
 
 logger = logging.getLogger(__name__)
 
+# how long stopping a ThreadActionWorker waits for its current work
+THREAD_STOP_TIMEOUT_SEC = 5.0
+
+
+def wait_for_completion(completion_condition: Evaluatable, period_sec: float) -> None:
+    """
+    Wait ``period_sec`` between calls of a work function.  Monitored
+    completion conditions (see ``beams.tree_config.pv_monitor``) end the wait
+    as soon as a change completes them
+    """
+    wait_for_change = getattr(completion_condition, "wait_for_change", None)
+    if wait_for_change is None:
+        time.sleep(period_sec)
+        return
+    deadline = time.monotonic() + period_sec
+    version = completion_condition.get_version()
+    while (remaining := deadline - time.monotonic()) > 0:
+        if not wait_for_change(version, remaining):
+            return
+        version = completion_condition.get_version()
+        if completion_condition():
+            return
+
+
+async def async_wait_for_completion(
+    completion_condition: Evaluatable,
+    is_complete: Callable[[], Awaitable[bool]],
+    period_sec: float,
+) -> None:
+    """As ``wait_for_completion``, awaiting changes on the running event loop"""
+    if not hasattr(completion_condition, "add_listener"):
+        await asyncio.sleep(period_sec)
+        return
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def on_change() -> None:
+        loop.call_soon_threadsafe(changed.set)
+
+    completion_condition.add_listener(on_change)
+    try:
+        deadline = loop.time() + period_sec
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+            changed.clear()
+            if await is_complete():
+                return
+    finally:
+        completion_condition.remove_listener(on_change)
+
+
+def run_action_work(
+    name: str,
+    func: ActionNodeWorkFunction,
+    volatile_status: VolatileStatus,
+    completion_condition: Evaluatable,
+    loop_period_sec: float,
+    timeout_timer: Timer,
+) -> None:
+    """
+    Call the work function ``func`` until the completion condition is met or
+    ``timeout_timer`` elapses, reporting its status through ``volatile_status``.
+    Runs one activation of an ActionNode, see ``wrapped_action_work``
+    """
+    # Set to running
+    volatile_status.set_value(py_trees.common.Status.RUNNING)
+    # Start timer
+    timeout_timer.start_timer()
+    while not completion_condition() and not timeout_timer.is_elapsed():
+        logger.debug(f" <<-- ({name}) not complete, doing work")
+        try:
+            status = func(completion_condition)
+        except Exception as ex:
+            volatile_status.set_value(py_trees.common.Status.FAILURE)
+            logger.error(f" <<-- ({name}) Work failed, setting "
+                         f"status=FAILURE. ({ex})")
+            break
+
+        volatile_status.set_value(status)
+        logger.debug(f" <<-- ({name}): {volatile_status.get_value().name}")
+        wait_for_completion(completion_condition, loop_period_sec)
+
+    # check if we exited loop because we timed out or we succeeded at task
+    if completion_condition():
+        logger.debug(f" <<-- ({name}): SUCCESS")
+        volatile_status.set_value(py_trees.common.Status.SUCCESS)
+    else:
+        logger.debug(f" <<-- ({name}): FAILURE")
+        volatile_status.set_value(py_trees.common.Status.FAILURE)
+
+
+async def run_async_action_work(
+    name: str,
+    func: AsyncActionNodeWorkFunction,
+    volatile_status: VolatileStatus,
+    completion_condition: Evaluatable,
+    loop_period_sec: float,
+    timeout_timer: Timer,
+) -> None:
+    """
+    As ``run_action_work``, for a coroutine work function.  The completion
+    condition may block, and is evaluated on the event loop's executor.
+    ``func`` is passed a coroutine function evaluating it
+    """
+    loop = asyncio.get_running_loop()
+
+    async def is_complete() -> bool:
+        return await loop.run_in_executor(None, completion_condition)
+
+    volatile_status.set_value(py_trees.common.Status.RUNNING)
+    timeout_timer.start_timer()
+    while not await is_complete() and not timeout_timer.is_elapsed():
+        logger.debug(f" <<-- ({name}) not complete, doing work")
+        try:
+            status = await func(is_complete)
+        except Exception as ex:
+            volatile_status.set_value(py_trees.common.Status.FAILURE)
+            logger.error(f" <<-- ({name}) Work failed, setting "
+                         f"status=FAILURE. ({ex})")
+            break
+
+        volatile_status.set_value(status)
+        logger.debug(f" <<-- ({name}): {volatile_status.get_value().name}")
+        await async_wait_for_completion(completion_condition, is_complete,
+                                        loop_period_sec)
+
+    if await is_complete():
+        logger.debug(f" <<-- ({name}): SUCCESS")
+        volatile_status.set_value(py_trees.common.Status.SUCCESS)
+    else:
+        logger.debug(f" <<-- ({name}): FAILURE")
+        volatile_status.set_value(py_trees.common.Status.FAILURE)
+
 
 def wrapped_action_work(loop_period_sec: float = 0.1, work_function_timeout_period_sec: float = 2):
     def action_worker_work_function_generator(func: ActionNodeWorkFunction) -> ActionNodeWorkLoop:
@@ -57,33 +198,83 @@ def wrapped_action_work(loop_period_sec: float = 0.1, work_function_timeout_peri
                 logger.debug(f" <<-- ({name}) waiting for work release")
                 work_gate.wait()
                 work_gate.clear()
+                run_action_work(name, func, volatile_status, completion_condition,
+                                loop_period_sec, work_loop_timeout_timer)
+
+        def run_once(
+            name: str,
+            volatile_status: VolatileStatus,
+            completion_condition: Evaluatable,
+        ) -> None:
+            """Run a single activation, for workers shared between ActionNodes"""
+            timeout_timer = Timer(name=name,
+                                  timer_period_seconds=work_function_timeout_period_sec,
+                                  auto_start=False)
+            run_action_work(name, func, volatile_status, completion_condition,
+                            loop_period_sec, timeout_timer)
+
+        work_wrapper.run_once = run_once
+        return work_wrapper
+    return action_worker_work_function_generator
+
+
+def wrapped_async_action_work(
+    loop_period_sec: float = 0.1,
+    work_function_timeout_period_sec: float = 2,
+):
+    """
+    As ``wrapped_action_work``, for ``async def`` work functions.  These are
+    passed a coroutine function evaluating the completion condition, and
+    should await their PV reads and writes, see ``beams.behavior_tree.async_ca``.
+
+    The result runs as tasks of an event loop shared by many ActionNodes
+    (``run_async``) with ``ActionExecution.ASYNC``.  With other executions,
+    each activation runs on the event loop of the worker's process.
+    """
+    def action_worker_work_function_generator(
+        func: AsyncActionNodeWorkFunction
+    ) -> ActionNodeWorkLoop:
+        async def run_async(
+            name: str,
+            volatile_status: VolatileStatus,
+            completion_condition: Evaluatable,
+        ) -> None:
+            """Run a single activation on the running event loop"""
+            timeout_timer = Timer(name=name,
+                                  timer_period_seconds=work_function_timeout_period_sec,
+                                  auto_start=False)
+            await run_async_action_work(name, func, volatile_status, completion_condition,
+                                        loop_period_sec, timeout_timer)
+
+        def run_once(
+            name: str,
+            volatile_status: VolatileStatus,
+            completion_condition: Evaluatable,
+        ) -> None:
+            """Run a single activation on this process's event loop, and wait for it"""
+            future = get_action_event_loop().submit(
+                run_async(name, volatile_status, completion_condition)
+            )
+            future.result()
 
-                # Set to running
-                volatile_status.set_value(py_trees.common.Status.RUNNING)
-                # Start timer
-                work_loop_timeout_timer.start_timer()
-                while not completion_condition() and not work_loop_timeout_timer.is_elapsed():
-                    logger.debug(f" <<-- ({name}) not complete, doing work")
-                    try:
-                        status = func(completion_condition)
-                    except Exception as ex:
-                        volatile_status.set_value(py_trees.common.Status.FAILURE)
-                        logger.error(f" <<-- ({name}) Work failed, setting "
-                                     f"status=FAILURE. ({ex})")
-                        break
-
-                    volatile_status.set_value(status)
-                    logger.debug(f" <<-- ({name}): {volatile_status.get_value().name}")
-                    time.sleep(loop_period_sec)
-
-                # check if we exited loop because we timed out or we succeeded at task
-                if completion_condition():
-                    logger.debug(f" <<-- ({name}): SUCCESS")
-                    volatile_status.set_value(py_trees.common.Status.SUCCESS)
-                else:
-                    logger.debug(f" <<-- ({name}): FAILURE")
-                    volatile_status.set_value(py_trees.common.Status.FAILURE)
+        def work_wrapper(
+            do_work: Synchronized,
+            name: str,
+            work_gate: EventClass,
+            volatile_status: VolatileStatus,
+            completion_condition: Evaluatable,
+            log_queue: Queue,
+            log_configurer: Callable) -> None:
+            """The ActionWorker process's loop, see ``wrapped_action_work``"""
+            log_configurer(log_queue)
+            while (do_work.value):
+                logger.debug(f" <<-- ({name}) waiting for work release")
+                work_gate.wait()
+                work_gate.clear()
+                run_once(name, volatile_status, completion_condition)
 
+        work_wrapper.run_once = run_once
+        work_wrapper.run_async = run_async
         return work_wrapper
     return action_worker_work_function_generator
 
@@ -110,7 +301,77 @@ class ActionWorker(Worker):
                       LOGGER_QUEUE,
                       worker_logging_configurer)
         )
+        self.work_gate = work_gate
         logger.debug(f"Creating worker ({proc_name})")
         # Note: there may be a world where we define a common stop_func here in
         # which case the class may have maintain a reference to voltaile_status and
         # or comp_cond
+
+    def release_work(self) -> None:
+        """Let the work process run the work function, once"""
+        self.work_gate.set()
+
+
+class ThreadActionWorker:
+    """
+    Runs an ActionNode's work function on a thread, in place of an
+    ActionWorker's process.  Suited to IO-bound work, which then shares the
+    Channel Access context and PV connections of the process ticking the
+    tree.  ``work_func`` must come from ``wrapped_action_work``.
+
+    Threads do not survive forking, and trees may be set up in a different
+    process than the one ticking them.  The thread is thus started by the
+    first ``release_work`` in the ticking process.
+    """
+    def __init__(
+        self,
+        proc_name: str,
+        volatile_status: VolatileStatus,
+        work_func: Callable[..., None],
+        comp_cond: Callable[..., bool],
+    ):
+        self.proc_name = proc_name
+        self.volatile_status = volatile_status
+        self.run_once = work_func.run_once
+        self.comp_cond = comp_cond
+        self.do_work = False
+        self.work_gate = threading.Event()
+        self.thread: Optional[CAThread] = None
+        # the process the thread was started in
+        self.thread_pid: Optional[int] = None
+
+    def start_work(self) -> None:
+        if self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Already working, cannot start")
+            return
+        self.do_work = True
+
+    def stop_work(self) -> None:
+        if not self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Not working, not stopping work")
+            return
+        self.do_work = False
+        self.work_gate.set()
+        if self.thread is not None and self.thread_pid == os.getpid():
+            self.thread.join(timeout=THREAD_STOP_TIMEOUT_SEC)
+        self.thread = None
+
+    def release_work(self) -> None:
+        """Let the work thread run the work function, once"""
+        if not self.do_work:
+            logger.error(f"({self.proc_name}) -->>: Not working, cannot run work")
+            return
+        if self.thread is None or self.thread_pid != os.getpid():
+            self.thread = CAThread(target=self.work_loop, name=self.proc_name, daemon=True)
+            self.thread_pid = os.getpid()
+            self.thread.start()
+        self.work_gate.set()
+
+    def work_loop(self) -> None:
+        while self.do_work:
+            logger.debug(f" <<-- ({self.proc_name}) waiting for work release")
+            self.work_gate.wait()
+            self.work_gate.clear()
+            if not self.do_work:
+                break
+            self.run_once(self.proc_name, self.volatile_status, self.comp_cond)
@@ -0,0 +1,64 @@
+"""
+Channel Access reads and writes for coroutine work functions.
+
+These await the PV's reply rather than blocking on it, so that the work of
+many ActionNodes may share one event loop (see ``beams.behavior_tree.action_loop``).
+Each event loop has its own ``caproto`` client context, whose PV connections
+are kept and shared by every coroutine running on that loop.
+"""
+import asyncio
+import weakref
+from typing import Any
+
+from caproto.asyncio.client import PV, Context
+
+# the caproto client context of each running event loop
+_contexts: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Context]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# seconds to wait for a PV to connect, and for each read or write
+DEFAULT_CA_TIMEOUT_SEC = 2.0
+
+
+def get_ca_context() -> Context:
+    """The client context of the running event loop, created on first use"""
+    loop = asyncio.get_running_loop()
+    context = _contexts.get(loop)
+    if context is None:
+        context = _contexts[loop] = Context()
+    return context
+
+
+async def get_pv(pvname: str, timeout: float = DEFAULT_CA_TIMEOUT_SEC) -> PV:
+    """The connected PV named ``pvname``, connecting it if needed"""
+    pv, = await get_ca_context().get_pvs(pvname, timeout=timeout)
+    await pv.wait_for_connection(timeout=timeout)
+    return pv
+
+
+async def async_caget(pvname: str, timeout: float = DEFAULT_CA_TIMEOUT_SEC) -> Any:
+    """
+    Read the value of ``pvname``.  As ``epics.caget``, scalars are returned
+    as such and strings are decoded
+    """
+    pv = await get_pv(pvname, timeout=timeout)
+    reading = await pv.read(timeout=timeout)
+    data = [item.decode() if isinstance(item, bytes) else item
+            for item in reading.data]
+    if len(data) == 1:
+        return data[0]
+    return data
+
+
+async def async_caput(
+    pvname: str,
+    value: Any,
+    wait: bool = True,
+    timeout: float = DEFAULT_CA_TIMEOUT_SEC,
+) -> None:
+    """Write ``value`` to ``pvname``, waiting for completion if ``wait``"""
+    pv = await get_pv(pvname, timeout=timeout)
+    if isinstance(value, (str, bytes)) or not hasattr(value, "__len__"):
+        value = [value]
+    await pv.write(value, wait=wait, timeout=timeout)
@@ -5,7 +5,8 @@ Communicate with a running BEAMS service (you are the client)
 import argparse
 import logging
 
-from beams.service.remote_calls.behavior_tree_pb2 import TickConfiguration
+from beams.service.remote_calls.behavior_tree_pb2 import (TickConfiguration,
+                                                          TickTiming)
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +34,13 @@ def build_arg_parser(argparser=None):
     )
     sub.set_defaults(command="get_heartbeat")
 
+    # get server metrics
+    sub = subparsers.add_parser(
+        "get_server_metrics",
+        help="get the load on the service's RPC server, and its per-method latencies"
+    )
+    sub.set_defaults(command="get_server_metrics")
+
     # load new tree
     load_new_tree_parser = subparsers.add_parser(
         "load_new_tree",
@@ -61,6 +69,45 @@ def build_arg_parser(argparser=None):
         default=1000,
         type=int
     )
+    load_new_tree_parser.add_argument(
+        "-t",
+        "--tick_timing",
+        type=str,
+        choices=list(TickTiming.keys()),
+        default="FIXED_DELAY",
+        help="specify how continuous tick deadlines are kept"
+    )
+    load_new_tree_parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="replace the loaded tree of the same name once this tree has loaded"
+    )
+
+    # reload tree
+    reload_tree_parser = subparsers.add_parser(
+        "reload_tree",
+        aliases=["RELOAD_TREE", "reload"],
+        help="reload a loaded tree, rebuilding only what changed"
+    )
+    reload_tree_parser.set_defaults(command="reload_tree")
+    reload_tree_parser.add_argument(
+        "new_tree_filepath",
+        help="filepath of the edited tree",
+        type=str
+    )
+
+    # tick rate
+    tick_rate_parser = subparsers.add_parser(
+        "change_tick_rate_of_tree",
+        aliases=["CHANGE_TICK_RATE_OF_TREE", "change_tick_rate"],
+        help="specify a new tick delay for a loaded tree"
+    )
+    tick_rate_parser.set_defaults(command="change_tick_rate_of_tree")
+    tick_rate_parser.add_argument(
+        "tick_delay_ms",
+        help="new tick delay (~period of ticking) in milliseconds",
+        type=int
+    )
 
     # tick config
     tick_config_parser = subparsers.add_parser(
@@ -85,6 +132,14 @@ def build_arg_parser(argparser=None):
         default=1000,
         type=int
     )
+    tick_config_parser.add_argument(
+        "-t",
+        "--tick_timing",
+        type=str,
+        choices=list(TickTiming.keys()),
+        default=None,
+        help="specify how continuous tick deadlines are kept (default: unchanged)"
+    )
 
     # ack node
     ack_node_parser = subparsers.add_parser(
@@ -144,6 +199,44 @@ def build_arg_parser(argparser=None):
     )
     details_parser.set_defaults(command="get_tree_details")
 
+    subscribe_parser = subparsers.add_parser(
+        "subscribe_tree_updates",
+        aliases=["SUBSCRIBE_TREE_UPDATES", "watch"],
+        help="Stream updates for loaded trees as they happen"
+    )
+    subscribe_parser.set_defaults(command="subscribe_tree_updates")
+    subscribe_parser.add_argument(
+        "--tree_name",
+        type=str,
+        action="append",
+        help="name of a tree to watch, may be repeated.  Watches all trees by default"
+    )
+    subscribe_parser.add_argument(
+        "--tree_uuid",
+        type=str,
+        action="append",
+        help="UUID of a tree to watch, may be repeated"
+    )
+    subscribe_parser.add_argument(
+        "-i",
+        "--min_interval_ms",
+        type=int,
+        default=0,
+        help="minimum time between updates for any one tree, in milliseconds"
+    )
+    subscribe_parser.add_argument(
+        "--details",
+        dest="include_details",
+        action="store_true",
+        help="also stream tree details when node statuses change"
+    )
+    subscribe_parser.add_argument(
+        "--status_deltas",
+        dest="include_status_deltas",
+        action="store_true",
+        help="also stream tree structures, then only the node statuses that change"
+    )
+
     # apply required tree identification arg or uuid for applicable subcommands
     load_new_tree_parser.add_argument(
         "tree_name",
@@ -151,9 +244,9 @@ def build_arg_parser(argparser=None):
         help="name of tree to load"
     )
 
-    for sub in [start_parser, tick_config_parser,
+    for sub in [start_parser, tick_config_parser, tick_rate_parser,
                 ack_node_parser, pause_parser, tick_parser,
-                unload_parser, details_parser]:
+                unload_parser, details_parser, reload_tree_parser]:
         group = sub.add_mutually_exclusive_group(required=True)
         group.add_argument(
             "--tree_name",
@@ -177,5 +270,13 @@ def main(*args, **kwargs):
     from beams.service.rpc_client import RPCClient
     cmd = kwargs.pop("command")
     logger.debug(f"Executing {cmd} with args {args, kwargs}")
-    client = RPCClient()  # TODO: gather client from config
-    print(client.run(cmd, *args, **kwargs))
+    with RPCClient() as client:  # TODO: gather client from config
+        response = client.run(cmd, *args, **kwargs)
+        if cmd == "subscribe_tree_updates":
+            try:
+                for update in response:
+                    print(update)
+            except KeyboardInterrupt:
+                response.cancel()
+        else:
+            print(response)
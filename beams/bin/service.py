@@ -21,6 +21,63 @@ def build_arg_parser(argparser=None):
     argparser.description = DESCRIPTION
     argparser.formatter_class = argparse.RawTextHelpFormatter
 
+    argparser.add_argument(
+        "-s", "--scheduler-workers",
+        dest="scheduler_workers", default=0, type=int,
+        help="Number of worker processes to cooperatively tick all trees in.  "
+             "If 0, each tree is ticked in its own process (default)"
+    )
+    argparser.add_argument(
+        "-p", "--action-pool-size",
+        dest="action_pool_size", default=0, type=int,
+        help="Number of worker processes shared by the ActionNodes ticked in "
+             "each process.  If 0, each ActionNode works in its own process (default)"
+    )
+    argparser.add_argument(
+        "--pv-max-age-sec",
+        dest="pv_max_age_sec", default=None, type=float,
+        help="How old monitored PV values may be before trees read them from "
+             "the IOC again.  Unbounded by default"
+    )
+    argparser.add_argument(
+        "--max-workers",
+        dest="max_workers", default=10, type=int,
+        help="Number of threads handling RPCs, not counting those held by "
+             "subscriptions (default 10)"
+    )
+    argparser.add_argument(
+        "--max-concurrent-rpcs",
+        dest="maximum_concurrent_rpcs", default=None, type=int,
+        help="Most RPCs handled or waiting at once, further RPCs are refused.  "
+             "Unbounded by default"
+    )
+    argparser.add_argument(
+        "--keepalive-time-ms",
+        dest="keepalive_time_ms", default=None, type=int,
+        help="Interval between keepalive pings sent to clients"
+    )
+    argparser.add_argument(
+        "--keepalive-timeout-ms",
+        dest="keepalive_timeout_ms", default=None, type=int,
+        help="Time to wait for a keepalive ping to be answered"
+    )
+    argparser.add_argument(
+        "--max-message-length",
+        dest="max_message_length", default=None, type=int,
+        help="Largest request or reply the server handles, in bytes"
+    )
+    argparser.add_argument(
+        "--aio",
+        dest="use_aio", action="store_true",
+        help="Serve RPCs with grpc.aio"
+    )
+    argparser.add_argument(
+        "--heartbeat-max-staleness-ms",
+        dest="heartbeat_max_staleness_ms", default=100, type=int,
+        help="How old the tree states served to heartbeat requests may be "
+             "(default 100)"
+    )
+
 
 def main(*args, **kwargs):
     from beams.bin.service_main import main
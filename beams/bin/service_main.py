@@ -1,14 +1,41 @@
 import logging
 import time
+from typing import Optional
 
 from beams.logging import setup_logging
 from beams.service.rpc_handler import BeamsService
+from beams.service.server_options import ServerOptions
 
 logger = logging.getLogger(__name__)
 
 
-def main(*args, **kwargs):
-    service = BeamsService()
+def main(
+    scheduler_workers: int = 0,
+    max_workers: int = 10,
+    maximum_concurrent_rpcs: Optional[int] = None,
+    keepalive_time_ms: Optional[int] = None,
+    keepalive_timeout_ms: Optional[int] = None,
+    max_message_length: Optional[int] = None,
+    use_aio: bool = False,
+    heartbeat_max_staleness_ms: int = 100,
+    action_pool_size: int = 0,
+    pv_max_age_sec: Optional[float] = None,
+    **kwargs,
+):
+    server_options = ServerOptions(
+        max_workers=max_workers,
+        maximum_concurrent_rpcs=maximum_concurrent_rpcs,
+        keepalive_time_ms=keepalive_time_ms,
+        keepalive_timeout_ms=keepalive_timeout_ms,
+        max_receive_message_length=max_message_length,
+        max_send_message_length=max_message_length,
+        use_aio=use_aio,
+        heartbeat_max_staleness_ms=heartbeat_max_staleness_ms,
+    )
+    service = BeamsService(scheduler_workers=scheduler_workers,
+                           server_options=server_options,
+                           action_pool_size=action_pool_size,
+                           pv_max_age_sec=pv_max_age_sec)
     service.start_work()
 
     while (input("press q+<enter> to kill") != 'q'):
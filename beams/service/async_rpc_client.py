@@ -0,0 +1,288 @@
+"""
+asyncio client for the BEAMS service, built on grpc.aio.
+
+Mirrors the commands of RPCClient, but each is a coroutine.  A single event
+loop can have many requests and subscriptions in flight at once, across one or
+many services, without a thread per request.
+"""
+from __future__ import annotations
+
+import logging
+from typing import AsyncIterator, Optional, Sequence, Union
+from uuid import UUID
+
+import grpc
+
+from beams.service.remote_calls.beams_rpc_pb2_grpc import BEAMS_rpcStub
+from beams.service.remote_calls.behavior_tree_pb2 import (NodeId, TreeDetails,
+                                                          TreeStatusDelta,
+                                                          TreeStructure)
+from beams.service.remote_calls.command_pb2 import (CommandBatch,
+                                                    CommandMessage,
+                                                    CommandType)
+from beams.service.remote_calls.generic_message_pb2 import Empty
+from beams.service.remote_calls.heartbeat_pb2 import (HeartBeatReply,
+                                                      HeartBeatRequest,
+                                                      TreeUpdate)
+from beams.service.remote_calls.server_metrics_pb2 import ServerMetrics
+from beams.service.rpc_client import BaseRPCClient
+
+logger = logging.getLogger(__name__)
+
+
+def check_tree_id(tree_name: Optional[str], tree_uuid: Optional[Union[UUID, str]]) -> None:
+    if not (tree_name or tree_uuid):
+        raise ValueError("Must provide either tree_name or tree_uuid")
+
+
+class AsyncRPCClient(BaseRPCClient):
+    """
+    asyncio client for communicating with the BEAMS service via RPC
+
+    The channel is opened on first use, and must be used from a single event
+    loop.  Concurrent calls are multiplexed over the one channel.  Release it
+    with ``close``, or by using the client as an async context manager.
+
+    Unlike RPCClient, ``last_response`` is not updated, as there may be many
+    calls in flight at once.
+    """
+    def __init__(
+        self,
+        address: str = "localhost",
+        port: int = 50051,
+    ):
+        super().__init__(address=address, port=port)
+
+        self._channel: Optional[grpc.aio.Channel] = None
+        self._stub: Optional[BEAMS_rpcStub] = None
+
+    async def __aenter__(self) -> AsyncRPCClient:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def get_stub(self) -> BEAMS_rpcStub:
+        """Return the stub for the client's channel, opening it if necessary"""
+        if self._channel is None:
+            logger.debug(f"Opening channel to {self.server_address}")
+            self._channel = grpc.aio.insecure_channel(
+                self.server_address, options=self.CHANNEL_OPTIONS
+            )
+            self._stub = BEAMS_rpcStub(self._channel)
+        return self._stub
+
+    async def close(self) -> None:
+        """
+        Close the channel, cancelling any calls or subscriptions in progress.
+        The client may still be used afterwards, and will open a new channel.
+        """
+        channel, self._channel, self._stub = self._channel, None, None
+        if channel is not None:
+            await channel.close()
+
+    async def enqueue_command(self, cmd_msg: CommandMessage) -> HeartBeatReply:
+        response = await self.get_stub().enqueue_command(cmd_msg)
+        logger.debug(response)
+        return response
+
+    async def enqueue_commands(self, cmd_msgs: Sequence[CommandMessage]) -> HeartBeatReply:
+        """
+        Send several commands in a single request.  See
+        RPCClient.enqueue_commands
+        """
+        response = await self.get_stub().enqueue_commands(CommandBatch(commands=cmd_msgs))
+        logger.debug(response)
+        return response
+
+    async def get_heartbeat(self, since_version: int = 0) -> HeartBeatReply:
+        """
+        Get service heartbeat.  Currently this includes information on every
+        tree running on the service.  See RPCClient.get_heartbeat
+        """
+        response = await self.get_stub().request_heartbeat(
+            HeartBeatRequest(since_version=since_version)
+        )
+        logger.debug(response)
+        return response
+
+    async def get_server_metrics(self) -> ServerMetrics:
+        """Get the load on the service's RPC server, see RPCClient.get_server_metrics"""
+        response = await self.get_stub().request_server_metrics(Empty())
+        logger.debug(response)
+        return response
+
+    async def start_tree(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Start the tree by specifying either its `tree_name` or `tree_uuid`"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_base_msg(CommandType.START_TREE, tree_name, tree_uuid)
+        )
+
+    async def tick_tree(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Tick the tree by specifying either its `tree_name` or `tree_uuid`"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_base_msg(CommandType.TICK_TREE, tree_name, tree_uuid)
+        )
+
+    async def pause_tree(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Pause the tree by specifying either its `tree_name` or `tree_uuid`"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_base_msg(CommandType.PAUSE_TREE, tree_name, tree_uuid)
+        )
+
+    async def unload_tree(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Unload the tree by specifying either its `tree_name` or `tree_uuid`"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_base_msg(CommandType.UNLOAD_TREE, tree_name, tree_uuid)
+        )
+
+    async def load_new_tree(
+        self,
+        new_tree_filepath: str,
+        tree_name: str = "",
+        tree_uuid: str = "",
+        tick_config: str = "INTERACTIVE",
+        tick_delay_ms: int = 5000,
+        tick_timing: str = "FIXED_DELAY",
+        replace: bool = False,
+    ) -> HeartBeatReply:
+        """
+        Load a new tree into the service.  Does not start the tree automatically,
+        unless it replaces a running tree.  See RPCClient.load_new_tree
+        """
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(self.construct_load_new_tree_msg(
+            new_tree_filepath, tree_name, tree_uuid, tick_config, tick_delay_ms,
+            tick_timing, replace,
+        ))
+
+    async def reload_tree(
+        self,
+        new_tree_filepath: str,
+        tree_name: str = "",
+        tree_uuid: str = "",
+    ) -> HeartBeatReply:
+        """
+        Reload a loaded tree, rebuilding only the parts of the tree that
+        changed.  See RPCClient.reload_tree
+        """
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_reload_tree_msg(new_tree_filepath, tree_name, tree_uuid)
+        )
+
+    async def ack_node(
+        self,
+        node_name: str,
+        user: str,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Acknowledge a node in a tree specified by either its name or uuid"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_ack_node_msg(tree_name, tree_uuid, node_name, user)
+        )
+
+    async def change_tick_rate_of_tree(
+        self,
+        tick_delay_ms: int,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Change the delay between ticks of a tree"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(
+            self.construct_tick_rate_msg(tick_delay_ms, tree_name, tree_uuid)
+        )
+
+    async def change_tick_configuration(
+        self,
+        tick_config: str,
+        tick_delay_ms: Optional[int] = None,
+        tick_timing: Optional[str] = None,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> HeartBeatReply:
+        """Change the tick mode (and optionally delay and timing) of a tree"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.enqueue_command(self.construct_tick_configuration_msg(
+            tick_config, tick_delay_ms, tick_timing, tree_name, tree_uuid
+        ))
+
+    async def get_detailed_update(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> TreeDetails:
+        """Gets a detailed update for a tree from the service"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.get_stub().request_tree_details(
+            NodeId(name=tree_name, uuid=str(tree_uuid))
+        )
+
+    async def get_tree_structure(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> TreeStructure:
+        """Gets the structure of a tree from the service"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.get_stub().request_tree_structure(
+            NodeId(name=tree_name, uuid=str(tree_uuid))
+        )
+
+    async def get_tree_statuses(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+    ) -> TreeStatusDelta:
+        """Gets the status of every node in a tree, as a full TreeStatusDelta"""
+        check_tree_id(tree_name, tree_uuid)
+        return await self.get_stub().request_tree_statuses(
+            NodeId(name=tree_name, uuid=str(tree_uuid))
+        )
+
+    def subscribe_tree_updates(
+        self,
+        tree_names: Sequence[str] = (),
+        tree_uuids: Sequence[Union[UUID, str]] = (),
+        min_interval_ms: int = 0,
+        include_details: bool = False,
+        include_status_deltas: bool = False,
+    ) -> AsyncIterator[TreeUpdate]:
+        """
+        Stream updates for trees as they tick or change state.  See
+        RPCClient.subscribe_tree_updates
+
+        Returns
+        -------
+        AsyncIterator[TreeUpdate]
+            The streaming call, iterate over it with ``async for``.  ``cancel``
+            it to end the subscription
+        """
+        subscription = self.construct_subscription(
+            tree_names, tree_uuids, min_interval_ms, include_details,
+            include_status_deltas,
+        )
+        return self.get_stub().subscribe_tree_updates(subscription)
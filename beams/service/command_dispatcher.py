@@ -0,0 +1,268 @@
+"""
+Priority-aware servicing of the CommandMessages sent to a BEAMS service.
+
+Commands are queued by the RPCHandler in a ``PriorityQueue``, so urgent
+commands (e.g. PAUSE_TREE, ACK_NODE) are taken ahead of slow ones (e.g.
+LOAD_NEW_TREE).  Priority must not reorder the commands of a single tree
+however: a START_TREE sent after a LOAD_NEW_TREE must wait for the load.  Each
+command is therefore queued with its position among the commands for its
+tree, and the ``CommandDispatcher`` services each tree's commands in that
+order.
+
+Long running commands are serviced on an executor, so they do not hold up the
+dispatch loop.  Commands that follow them for the same tree are chained
+behind them on the executor.
+
+Commands dispatched together are coalesced: of consecutive commands for a tree
+that supersede one another (see ``SUPERSEDES``), only the last is serviced.
+"""
+from __future__ import annotations
+
+import logging
+from concurrent import futures
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+
+from beams.service.remote_calls.command_pb2 import (CommandMessage,
+                                                    CommandPriority,
+                                                    CommandType)
+from beams.service.tree_registry import TreeIdKey
+
+logger = logging.getLogger(__name__)
+
+# (tree key, position among the commands for that tree, command)
+QueuedCommand = Tuple[str, int, CommandMessage]
+
+# (name, uuid) -> the key of the loaded tree they identify, if any.  May raise
+# ValueError for ids that can not identify a tree, see TreeRegistry.lookup
+TreeResolver = Callable[[str, str], Optional[TreeIdKey]]
+
+# Priority of each command type, used when a command has PRIORITY_DEFAULT
+COMMAND_PRIORITIES: Dict[CommandType, CommandPriority] = {
+    CommandType.PAUSE_TREE: CommandPriority.PRIORITY_HIGH,
+    CommandType.ACK_NODE: CommandPriority.PRIORITY_HIGH,
+    CommandType.TICK_TREE: CommandPriority.PRIORITY_NORMAL,
+    CommandType.START_TREE: CommandPriority.PRIORITY_NORMAL,
+    CommandType.CHANGE_TICK_RATE_OF_TREE: CommandPriority.PRIORITY_NORMAL,
+    CommandType.CHANGE_TICK_CONFIGURATION: CommandPriority.PRIORITY_NORMAL,
+    CommandType.LOAD_NEW_TREE: CommandPriority.PRIORITY_LOW,
+    CommandType.UNLOAD_TREE: CommandPriority.PRIORITY_LOW,
+    CommandType.RELOAD_TREE: CommandPriority.PRIORITY_LOW,
+}
+
+# CommandPriority -> PriorityQueue priority, lower values are taken first
+PRIORITY_ORDER: Dict[CommandPriority, int] = {
+    CommandPriority.PRIORITY_HIGH: 0,
+    CommandPriority.PRIORITY_NORMAL: 1,
+    CommandPriority.PRIORITY_LOW: 2,
+}
+
+# Commands serviced on the dispatcher's executor
+LONG_RUNNING_COMMANDS = {
+    CommandType.LOAD_NEW_TREE, CommandType.UNLOAD_TREE, CommandType.RELOAD_TREE,
+}
+
+# Command type -> the command types it makes redundant when it immediately
+# follows them for the same tree.  Starting and pausing set whether a tree is
+# ticking, so only the last of a run of them matters.  A reload brings the
+# tree to the file it reads, whatever was reloaded before
+SUPERSEDES: Dict[CommandType, Set[CommandType]] = {
+    CommandType.TICK_TREE: {CommandType.TICK_TREE},
+    CommandType.START_TREE: {CommandType.START_TREE, CommandType.PAUSE_TREE},
+    CommandType.PAUSE_TREE: {CommandType.START_TREE, CommandType.PAUSE_TREE},
+    CommandType.CHANGE_TICK_RATE_OF_TREE: {CommandType.CHANGE_TICK_RATE_OF_TREE},
+    CommandType.RELOAD_TREE: {CommandType.RELOAD_TREE},
+}
+
+
+def get_command_priority(request: CommandMessage) -> CommandPriority:
+    """
+    The priority of ``request``, resolving PRIORITY_DEFAULT (or unknown
+    priorities) by its type
+    """
+    if request.priority in PRIORITY_ORDER:
+        return request.priority
+    return COMMAND_PRIORITIES.get(request.command_t, CommandPriority.PRIORITY_NORMAL)
+
+
+def coalesce_commands(requests: Sequence[CommandMessage]) -> List[CommandMessage]:
+    """
+    Drop the commands in ``requests`` (in order, for a single tree) that are
+    made redundant by the command that follows them
+    """
+    coalesced: List[CommandMessage] = []
+    for request in requests:
+        if coalesced and coalesced[-1].command_t in SUPERSEDES.get(request.command_t, ()):
+            coalesced[-1] = request
+        else:
+            coalesced.append(request)
+    return coalesced
+
+
+class CommandSequencer:
+    """
+    Numbers commands by their position among the commands for their tree.
+    Not thread safe, callers must serialize calls to ``next`` and ``cancel``.
+
+    Trees are keyed by their uuid, so that a tree's commands are ordered
+    together whether they identify it by name or by (partial) uuid.  Loaded
+    trees are found with ``resolve``.  A tree loaded by LOAD_NEW_TREE is given
+    its uuid here, and later commands naming it are keyed on that uuid, so
+    they follow the load even while it is in progress.  Commands for trees
+    that can not be found are keyed on the name or uuid they give.
+
+    Parameters
+    ----------
+    resolve : TreeResolver, optional
+        Finds the key of a loaded tree, see TreeHostClient.lookup_key.  If
+        omitted, only the trees loaded through this sequencer are resolved
+    """
+    def __init__(self, resolve: Optional[TreeResolver] = None):
+        self.resolve = resolve
+        self.counts: Dict[str, int] = {}
+        # tree name -> uuid given to the latest tree loaded with that name
+        self.loaded: Dict[str, str] = {}
+
+    def get_tree_key(self, request: CommandMessage) -> str:
+        """
+        Identifies the tree ``request`` acts on, for ordering purposes.
+        Gives the tree to be loaded by a LOAD_NEW_TREE its uuid
+        """
+        if request.command_t == CommandType.LOAD_NEW_TREE:
+            try:
+                uuid = str(UUID(request.tree_uuid))
+            except ValueError:
+                uuid = str(uuid4())
+            request.tree_uuid = uuid
+            if request.tree_name:
+                self.loaded[request.tree_name] = uuid
+            return uuid
+
+        # as TreeRegistry.lookup, uuids take precedence over names
+        if not request.tree_uuid and request.tree_name in self.loaded:
+            return self.loaded[request.tree_name]
+        key = None
+        if self.resolve is not None:
+            try:
+                key = self.resolve(request.tree_name, request.tree_uuid)
+            except ValueError:
+                pass
+        if key is not None:
+            return str(key.uuid)
+        return request.tree_uuid or request.tree_name
+
+    def next(self, request: CommandMessage) -> QueuedCommand:
+        key = self.get_tree_key(request)
+        position = self.counts.get(key, 0)
+        self.counts[key] = position + 1
+        return key, position, request
+
+    def cancel(self, command: QueuedCommand) -> None:
+        """
+        Give back the position of ``command``, the latest numbered, which
+        could not be queued.  Otherwise its tree's later commands would be
+        held forever, waiting for it
+        """
+        key, position, request = command
+        if self.counts.get(key) != position + 1:
+            raise ValueError(f"Only the latest command may be cancelled: {command}")
+        self.counts[key] = position
+        if (
+            request.command_t == CommandType.LOAD_NEW_TREE
+            and self.loaded.get(request.tree_name) == key
+        ):
+            del self.loaded[request.tree_name]
+
+
+class CommandDispatcher:
+    """
+    Services commands through ``service``, in order for each tree.
+
+    Commands may be dispatched out of order (e.g. by priority).  Commands that
+    arrive ahead of an earlier command for the same tree are held until it
+    arrives.  The commands for a tree that become ready together are
+    coalesced, see ``coalesce_commands``.
+
+    Parameters
+    ----------
+    service : Callable[[CommandMessage], None]
+        Services a single command, returning once it is done.  Must be thread
+        safe, as it is also called from the executor
+    max_workers : int, optional
+        The number of long running commands that may be serviced at once, by
+        default 4
+    """
+    def __init__(
+        self,
+        service: Callable[[CommandMessage], None],
+        max_workers: int = 4,
+    ):
+        self.service = service
+        self.executor = futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="CommandDispatcher"
+        )
+        # tree key -> position of the next command to service
+        self.next_position: Dict[str, int] = {}
+        # tree key -> {position: command} that arrived early
+        self.held: Dict[str, Dict[int, CommandMessage]] = {}
+        # tree key -> the last command for that tree sent to the executor
+        self.in_flight: Dict[str, futures.Future] = {}
+
+        # the number of commands dropped by coalescing
+        self.coalesced_count = 0
+
+    def dispatch(self, command: QueuedCommand) -> None:
+        self.dispatch_many([command])
+
+    def dispatch_many(self, commands: Sequence[QueuedCommand]) -> None:
+        """
+        Service ``commands``, coalescing the commands for each tree that are
+        ready to be serviced together.  Trees are serviced in the order they
+        first appear in ``commands``
+        """
+        keys: Dict[str, None] = {}
+        for key, position, request in commands:
+            self.held.setdefault(key, {})[position] = request
+            keys[key] = None
+
+        for key in keys:
+            held = self.held[key]
+            next_position = self.next_position.get(key, 0)
+            ready: List[CommandMessage] = []
+            while next_position in held:
+                ready.append(held.pop(next_position))
+                next_position += 1
+            self.next_position[key] = next_position
+            if not held:
+                del self.held[key]
+
+            coalesced = coalesce_commands(ready)
+            if len(coalesced) < len(ready):
+                logger.debug(f"Coalesced {len(ready)} commands for {key} into "
+                             f"{len(coalesced)}")
+                self.coalesced_count += len(ready) - len(coalesced)
+            for request in coalesced:
+                self._start(key, request)
+
+    def _start(self, key: str, request: CommandMessage) -> None:
+        previous = self.in_flight.get(key)
+        if previous is not None and previous.done():
+            del self.in_flight[key]
+            previous = None
+
+        if previous is None and request.command_t not in LONG_RUNNING_COMMANDS:
+            self._service(request)
+        else:
+            self.in_flight[key] = self.executor.submit(self._service, request, previous)
+
+    def _service(self, request: CommandMessage, after: Optional[futures.Future] = None) -> None:
+        if after is not None:
+            # chained futures log their own exceptions
+            futures.wait([after])
+        try:
+            self.service(request)
+        except Exception:
+            logger.exception(f"Failed to service command: {request}")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
@@ -0,0 +1,99 @@
+"""
+Cache of the heartbeat served to clients by the RPCHandler.
+
+Heartbeats report every tree, so building one costs a round trip to the
+TreeHost and a message per tree.  The ``HeartbeatCache`` keeps the last
+HeartBeatReply built, and serves it to every client until it is older than the
+maximum staleness.  Refreshes are made by one caller at a time, and callers
+waiting on a refresh are served its result, so many clients polling together
+cost about as much as one.
+
+Snapshots are versioned by the TreeHost, which only gathers the trees' updates
+when they changed since the cached version.  Clients may pass the version of
+the last heartbeat they received, and are told if nothing has changed since,
+instead of being sent every tree again.
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+from beams.service.remote_calls.generic_message_pb2 import MessageType
+from beams.service.remote_calls.heartbeat_pb2 import HeartBeatReply
+from beams.service.tree_host import HeartbeatSnapshot
+
+
+class HeartbeatCache:
+    """
+    The latest heartbeat, refreshed once it is older than
+    ``max_staleness_ms``.  Thread safe.
+
+    Parameters
+    ----------
+    get_snapshot : Callable[[int], HeartbeatSnapshot]
+        Returns the current snapshot of the trees, given the version of the
+        last one received.  Typically TreeHostClient.get_heartbeat
+    max_staleness_ms : int, optional
+        How old a heartbeat may be when it is served, by default 100.  If 0,
+        every request waits for a snapshot taken after it arrived
+    """
+    def __init__(
+        self,
+        get_snapshot: Callable[[int], HeartbeatSnapshot],
+        max_staleness_ms: int = 100,
+    ):
+        self.get_snapshot = get_snapshot
+        self.max_staleness_sec = max_staleness_ms / 1000
+        # held while refreshing, so concurrent requests share one refresh
+        self.lock = threading.Lock()
+        self.reply: Optional[HeartBeatReply] = None
+        # time.monotonic() when the cached reply's snapshot was requested
+        self.taken = 0.0
+
+        # the number of snapshots requested, and of heartbeats served
+        self.refresh_count = 0
+        self.request_count = 0
+
+    def get(self) -> HeartBeatReply:
+        """
+        The latest heartbeat, no older than the maximum staleness.  Shared
+        between callers, so must not be modified
+        """
+        arrived = time.monotonic()
+        with self.lock:
+            self.request_count += 1
+            if self.reply is None or self.taken < arrived - self.max_staleness_sec:
+                self._refresh()
+            return self.reply
+
+    def get_since(self, since_version: int) -> HeartBeatReply:
+        """
+        As ``get``, but only a notice that nothing changed if the latest
+        heartbeat's version is ``since_version``
+        """
+        reply = self.get()
+        if since_version == 0 or since_version != reply.version:
+            return reply
+
+        not_modified = HeartBeatReply(mess_t=MessageType.MESSAGE_TYPE_HEARTBEAT,
+                                      version=reply.version, not_modified=True)
+        not_modified.reply_timestamp.CopyFrom(reply.reply_timestamp)
+        return not_modified
+
+    def _refresh(self) -> None:
+        taken = time.monotonic()
+        version = self.reply.version if self.reply is not None else 0
+        snapshot = self.get_snapshot(version)
+        self.refresh_count += 1
+        self.taken = taken
+
+        # replies may be in use by other callers, so are replaced rather than
+        # modified
+        reply = HeartBeatReply(mess_t=MessageType.MESSAGE_TYPE_HEARTBEAT)
+        if snapshot.updates is None and self.reply is not None:
+            # unchanged, only the timestamp is new
+            reply.CopyFrom(self.reply)
+        else:
+            reply.version = snapshot.version
+            reply.behavior_tree_update.extend(snapshot.updates or [])
+        reply.reply_timestamp.GetCurrentTime()
+        self.reply = reply
@@ -1,59 +1,309 @@
 """
-Thread safe priority queue
-Warning this is not effecient to search, it is a dumb priority queue. If performance becomes an issue... this is python.
-But also make it a binary tree, you could utilize the heapq library but it kind of sucks
+Multiprocessing safe priority queue, backed by shared memory.
+
+The queue is a named ``SharedMemory`` block holding a header, a binary heap of
+fixed-size entries and a pool of fixed-size payload slots.  Each heap entry
+holds the entry's priority, its insertion sequence (so entries of equal
+priority are taken in the order they were put) and the slot its pickled
+payload was written to.  Free slots are kept on a stack, so putting and
+popping an entry costs O(log n) entry moves, and only that entry's payload is
+pickled.
+
+The queue is bounded: ``put`` blocks (and ``put_nowait`` raises ``queue.Full``)
+while every slot is taken, and ``get`` blocks (and ``get_nowait`` raises
+``queue.Empty``) while there are no entries.
 """
 
-import heapq
 import logging
-import os
-from multiprocessing import Lock, Pipe, Value
+import pickle
+from ctypes import Structure, c_int64, c_uint32, c_uint64, sizeof
+from multiprocessing import Lock, Semaphore
+from multiprocessing.shared_memory import SharedMemory
+from queue import Empty, Full
+from typing import Any, Dict, Hashable, List, Optional
 
 logger = logging.getLogger(__name__)
 
 
+class QueueHeader(Structure):
+    _fields_ = [
+        ("capacity", c_uint32),
+        ("slot_size", c_uint32),
+        ("count", c_uint32),
+        # number of free slots on the free slot stack
+        ("free_count", c_uint32),
+        ("next_sequence", c_uint64),
+    ]
+
+
+class HeapEntry(Structure):
+    _fields_ = [
+        ("priority", c_int64),
+        ("sequence", c_uint64),
+        ("slot", c_uint32),
+        ("length", c_uint32),
+    ]
+
+
+def get_block_size(capacity: int, slot_size: int) -> int:
+    """The size of the shared memory block backing a queue"""
+    return (sizeof(QueueHeader) + capacity * sizeof(HeapEntry)
+            + capacity * sizeof(c_uint32) + capacity * slot_size)
+
+
 class PriorityQueue:
-    def __init__(self, priority_dict):
-        self.__queue__ = []
+    """
+    Bounded priority queue shared between processes.  Entries with lower
+    priority integers are taken first, entries of equal priority are taken in
+    the order they were put.
+
+    The queue must be created before the processes that use it are started,
+    and is handed to them by inheritance (or as a Process argument), like the
+    multiprocessing primitives it is built on.  The creating process is
+    responsible for calling ``unlink`` once the queue is no longer needed.
+
+    Parameters
+    ----------
+    priority_dict : Dict[Hashable, int]
+        Maps the priorities given to ``put`` (typically enum members) to
+        integers, lower integers are taken first
+    capacity : int, optional
+        The maximum number of entries in the queue, by default 1024
+    slot_size : int, optional
+        The maximum size in bytes of a pickled entry, by default 1024
+    """
+    def __init__(
+        self,
+        priority_dict: Dict[Hashable, int],
+        capacity: int = 1024,
+        slot_size: int = 1024,
+    ):
+        if capacity < 1 or slot_size < 1:
+            raise ValueError("capacity and slot_size must be positive, got "
+                             f"({capacity}, {slot_size})")
         self.__priority_dict__ = priority_dict
         self.__lock__ = Lock()
-        self.entry_count = Value("d", 0)
-        self.recv_sock, self.send_sock = Pipe(
-            duplex=False
-        )  # object for transfering pqueue between processes
-        self.send_sock.send(self.__queue__)
+        # count free slots and queued entries, so callers can block on them
+        self.not_full = Semaphore(capacity)
+        self.not_empty = Semaphore(0)
+
+        self.shm = SharedMemory(create=True, size=get_block_size(capacity, slot_size))
+        self.is_owner = True
+        header = QueueHeader.from_buffer(self.shm.buf)
+        header.capacity = capacity
+        header.slot_size = slot_size
+        del header
+        self._map()
+        self.header.count = 0
+        self.header.next_sequence = 0
+        for slot in range(capacity):
+            self.free_slots[slot] = capacity - 1 - slot
+        self.header.free_count = capacity
+
+    def _map(self) -> None:
+        """Lay the header, heap, free slot stack and slots over the block"""
+        buf = self.shm.buf
+        self.header = QueueHeader.from_buffer(buf)
+        capacity = self.header.capacity
+        offset = sizeof(QueueHeader)
+        self.heap = (HeapEntry * capacity).from_buffer(buf, offset)
+        offset += capacity * sizeof(HeapEntry)
+        self.free_slots = (c_uint32 * capacity).from_buffer(buf, offset)
+        offset += capacity * sizeof(c_uint32)
+        self.slots_offset = offset
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {
+            "name": self.shm.name,
+            "priority_dict": self.__priority_dict__,
+            "lock": self.__lock__,
+            "not_full": self.not_full,
+            "not_empty": self.not_empty,
+        }
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__priority_dict__ = state["priority_dict"]
+        self.__lock__ = state["lock"]
+        self.not_full = state["not_full"]
+        self.not_empty = state["not_empty"]
+        self.shm = SharedMemory(name=state["name"])
+        self.is_owner = False
+        self._map()
 
-    def get_priority_int(self, prio_enum):
+    @property
+    def capacity(self) -> int:
+        return self.header.capacity
+
+    @property
+    def slot_size(self) -> int:
+        return self.header.slot_size
+
+    def get_priority_int(self, prio_enum: Hashable) -> int:
         try:
             return self.__priority_dict__[prio_enum]
         except KeyError:
             raise KeyError(f"Priority Enum provided {prio_enum} not in priority_dict")
 
-    def put(self, ent, prio_enum):
-        logger.debug(f"acquiring the put lock on {os.getpid()}")
+    def qsize(self) -> int:
+        """The number of entries in the queue, approximate if it is in use"""
+        return self.header.count
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def full(self) -> bool:
+        return self.qsize() == self.capacity
+
+    def put(
+        self,
+        ent: Any,
+        prio_enum: Hashable,
+        block: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """
+        Put ``ent`` in the queue with priority ``prio_enum``.  If the queue is
+        full, wait for a free slot (up to ``timeout`` seconds) if ``block``,
+        raising ``queue.Full`` if none frees up.
+        """
+        priority = self.get_priority_int(prio_enum)
+        payload = pickle.dumps(ent, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.slot_size:
+            raise ValueError(f"Entry of {len(payload)} bytes does not fit in a "
+                             f"{self.slot_size} byte slot: {ent}")
+
+        if not self.not_full.acquire(block, timeout):
+            raise Full
+        with self.__lock__:
+            self._push(priority, payload)
+        self.not_empty.release()
+
+    def put_nowait(self, ent: Any, prio_enum: Hashable) -> None:
+        """Put ``ent`` in the queue, raising ``queue.Full`` if it is full"""
+        self.put(ent, prio_enum, block=False)
+
+    def get(self, block: bool = True, timeout: Optional[float] = None) -> Any:
+        """
+        Remove and return the most urgent entry.  If the queue is empty, wait
+        for an entry (up to ``timeout`` seconds) if ``block``, raising
+        ``queue.Empty`` if none arrives.
+        """
+        if not self.not_empty.acquire(block, timeout):
+            raise Empty
         with self.__lock__:
-            logger.debug("getting queue")
-            q = self.recv_sock.recv()
-            logger.debug(f"got queue {q}, putting it in")
-            heapq.heappush(
-                q, (self.get_priority_int(prio_enum), self.entry_count.value, ent)
-            )
-            logger.debug(f"q is now {q}")
-            self.__queue__ = q  # kinda just for posterity
-            self.entry_count.value += 1  # safe due to lock object
-            self.send_sock.send(q)
-        logger.debug("lock released")
-
-    def pop(self):
-        logger.debug(f"acquiring the lock for pop on {os.getpid()}")
+            payload = self._pop()
+        self.not_full.release()
+        return pickle.loads(payload)
+
+    def get_nowait(self) -> Any:
+        """Remove and return the most urgent entry, or raise ``queue.Empty``"""
+        return self.get(block=False)
+
+    def pop(self) -> Any:
+        """Remove and return the most urgent entry, waiting for one if empty"""
+        return self.get()
+
+    def get_many(
+        self,
+        max_entries: int,
+        block: bool = True,
+        timeout: Optional[float] = None,
+    ) -> List[Any]:
+        """
+        Remove and return up to ``max_entries`` entries, most urgent first, in
+        a single acquisition of the queue's lock.  Waits as ``get`` does for
+        the first entry, but not for the rest.
+        """
+        if max_entries < 1:
+            return []
+        if not self.not_empty.acquire(block, timeout):
+            raise Empty
+        n_entries = 1
+        while n_entries < max_entries and self.not_empty.acquire(False):
+            n_entries += 1
+
         with self.__lock__:
-            logger.debug("getting queue")
-            q = self.recv_sock.recv()
-            logger.debug(f"got queue {q}")
-            val = heapq.heappop(q)
-            logger.debug(f"got val {val}")
-            self.send_sock.send(q)
-            self.__queue__ = q
-            logger.debug(f"new queue {q}")
-        logger.debug("releasing lock for pop")
-        return val[-1]
+            payloads = [self._pop() for _ in range(n_entries)]
+        for _ in range(n_entries):
+            self.not_full.release()
+        return [pickle.loads(payload) for payload in payloads]
+
+    # Heap operations, only to be called while holding the lock.  The
+    # semaphores guarantee there is a free slot to push into and an entry to
+    # pop.  Indexing the heap returns views into shared memory, so entries
+    # are copied into a hole rather than swapped.  Assigning a view to the
+    # heap would also leave a reference cycle that keeps the block mapped.
+    def _push(self, priority: int, payload: bytes) -> None:
+        header = self.header
+        header.free_count -= 1
+        slot = self.free_slots[header.free_count]
+        start = self.slots_offset + slot * header.slot_size
+        self.shm.buf[start:start + len(payload)] = payload
+
+        sequence = header.next_sequence
+        header.next_sequence = sequence + 1
+        key = (priority, sequence)
+
+        heap = self.heap
+        pos = header.count
+        header.count = pos + 1
+        while pos > 0:
+            parent_pos = (pos - 1) >> 1
+            parent = heap[parent_pos]
+            if key >= (parent.priority, parent.sequence):
+                break
+            heap[pos] = HeapEntry.from_buffer_copy(parent)
+            pos = parent_pos
+        heap[pos] = HeapEntry(priority, sequence, slot, len(payload))
+
+    def _pop(self) -> bytes:
+        header = self.header
+        heap = self.heap
+        top = heap[0]
+        start = self.slots_offset + top.slot * header.slot_size
+        payload = bytes(self.shm.buf[start:start + top.length])
+        self.free_slots[header.free_count] = top.slot
+        header.free_count += 1
+
+        count = header.count - 1
+        header.count = count
+        if count == 0:
+            return payload
+
+        # sift the last entry down from the root
+        last = HeapEntry.from_buffer_copy(heap[count])
+        key = (last.priority, last.sequence)
+        pos = 0
+        child_pos = 1
+        while child_pos < count:
+            child = heap[child_pos]
+            child_key = (child.priority, child.sequence)
+            right_pos = child_pos + 1
+            if right_pos < count:
+                right = heap[right_pos]
+                right_key = (right.priority, right.sequence)
+                if right_key < child_key:
+                    child, child_key, child_pos = right, right_key, right_pos
+            if key <= child_key:
+                break
+            heap[pos] = HeapEntry.from_buffer_copy(child)
+            pos = child_pos
+            child_pos = 2 * pos + 1
+        heap[pos] = last
+        return payload
+
+    def close(self) -> None:
+        """Release this process's view of the queue"""
+        # ctypes views must be released before the block can be closed
+        self.header = self.heap = self.free_slots = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Close and free the queue, only to be called by its creator"""
+        self.close()
+        if not self.is_owner:
+            return
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            logger.debug(f"Priority queue {self.shm.name} was already unlinked")
@@ -0,0 +1,131 @@
+"""
+Shared-memory table of per-node statuses for a behavior tree.
+
+The table is a named ``SharedMemory`` block, so any process can attach to it
+by name.  The layout is an 8 byte sequence counter followed by one status byte
+per node, indexed by the node's ordinal (its pre-order position in the tree).
+
+A single writer updates the table using a seqlock: the sequence is made odd
+before writing and even afterwards.  Readers copy the statuses without taking
+any lock, and retry if the sequence was odd or changed while they copied.
+A write left unfinished (its writer was terminated mid-write) is abandoned
+by readers after ``WRITE_TIMEOUT_SEC``, rather than retried forever.
+"""
+import logging
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEQ_FORMAT = "<Q"
+SEQ_SIZE = struct.calcsize(SEQ_FORMAT)
+
+# how long a write may stay unfinished before readers abandon it
+WRITE_TIMEOUT_SEC = 1.0
+# the pause between a reader's retries, once the writer is not finishing
+READ_RETRY_SEC = 0.001
+
+
+class NodeStatusTable:
+    """
+    Per-node status bytes in shared memory, guarded by a seqlock.
+
+    Parameters
+    ----------
+    n_nodes : int, optional
+        The number of nodes to allocate statuses for when creating a new
+        table, by default 0
+    name : Optional[str], optional
+        The name of an existing table to attach to.  If omitted a new table is
+        created, which the creator is responsible for unlinking.
+    """
+    def __init__(self, n_nodes: int = 0, name: Optional[str] = None):
+        if name is None:
+            # SharedMemory refuses zero-sized blocks, seq counter is always present
+            self.shm = SharedMemory(create=True, size=SEQ_SIZE + n_nodes)
+            self.n_nodes = n_nodes
+            self.shm.buf[:SEQ_SIZE + n_nodes] = bytes(SEQ_SIZE + n_nodes)
+        else:
+            self.shm = SharedMemory(name=name)
+            # blocks may be rounded up to the page size, readers that know the
+            # true node count should pass it to ``read``
+            self.n_nodes = self.shm.size - SEQ_SIZE
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _get_seq(self) -> int:
+        return struct.unpack_from(SEQ_FORMAT, self.shm.buf, 0)[0]
+
+    def _set_seq(self, seq: int) -> None:
+        struct.pack_into(SEQ_FORMAT, self.shm.buf, 0, seq)
+
+    def write(self, updates: Iterable[Tuple[int, int]]) -> None:
+        """
+        Write (ordinal, status) pairs to the table.  Must only be called from
+        the single process that owns the tree.
+        """
+        seq = self._get_seq()
+        self._set_seq(seq + 1)
+        buf = self.shm.buf
+        for ordinal, status in updates:
+            buf[SEQ_SIZE + ordinal] = status
+        self._set_seq(seq + 2)
+
+    def read(self, n_nodes: Optional[int] = None) -> bytes:
+        """
+        Return a consistent copy of the first ``n_nodes`` statuses (all by
+        default), retrying while a write is in progress.
+        """
+        return self.read_with_sequence(n_nodes)[1]
+
+    def read_with_sequence(self, n_nodes: Optional[int] = None) -> Tuple[int, bytes]:
+        """
+        As ``read``, also returning the number of writes made to the table
+        when the copy was taken.
+        """
+        end = SEQ_SIZE + (self.n_nodes if n_nodes is None else n_nodes)
+        attempts = 0
+        # (seq, time) at which an unfinished write was first seen
+        stalled: Optional[Tuple[int, float]] = None
+        while True:
+            before = self._get_seq()
+            if before % 2 == 0:
+                statuses = bytes(self.shm.buf[SEQ_SIZE:end])
+                if self._get_seq() == before:
+                    return before // 2, statuses
+            attempts += 1
+            if attempts % 100 != 0:
+                continue
+            if attempts < 1000:
+                # the writer was likely descheduled mid-write, let it finish
+                time.sleep(0)
+                continue
+
+            time.sleep(READ_RETRY_SEC)
+            if stalled is None or stalled[0] != before:
+                stalled = (before, time.monotonic())
+            elif before % 2 and time.monotonic() - stalled[1] > WRITE_TIMEOUT_SEC:
+                self._abandon_write(before)
+
+    def _abandon_write(self, seq: int) -> None:
+        """End the write begun at ``seq``, whose writer never finished it"""
+        if self._get_seq() == seq:
+            logger.error(f"Status table {self.name} write unfinished after "
+                         f"{WRITE_TIMEOUT_SEC}s, its writer was likely "
+                         "terminated.  Abandoning it")
+            self._set_seq(seq + 1)
+
+    def close(self) -> None:
+        self.shm.close()
+
+    def unlink(self) -> None:
+        """Close and free the table, only to be called by its creator"""
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            logger.debug(f"Status table {self.name} was already unlinked")
@@ -0,0 +1,128 @@
+"""
+Deadline bookkeeping for continuously ticked trees.
+
+``TickClock`` decides when a tree is next due based on its tick period and
+``TickTiming`` policy, and keeps count of how well the tree keeps to that period.
+All times are ``time.monotonic()`` values in seconds.
+"""
+from collections import deque
+from typing import Deque, List, Optional
+
+from beams.service.remote_calls.behavior_tree_pb2 import (TickStatistics,
+                                                          TickTiming)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list, 0 if empty"""
+    if not sorted_values:
+        return 0.0
+    rank = int(round(pct / 100 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class TickClock:
+    """
+    Track the deadlines and timing statistics of a periodically ticked tree.
+
+    Policies (``TickTiming``):
+    - FIXED_DELAY: the next tick is due one period after the last tick ended
+    - FIXED_RATE_SKIP: ticks are due every period.  Deadlines that pass while
+      a tick overruns are skipped and counted as missed
+    - FIXED_RATE_CATCH_UP: ticks are due every period.  Deadlines that pass
+      while a tick overruns are run back to back afterwards.  Ticks starting
+      a full period or more late count as missed.  At most ``max_catch_up``
+      deadlines are kept in the backlog, the rest are skipped.
+
+    Parameters
+    ----------
+    period_sec : float
+        The tick period in seconds
+    tick_timing : TickTiming, optional
+        The deadline policy, by default FIXED_DELAY
+    history_size : int, optional
+        The number of recent tick durations used for percentiles, by default 256
+    max_catch_up : int, optional
+        The largest backlog of deadlines FIXED_RATE_CATCH_UP will catch up on,
+        by default 10
+    """
+    def __init__(
+        self,
+        period_sec: float,
+        tick_timing: TickTiming = TickTiming.FIXED_DELAY,
+        history_size: int = 256,
+        max_catch_up: int = 10,
+    ):
+        self.period_sec = period_sec
+        self.tick_timing = tick_timing
+        self.max_catch_up = max_catch_up
+        self.next_deadline: Optional[float] = None
+
+        self.tick_count = 0
+        self.overruns = 0
+        self.missed_deadlines = 0
+        self.durations: Deque[float] = deque(maxlen=history_size)
+
+    def reset(self, now: float) -> None:
+        """Make the next tick due at ``now``, eg. when (re)starting ticking"""
+        self.next_deadline = now
+
+    def set_period(self, period_sec: float) -> None:
+        """Change the period, moving any pending deadline to match"""
+        if self.next_deadline is not None:
+            self.next_deadline += period_sec - self.period_sec
+        self.period_sec = period_sec
+
+    def set_tick_timing(self, tick_timing: TickTiming) -> None:
+        self.tick_timing = tick_timing
+
+    def time_until_next(self, now: float) -> float:
+        """Seconds until the next tick is due, 0 if it is already due"""
+        if self.next_deadline is None:
+            return 0.0
+        return max(self.next_deadline - now, 0.0)
+
+    def record_tick(self, start: float, end: float) -> None:
+        """
+        Record a tick that ran from ``start`` to ``end``, and compute when the
+        next tick is due.
+        """
+        duration = end - start
+        self.durations.append(duration)
+        self.tick_count += 1
+        if duration > self.period_sec:
+            self.overruns += 1
+
+        if self.tick_timing == TickTiming.FIXED_DELAY or self.period_sec <= 0:
+            self.next_deadline = end + max(self.period_sec, 0)
+            return
+
+        scheduled = start if self.next_deadline is None else self.next_deadline
+        catch_up = self.tick_timing == TickTiming.FIXED_RATE_CATCH_UP
+        if catch_up and start - scheduled >= self.period_sec:
+            self.missed_deadlines += 1
+
+        next_deadline = scheduled + self.period_sec
+        if end >= next_deadline:
+            # number of further deadlines that passed while this tick ran
+            n_behind = int((end - next_deadline) // self.period_sec) + 1
+            if catch_up:
+                n_skipped = max(n_behind - self.max_catch_up, 0)
+            else:
+                n_skipped = n_behind
+            next_deadline += n_skipped * self.period_sec
+            self.missed_deadlines += n_skipped
+
+        self.next_deadline = next_deadline
+
+    def get_statistics(self) -> TickStatistics:
+        durations_ms = sorted(d * 1000 for d in self.durations)
+        return TickStatistics(
+            tick_timing=self.tick_timing,
+            tick_count=self.tick_count,
+            overruns=self.overruns,
+            missed_deadlines=self.missed_deadlines,
+            duration_p50_ms=percentile(durations_ms, 50),
+            duration_p90_ms=percentile(durations_ms, 90),
+            duration_p99_ms=percentile(durations_ms, 99),
+            duration_max_ms=durations_ms[-1] if durations_ms else 0.0,
+        )
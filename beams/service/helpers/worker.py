@@ -67,6 +67,10 @@ class Worker():
         if (self.stop_func is not None):
             self.stop_func()
 
+        if self.work_proc._parent_pid != os.getpid():
+            # started by the process this one was forked from, which reaps it
+            logger.debug(f"({self.proc_name}) -->>: Not started by this process, not joining")
+            return
         logger.debug(f"({self.proc_name}) -->>: Ending work, calling join")
         self.work_proc.join()
         logger.debug(f"({self.proc_name}) -->>: Worker process joined")
@@ -1,11 +1,12 @@
-from __future__ import print_function
+from __future__ import annotations, print_function
 
 import configparser
 import logging
 import os
+import threading
 from functools import wraps
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Sequence, Union
 from uuid import UUID
 
 import grpc
@@ -13,26 +14,40 @@ import grpc
 from beams.service.remote_calls.beams_rpc_pb2_grpc import BEAMS_rpcStub
 from beams.service.remote_calls.behavior_tree_pb2 import (NodeId,
                                                           TickConfiguration,
-                                                          TreeDetails)
+                                                          TickTiming,
+                                                          TreeDetails,
+                                                          TreeStatusDelta,
+                                                          TreeStructure)
 from beams.service.remote_calls.command_pb2 import (AckNodeMessage,
+                                                    CommandBatch,
                                                     CommandMessage,
                                                     CommandType,
                                                     LoadNewTreeMessage,
+                                                    ReloadTreeMessage,
                                                     TickConfigurationMessage)
 from beams.service.remote_calls.generic_message_pb2 import Empty, MessageType
-from beams.service.remote_calls.heartbeat_pb2 import HeartBeatReply
+from beams.service.remote_calls.heartbeat_pb2 import (HeartBeatReply,
+                                                      HeartBeatRequest,
+                                                      TreeUpdate,
+                                                      TreeUpdateSubscription)
+from beams.service.remote_calls.server_metrics_pb2 import ServerMetrics
 
 logger = logging.getLogger(__name__)
 
 
-class RPCClient:
-    """Client for communicating with the BEAMS service via RPC"""
-    BASE_COMMANDS: list[CommandType] = [
-        CommandType.START_TREE,
-        CommandType.TICK_TREE,
-        CommandType.PAUSE_TREE,
-        CommandType.UNLOAD_TREE,
-    ]
+class BaseRPCClient:
+    """
+    Configuration and message construction shared by the BEAMS service
+    clients, see RPCClient and AsyncRPCClient
+    """
+    CHANNEL_OPTIONS = (
+        # Default ecs config uses psproxy, which doesn't work here
+        ("grpc.enable_http_proxy", 0),
+        # retry soon after losing the service, backing off to once every 5s
+        ("grpc.initial_reconnect_backoff_ms", 100),
+        ("grpc.min_reconnect_backoff_ms", 100),
+        ("grpc.max_reconnect_backoff_ms", 5000),
+    )
 
     def __init__(
         self,
@@ -143,7 +158,197 @@ class RPCClient:
         # If found nothing
         raise OSError("No beams configuration file found. Check BEAMS_CFG.")
 
-    def run(self, command: str, **kwargs) -> Union[HeartBeatReply, TreeDetails]:
+    def construct_base_msg(
+        self,
+        command: CommandType,
+        tree_name: str,
+        tree_uuid: str,
+    ) -> CommandMessage:
+        """
+        Construct the base CommandMessage for RPC communication.  Some command
+        types may require additonal configuration of the message
+
+        Parameters
+        ----------
+        command : CommandType
+            The message subcommand type
+        tree_name : str
+            The name of the tree to manipulate
+        tree_uuid : str
+            The uuid of the tree to manipulate
+
+        Returns
+        -------
+        CommandMessage
+        """
+        # unpack the command type from arg parse
+        cmd_msg = CommandMessage(mess_t=MessageType.MESSAGE_TYPE_COMMAND_MESSAGE)
+        cmd_msg.command_t = command
+        cmd_msg.tree_name = tree_name
+        cmd_msg.tree_uuid = tree_uuid
+        return cmd_msg
+
+    def construct_load_new_tree_msg(
+        self,
+        new_tree_filepath: str,
+        tree_name: str,
+        tree_uuid: str,
+        tick_config: str,
+        tick_delay_ms: int,
+        tick_timing: str,
+        replace: bool = False,
+    ) -> CommandMessage:
+        cmd_msg = self.construct_base_msg(CommandType.LOAD_NEW_TREE, tree_name, tree_uuid)
+        load_new_tree_mesg = LoadNewTreeMessage()
+        load_new_tree_mesg.tree_file_path = new_tree_filepath
+        load_new_tree_mesg.replace = replace
+        # make tick config
+        tc = TickConfigurationMessage()
+        tc.tick_config = getattr(TickConfiguration, tick_config)
+        tc.delay_ms = tick_delay_ms
+        tc.tick_timing = getattr(TickTiming, tick_timing)
+        # pack em up
+        load_new_tree_mesg.tick_spec.CopyFrom(tc)
+        cmd_msg.load_new_tree.CopyFrom(load_new_tree_mesg)
+        return cmd_msg
+
+    def construct_reload_tree_msg(
+        self,
+        new_tree_filepath: str,
+        tree_name: str,
+        tree_uuid: str,
+    ) -> CommandMessage:
+        cmd_msg = self.construct_base_msg(CommandType.RELOAD_TREE, tree_name, tree_uuid)
+        cmd_msg.reload_tree.CopyFrom(ReloadTreeMessage(tree_file_path=new_tree_filepath))
+        return cmd_msg
+
+    def construct_ack_node_msg(
+        self,
+        tree_name: str,
+        tree_uuid: str,
+        node_name: str,
+        user: str,
+    ) -> CommandMessage:
+        cmd_msg = self.construct_base_msg(CommandType.ACK_NODE, tree_name, tree_uuid)
+        # TODO: grab user from kerberos?  Verify that user is who they say they are?
+        ack_node_mess = AckNodeMessage(
+            node_name_to_ack=node_name, user_acking_node=user
+        )
+        cmd_msg.ack_node.CopyFrom(ack_node_mess)
+        return cmd_msg
+
+    def construct_tick_rate_msg(
+        self,
+        tick_delay_ms: int,
+        tree_name: str,
+        tree_uuid: str,
+    ) -> CommandMessage:
+        cmd_msg = self.construct_base_msg(
+            CommandType.CHANGE_TICK_RATE_OF_TREE, tree_name, tree_uuid
+        )
+        cmd_msg.tick_rate_ms = tick_delay_ms
+        return cmd_msg
+
+    def construct_tick_configuration_msg(
+        self,
+        tick_config: str,
+        tick_delay_ms: Optional[int],
+        tick_timing: Optional[str],
+        tree_name: str,
+        tree_uuid: str,
+    ) -> CommandMessage:
+        cmd_msg = self.construct_base_msg(
+            CommandType.CHANGE_TICK_CONFIGURATION, tree_name, tree_uuid
+        )
+        tc = TickConfigurationMessage()
+        tc.tick_config = getattr(TickConfiguration, tick_config)
+        if tick_delay_ms is not None:
+            tc.delay_ms = tick_delay_ms
+        if tick_timing is not None:
+            tc.tick_timing = getattr(TickTiming, tick_timing)
+        cmd_msg.tick_config.CopyFrom(tc)
+        return cmd_msg
+
+    def construct_subscription(
+        self,
+        tree_names: Sequence[str],
+        tree_uuids: Sequence[Union[UUID, str]],
+        min_interval_ms: int,
+        include_details: bool,
+        include_status_deltas: bool,
+    ) -> TreeUpdateSubscription:
+        return TreeUpdateSubscription(
+            tree_ids=([NodeId(name=name) for name in tree_names]
+                      + [NodeId(uuid=str(uuid)) for uuid in tree_uuids]),
+            min_interval_ms=min_interval_ms,
+            include_details=include_details,
+            include_status_deltas=include_status_deltas,
+        )
+
+
+class RPCClient(BaseRPCClient):
+    """
+    Client for communicating with the BEAMS service via RPC
+
+    A single channel to the service is opened on first use, and shared by all
+    later calls (and threads).  If the service goes away the channel reconnects
+    by itself, with backoff.  Release the channel with ``close``, or by using
+    the client as a context manager.
+    """
+    BASE_COMMANDS: list[CommandType] = [
+        CommandType.START_TREE,
+        CommandType.TICK_TREE,
+        CommandType.PAUSE_TREE,
+        CommandType.UNLOAD_TREE,
+    ]
+
+    def __init__(
+        self,
+        address: str = "localhost",
+        port: int = 50051,
+    ):
+        super().__init__(address=address, port=port)
+
+        self._channel_lock = threading.Lock()
+        self._channel: Optional[grpc.Channel] = None
+        self._stub: Optional[BEAMS_rpcStub] = None
+        # the process the channel was opened in, channels do not survive a fork
+        self._channel_pid: Optional[int] = None
+
+    def __enter__(self) -> RPCClient:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_stub(self) -> BEAMS_rpcStub:
+        """Return the stub for the shared channel, opening it if necessary"""
+        with self._channel_lock:
+            if self._channel is not None and self._channel_pid != os.getpid():
+                # inherited from the parent process, which still owns it
+                self._channel = None
+            if self._channel is None:
+                logger.debug(f"Opening channel to {self.server_address}")
+                self._channel = grpc.insecure_channel(
+                    self.server_address, options=self.CHANNEL_OPTIONS
+                )
+                self._stub = BEAMS_rpcStub(self._channel)
+                self._channel_pid = os.getpid()
+            return self._stub
+
+    def close(self) -> None:
+        """
+        Close the shared channel, cancelling any calls or streams in progress.
+        The client may still be used afterwards, and will open a new channel.
+        """
+        with self._channel_lock:
+            channel, self._channel, self._stub = self._channel, None, None
+            if channel is not None and self._channel_pid == os.getpid():
+                channel.close()
+
+    def run(
+        self, command: str, **kwargs
+    ) -> Union[HeartBeatReply, TreeDetails, TreeUpdateStream]:
         """
         Run a command
 
@@ -163,9 +368,22 @@ class RPCClient:
         ValueError
             If an unknown command is provided
         """
-        if command.upper() == "GET_HEARTBEAT":
-            response = self.get_heartbeat()
-            return response
+        # These commands take no arguments
+        queries = {
+            "GET_HEARTBEAT": self.get_heartbeat,
+            "GET_SERVER_METRICS": self.get_server_metrics,
+        }
+        if command.upper() in queries:
+            return queries[command.upper()]()
+
+        if command.upper() == "SUBSCRIBE_TREE_UPDATES":
+            return self.subscribe_tree_updates(
+                tree_names=kwargs.get("tree_name") or (),
+                tree_uuids=kwargs.get("tree_uuid") or (),
+                min_interval_ms=kwargs.get("min_interval_ms", 0),
+                include_details=kwargs.get("include_details", False),
+                include_status_deltas=kwargs.get("include_status_deltas", False),
+            )
 
         # TODO: deal with none as tree name
         tree_name = kwargs.get("tree_name") or ""
@@ -178,6 +396,13 @@ class RPCClient:
         if command not in CommandType.values():
             raise ValueError(f"Unsupported command provided: {command}")
 
+        self._run_tree_command(command, tree_name, tree_uuid, kwargs)
+        return self.last_response
+
+    def _run_tree_command(
+        self, command: CommandType, tree_name: str, tree_uuid: str, kwargs: Dict[str, Any]
+    ) -> None:
+        """Send a command acting on a tree, see ``run``"""
         if command in self.BASE_COMMANDS:
             cmd_method = getattr(self, f"{CommandType.Name(command).lower()}")
             cmd_method(tree_name=tree_name, tree_uuid=tree_uuid)
@@ -187,50 +412,40 @@ class RPCClient:
                 tree_uuid=tree_uuid,
                 new_tree_filepath=kwargs["new_tree_filepath"],
                 tick_config=kwargs["tick_mode"],
-                tick_delay_ms=kwargs["tick_delay_ms"]
+                tick_delay_ms=kwargs["tick_delay_ms"],
+                tick_timing=kwargs.get("tick_timing", "FIXED_DELAY"),
+                replace=kwargs.get("replace", False),
+            )
+        elif command == CommandType.RELOAD_TREE:
+            self.reload_tree(
+                tree_name=tree_name,
+                tree_uuid=tree_uuid,
+                new_tree_filepath=kwargs["new_tree_filepath"],
             )
         elif command == CommandType.ACK_NODE:
             self.ack_node(
                 tree_name=tree_name,
                 node_name=kwargs["node_name"], user=kwargs["user"],
             )
-
-        return self.last_response
-
-    def construct_base_msg(
-        self,
-        command: CommandType,
-        tree_name: str,
-        tree_uuid: str,
-    ) -> CommandMessage:
-        """
-        Construct the base CommandMessage for RPC communication.  Some command
-        types may require additonal configuration of the message
-
-        Parameters
-        ----------
-        command : CommandType
-            The message subcommand type
-        tree_name : str
-            The name of the tree to manipulate
-        tree_uuid : str
-            The uuid of the tree to manipulate
-
-        Returns
-        -------
-        CommandMessage
-        """
-        # unpack the command type from arg parse
-        cmd_msg = CommandMessage(mess_t=MessageType.MESSAGE_TYPE_COMMAND_MESSAGE)
-        cmd_msg.command_t = command
-        cmd_msg.tree_name = tree_name
-        cmd_msg.tree_uuid = tree_uuid
-        return cmd_msg
+        elif command == CommandType.CHANGE_TICK_RATE_OF_TREE:
+            self.change_tick_rate_of_tree(
+                tree_name=tree_name,
+                tree_uuid=tree_uuid,
+                tick_delay_ms=kwargs["tick_delay_ms"],
+            )
+        elif command == CommandType.CHANGE_TICK_CONFIGURATION:
+            self.change_tick_configuration(
+                tree_name=tree_name,
+                tree_uuid=tree_uuid,
+                tick_config=kwargs["tick_mode"],
+                tick_delay_ms=kwargs.get("tick_delay_ms"),
+                tick_timing=kwargs.get("tick_timing"),
+            )
 
     def with_server_stub(func):
         """
-        Create rpc stub inside the grpc context as a decorator for commands
-        If stub is provided, then the context already exists, run as normal.
+        Provide the client's shared rpc stub to commands, as a decorator.
+        If stub is provided, then it is used instead.
         """
         @wraps(func)
         def wrapper(self, *args, stub: Optional[BEAMS_rpcStub] = None, **kwargs):
@@ -239,21 +454,17 @@ class RPCClient:
                                  f"{type(RPCClient)}, not {type(self)}")
 
             if stub is None:
-                # TODO: obviously not this. Grab from config
-                with grpc.insecure_channel(
-                    self.server_address,
-                    # Default ecs config uses psproxy, which doesn't work here
-                    options=(("grpc.enable_http_proxy", 0),)
-                ) as channel:
-                    stub = BEAMS_rpcStub(channel)
-                    return func(self, stub=stub, *args, **kwargs)
-            else:
-                return func(self, stub=stub, *args, **kwargs)
+                stub = self.get_stub()
+            return func(self, stub=stub, *args, **kwargs)
 
         return wrapper
 
     @with_server_stub
-    def get_heartbeat(self, stub: Optional[BEAMS_rpcStub] = None) -> HeartBeatReply:
+    def get_heartbeat(
+        self,
+        since_version: int = 0,
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> HeartBeatReply:
         """
         Get service heartbeat.  Currently this includes information on every
         tree running on the service.
@@ -262,13 +473,36 @@ class RPCClient:
 
         Parameters
         ----------
+        since_version : int, optional
+            The version of the last heartbeat received.  If the trees have not
+            changed since, the reply is marked ``not_modified`` and holds no
+            updates.  By default 0, always get every tree
         stub : Optional[BEAMS_rpcStub], optional
             the rpc stub used to send messages, by default None
         """
-        self.last_response = stub.request_heartbeat(Empty())
+        self.last_response = stub.request_heartbeat(
+            HeartBeatRequest(since_version=since_version)
+        )
         logger.debug(self.last_response)
         return self.last_response
 
+    @with_server_stub
+    def get_server_metrics(self, stub: Optional[BEAMS_rpcStub] = None) -> ServerMetrics:
+        """
+        Get the load on the service's RPC server: its backlog of RPCs and
+        commands, and the call counts and latencies of each RPC method.
+
+        If `stub` is not provided, this will create one based on client settings
+
+        Parameters
+        ----------
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+        """
+        response = stub.request_server_metrics(Empty())
+        logger.debug(response)
+        return response
+
     @with_server_stub
     def start_tree(
         self,
@@ -397,10 +631,14 @@ class RPCClient:
         tree_uuid: str = "",
         tick_config: str = "INTERACTIVE",
         tick_delay_ms: int = 5000,
+        tick_timing: str = "FIXED_DELAY",
+        replace: bool = False,
         stub: Optional[BEAMS_rpcStub] = None,
     ) -> HeartBeatReply:
         """
-        Load a new tree into the service.  Does not start the tree automatically.
+        Load a new tree into the service.  Does not start the tree automatically,
+        unless it replaces a running tree.  The tree is reported as LOADING
+        until it has loaded.
         One of `tree_name` or `tree_uuid` must be provided
 
         If `stub` is not provided, this will create one based on client settings
@@ -417,28 +655,64 @@ class RPCClient:
             The tick mode (INTERACTIVE, CONTINUOUS), by default INTERACTIVE
         tick_delay_ms : int, optional
             The delay between ticks in ms, by default 5000 (5s)
+        tick_timing : str, optional
+            How continuous tick deadlines are kept (FIXED_DELAY, FIXED_RATE_SKIP,
+            FIXED_RATE_CATCH_UP), by default FIXED_DELAY
+        replace : bool, optional
+            Whether to replace the loaded tree named `tree_name` once the new
+            tree has loaded, by default False.  The old tree keeps ticking
+            meanwhile, and is kept if the new tree fails to load
         stub : Optional[BEAMS_rpcStub], optional
             the rpc stub used to send messages, by default None
         """
         if not (tree_name or tree_uuid):
             raise ValueError("Must provide either tree_name or tree_uuid")
 
-        cmd_msg = self.construct_base_msg(CommandType.LOAD_NEW_TREE, tree_name, tree_uuid)
-        load_new_tree_mesg = LoadNewTreeMessage()
-        load_new_tree_mesg.tree_file_path = new_tree_filepath
-        # make tick config
-        tc = TickConfigurationMessage()
-        tc.tick_config = getattr(TickConfiguration, tick_config)
-        tc.delay_ms = tick_delay_ms
-        # pack em up
-        load_new_tree_mesg.tick_spec.CopyFrom(tc)
-        cmd_msg.load_new_tree.CopyFrom(load_new_tree_mesg)
+        cmd_msg = self.construct_load_new_tree_msg(
+            new_tree_filepath, tree_name, tree_uuid, tick_config, tick_delay_ms,
+            tick_timing, replace,
+        )
 
         # persist response
         self.last_response = stub.enqueue_command(cmd_msg)
         logger.debug(self.last_response)
         return self.last_response
 
+    @with_server_stub
+    def reload_tree(
+        self,
+        new_tree_filepath: str,
+        tree_name: str = "",
+        tree_uuid: str = "",
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> HeartBeatReply:
+        """
+        Reload a loaded tree from `new_tree_filepath`, rebuilding only the
+        parts of the tree that changed.  Unchanged nodes keep their state, and
+        a running tree keeps running.
+        One of `tree_name` or `tree_uuid` must be provided
+
+        If `stub` is not provided, this will create one based on client settings
+
+        Parameters
+        ----------
+        new_tree_filepath : str
+            Path to the serialized tree
+        tree_name : str
+            the name of the tree to reload
+        tree_uuid : str
+            the uuid of the tree to reload
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+        """
+        if not (tree_name or tree_uuid):
+            raise ValueError("Must provide either tree_name or tree_uuid")
+
+        cmd_msg = self.construct_reload_tree_msg(new_tree_filepath, tree_name, tree_uuid)
+        self.last_response = stub.enqueue_command(cmd_msg)
+        logger.debug(self.last_response)
+        return self.last_response
+
     @with_server_stub
     def ack_node(
         self,
@@ -474,18 +748,129 @@ class RPCClient:
         if not (tree_name or tree_uuid):
             raise ValueError("Must provide either tree_name or tree_uuid")
 
-        cmd_msg = self.construct_base_msg(CommandType.ACK_NODE, tree_name, tree_uuid)
-        # TODO: grab user from kerberos?  Verify that user is who they say they are?
-        ack_node_mess = AckNodeMessage(
-            node_name_to_ack=node_name, user_acking_node=user
-        )
-        cmd_msg.ack_node.CopyFrom(ack_node_mess)
+        cmd_msg = self.construct_ack_node_msg(tree_name, tree_uuid, node_name, user)
 
         # persist response
         self.last_response = stub.enqueue_command(cmd_msg)
         logger.debug(self.last_response)
         return self.last_response
 
+    @with_server_stub
+    def change_tick_rate_of_tree(
+        self,
+        tick_delay_ms: int,
+        tree_name: str = "",
+        tree_uuid: str = "",
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> HeartBeatReply:
+        """
+        Change the delay between ticks of a tree specified by either its name
+        or uuid.  Takes effect immediately, even mid-delay.
+
+        If `stub` is not provided, this will create one based on client settings
+
+        Parameters
+        ----------
+        tick_delay_ms : int
+            The new delay between ticks in ms
+        tree_name : str
+            Name of the tree to modify
+        tree_uuid: str
+            UUID of the tree to modify
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+        """
+        if not (tree_name or tree_uuid):
+            raise ValueError("Must provide either tree_name or tree_uuid")
+
+        cmd_msg = self.construct_tick_rate_msg(tick_delay_ms, tree_name, tree_uuid)
+
+        self.last_response = stub.enqueue_command(cmd_msg)
+        logger.debug(self.last_response)
+        return self.last_response
+
+    @with_server_stub
+    def change_tick_configuration(
+        self,
+        tick_config: str,
+        tick_delay_ms: Optional[int] = None,
+        tick_timing: Optional[str] = None,
+        tree_name: str = "",
+        tree_uuid: str = "",
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> HeartBeatReply:
+        """
+        Change the tick mode (and optionally the tick delay) of a tree specified
+        by either its name or uuid.
+
+        If `stub` is not provided, this will create one based on client settings
+
+        Parameters
+        ----------
+        tick_config : str
+            The tick mode (INTERACTIVE, CONTINUOUS)
+        tick_delay_ms : Optional[int], optional
+            The new delay between ticks in ms, by default None (unchanged)
+        tick_timing : Optional[str], optional
+            The new tick timing policy (FIXED_DELAY, FIXED_RATE_SKIP,
+            FIXED_RATE_CATCH_UP), by default None (unchanged)
+        tree_name : str
+            Name of the tree to modify
+        tree_uuid: str
+            UUID of the tree to modify
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+        """
+        if not (tree_name or tree_uuid):
+            raise ValueError("Must provide either tree_name or tree_uuid")
+
+        cmd_msg = self.construct_tick_configuration_msg(
+            tick_config, tick_delay_ms, tick_timing, tree_name, tree_uuid
+        )
+
+        self.last_response = stub.enqueue_command(cmd_msg)
+        logger.debug(self.last_response)
+        return self.last_response
+
+    @with_server_stub
+    def enqueue_commands(
+        self,
+        cmd_msgs: Sequence[CommandMessage],
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> HeartBeatReply:
+        """
+        Send several commands in a single request, e.g. to pause many trees at
+        once.  Commands are serviced in order for each tree, and redundant
+        commands (such as repeated ticks) may be coalesced by the service.
+
+        Messages can be made with the ``construct_*`` methods, for example:
+
+        .. code::
+
+            client.enqueue_commands([
+                client.construct_base_msg(CommandType.PAUSE_TREE, name, "")
+                for name in tree_names
+            ])
+
+        If `stub` is not provided, this will create one based on client settings
+
+        Parameters
+        ----------
+        cmd_msgs : Sequence[CommandMessage]
+            the commands to send
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+
+        Returns
+        -------
+        HeartBeatReply
+            Holding the update of each tree the commands act on
+        """
+        self.last_response = stub.enqueue_commands(CommandBatch(commands=cmd_msgs))
+        logger.debug(self.last_response)
+        return self.last_response
+
+    @with_server_stub
     def get_detailed_update(
         self,
         tree_name: Optional[str] = None,
@@ -517,13 +902,140 @@ class RPCClient:
             raise ValueError("Must provide either tree_name or tree_uuid")
 
         tree_id = NodeId(name=tree_name, uuid=str(tree_uuid))
-        if stub is None:
-            # TODO: obviously not this. Grab from config
-            with grpc.insecure_channel(self.server_address) as channel:
-                stub = BEAMS_rpcStub(channel)
-                resp = stub.request_tree_details(tree_id)
-        else:
-            resp = stub.request_tree_details(tree_id)
+        self.last_response = stub.request_tree_details(tree_id)
+        return self.last_response
 
-        self.last_response = resp
-        return resp
+    @with_server_stub
+    def get_tree_structure(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> TreeStructure:
+        """
+        Gets the structure of a tree from the service: its nodes in pre-order.
+        Trees can be identified by either their name or uuid, but at least one
+        of these must be provided.
+
+        Parameters
+        ----------
+        tree_name : Optional[str]
+            The name of the tree in question
+        tree_uuid : Optional[Union[UUID, str]]
+            The uuid of the tree in question.  May be a partial uuid (>= 5 characters)
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+
+        Returns
+        -------
+        TreeStructure
+            the nodes of the tree, which node statuses are indexed against
+        """
+        if not (tree_name or tree_uuid):
+            raise ValueError("Must provide either tree_name or tree_uuid")
+
+        self.last_response = stub.request_tree_structure(
+            NodeId(name=tree_name, uuid=str(tree_uuid))
+        )
+        return self.last_response
+
+    @with_server_stub
+    def get_tree_statuses(
+        self,
+        tree_name: Optional[str] = None,
+        tree_uuid: Optional[Union[UUID, str]] = "",
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> TreeStatusDelta:
+        """
+        Gets the status of every node in a tree, as a full TreeStatusDelta.
+        Used to (re)synchronize a TreeStatusMirror.
+
+        Parameters
+        ----------
+        tree_name : Optional[str]
+            The name of the tree in question
+        tree_uuid : Optional[Union[UUID, str]]
+            The uuid of the tree in question.  May be a partial uuid (>= 5 characters)
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+
+        Returns
+        -------
+        TreeStatusDelta
+            the node statuses, indexed by position in the tree's structure
+        """
+        if not (tree_name or tree_uuid):
+            raise ValueError("Must provide either tree_name or tree_uuid")
+
+        self.last_response = stub.request_tree_statuses(
+            NodeId(name=tree_name, uuid=str(tree_uuid))
+        )
+        return self.last_response
+
+    @with_server_stub
+    def subscribe_tree_updates(
+        self,
+        tree_names: Sequence[str] = (),
+        tree_uuids: Sequence[Union[UUID, str]] = (),
+        min_interval_ms: int = 0,
+        include_details: bool = False,
+        include_status_deltas: bool = False,
+        stub: Optional[BEAMS_rpcStub] = None,
+    ) -> TreeUpdateStream:
+        """
+        Stream updates for trees as they tick or change state.  The current
+        state of each watched tree is sent first.
+
+        Parameters
+        ----------
+        tree_names : Sequence[str], optional
+            Names of the trees to watch
+        tree_uuids : Sequence[Union[UUID, str]], optional
+            UUIDs of the trees to watch.  May be partial uuids (>= 5 characters).
+            If no names or uuids are provided, every tree is watched
+        min_interval_ms : int, optional
+            The minimum time between updates for any one tree.  Changes within
+            the interval are coalesced.  By default 0, every change is sent
+        include_details : bool, optional
+            Also stream TreeDetails when node statuses change, by default False
+        include_status_deltas : bool, optional
+            Also stream each tree's TreeStructure, followed by TreeStatusDeltas
+            holding only the node statuses that changed, by default False.
+            Much smaller than TreeDetails for large trees, see TreeStatusMirror
+        stub : Optional[BEAMS_rpcStub], optional
+            the rpc stub used to send messages, by default None
+
+        Returns
+        -------
+        TreeUpdateStream
+            An iterator of TreeUpdates, ``cancel`` it to end the subscription
+        """
+        subscription = self.construct_subscription(
+            tree_names, tree_uuids, min_interval_ms, include_details,
+            include_status_deltas,
+        )
+        return TreeUpdateStream(stub.subscribe_tree_updates(subscription))
+
+
+class TreeUpdateStream:
+    """
+    Iterator over the TreeUpdates of a subscribe_tree_updates stream.
+    ``cancel`` may be called from any thread, and ends the iteration.  Closing
+    the client also ends the stream.
+    """
+    def __init__(self, call: grpc.Future):
+        self.call = call
+
+    def __iter__(self) -> TreeUpdateStream:
+        return self
+
+    def __next__(self) -> TreeUpdate:
+        try:
+            return next(self.call)
+        except grpc.RpcError as ex:
+            if ex.code() == grpc.StatusCode.CANCELLED:
+                raise StopIteration
+            raise
+
+    def cancel(self) -> None:
+        self.call.cancel()
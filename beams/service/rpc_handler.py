@@ -1,131 +1,105 @@
+import asyncio
 import logging
-import time
-from concurrent import futures
-from dataclasses import dataclass, field
-from multiprocessing import Queue, Semaphore
-from multiprocessing.managers import BaseManager
-from typing import Callable, Dict, List, Optional, Tuple, Union
-from uuid import UUID, uuid4
+import queue
+import threading
+from typing import AsyncIterator, Iterator, List, Optional, Sequence, Union
+from uuid import UUID
 
 import grpc
 
+from beams.behavior_tree.action_node import (ActionExecution,
+                                             set_default_action_execution)
+from beams.behavior_tree.action_pool import configure_action_pool
+from beams.service.command_dispatcher import (PRIORITY_ORDER,
+                                              CommandDispatcher,
+                                              CommandSequencer, QueuedCommand,
+                                              get_command_priority)
+from beams.service.heartbeat_cache import HeartbeatCache
+from beams.service.helpers.queue import PriorityQueue
 from beams.service.helpers.worker import Worker
 from beams.service.remote_calls.beams_rpc_pb2_grpc import (
     BEAMS_rpcServicer, add_BEAMS_rpcServicer_to_server)
 from beams.service.remote_calls.behavior_tree_pb2 import (
-    BehaviorTreeUpdateMessage, NodeId, TreeDetails)
-from beams.service.remote_calls.command_pb2 import CommandMessage, CommandType
-from beams.service.remote_calls.generic_message_pb2 import MessageType
-from beams.service.remote_calls.heartbeat_pb2 import HeartBeatReply
-from beams.service.tree_ticker import TreeState, TreeTicker
+    BehaviorTreeUpdateMessage, NodeId, TreeDetails, TreeStatusDelta,
+    TreeStructure)
+from beams.service.remote_calls.command_pb2 import CommandBatch, CommandMessage
+from beams.service.remote_calls.generic_message_pb2 import Empty, MessageType
+from beams.service.remote_calls.heartbeat_pb2 import (HeartBeatReply,
+                                                      HeartBeatRequest,
+                                                      TreeUpdate,
+                                                      TreeUpdateSubscription)
+from beams.service.remote_calls.server_metrics_pb2 import ServerMetrics
+from beams.service.server_metrics import (AsyncMetricsInterceptor,
+                                          MeteredThreadPoolExecutor,
+                                          MetricsInterceptor,
+                                          ServerMetricsRecorder)
+from beams.service.server_options import ServerOptions
+from beams.service.tree_host import HeartbeatSnapshot, TreeHost, TreeHostClient
+from beams.service.tree_registry import TreeIdKey  # noqa: F401
+from beams.service.tree_scheduler import TreeScheduler
+from beams.service.tree_subscriptions import UpdateBroadcaster
+from beams.tree_config.pv_monitor import configure_pv_cache
 
 logger = logging.getLogger(__name__)
 
-
-@dataclass(frozen=True)
-class TreeIdKey:
-    """
-    Tree ID information bundle.
-
-    Name exists for readability primarily, and comparisons are first made on
-    the uuid, then the name.
-    Partial uuids (str) matching the beginning of an instance's uuid are
-    considered equal to the instance (for ease of matching).
-
-    When used as a dictionary key, items can be accessed with either:
-    - a TreeIdKey with the correct UUID
-    - a matching UUID directly
-
-    Note that this does not let you use partial strings to match dictionary keys
-    via the `in` keyword, since __contains__ uses hashes
-    """
-    name: str
-    uuid: UUID = field(default_factory=uuid4)
-
-    def __hash__(self) -> int:
-        # allow quick lookups by specifying uuid
-        return hash(self.uuid)
-
-    def __eq__(self, other) -> bool:
-        # Require partial strings to be greater than 5 to avoid collisions
-        # Eventually maybe somebody does some stats to figure out what a good
-        # threshold is (birthday paradox)
-        if isinstance(other, str):
-            if len(other) >= 5:
-                uuid_match = str(self.uuid).startswith(other)
-            else:
-                uuid_match = False
-            name_match = (self.name == other)
-            return uuid_match or name_match
-        elif isinstance(other, UUID):
-            return self.uuid == other
-        elif isinstance(other, TreeIdKey):
-            return self.uuid == other.uuid
-        return False
-
-
-TreeTickerDict = Dict[TreeIdKey, TreeTicker]
-
-
-def get_tree_from_treetickerdict(
-    tree_dict: TreeTickerDict,
-    name: Optional[str] = None,
-    uuid: Optional[Union[UUID, str]] = None,
-) -> Union[Tuple[TreeIdKey, TreeTicker], Tuple[None, None]]:
-    """
-    Returns TreeIdKey and TreeTicker from `tree_dict` to best effort.
-    In order of priority:
-    1. Check for uuid full match
-    2. Check for uuid partial match
-    3. Check for tree name full match
-
-    Returns the first match it finds, in the case of collisions
-    Returns None if no match can be found
-    """
-    # `tree_dict` is often actually a multiprocessing.BaseProxy, which only exposes
-    # methods, not attributes (or subscripting).  Also, the way we use this
-    # the values of the dictionary are frequently AutoProxy[TreeTicker],
-    # which cannot be checked for identity against itself.
-    # So in the end we do this the slow and silly way
-    if not (name or uuid):
-        raise ValueError("One of `name` and `uuid` must be provided")
-
-    if isinstance(uuid, str) and len(uuid) < 5 and uuid != "":
-        raise ValueError("Partial uuids must provide at least "
-                         f"5 characters, got ({uuid})")
-
-    for key, value in tree_dict.items():
-        # covers partial uuids, full uuids (string or object)
-        if key == uuid:
-            return key, value
-        elif key == name:
-            return key, value
-
-    return None, None
+# The most commands taken from the queue at once by BeamsService
+COMMAND_BATCH_SIZE = 32
+# Time given to RPCs in progress when the server is stopped
+SERVER_STOP_GRACE_SEC = 0.25
 
 
 class RPCHandler(BEAMS_rpcServicer, Worker):
-    def __init__(self, sync_manager: BaseManager, port=50051):
+    def __init__(
+        self,
+        tree_host: Optional[TreeHostClient],
+        port=50051,
+        max_subscribers: int = 64,
+        server_options: Optional[ServerOptions] = None,
+    ):
         # GRPC server launching things from docs:
         # https://grpc.io/docs/languages/python/basics/#starting-the-server
-        self.thread_pool = futures.ThreadPoolExecutor(max_workers=10)
-        self.server = grpc.server(self.thread_pool)
+        # The server itself is created in the work process, see work_func
+        self.server_options = server_options or ServerOptions()
         self.server_port = port
-
-        # calling Worker's super
+        # Each subscriber's stream holds a thread for its lifetime, on top of
+        # those serving unary requests
+        self.thread_pool = MeteredThreadPoolExecutor(
+            max_workers=self.server_options.max_workers + max_subscribers
+        )
+        self.metrics = ServerMetricsRecorder()
+        # heartbeats are served from a snapshot shared by every client
+        self.heartbeat_cache = HeartbeatCache(
+            get_snapshot=self.get_heartbeat_snapshot,
+            max_staleness_ms=self.server_options.heartbeat_max_staleness_ms,
+        )
+
+        # calling Worker's super.  The work process stops its own server
         super().__init__(proc_name="RPCHandler",
-                         stop_func=lambda: self.server.stop(1),
                          grace_window_before_terminate_seconds=.5)
 
-        self.sync_man = sync_manager
-        if sync_manager is not None:  # for testing modularity purposes
-            # process safe dictionary given by BEAMSService so we can appropriately respond with heartbeat
-            logger.debug(f"Connecting to sync_man at: {self.sync_man.address}")
-            self.sync_man.connect()
-
-        # queue for owning object to grab commands s
-        self.incoming_command_queue = Queue()
-        self.command_ready_sem = Semaphore(value=0)
+        # the process holding the trees, given by BeamsService so we can
+        # appropriately respond with heartbeat.  None for testing modularity
+        self.tree_host = tree_host
+
+        # queue for owning object to grab commands, as QueuedCommands.  Urgent
+        # commands are taken first, see get_command_priority.  Shared with the
+        # owning process, which must unlink it
+        self.incoming_command_queue = PriorityQueue(PRIORITY_ORDER)
+        # numbers each tree's commands in the order they arrive, keyed on the
+        # tree's uuid in the host's registry
+        self.command_sequencer = CommandSequencer(
+            resolve=tree_host.lookup_key if tree_host is not None else None
+        )
+        self.command_sequencer_lock = threading.Lock()
+
+        # pushes tree updates to subscribe_tree_updates streams
+        self.broadcaster = UpdateBroadcaster(
+            get_updates=self.get_all_tree_updates,
+            get_details=self.request_tree_details_by_id,
+            max_subscribers=max_subscribers,
+            get_structure=self.request_tree_structure_by_id,
+            get_statuses=self.request_tree_statuses_by_id,
+        )
 
     # NOTE: these could also live and work in a process spawned by beams service..
     # returns a single bt update as a list...
@@ -134,67 +108,50 @@ class RPCHandler(BEAMS_rpcServicer, Worker):
         tree_name: Optional[str] = None,
         tree_uuid: Optional[Union[UUID, str]] = None,
     ) -> List[BehaviorTreeUpdateMessage]:
-        if self.sync_man is None:  # for testing modularity
+        if self.tree_host is None:  # for testing modularity
+            return []
+        update = self.tree_host.get_tree_update(name=tree_name, uuid=tree_uuid)
+        if update is not None:
+            return [update]
+        else:
+            logger.error(f"Unable to find tree of name {tree_name} currently being ticked")
             return []
-        with self.sync_man as man:
-            tree_dict: TreeTickerDict = man.get_tree_dict()
-            key, tree_ticker = get_tree_from_treetickerdict(
-                tree_dict, name=tree_name, uuid=tree_uuid
-            )
-            if key and tree_ticker:
-                update = tree_ticker.get_behavior_tree_update()
-                # replace tree_id with information that can identify tree in service
-                return [BehaviorTreeUpdateMessage(
-                    mess_t=update.mess_t,
-                    tree_id=NodeId(name=key.name, uuid=str(key.uuid)),
-                    node_id=update.node_id,
-                    tick_status=update.tick_status,
-                    tick_config=update.tick_config,
-                    tick_delay_ms=update.tick_delay_ms,
-                    tree_status=update.tree_status,
-
-                )]
-            else:
-                logger.error(f"Unable to find tree of name {tree_name} currently being ticked")
-                return []
 
     def get_all_tree_updates(self) -> List[BehaviorTreeUpdateMessage]:
-        if self.sync_man is None:  # for testing modularity
+        if self.tree_host is None:  # for testing modularity
             return []
 
-        with self.sync_man as man:
-            tree_dict: TreeTickerDict = man.get_tree_dict()
-            # if dictionary empty return none
-            if len(tree_dict.items()) == 0:
-                return []
-
-            updates = []
-            for key, tree_ticker in tree_dict.items():
-                update = tree_ticker.get_behavior_tree_update()
-                update_msg = BehaviorTreeUpdateMessage(
-                    mess_t=update.mess_t,
-                    tree_id=NodeId(name=key.name, uuid=str(key.uuid)),
-                    node_id=update.node_id,
-                    tick_status=update.tick_status,
-                    tick_config=update.tick_config,
-                    tick_delay_ms=update.tick_delay_ms,
-                    tree_status=update.tree_status,
-                )
-                updates.append(update_msg)
-
-            return updates
+        # a single round trip, regardless of how many trees are loaded
+        return self.tree_host.get_tree_updates()
+
+    def _enqueue(self, requests: Sequence[CommandMessage]) -> None:
+        """Number and queue ``requests`` for the owning BeamsService, in order"""
+        # blocks while the queue is full, a sequenced command must not be
+        # dropped or the dispatcher will hold the tree's later commands
+        with self.command_sequencer_lock:
+            for request in requests:
+                if request.mess_t != MessageType.MESSAGE_TYPE_COMMAND_MESSAGE:
+                    logger.error("You seriously messed up, reevlauate your life choices")
+                    continue
+                command = self.command_sequencer.next(request)
+                try:
+                    self.incoming_command_queue.put(command,
+                                                    get_command_priority(request))
+                except ValueError as ex:
+                    # too large for the queue, the tree's later commands must
+                    # not wait for it
+                    self.command_sequencer.cancel(command)
+                    logger.error(f"Dropped command of type: {request.command_t} "
+                                 f"for {request.tree_name}: {ex}")
+                    continue
+                logger.debug(f"Command of type: {request.command_t} enqueued for "
+                             f"{request.tree_name}")
 
     def enqueue_command(self, request: CommandMessage, context) -> HeartBeatReply:
-        mess_t = request.mess_t
-        if mess_t != MessageType.MESSAGE_TYPE_COMMAND_MESSAGE:
-            logger.error("You seriously messed up, reevlauate your life choices")
-        else:
-            self.incoming_command_queue.put(request)
-            logger.debug(f"Command of type: {request.command_t} enqueued for {request.tree_name}")
-            self.command_ready_sem.release()
+        self._enqueue([request])
 
-        bt_update = None
-        if self.sync_man is not None:  # for testing modularity
+        bt_update = []
+        if self.tree_host is not None:  # for testing modularity
             bt_update = self.attempt_to_get_tree_update(request.tree_name, request.tree_uuid)
 
         hbeat_message = HeartBeatReply(mess_t=MessageType.MESSAGE_TYPE_HEARTBEAT)
@@ -203,21 +160,40 @@ class RPCHandler(BEAMS_rpcServicer, Worker):
         hbeat_message.behavior_tree_update.extend(bt_update)
         return hbeat_message
 
-    def request_heartbeat(self, request, context) -> HeartBeatReply:
-        # assumption that hitting this service endpoint means you want to know
-        # ALL the trees this service is currently ticking
+    def enqueue_commands(self, request: CommandBatch, context) -> HeartBeatReply:
+        """
+        Enqueue a batch of commands, replying with the update of each tree
+        they act on, gathered in a single round trip to the tree host
+        """
+        self._enqueue(request.commands)
 
-        # TODO: it is placing like here that I am not happy with the distance
-        # of the py_trees vs GRPC object, reflect on this
-        # for example: how could we keep thee py_tree treename and this one aligned?
-        updates = self.get_all_tree_updates()
+        bt_updates = []
+        if self.tree_host is not None:  # for testing modularity
+            tree_ids = dict.fromkeys((command.tree_name, command.tree_uuid)
+                                     for command in request.commands)
+            bt_updates = self.tree_host.get_tree_updates(tree_ids=list(tree_ids))
 
         hbeat_message = HeartBeatReply(mess_t=MessageType.MESSAGE_TYPE_HEARTBEAT)
         hbeat_message.reply_timestamp.GetCurrentTime()
 
-        hbeat_message.behavior_tree_update.extend(updates)
+        hbeat_message.behavior_tree_update.extend(bt_updates)
         return hbeat_message
 
+    def get_heartbeat_snapshot(self, since_version: int) -> HeartbeatSnapshot:
+        if self.tree_host is None:  # for testing modularity
+            return HeartbeatSnapshot(0, [])
+
+        return self.tree_host.get_heartbeat(since_version)
+
+    def request_heartbeat(self, request: HeartBeatRequest, context) -> HeartBeatReply:
+        # assumption that hitting this service endpoint means you want to know
+        # ALL the trees this service is currently ticking
+
+        # TODO: it is placing like here that I am not happy with the distance
+        # of the py_trees vs GRPC object, reflect on this
+        # for example: how could we keep thee py_tree treename and this one aligned?
+        return self.heartbeat_cache.get_since(request.since_version)
+
     def request_tree_details(self, request: NodeId, context) -> TreeDetails:
         """
         Gather tree details for the node ID provided
@@ -232,150 +208,266 @@ class RPCHandler(BEAMS_rpcServicer, Worker):
         TreeDetails
             The details of the requested tree
         """
-        with self.sync_man as manager:
-            tree_dict: TreeTickerDict = manager.get_tree_dict()
-            key, tree_ticker = get_tree_from_treetickerdict(tree_dict, request.name,
-                                                            request.uuid)
-            if tree_ticker and key:
-                details = tree_ticker.get_detailed_update()
-
-                # repackage into new message with the right details
-                new_details = TreeDetails(
-                    tree_id=NodeId(name=key.name, uuid=str(key.uuid)),
-                    node_info=details.node_info,
-                    tree_status=details.tree_status,
-                )
-                return new_details
+        return self.request_tree_details_by_id(request)
 
+    def request_tree_details_by_id(self, request: NodeId) -> TreeDetails:
+        if self.tree_host is None:  # for testing modularity
             return TreeDetails()
 
+        return self.tree_host.get_tree_details(request.name, request.uuid)
+
+    def request_tree_structure(self, request: NodeId, context) -> TreeStructure:
+        """
+        Gather the structure of the tree identified by ``request``.  Node
+        statuses are indexed by position in TreeStructure.nodes, see
+        ``request_tree_statuses``
+
+        Parameters
+        ----------
+        request : NodeId
+            The identification
+
+        Returns
+        -------
+        TreeStructure
+            The nodes of the requested tree, in pre-order
+        """
+        return self.request_tree_structure_by_id(request)
+
+    def request_tree_structure_by_id(self, request: NodeId) -> TreeStructure:
+        if self.tree_host is None:  # for testing modularity
+            return TreeStructure()
+
+        return self.tree_host.get_tree_structure(request.name, request.uuid)
+
+    def request_tree_statuses(self, request: NodeId, context) -> TreeStatusDelta:
+        """
+        Gather the status of every node in the tree identified by
+        ``request``, as a full TreeStatusDelta.  Used to (re)synchronize
+        clients following status deltas
+
+        Parameters
+        ----------
+        request : NodeId
+            The identification
+
+        Returns
+        -------
+        TreeStatusDelta
+            The node statuses of the requested tree
+        """
+        return self.request_tree_statuses_by_id(request)
+
+    def request_tree_statuses_by_id(self, request: NodeId) -> TreeStatusDelta:
+        if self.tree_host is None:  # for testing modularity
+            return TreeStatusDelta()
+
+        return self.tree_host.get_tree_statuses(request.name, request.uuid)
+
+    def subscribe_tree_updates(
+        self,
+        request: TreeUpdateSubscription,
+        context: grpc.ServicerContext,
+    ) -> Iterator[TreeUpdate]:
+        """
+        Stream updates for the requested trees as they tick or change state.
+        The current state of each tree is sent first.
+
+        Parameters
+        ----------
+        request : TreeUpdateSubscription
+            The trees to watch, and how often to send updates
+
+        Yields
+        ------
+        TreeUpdate
+            BehaviorTreeUpdateMessages, TreeDetails or TreeStructures and
+            TreeStatusDeltas (if requested) and notices of trees being unloaded
+        """
+        subscriber = self.broadcaster.subscribe(request)
+        if subscriber is None:
+            context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                          "Too many subscribers, try again later")
+
+        try:
+            # wake periodically to notice cancelled streams and shutdown
+            while context.is_active() and self.do_work.value:
+                yield from subscriber.next_updates(timeout=1.0)
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+
+    async def subscribe_tree_updates_aio(
+        self,
+        request: TreeUpdateSubscription,
+        context: grpc.aio.ServicerContext,
+    ) -> AsyncIterator[TreeUpdate]:
+        """
+        ``subscribe_tree_updates`` for a ``grpc.aio`` server.  grpc.aio runs
+        sync generators on a thread that never finishes if the stream is
+        cancelled, so updates are awaited on the thread pool instead.
+        """
+        subscriber = self.broadcaster.subscribe(request)
+        if subscriber is None:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED,
+                                "Too many subscribers, try again later")
+
+        loop = asyncio.get_running_loop()
+        try:
+            while not subscriber.closed and self.do_work.value:
+                updates = await loop.run_in_executor(
+                    self.thread_pool, subscriber.next_updates, 1.0
+                )
+                for update in updates:
+                    yield update
+        finally:
+            # also wakes the pending next_updates of a cancelled stream
+            self.broadcaster.unsubscribe(subscriber)
+
+    def request_server_metrics(self, request: Empty, context) -> ServerMetrics:
+        """Report the load on this server, and the latency of each method"""
+        return self.metrics.get_server_metrics(
+            executor=self.thread_pool,
+            command_queue_depth=self.incoming_command_queue.qsize(),
+        )
+
     def work_func(self):
         logger.debug(f"{self.proc_name} running")
+        if self.server_options.use_aio:
+            asyncio.run(self.serve_aio())
+        else:
+            self.serve()
+        logger.debug("RPCHandler work_func exitted")
+
+    def serve(self):
+        """Serve with a threaded ``grpc.server`` until work is stopped"""
+        self.server = grpc.server(
+            self.thread_pool,
+            interceptors=[MetricsInterceptor(self.metrics)],
+            options=self.server_options.get_channel_options(),
+            maximum_concurrent_rpcs=self.server_options.maximum_concurrent_rpcs,
+        )
         add_BEAMS_rpcServicer_to_server(self, self.server)
         self.server.add_insecure_port(f"[::]:{self.server_port}")  # note: binding to localhost implicitly
         self.server.start()
         logger.debug("Server started, listening on " + str(self.server_port))
         while self.do_work.value:
-            time.sleep(0.1)
-        logger.debug("RPCHandler work_func exitted")
+            # True if it timed out, False if the server terminated by itself
+            if not self.server.wait_for_termination(timeout=0.1):
+                break
+        self.server.stop(SERVER_STOP_GRACE_SEC).wait()
+
+    async def serve_aio(self):
+        """
+        Serve with a ``grpc.aio`` server until work is stopped.  The servicer's
+        methods still run on the thread pool, except for subscriptions
+        """
+        # only this process serves, so the override is not seen elsewhere
+        self.subscribe_tree_updates = self.subscribe_tree_updates_aio
+        self.server = grpc.aio.server(
+            migration_thread_pool=self.thread_pool,
+            interceptors=[AsyncMetricsInterceptor(self.metrics)],
+            options=self.server_options.get_channel_options(),
+            maximum_concurrent_rpcs=self.server_options.maximum_concurrent_rpcs,
+        )
+        add_BEAMS_rpcServicer_to_server(self, self.server)
+        self.server.add_insecure_port(f"[::]:{self.server_port}")
+        await self.server.start()
+        logger.debug("aio server started, listening on " + str(self.server_port))
+        while self.do_work.value:
+            if not await self.server.wait_for_termination(timeout=0.1):
+                break
+        await self.server.stop(SERVER_STOP_GRACE_SEC)
 
 
 class BeamsService(Worker):
-    def __init__(self):
+    def __init__(
+        self,
+        scheduler_workers: int = 0,
+        server_options: Optional[ServerOptions] = None,
+        action_pool_size: int = 0,
+        pv_max_age_sec: Optional[float] = None,
+    ):
+        """
+        Parameters
+        ----------
+        scheduler_workers : int, optional
+            The number of TreeScheduler processes to tick trees in.  If 0 (the
+            default), each tree is ticked in its own TreeTicker process.
+        server_options : Optional[ServerOptions], optional
+            Settings for the gRPC server, gRPC's defaults if omitted
+        action_pool_size : int, optional
+            If positive, ActionNodes run their work on a pool of this many
+            processes per tree-ticking process, rather than on a process of
+            their own.  By default 0
+        pv_max_age_sec : Optional[float], optional
+            How old the monitored PV values read by trees may be before they
+            are read from the IOC again.  If None (the default), monitored
+            values are used for as long as the PV is connected
+        """
+        self.server_options = server_options
         # TODO: make a singleton. Make process safe by leaving artifact file
-        super().__init__("BeamsService", grace_window_before_terminate_seconds=0.5)
-
-        class SyncMan(BaseManager):
-            def __init__(self, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                # For type hinting purposes only
-                self.TreeTicker: type[TreeTicker]
-                self.TreeState: type[TreeState]
-                self.get_tree_dict: Callable[[], TreeTickerDict]
-
-        self.tree_dict = {}
-        SyncMan.register("TreeTicker", TreeTicker)
-        SyncMan.register("TreeState", TreeState)
-        SyncMan.register("get_tree_dict", callable=lambda: self.tree_dict)
-
-        self.sync_man = SyncMan()
-        self.sync_man.start()
-        logger.debug(f"Sync Man starting at: {self.sync_man.address}")
+        super().__init__("BeamsService", stop_func=lambda: self.tree_host.stop_work(),
+                         grace_window_before_terminate_seconds=0.5)
+
+        if action_pool_size > 0:
+            # inherited by the TreeHost and schedulers
+            configure_action_pool(action_pool_size)
+            set_default_action_execution(ActionExecution.POOL)
+        # inherited by every process reading PVs
+        configure_pv_cache(pv_max_age_sec)
+
+        # Schedulers must exist before the TreeHost starts, so that the host
+        # process inherits their command queues
+        self.schedulers: List[TreeScheduler] = [
+            TreeScheduler(proc_name=f"TreeScheduler{i}")
+            for i in range(scheduler_workers)
+        ]
+
+        # holds the trees, commands and queries are sent to it over tree_host_client
+        self.tree_host = TreeHost(schedulers=self.schedulers)
+        self.tree_host_client = self.tree_host.get_client()
+        self.tree_host.start_work()
+        logger.debug(f"TreeHost listening at: {self.tree_host.address}")
+
+        for scheduler in self.schedulers:
+            scheduler.start_work()
 
     # mechanism to send shutdown signal to trees
     def join_all_trees(self):
-        with self.sync_man as man:
-            tree_dict = man.get_tree_dict()
-            for tree_name, tree in tree_dict.items():
-                logger.debug(f"Cleaning up tree of name {tree_name}")
-                tree.stop_work()
-                tree.shutdown()
+        self.tree_host_client.shutdown_trees()
+
+        for scheduler in self.schedulers:
+            scheduler.stop_work()
 
     def work_func(self):
-        self.grpc_service = RPCHandler(sync_manager=self.sync_man)
+        self.grpc_service = RPCHandler(tree_host=self.tree_host_client,
+                                       server_options=self.server_options)
         self.grpc_service.start_work()
+        # long running commands (loads) are serviced off of this loop
+        self.dispatcher = CommandDispatcher(service=self.tree_host_client.send_command)
 
-        # the job of this work function will be to consume messages and update
-        # the managed trees
+        # the job of this work function will be to consume messages and
+        # forward them to the trees
         while (self.do_work.value):
             try:
-                # block untill we get something to work on
-                if self.grpc_service.command_ready_sem.acquire(timeout=0.2):
-                    request: CommandMessage = self.grpc_service.incoming_command_queue.get()
-                    logger.debug(f"inbound command {request}")
-
-                    if (request.command_t == CommandType.LOAD_NEW_TREE):
-                        self.load_new_tree(request)
-                    elif (request.command_t == CommandType.START_TREE):
-                        self.start_tree(request)
-                    elif (request.command_t == CommandType.PAUSE_TREE):
-                        self.pause_tree(request)
-                    elif (request.command_t == CommandType.TICK_TREE):
-                        self.tick_tree(request)
-                    elif (request.command_t == CommandType.ACK_NODE):
-                        self.acknowledge_node(request)
+                # block untill we get something to work on, then take
+                # whatever else has arrived in one go
+                commands: List[QueuedCommand] = \
+                    self.grpc_service.incoming_command_queue.get_many(
+                        COMMAND_BATCH_SIZE, timeout=0.2
+                    )
+            except queue.Empty:
+                continue
 
+            try:
+                for command in commands:
+                    logger.debug(f"inbound command {command[-1]}")
+                # coalesces redundant commands within the batch
+                self.dispatcher.dispatch_many(commands)
             except Exception:
                 logger.exception('Exception caught')
+        # the RPCHandler process keeps its mapping of the queue, free it
+        # before the (slower) shutdown of the handler
+        self.grpc_service.incoming_command_queue.unlink()
+        self.dispatcher.shutdown(wait=False)
         self.grpc_service.stop_work()
-
-    def load_new_tree(self, request: CommandMessage) -> None:
-        with self.sync_man as man:
-            tick_config_mess = request.load_new_tree.tick_spec
-            init_state = man.TreeState(
-                tick_delay_ms=tick_config_mess.delay_ms,
-                tick_config=tick_config_mess.tick_config
-            )
-            x = man.TreeTicker(filepath=request.load_new_tree.tree_file_path,
-                               init_tree_state=init_state)
-            tree_dict = man.get_tree_dict()
-
-            # New trees won't have uuids, but likely have names
-            tree_id = TreeIdKey(name=request.tree_name)
-            tree_dict.update({tree_id: x})
-            logger.debug(f"Loaded tree ({request.tree_name}) from filepath: "
-                         f"{request.load_new_tree.tree_file_path}.  Explcit "
-                         "START_TREE command needed to begin ticking.")
-
-    def start_tree(self, request: CommandMessage) -> None:
-        with self.sync_man as man:
-            # get tree
-            tree_dict = man.get_tree_dict()
-            _, tree_ticker = get_tree_from_treetickerdict(
-                tree_dict, name=request.tree_name, uuid=request.tree_uuid,
-            )
-            if tree_ticker is not None:
-                tree_ticker.start_tree()
-
-    def pause_tree(self, request: CommandMessage) -> None:
-        with self.sync_man as man:
-            # get tree
-            tree_dict = man.get_tree_dict()
-            _, tree_ticker = get_tree_from_treetickerdict(
-                tree_dict, name=request.tree_name, uuid=request.tree_uuid,
-            )
-            if tree_ticker is not None:
-                tree_ticker.pause_tree()
-
-    def tick_tree(self, request: CommandMessage) -> None:
-        with self.sync_man as man:
-            # get tree
-            tree_dict = man.get_tree_dict()
-            _, tree_ticker = get_tree_from_treetickerdict(
-                tree_dict, name=request.tree_name, uuid=request.tree_uuid,
-            )
-            if tree_ticker is not None:
-                tree_ticker.command_tick()
-
-    def acknowledge_node(self, request: CommandMessage):
-        node_name_to_ack = request.ack_node.node_name_to_ack
-        user_acking_node = request.ack_node.user_acking_node
-        with self.sync_man as man:
-            tree_dict = man.get_tree_dict()
-            _, tree_ticker = get_tree_from_treetickerdict(
-                tree_dict, name=request.tree_name, uuid=request.tree_uuid,
-            )
-            if tree_ticker is not None:
-                tree_ticker.acknowledge_node(
-                    node_name_to_ack, user_acking_node
-                )
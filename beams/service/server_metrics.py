@@ -0,0 +1,259 @@
+"""
+Load and latency metrics for the BEAMS service's gRPC server.
+
+``MeteredThreadPoolExecutor`` counts the RPCs waiting for, and running on, the
+server's worker threads.  ``ServerMetricsRecorder`` keeps call counts and
+recent latencies for each RPC method, recorded by wrapping the server's method
+handlers with ``MetricsInterceptor`` (or ``AsyncMetricsInterceptor`` for a
+``grpc.aio`` server).  Together they make up the ServerMetrics reported by
+``request_server_metrics``.
+"""
+import asyncio
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent import futures
+from typing import (Any, AsyncIterator, Callable, Deque, Dict, Iterator, List,
+                    Optional, Tuple)
+
+import grpc
+
+from beams.service.helpers.tick_clock import percentile
+from beams.service.remote_calls.server_metrics_pb2 import (MethodMetrics,
+                                                           ServerMetrics)
+
+
+class MeteredThreadPoolExecutor(futures.ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that counts its queued and running work items, so the
+    backlog of a gRPC server using it can be reported.
+    """
+    def __init__(self, max_workers: int, **kwargs):
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.max_workers = max_workers
+        self._count_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+
+    def submit(self, fn: Callable[..., Any], /, *args, **kwargs) -> futures.Future:
+        with self._count_lock:
+            self.queued += 1
+        try:
+            return super().submit(self._run, fn, *args, **kwargs)
+        except Exception:
+            with self._count_lock:
+                self.queued -= 1
+            raise
+
+    def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._count_lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._count_lock:
+                self.active -= 1
+
+
+class MethodStats:
+    """Counts and recent latencies (in seconds) of calls to one method"""
+    def __init__(self, history_size: int):
+        self.call_count = 0
+        self.error_count = 0
+        self.in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=history_size)
+
+
+class ServerMetricsRecorder:
+    """
+    Per-method call metrics of a gRPC server.  Thread safe.
+
+    Parameters
+    ----------
+    history_size : int, optional
+        The number of recent calls to each method used for latency
+        percentiles, by default 256
+    """
+    def __init__(self, history_size: int = 256):
+        self.history_size = history_size
+        self.lock = threading.Lock()
+        self.methods: Dict[str, MethodStats] = {}
+        # method -> (handler, the handler wrapped to record metrics)
+        self._wrapped: Dict[str, Tuple[grpc.RpcMethodHandler, grpc.RpcMethodHandler]] = {}
+
+    def start_call(self, method: str) -> float:
+        """Record the start of a call, returning its start time"""
+        with self.lock:
+            stats = self.methods.get(method)
+            if stats is None:
+                stats = self.methods[method] = MethodStats(self.history_size)
+            stats.call_count += 1
+            stats.in_flight += 1
+        return time.monotonic()
+
+    def end_call(self, method: str, start: float, failed: bool) -> None:
+        """Record the end of a call started at ``start``"""
+        latency = time.monotonic() - start
+        with self.lock:
+            stats = self.methods[method]
+            stats.in_flight -= 1
+            stats.latencies.append(latency)
+            if failed:
+                stats.error_count += 1
+
+    def get_method_metrics(self) -> List[MethodMetrics]:
+        """The metrics of every method called so far, sorted by method"""
+        with self.lock:
+            snapshot = [
+                (method, stats.call_count, stats.error_count, stats.in_flight,
+                 list(stats.latencies))
+                for method, stats in self.methods.items()
+            ]
+
+        method_metrics = []
+        for method, call_count, error_count, in_flight, latencies in sorted(snapshot):
+            latencies_ms = sorted(latency * 1000 for latency in latencies)
+            method_metrics.append(MethodMetrics(
+                method=method,
+                call_count=call_count,
+                error_count=error_count,
+                in_flight=in_flight,
+                latency_p50_ms=percentile(latencies_ms, 50),
+                latency_p90_ms=percentile(latencies_ms, 90),
+                latency_p99_ms=percentile(latencies_ms, 99),
+                latency_max_ms=latencies_ms[-1] if latencies_ms else 0.0,
+            ))
+        return method_metrics
+
+    def get_server_metrics(
+        self,
+        executor: Optional[MeteredThreadPoolExecutor] = None,
+        command_queue_depth: int = 0,
+    ) -> ServerMetrics:
+        """
+        The ServerMetrics of a server handling RPCs on ``executor``, including
+        the depth of the service's command queue
+        """
+        metrics = ServerMetrics(command_queue_depth=command_queue_depth,
+                                methods=self.get_method_metrics())
+        metrics.reply_timestamp.GetCurrentTime()
+        if executor is not None:
+            metrics.executor_queue_depth = max(executor.queued, 0)
+            metrics.executor_active = executor.active
+            metrics.executor_max_workers = executor.max_workers
+        return metrics
+
+    def wrap_handler(
+        self,
+        handler: Optional[grpc.RpcMethodHandler],
+        method: str,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        """
+        Wrap the behavior of ``handler`` to record the metrics of its calls.
+        Only unary-request handlers are wrapped, as the service has no others.
+        Streams may be sync or async generators.
+        """
+        if handler is None:
+            return None
+        cached = self._wrapped.get(method)
+        if cached is not None and cached[0] is handler:
+            return cached[1]
+
+        if handler.unary_unary is not None:
+            wrapped = grpc.unary_unary_rpc_method_handler(
+                self._record_unary(handler.unary_unary, method),
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        elif handler.unary_stream is not None:
+            if inspect.isasyncgenfunction(handler.unary_stream):
+                record = self._record_async_stream(handler.unary_stream, method)
+            else:
+                record = self._record_stream(handler.unary_stream, method)
+            wrapped = grpc.unary_stream_rpc_method_handler(
+                record,
+                request_deserializer=handler.request_deserializer,
+                response_serializer=handler.response_serializer,
+            )
+        else:
+            wrapped = handler
+        self._wrapped[method] = (handler, wrapped)
+        return wrapped
+
+    def _record_unary(self, behavior: Callable, method: str) -> Callable:
+        def unary_unary(request: Any, context: grpc.ServicerContext) -> Any:
+            start = self.start_call(method)
+            failed = True
+            try:
+                response = behavior(request, context)
+                failed = False
+                return response
+            finally:
+                self.end_call(method, start, failed)
+
+        return unary_unary
+
+    def _record_stream(self, behavior: Callable, method: str) -> Callable:
+        def unary_stream(request: Any, context: grpc.ServicerContext) -> Iterator[Any]:
+            start = self.start_call(method)
+            failed = True
+            try:
+                yield from behavior(request, context)
+                failed = False
+            except GeneratorExit:
+                # the client went away, which ends subscriptions normally
+                failed = False
+                raise
+            finally:
+                self.end_call(method, start, failed)
+
+        return unary_stream
+
+    def _record_async_stream(self, behavior: Callable, method: str) -> Callable:
+        async def unary_stream(
+            request: Any,
+            context: grpc.aio.ServicerContext,
+        ) -> AsyncIterator[Any]:
+            start = self.start_call(method)
+            failed = True
+            try:
+                async for response in behavior(request, context):
+                    yield response
+                failed = False
+            except (GeneratorExit, asyncio.CancelledError):
+                failed = False
+                raise
+            finally:
+                self.end_call(method, start, failed)
+
+        return unary_stream
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records the metrics of every call to a ``grpc.server``"""
+    def __init__(self, recorder: ServerMetricsRecorder):
+        self.recorder = recorder
+
+    def intercept_service(
+        self,
+        continuation: Callable[[grpc.HandlerCallDetails], Optional[grpc.RpcMethodHandler]],
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        return self.recorder.wrap_handler(continuation(handler_call_details),
+                                          handler_call_details.method)
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Records the metrics of every call to a ``grpc.aio.server``"""
+    def __init__(self, recorder: ServerMetricsRecorder):
+        self.recorder = recorder
+
+    async def intercept_service(
+        self,
+        continuation: Callable,
+        handler_call_details: grpc.HandlerCallDetails,
+    ) -> Optional[grpc.RpcMethodHandler]:
+        return self.recorder.wrap_handler(await continuation(handler_call_details),
+                                          handler_call_details.method)
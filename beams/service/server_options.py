@@ -0,0 +1,79 @@
+"""
+Tunable settings of the BEAMS service's gRPC server.
+
+``ServerOptions`` collects the server's concurrency limits, keepalive and
+message size settings, whether it runs on ``grpc.aio`` and how stale the
+heartbeats it serves may be.  Settings left as
+None keep gRPC's defaults.
+"""
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+
+@dataclass
+class ServerOptions:
+    """
+    Settings for the RPCHandler's gRPC server.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        The number of threads handling RPCs, by default 10.  Each subscriber's
+        stream holds a thread for its lifetime, so the server is given one
+        extra thread per allowed subscriber on top of these.
+    maximum_concurrent_rpcs : Optional[int], optional
+        The most RPCs handled (or waiting for a thread) at once.  Further RPCs
+        fail with RESOURCE_EXHAUSTED.  Unbounded if None
+    keepalive_time_ms : Optional[int], optional
+        How often the server pings idle connections
+    keepalive_timeout_ms : Optional[int], optional
+        How long the server waits for a ping to be answered before closing
+        the connection
+    keepalive_permit_without_calls : bool, optional
+        Whether to send keepalive pings on connections with no calls in
+        progress, by default False
+    max_receive_message_length : Optional[int], optional
+        The largest request the server accepts, in bytes
+    max_send_message_length : Optional[int], optional
+        The largest reply the server sends, in bytes
+    use_aio : bool, optional
+        Serve with ``grpc.aio``, handling connections on an event loop, by
+        default False.  RPCs are still handled on the worker threads.
+    heartbeat_max_staleness_ms : int, optional
+        How old the snapshot of the trees served by request_heartbeat may be,
+        by default 100.  Clients polling within this window share a snapshot
+    """
+    max_workers: int = 10
+    maximum_concurrent_rpcs: Optional[int] = None
+    keepalive_time_ms: Optional[int] = None
+    keepalive_timeout_ms: Optional[int] = None
+    keepalive_permit_without_calls: bool = False
+    max_receive_message_length: Optional[int] = None
+    max_send_message_length: Optional[int] = None
+    use_aio: bool = False
+    heartbeat_max_staleness_ms: int = 100
+
+    def __post_init__(self):
+        if self.max_workers < 1:
+            raise ValueError(f"max_workers must be positive, got ({self.max_workers})")
+        if self.maximum_concurrent_rpcs is not None and self.maximum_concurrent_rpcs < 1:
+            raise ValueError("maximum_concurrent_rpcs must be positive, got "
+                             f"({self.maximum_concurrent_rpcs})")
+        if self.heartbeat_max_staleness_ms < 0:
+            raise ValueError("heartbeat_max_staleness_ms must not be negative, got "
+                             f"({self.heartbeat_max_staleness_ms})")
+
+    def get_channel_options(self) -> List[Tuple[str, Any]]:
+        """The gRPC channel arguments for these settings"""
+        options: List[Tuple[str, Any]] = []
+        for key, value in (
+            ("grpc.keepalive_time_ms", self.keepalive_time_ms),
+            ("grpc.keepalive_timeout_ms", self.keepalive_timeout_ms),
+            ("grpc.max_receive_message_length", self.max_receive_message_length),
+            ("grpc.max_send_message_length", self.max_send_message_length),
+        ):
+            if value is not None:
+                options.append((key, value))
+        if self.keepalive_permit_without_calls:
+            options.append(("grpc.keepalive_permit_without_calls", 1))
+        return options
@@ -0,0 +1,186 @@
+"""
+Delta encoding of tree node statuses.
+
+A tree's ``TreeStructure`` lists its nodes in pre-order and is sent once.
+After that, ``TreeStatusDelta`` messages carry only the statuses that changed,
+keyed by node ordinal (index into ``TreeStructure.nodes``).  Each delta holds
+the status sequence it was computed against (``base_sequence``) and the
+sequence it brings the client to (``sequence``).  A delta may also only carry
+a new tree status, in which case the two are equal.  A client that falls
+behind ``base_sequence`` resyncs from a full snapshot.
+
+``TreeStatusMirror`` is the client side of this scheme.
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+from beams.service.remote_calls.behavior_tree_pb2 import (NodeId, TreeDetails,
+                                                          TreeStatus,
+                                                          TreeStatusDelta,
+                                                          TreeStructure)
+
+
+def full_status_delta(
+    tree_id: NodeId,
+    sequence: int,
+    statuses: bytes,
+    tree_status: TreeStatus,
+    structure_version: int = 0,
+) -> TreeStatusDelta:
+    """A delta holding every node's status, used to (re)synchronize"""
+    return TreeStatusDelta(
+        tree_id=tree_id,
+        sequence=sequence,
+        base_sequence=0,
+        statuses=statuses,
+        full=True,
+        tree_status=tree_status,
+        structure_version=structure_version,
+    )
+
+
+def diff_status_delta(base: TreeStatusDelta, current: TreeStatusDelta) -> TreeStatusDelta:
+    """
+    The delta that brings a client holding the full snapshot ``base`` to the
+    full snapshot ``current``
+    """
+    ordinals = [ordinal for ordinal, (old, new)
+                in enumerate(zip(base.statuses, current.statuses)) if old != new]
+    return TreeStatusDelta(
+        tree_id=current.tree_id,
+        sequence=current.sequence,
+        base_sequence=base.sequence,
+        ordinals=ordinals,
+        statuses=bytes(current.statuses[ordinal] for ordinal in ordinals),
+        tree_status=current.tree_status,
+        structure_version=current.structure_version,
+    )
+
+
+def merge_status_deltas(
+    older: TreeStatusDelta,
+    newer: TreeStatusDelta,
+) -> Optional[TreeStatusDelta]:
+    """
+    Combine two deltas into one with the effect of applying both in order.
+    Returns None if ``newer`` cannot be applied after ``older``.
+    """
+    if newer.full:
+        return newer
+    if not (newer.base_sequence <= older.sequence <= newer.sequence):
+        return None
+
+    if older.full:
+        statuses = bytearray(older.statuses)
+        for ordinal, status in zip(newer.ordinals, newer.statuses):
+            statuses[ordinal] = status
+        merged = TreeStatusDelta()
+        merged.CopyFrom(newer)
+        merged.full = True
+        merged.base_sequence = 0
+        merged.statuses = bytes(statuses)
+        del merged.ordinals[:]
+        return merged
+
+    changes = dict(zip(older.ordinals, older.statuses))
+    changes.update(zip(newer.ordinals, newer.statuses))
+    ordinals = sorted(changes)
+    return TreeStatusDelta(
+        tree_id=newer.tree_id,
+        sequence=newer.sequence,
+        base_sequence=older.base_sequence,
+        ordinals=ordinals,
+        statuses=bytes(changes[ordinal] for ordinal in ordinals),
+        tree_status=newer.tree_status,
+        structure_version=newer.structure_version,
+    )
+
+
+class TreeStatusMirror:
+    """
+    Client-side copy of a tree's node statuses, kept current by applying
+    TreeStatusDeltas.
+
+    Parameters
+    ----------
+    structure : TreeStructure
+        The static structure of the tree
+    """
+    def __init__(self, structure: TreeStructure):
+        self.set_structure(structure)
+
+    def set_structure(self, structure: TreeStructure) -> None:
+        """
+        Hold ``structure`` (e.g. re-fetched after the tree was reloaded), the
+        mirror is unsynchronized until a full snapshot for it is applied
+        """
+        self.structure = structure
+        self.statuses = bytearray(len(structure.nodes))
+        # 0 until synchronized with a full snapshot
+        self.sequence = 0
+        self.synced = False
+        self.tree_status = TreeStatus.IDLE
+
+    def apply(self, delta: TreeStatusDelta) -> bool:
+        """
+        Apply ``delta``.  Returns False if changes were missed, in which case
+        the mirror must be resynchronized by applying a full snapshot.  Also
+        returns False if ``delta`` is for another version of the tree's
+        structure, which must be re-fetched (see ``set_structure``) first.
+        """
+        if delta.structure_version != self.structure.structure_version:
+            self.synced = False
+            return False
+
+        n_nodes = len(self.statuses)
+        if delta.full:
+            # statuses always match the structure
+            self.statuses[:] = delta.statuses[:n_nodes].ljust(n_nodes, b"\0")
+        elif not self.synced or delta.base_sequence > self.sequence:
+            self.synced = False
+            return False
+        elif delta.sequence < self.sequence:
+            # older than what we hold already
+            return True
+        elif any(ordinal >= n_nodes for ordinal in delta.ordinals):
+            self.synced = False
+            return False
+        else:
+            for ordinal, status in zip(delta.ordinals, delta.statuses):
+                self.statuses[ordinal] = status
+
+        self.sequence = delta.sequence
+        self.synced = True
+        self.tree_status = delta.tree_status
+        return True
+
+    def to_details(self) -> TreeDetails:
+        """Expand into the equivalent TreeDetails"""
+        details = TreeDetails(tree_status=self.tree_status)
+        if self.structure.HasField("tree_id"):
+            details.tree_id.CopyFrom(self.structure.tree_id)
+        if not self.structure.nodes:
+            return details
+
+        # (NodeInfo, number of children still to be added) for open ancestors
+        stack: List[List] = []
+        for ordinal, node in enumerate(self.structure.nodes):
+            if not stack:
+                info = details.node_info
+            else:
+                parent = stack[-1]
+                info = parent[0].children.add()
+                parent[1] -= 1
+                if parent[1] == 0:
+                    stack.pop()
+            info.id.CopyFrom(node.id)
+            info.status = self.statuses[ordinal]
+            if node.n_children:
+                stack.append([info, node.n_children])
+        return details
+
+
+def skeleton_from_structure(structure: TreeStructure) -> TreeDetails:
+    """A TreeDetails with the shape of ``structure``, and no statuses set"""
+    return TreeStatusMirror(structure).to_details()
@@ -0,0 +1,611 @@
+"""
+The process hosting the trees of a BEAMS service, and its control plane.
+
+A ``TreeHost`` owns the service's TreeRegistry and every TreeTicker or
+ScheduledTreeTicker within it.  Trees are ticked in processes forked from the
+host (or in TreeSchedulers), and share their state with it through shared
+memory (TreeState, NodeStatusTable), which the host reads in place.
+
+Other processes, namely the service's command loop and the RPCHandler, reach
+the host through a ``TreeHostClient``.  Each call is a single request and
+reply over a Unix socket, pickled by ``multiprocessing.connection``:
+
+    request: (ControlOp, args)
+    reply:   (True, result) or (False, the exception raised by the host)
+
+===================  =================  ===================================
+ControlOp            args               result
+===================  =================  ===================================
+COMMAND              (CommandMessage,)  None, once the command is serviced
+GET_TREE_KEYS        ()                 List[TreeIdKey]
+GET_TREE_UPDATES     (tree_ids,)        List[BehaviorTreeUpdateMessage]
+GET_TREE_UPDATE      (name, uuid)       Optional[BehaviorTreeUpdateMessage]
+GET_TREE_DETAILS     (name, uuid)       TreeDetails
+GET_TREE_STRUCTURE   (name, uuid)       TreeStructure
+GET_TREE_STATUSES    (name, uuid)       TreeStatusDelta
+SHUTDOWN_TREES       ()                 None, once every tree is unloaded
+GET_HEARTBEAT        (since_version,)   HeartbeatSnapshot
+LOOKUP_TREE_KEY      (name, uuid)       Optional[TreeIdKey]
+===================  =================  ===================================
+
+Trees are identified by ``name`` and/or ``uuid`` as in TreeRegistry.lookup,
+and results are identified by the tree's key in the registry.  Unlike a
+multiprocessing manager there are no proxies: a request returns plain values,
+and each client connection is served by its own thread with no server-wide
+lock.  The per-call cost of the queries is measured by
+``benchmarks/tree_host.py``.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from enum import IntEnum
+from multiprocessing import AuthenticationError, Event, current_process
+from multiprocessing.connection import Client, Connection, Listener
+from typing import (Any, Callable, List, NamedTuple, Optional, Sequence, Tuple,
+                    Union)
+from uuid import UUID
+
+from beams.service.helpers.worker import Worker
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId, TreeDetails, TreeStatus,
+    TreeStatusDelta, TreeStructure)
+from beams.service.remote_calls.command_pb2 import CommandMessage, CommandType
+from beams.service.tree_deltas import full_status_delta
+from beams.service.tree_registry import TreeIdKey, TreeRegistry
+from beams.service.tree_scheduler import ScheduledTreeTicker, TreeScheduler
+from beams.service.tree_ticker import TreeState, TreeTicker
+
+logger = logging.getLogger(__name__)
+
+
+class ControlOp(IntEnum):
+    """Requests understood by a TreeHost, see the module docstring"""
+    COMMAND = 1
+    GET_TREE_KEYS = 2
+    GET_TREE_UPDATES = 3
+    GET_TREE_UPDATE = 4
+    GET_TREE_DETAILS = 5
+    GET_TREE_STRUCTURE = 6
+    GET_TREE_STATUSES = 7
+    SHUTDOWN_TREES = 8
+    GET_HEARTBEAT = 9
+    LOOKUP_TREE_KEY = 10
+
+
+class HeartbeatSnapshot(NamedTuple):
+    """The updates of every tree, numbered by ``version``"""
+    version: int
+    # None if unchanged since the requested version
+    updates: Optional[List[BehaviorTreeUpdateMessage]]
+
+
+class LoadingTree:
+    """
+    Stands in for a tree in the registry while it is constructed, so that it
+    is reported (as LOADING) by heartbeats and queries.  Commands are refused
+    until the tree has loaded.
+    """
+    def __init__(self, filepath: str, state: TreeState):
+        self.fp = filepath
+        # owned by the load in progress, which releases it
+        self.state = state
+
+    def stop_work(self):
+        pass
+
+    def shutdown(self):
+        # the load in progress finds its tree unloaded, and releases it
+        pass
+
+    def get_tree_state(self):
+        return self.state
+
+    def get_detailed_update(self) -> TreeDetails:
+        return TreeDetails(tree_status=self.state.get_tree_status())
+
+    def get_tree_structure(self) -> TreeStructure:
+        return TreeStructure()
+
+    def get_status_snapshot(self) -> TreeStatusDelta:
+        return full_status_delta(NodeId(), 0, b"", self.state.get_tree_status())
+
+    # Hooks for CommandMessages
+
+    def _refuse_command(self, *args) -> None:
+        logger.error(f"Tree at {self.fp} is still loading, command ignored")
+
+    start_tree = _refuse_command
+    pause_tree = _refuse_command
+    command_tick = _refuse_command
+    acknowledge_node = _refuse_command
+    reload_tree = _refuse_command
+    change_tick_rate = _refuse_command
+    change_tick_configuration = _refuse_command
+
+
+class TreeHost(Worker):
+    """
+    Worker process holding the loaded trees, served over a Unix socket.
+
+    The socket is bound when the host is instantiated, so clients may be
+    created (and inherited by other processes) before the host is started.
+    TreeSchedulers must likewise be created before the host is started, to
+    be inherited by it.
+
+    Parameters
+    ----------
+    schedulers : Sequence[TreeScheduler], optional
+        Schedulers to tick trees in.  If empty (the default), each tree is
+        ticked in its own TreeTicker process.
+    """
+    def __init__(self, schedulers: Sequence[TreeScheduler] = ()):
+        super().__init__("TreeHost")
+        self.schedulers = list(schedulers)
+        self.listener = Listener(family="AF_UNIX", authkey=current_process().authkey)
+        self.address = self.listener.address
+        # set by stop_work, the work process waits on it while serving
+        self.stopping = Event()
+
+    def get_client(self) -> TreeHostClient:
+        return TreeHostClient(self.address)
+
+    def stop_work(self):
+        self.stopping.set()
+        super().stop_work()
+        # also removes the socket file
+        self.listener.close()
+
+    def work_func(self):
+        self.registry = TreeRegistry()
+        # guards the registry, held only while it is read or modified
+        self.registry_lock = threading.Lock()
+        # the tree versions last reported by get_heartbeat, and their number
+        self.heartbeat_tree_versions: Optional[Tuple[Tuple[str, int], ...]] = None
+        self.heartbeat_version = 0
+
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+        logger.debug(f"{self.proc_name} listening at {self.address}")
+        # requests are served by the connection threads
+        self.stopping.wait()
+        logger.debug(f"{self.proc_name} work_func exited")
+
+    def accept_connections(self) -> None:
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                logger.exception("Rejected connection")
+                continue
+            except OSError:
+                logger.debug(f"{self.proc_name} listener closed")
+                return
+            threading.Thread(target=self.serve_connection, args=(conn,),
+                             daemon=True).start()
+
+    def serve_connection(self, conn: Connection) -> None:
+        """Service requests from a single client until it disconnects"""
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    reply = (True, self.get_handler(op)(*args))
+                except Exception as ex:
+                    logger.debug(f"Request {op!r} failed", exc_info=True)
+                    reply = (False, ex)
+
+                try:
+                    conn.send(reply)
+                except Exception as ex:
+                    # the result or exception could not be pickled
+                    conn.send((False, RuntimeError(f"Request {op!r} failed: {ex}")))
+
+    def get_handler(self, op: ControlOp) -> Callable[..., Any]:
+        """Returns the method that services requests of type ``op``"""
+        return {
+            ControlOp.COMMAND: self.handle_command,
+            ControlOp.GET_TREE_KEYS: self.get_tree_keys,
+            ControlOp.GET_TREE_UPDATES: self.get_tree_updates,
+            ControlOp.GET_TREE_UPDATE: self.get_tree_update,
+            ControlOp.GET_TREE_DETAILS: self.get_tree_details,
+            ControlOp.GET_TREE_STRUCTURE: self.get_tree_structure,
+            ControlOp.GET_TREE_STATUSES: self.get_tree_statuses,
+            ControlOp.SHUTDOWN_TREES: self.shutdown_trees,
+            ControlOp.GET_HEARTBEAT: self.get_heartbeat,
+            ControlOp.LOOKUP_TREE_KEY: self.lookup_key,
+        }[op]
+
+    def lookup(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Union[Tuple[TreeIdKey, Any], Tuple[None, None]]:
+        with self.registry_lock:
+            return self.registry.lookup(name=name, uuid=uuid)
+
+    def lookup_key(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Optional[TreeIdKey]:
+        key, _ = self.lookup(name=name, uuid=uuid)
+        return key
+
+    # Queries
+
+    def get_tree_keys(self) -> List[TreeIdKey]:
+        with self.registry_lock:
+            return self.registry.keys()
+
+    def get_tree_updates(
+        self,
+        tree_ids: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> List[BehaviorTreeUpdateMessage]:
+        # read from shared memory, without leaving the host
+        with self.registry_lock:
+            return self.registry.get_tree_updates(tree_ids=tree_ids)
+
+    def get_heartbeat(self, since_version: int = 0) -> HeartbeatSnapshot:
+        """
+        The updates of every tree, numbered by a version that changes whenever
+        any tree does.  Updates are only gathered if they changed since
+        ``since_version``
+        """
+        with self.registry_lock:
+            tree_versions = self.registry.get_tree_versions()
+            if tree_versions != self.heartbeat_tree_versions:
+                self.heartbeat_tree_versions = tree_versions
+                self.heartbeat_version += 1
+            elif since_version == self.heartbeat_version:
+                return HeartbeatSnapshot(self.heartbeat_version, None)
+            # trees changing while their updates are gathered give the next
+            # call a new version, even if these updates already show it
+            return HeartbeatSnapshot(self.heartbeat_version,
+                                     self.registry.get_tree_updates())
+
+    def get_tree_update(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Optional[BehaviorTreeUpdateMessage]:
+        with self.registry_lock:
+            return self.registry.get_tree_update(name=name, uuid=uuid)
+
+    def get_tree_details(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeDetails:
+        key, tree_ticker = self.lookup(name=name, uuid=uuid)
+        if key is None:
+            return TreeDetails()
+
+        details = tree_ticker.get_detailed_update()
+        # repackage into new message with the right details
+        return TreeDetails(
+            tree_id=NodeId(name=key.name, uuid=str(key.uuid)),
+            node_info=details.node_info,
+            tree_status=details.tree_status,
+            load_timings=details.load_timings,
+        )
+
+    def get_tree_structure(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeStructure:
+        key, tree_ticker = self.lookup(name=name, uuid=uuid)
+        if key is None:
+            return TreeStructure()
+
+        structure = TreeStructure()
+        structure.CopyFrom(tree_ticker.get_tree_structure())
+        structure.tree_id.CopyFrom(NodeId(name=key.name, uuid=str(key.uuid)))
+        return structure
+
+    def get_tree_statuses(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeStatusDelta:
+        key, tree_ticker = self.lookup(name=name, uuid=uuid)
+        if key is None:
+            return TreeStatusDelta()
+
+        snapshot = tree_ticker.get_status_snapshot()
+        snapshot.tree_id.CopyFrom(NodeId(name=key.name, uuid=str(key.uuid)))
+        return snapshot
+
+    def shutdown_trees(self) -> None:
+        """Stop and unload every tree"""
+        with self.registry_lock:
+            items = self.registry.items()
+            for key, _ in items:
+                self.registry.remove(key)
+
+        for key, tree_ticker in items:
+            logger.debug(f"Cleaning up tree of name {key.name}")
+            tree_ticker.stop_work()
+            tree_ticker.shutdown()
+
+    # Commands
+
+    def handle_command(self, request: CommandMessage) -> None:
+        handler = self.get_command_handler(request.command_t)
+        if handler is None:
+            logger.error("Unsupported command type: "
+                         f"{CommandType.Name(request.command_t)}")
+        else:
+            handler(request)
+
+    def get_command_handler(
+        self,
+        command_t: CommandType
+    ) -> Optional[Callable[[CommandMessage], None]]:
+        """Returns the method that services CommandMessages of type ``command_t``"""
+        return {
+            CommandType.LOAD_NEW_TREE: self.load_new_tree,
+            CommandType.START_TREE: self.start_tree,
+            CommandType.PAUSE_TREE: self.pause_tree,
+            CommandType.TICK_TREE: self.tick_tree,
+            CommandType.ACK_NODE: self.acknowledge_node,
+            CommandType.UNLOAD_TREE: self.unload_tree,
+            CommandType.RELOAD_TREE: self.reload_tree,
+            CommandType.CHANGE_TICK_RATE_OF_TREE: self.change_tick_rate,
+            CommandType.CHANGE_TICK_CONFIGURATION: self.change_tick_configuration,
+        }.get(command_t)
+
+    def load_new_tree(self, request: CommandMessage) -> None:
+        """
+        Load a tree, which is reported as LOADING until it is constructed.
+
+        If ``replace`` is requested, the tree of the same name keeps ticking
+        until the new tree has loaded, then the new tree takes its place (and
+        is started if the old tree was).  The old tree is kept if the new tree
+        fails to load.
+        """
+        load = request.load_new_tree
+        tick_config_mess = load.tick_spec
+        init_state = TreeState(
+            tick_delay_ms=tick_config_mess.delay_ms,
+            tick_config=tick_config_mess.tick_config,
+            tick_timing=tick_config_mess.tick_timing,
+        )
+        init_state.set_tree_status(TreeStatus.LOADING)
+
+        # New trees are given their uuid when the command is sequenced (see
+        # CommandSequencer), or are given one here
+        if request.tree_uuid:
+            tree_id = TreeIdKey(name=request.tree_name, uuid=UUID(request.tree_uuid))
+        else:
+            tree_id = TreeIdKey(name=request.tree_name)
+        with self.registry_lock:
+            # trees are found by name in load order, so a tree being replaced
+            # is still the one found until the swap
+            self.registry.add(tree_id, LoadingTree(load.tree_file_path, init_state))
+
+        try:
+            if self.schedulers:
+                x = ScheduledTreeTicker(filepath=load.tree_file_path,
+                                        init_tree_state=init_state,
+                                        schedulers=self.schedulers)
+            else:
+                x = TreeTicker(filepath=load.tree_file_path,
+                               init_tree_state=init_state)
+        except Exception:
+            with self.registry_lock:
+                self.registry.remove(tree_id)
+            init_state.close()
+            raise
+        self._finish_load(request, tree_id, x)
+
+    def _finish_load(self, request: CommandMessage, tree_id: TreeIdKey, x: Any) -> None:
+        """Swap the constructed tree ``x`` in for its LoadingTree"""
+        load = request.load_new_tree
+        # scheduled trees are constructed by their scheduler, only wait for
+        # them if another tree depends on the outcome
+        loaded = x.wait_loaded() if load.replace else True
+        replaced_key, replaced = None, None
+        with self.registry_lock:
+            in_registry = self.registry.replace(tree_id, x)
+            if in_registry and not loaded:
+                self.registry.remove(tree_id)
+            elif in_registry and load.replace:
+                replaced_key, replaced = self.registry.lookup(name=request.tree_name)
+                if replaced_key == tree_id:
+                    replaced_key, replaced = None, None
+                else:
+                    self.registry.remove(replaced_key)
+
+        if not (in_registry and loaded):
+            x.stop_work()
+            x.shutdown()
+            if not loaded:
+                raise RuntimeError(f"Tree at {load.tree_file_path} failed to load, "
+                                   f"({request.tree_name}) was not replaced")
+            logger.debug(f"Tree ({request.tree_name}) was unloaded while loading")
+            return
+
+        if replaced is None:
+            logger.debug(f"Loaded tree ({request.tree_name}) from filepath: "
+                         f"{load.tree_file_path}.  Explcit "
+                         "START_TREE command needed to begin ticking.")
+            return
+
+        was_running = not replaced.get_tree_state().get_pause_tree()
+        replaced.stop_work()
+        replaced.shutdown()
+        if was_running:
+            x.start_tree()
+        logger.debug(f"Replaced tree ({request.tree_name}) with the tree at "
+                     f"{load.tree_file_path}")
+
+    def start_tree(self, request: CommandMessage) -> None:
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.start_tree()
+
+    def pause_tree(self, request: CommandMessage) -> None:
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.pause_tree()
+
+    def tick_tree(self, request: CommandMessage) -> None:
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.command_tick()
+
+    def unload_tree(self, request: CommandMessage) -> None:
+        with self.registry_lock:
+            key, tree_ticker = self.registry.lookup(
+                name=request.tree_name, uuid=request.tree_uuid,
+            )
+            if tree_ticker is None:
+                return
+            # no longer visible to queries once its state is released
+            self.registry.remove(key)
+
+        tree_ticker.stop_work()
+        tree_ticker.shutdown()
+        logger.debug(f"Unloaded tree ({key.name})")
+
+    def reload_tree(self, request: CommandMessage) -> None:
+        if not request.HasField("reload_tree"):
+            logger.error("RELOAD_TREE command requires reload_tree")
+            return
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.reload_tree(request.reload_tree.tree_file_path)
+
+    def change_tick_rate(self, request: CommandMessage) -> None:
+        if not request.HasField("tick_rate_ms"):
+            logger.error("CHANGE_TICK_RATE_OF_TREE command requires tick_rate_ms")
+            return
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.change_tick_rate(request.tick_rate_ms)
+
+    def change_tick_configuration(self, request: CommandMessage) -> None:
+        tick_config_mess = request.tick_config
+        delay_ms = None
+        if tick_config_mess.HasField("delay_ms"):
+            delay_ms = tick_config_mess.delay_ms
+        tick_timing = None
+        if tick_config_mess.HasField("tick_timing"):
+            tick_timing = tick_config_mess.tick_timing
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.change_tick_configuration(
+                tick_config_mess.tick_config, delay_ms, tick_timing
+            )
+
+    def acknowledge_node(self, request: CommandMessage):
+        node_name_to_ack = request.ack_node.node_name_to_ack
+        user_acking_node = request.ack_node.user_acking_node
+        _, tree_ticker = self.lookup(name=request.tree_name, uuid=request.tree_uuid)
+        if tree_ticker is not None:
+            tree_ticker.acknowledge_node(node_name_to_ack, user_acking_node)
+
+
+class TreeHostClient:
+    """
+    Client for a TreeHost, see the module docstring for the requests made.
+
+    May be shared between threads, and inherited by forked processes.  Each
+    thread of each process opens its own connection on first use.
+    """
+    def __init__(self, address: str):
+        self.address = address
+        self._local = threading.local()
+
+    def _get_connection(self) -> Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            # a connection inherited through fork belongs to the parent
+            conn = Client(self.address, family="AF_UNIX",
+                          authkey=current_process().authkey)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def call(self, op: ControlOp, *args) -> Any:
+        """Make a request of the host, re-raising any exception it raised"""
+        conn = self._get_connection()
+        conn.send((op, args))
+        ok, result = conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def close(self) -> None:
+        """Close this thread's connection, if one is open"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            conn.close()
+        self._local.conn = None
+
+    def send_command(self, request: CommandMessage) -> None:
+        """Service ``request`` in the host, returning once it is done"""
+        self.call(ControlOp.COMMAND, request)
+
+    def get_tree_keys(self) -> List[TreeIdKey]:
+        return self.call(ControlOp.GET_TREE_KEYS)
+
+    def lookup_key(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Optional[TreeIdKey]:
+        """The key of the tree identified as in TreeRegistry.lookup, if any"""
+        return self.call(ControlOp.LOOKUP_TREE_KEY, name, uuid)
+
+    def get_tree_updates(
+        self,
+        tree_ids: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> List[BehaviorTreeUpdateMessage]:
+        """
+        The updates of the trees identified by (name, uuid) pairs in
+        ``tree_ids``, or of every tree if omitted.  See
+        TreeRegistry.get_tree_updates
+        """
+        return self.call(ControlOp.GET_TREE_UPDATES, tree_ids)
+
+    def get_heartbeat(self, since_version: int = 0) -> HeartbeatSnapshot:
+        """See TreeHost.get_heartbeat"""
+        return self.call(ControlOp.GET_HEARTBEAT, since_version)
+
+    def get_tree_update(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Optional[BehaviorTreeUpdateMessage]:
+        return self.call(ControlOp.GET_TREE_UPDATE, name, uuid)
+
+    def get_tree_details(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeDetails:
+        return self.call(ControlOp.GET_TREE_DETAILS, name, uuid)
+
+    def get_tree_structure(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeStructure:
+        return self.call(ControlOp.GET_TREE_STRUCTURE, name, uuid)
+
+    def get_tree_statuses(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> TreeStatusDelta:
+        return self.call(ControlOp.GET_TREE_STATUSES, name, uuid)
+
+    def shutdown_trees(self) -> None:
+        self.call(ControlOp.SHUTDOWN_TREES)
@@ -0,0 +1,204 @@
+"""
+Registry of the trees loaded on a BEAMS service.
+
+The registry lives in the TreeHost process, alongside the trees themselves.
+Trees are indexed by exact uuid, by name and by sorted uuid (for partial uuid
+matches), so lookups do not depend on the number of loaded trees.  The updates
+of every tree are gathered in one call, reading each tree's TreeState directly.
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from uuid import UUID, uuid4
+
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId)
+from beams.service.tree_ticker import get_behavior_tree_update_from_state
+
+# Partial uuids must be at least this long to avoid collisions
+MIN_PARTIAL_UUID_LENGTH = 5
+
+
+@dataclass(frozen=True)
+class TreeIdKey:
+    """
+    Tree ID information bundle.
+
+    Name exists for readability primarily, and comparisons are first made on
+    the uuid, then the name.
+    Partial uuids (str) matching the beginning of an instance's uuid are
+    considered equal to the instance (for ease of matching).
+
+    When used as a dictionary key, items can be accessed with either:
+    - a TreeIdKey with the correct UUID
+    - a matching UUID directly
+
+    Note that this does not let you use partial strings to match dictionary keys
+    via the `in` keyword, since __contains__ uses hashes
+    """
+    name: str
+    uuid: UUID = field(default_factory=uuid4)
+
+    def __hash__(self) -> int:
+        # allow quick lookups by specifying uuid
+        return hash(self.uuid)
+
+    def __eq__(self, other) -> bool:
+        # Require partial strings to be greater than 5 to avoid collisions
+        # Eventually maybe somebody does some stats to figure out what a good
+        # threshold is (birthday paradox)
+        if isinstance(other, str):
+            if len(other) >= MIN_PARTIAL_UUID_LENGTH:
+                uuid_match = str(self.uuid).startswith(other)
+            else:
+                uuid_match = False
+            name_match = (self.name == other)
+            return uuid_match or name_match
+        elif isinstance(other, UUID):
+            return self.uuid == other
+        elif isinstance(other, TreeIdKey):
+            return self.uuid == other.uuid
+        return False
+
+
+class TreeRegistry:
+    """
+    Trees (TreeTickers or ScheduledTreeTickers) keyed by TreeIdKey, indexed
+    for lookup by uuid, partial uuid or name.
+    """
+    def __init__(self):
+        # str(uuid) -> (key, ticker), in load order
+        self.by_uuid: Dict[str, Tuple[TreeIdKey, Any]] = {}
+        # name -> uuid strings of trees with that name, in load order
+        self.by_name: Dict[str, List[str]] = {}
+        # every uuid string, sorted so partial uuids can be bisected
+        self.sorted_uuids: List[str] = []
+
+    def add(self, key: TreeIdKey, ticker: Any) -> None:
+        uuid = str(key.uuid)
+        if uuid in self.by_uuid:
+            self.remove(key)
+        self.by_uuid[uuid] = (key, ticker)
+        self.by_name.setdefault(key.name, []).append(uuid)
+        bisect.insort(self.sorted_uuids, uuid)
+
+    def remove(self, key: TreeIdKey) -> Optional[Any]:
+        """Remove the tree identified by ``key``, returning its ticker"""
+        uuid = str(key.uuid)
+        key, ticker = self.by_uuid.pop(uuid, (None, None))
+        if key is None:
+            return None
+        names = self.by_name[key.name]
+        names.remove(uuid)
+        if not names:
+            del self.by_name[key.name]
+        del self.sorted_uuids[bisect.bisect_left(self.sorted_uuids, uuid)]
+        return ticker
+
+    def replace(self, key: TreeIdKey, ticker: Any) -> bool:
+        """
+        Swap in ``ticker`` for the tree identified by ``key``, keeping its
+        place among trees of the same name.  Returns False, changing nothing,
+        if there is no such tree
+        """
+        uuid = str(key.uuid)
+        if uuid not in self.by_uuid:
+            return False
+        self.by_uuid[uuid] = (self.by_uuid[uuid][0], ticker)
+        return True
+
+    def _match_partial_uuid(self, prefix: str) -> Optional[str]:
+        idx = bisect.bisect_left(self.sorted_uuids, prefix)
+        if idx < len(self.sorted_uuids) and self.sorted_uuids[idx].startswith(prefix):
+            return self.sorted_uuids[idx]
+        return None
+
+    def lookup(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Union[Tuple[TreeIdKey, Any], Tuple[None, None]]:
+        """
+        Returns the TreeIdKey and ticker of a tree, to best effort.
+        In order of priority:
+        1. Check for uuid full match
+        2. Check for uuid partial match
+        3. Check for tree name full match
+
+        Returns the first tree loaded in the case of collisions
+        Returns (None, None) if no match can be found
+        """
+        if not (name or uuid):
+            raise ValueError("One of `name` and `uuid` must be provided")
+
+        uuid = str(uuid) if uuid else ""
+        if uuid and len(uuid) < MIN_PARTIAL_UUID_LENGTH:
+            raise ValueError("Partial uuids must provide at least "
+                             f"{MIN_PARTIAL_UUID_LENGTH} characters, got ({uuid})")
+
+        if uuid:
+            match = uuid if uuid in self.by_uuid else self._match_partial_uuid(uuid)
+            if match is not None:
+                return self.by_uuid[match]
+        if name and name in self.by_name:
+            return self.by_uuid[self.by_name[name][0]]
+
+        return None, None
+
+    def keys(self) -> List[TreeIdKey]:
+        return [key for key, _ in self.by_uuid.values()]
+
+    def items(self) -> List[Tuple[TreeIdKey, Any]]:
+        return list(self.by_uuid.values())
+
+    def get_tree_versions(self) -> Tuple[Tuple[str, int], ...]:
+        """
+        The uuid and TreeState version of every tree.  Equal results mean no
+        tree was loaded, unloaded or changed in between
+        """
+        return tuple((uuid, ticker.get_tree_state().get_version())
+                     for uuid, (_, ticker) in self.by_uuid.items())
+
+    def _get_tree_update(self, key: TreeIdKey, ticker: Any) -> BehaviorTreeUpdateMessage:
+        tree_id = NodeId(name=key.name, uuid=str(key.uuid))
+        return get_behavior_tree_update_from_state(ticker.get_tree_state(), tree_id)
+
+    def get_tree_update(
+        self,
+        name: Optional[str] = None,
+        uuid: Optional[Union[UUID, str]] = None,
+    ) -> Optional[BehaviorTreeUpdateMessage]:
+        """
+        The update of the tree found by ``lookup``, identified by its key in
+        this registry.  Returns None if no match can be found
+        """
+        key, ticker = self.lookup(name=name, uuid=uuid)
+        if key is None:
+            return None
+        return self._get_tree_update(key, ticker)
+
+    def get_tree_updates(
+        self,
+        tree_ids: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> List[BehaviorTreeUpdateMessage]:
+        """
+        The updates of the trees found by ``lookup`` for each (name, uuid) in
+        ``tree_ids``, or of every tree if omitted.  Each tree is included once,
+        identified by its key in this registry.  Identifiers that match no
+        tree (or are invalid) are skipped.
+        """
+        if tree_ids is None:
+            return [self._get_tree_update(key, ticker)
+                    for key, ticker in list(self.by_uuid.values())]
+
+        trees: Dict[str, Tuple[TreeIdKey, Any]] = {}
+        for name, uuid in tree_ids:
+            try:
+                key, ticker = self.lookup(name=name, uuid=uuid)
+            except ValueError:
+                continue
+            if key is not None:
+                trees.setdefault(str(key.uuid), (key, ticker))
+        return [self._get_tree_update(key, ticker) for key, ticker in trees.values()]
@@ -0,0 +1,193 @@
+"""
+Reloading a behavior tree in place, rebuilding only what changed.
+
+A tree is reloaded by comparing the item it was built from against a new
+item, and building behaviours only for the parts that differ.  Subtrees whose
+items are unchanged keep their behaviours, so ActionNodes keep their worker
+processes and are not set up again.
+
+Composite items of the same type are matched child by child: children are
+paired with an identical old child if there is one, otherwise with an old
+child of the same type and name, which is then compared in turn.  New
+children that match nothing are built, old children left unmatched are
+removed.  Any other changed item is rebuilt as a whole.  The work done is
+thus proportional to the size of the change, plus comparing the items along
+the way.  A changed ``action_execution`` rebuilds the whole tree, as it
+changes where every ActionNode runs.
+
+Reloading happens in two steps.  ``plan_reload`` builds the new behaviours
+without touching the loaded tree, so a failure leaves it as it was.
+``apply_reload`` then swaps them in, and must be called between ticks by the
+process that ticks the tree.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import operator
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from py_trees.behaviour import Behaviour
+from py_trees.common import Status
+from py_trees.composites import Composite
+from py_trees.trees import BehaviourTree
+
+from beams.behavior_tree.action_node import default_action_execution
+from beams.tree_config.base import BaseItem, BehaviorTreeItem
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReloadPlan:
+    """The changes that turn a loaded tree into a reloaded one"""
+    # the root of the reloaded tree, the loaded root if it was kept
+    root: Optional[Behaviour] = None
+    # composites whose children change, and their new children.  Includes
+    # new composites built to hold kept children, when only the composite
+    # itself changed
+    relinks: List[Tuple[Composite, List[Behaviour]]] = field(default_factory=list)
+    # roots of the subtrees built from the new item
+    built: List[Behaviour] = field(default_factory=list)
+    # composites built without their children, see ``relinks``
+    shells: List[Composite] = field(default_factory=list)
+    # roots of the subtrees removed from the loaded tree
+    removed: List[Behaviour] = field(default_factory=list)
+    # composites of the loaded tree replaced by a shell
+    replaced: List[Composite] = field(default_factory=list)
+
+    def count_built(self) -> int:
+        """The number of behaviours constructed"""
+        return len(self.shells) + sum(len(list(node.iterate())) for node in self.built)
+
+
+def _composite_fields(item: BaseItem) -> dict:
+    """The fields of a composite item, except its children"""
+    return {f.name: getattr(item, f.name) for f in dataclasses.fields(item)
+            if f.name != "children"}
+
+
+def _is_matching_composite(old_item: BaseItem, old_node: Behaviour, new_item: BaseItem) -> bool:
+    return (
+        type(old_item) is type(new_item)
+        and isinstance(getattr(new_item, "children", None), list)
+        and isinstance(old_node, Composite)
+        # the node is laid out as its item, see e.g. SequenceItem.get_tree
+        and len(old_node.children) == len(old_item.children)
+    )
+
+
+def _is_counterpart(old_item: BaseItem, new_item: BaseItem) -> bool:
+    """Whether ``new_item`` may be a changed version of ``old_item``"""
+    return type(old_item) is type(new_item) and old_item.name == new_item.name
+
+
+def _match_children(
+    old_items: List[BaseItem],
+    new_items: List[BaseItem],
+) -> Tuple[List[Optional[int]], List[int]]:
+    """
+    The index of the old item matched to each new item (None if unmatched),
+    and the indices of the old items left unmatched
+    """
+    matches: List[Optional[int]] = [None] * len(new_items)
+    unmatched = list(range(len(old_items)))
+    # identical items first, so they are not claimed by a changed sibling
+    for is_match in (operator.eq, _is_counterpart):
+        for idx, new_item in enumerate(new_items):
+            if matches[idx] is not None:
+                continue
+            old = next((old for old in unmatched if is_match(old_items[old], new_item)),
+                       None)
+            if old is not None:
+                matches[idx] = old
+                unmatched.remove(old)
+    return matches, unmatched
+
+
+def _plan_node(
+    old_item: BaseItem,
+    old_node: Behaviour,
+    new_item: BaseItem,
+    plan: ReloadPlan,
+) -> Behaviour:
+    """The node for ``new_item``, reusing ``old_node`` where possible"""
+    if old_item == new_item:
+        return old_node
+
+    if not _is_matching_composite(old_item, old_node, new_item):
+        node = new_item.get_tree()
+        plan.removed.append(old_node)
+        plan.built.append(node)
+        return node
+
+    old_children = list(zip(old_item.children, old_node.children))
+    matches, unmatched = _match_children(old_item.children, new_item.children)
+    children = []
+    for new_child, match in zip(new_item.children, matches):
+        if match is None:
+            child = new_child.get_tree()
+            plan.built.append(child)
+        else:
+            child = _plan_node(*old_children[match], new_child, plan)
+        children.append(child)
+    plan.removed.extend(old_children[old][1] for old in unmatched)
+
+    if _composite_fields(old_item) != _composite_fields(new_item):
+        # only the composite changed, its children are relinked to a new one
+        node = dataclasses.replace(new_item, children=[]).get_tree()
+        plan.shells.append(node)
+        plan.replaced.append(old_node)
+        plan.relinks.append((node, children))
+        return node
+
+    if [id(child) for child in children] != [id(child) for child in old_node.children]:
+        plan.relinks.append((old_node, children))
+    return old_node
+
+
+def plan_reload(old: BehaviorTreeItem, tree: BehaviourTree, new: BehaviorTreeItem) -> ReloadPlan:
+    """
+    Build the behaviours needed to turn ``tree``, built from ``old``, into
+    the tree ``new`` describes.  ``tree`` itself is not modified
+    """
+    plan = ReloadPlan()
+    with default_action_execution(new.action_execution):
+        if old.action_execution == new.action_execution:
+            plan.root = _plan_node(old.root, tree.root, new.root, plan)
+        else:
+            plan.root = new.root.get_tree()
+            plan.removed.append(tree.root)
+            plan.built.append(plan.root)
+    return plan
+
+
+def apply_reload(tree: BehaviourTree, plan: ReloadPlan, set_up: bool) -> None:
+    """
+    Swap the behaviours of ``plan`` into ``tree``, setting up the new
+    behaviours if ``set_up``, and shutting down the removed ones.
+
+    Composites whose children change are stopped, so that they restart from
+    their first child.  Kept behaviours are otherwise left as they were.
+    """
+    stopped = plan.replaced + [node for node, _ in plan.relinks] + plan.removed
+    for node in stopped:
+        if node.status != Status.INVALID:
+            node.stop(Status.INVALID)
+
+    for node, children in plan.relinks:
+        for child in children:
+            child.parent = node
+        node.children = children
+    plan.root.parent = None
+    tree.root = plan.root
+
+    for node in plan.removed:
+        for sub_node in node.iterate():
+            sub_node.shutdown()
+    if set_up:
+        new_nodes = plan.shells + [sub_node for node in plan.built
+                                   for sub_node in node.iterate()]
+        for node in new_nodes:
+            node.setup()
@@ -0,0 +1,479 @@
+"""
+Cooperative scheduling of many behavior trees within a single worker process.
+
+By default the BEAMS service spawns one ``TreeTicker`` process per loaded tree.
+A ``TreeScheduler`` instead owns a set of trees and ticks each of them from a
+deadline heap keyed on the tree's tick delay, so that a service running dozens
+of small trees only pays for a handful of interpreters.
+
+``ScheduledTreeTicker`` is the handle stored in the service's tree registry
+in scheduler mode.  It presents the same command hooks as ``TreeTicker``, but
+forwards them to the scheduler process that actually holds the tree.  The
+tree's TreeState is handed over to the scheduler, which is then its only
+writer.
+"""
+from __future__ import annotations
+
+import heapq
+import itertools
+import logging
+import queue
+import time
+from ctypes import c_uint
+from dataclasses import dataclass
+from multiprocessing import Queue, Value
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from beams.behavior_tree.action_pool import sync_action_worker_pool
+from beams.service.helpers.status_table import NodeStatusTable
+from beams.service.helpers.tick_clock import TickClock
+from beams.service.helpers.worker import Worker
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId, TickConfiguration, TickTiming,
+    TreeDetails, TreeStatus, TreeStatusDelta, TreeStructure)
+from beams.service.remote_calls.command_pb2 import CommandType
+from beams.service.tree_deltas import (full_status_delta,
+                                       skeleton_from_structure)
+from beams.service.tree_ticker import (PublishedTree, TreeState, TreeTicker,
+                                       get_behavior_tree_update_from_state,
+                                       get_detailed_update_from_state)
+
+logger = logging.getLogger(__name__)
+
+# (command, tree id, command arguments)
+SchedulerCommand = Tuple[CommandType, str, Tuple[Any, ...]]
+
+# commands handled by the TreeTicker hook of the same arguments
+TICKER_HOOKS: Dict[CommandType, str] = {
+    CommandType.PAUSE_TREE: "pause_tree",
+    CommandType.ACK_NODE: "acknowledge_node",
+    CommandType.CHANGE_TICK_RATE_OF_TREE: "change_tick_rate",
+    CommandType.CHANGE_TICK_CONFIGURATION: "change_tick_configuration",
+}
+# commands after which the tree's next tick is rescheduled
+RESCHEDULING_COMMANDS = {
+    CommandType.CHANGE_TICK_RATE_OF_TREE,
+    CommandType.CHANGE_TICK_CONFIGURATION,
+}
+
+
+@dataclass
+class ScheduledTree:
+    """Bookkeeping for a single tree owned by a TreeScheduler"""
+    ticker: TreeTicker
+    clock: TickClock
+    is_set_up: bool = False
+    # the deadline for this tree currently in the heap, if any.  Heap entries
+    # that don't match this are stale and skipped
+    next_deadline: Optional[float] = None
+    # interactive ticks requested but not yet performed
+    pending_ticks: int = 0
+    # whether the clock is tracking continuous ticks, it is reset when
+    # continuous ticking (re)starts
+    on_clock: bool = False
+
+
+class TreeScheduler(Worker):
+    """
+    Worker that ticks many trees cooperatively in one process.
+
+    Trees are loaded, controlled and unloaded by placing commands onto
+    ``command_queue`` via the public methods of this class, which may be called
+    from any process that inherited the scheduler.  The work process sleeps on
+    that queue until either a command arrives or the earliest tree deadline
+    is reached.
+    """
+    def __init__(self, proc_name: str = "TreeScheduler"):
+        super().__init__(proc_name, grace_window_before_terminate_seconds=1)
+        # SchedulerCommands, or None to end the work loop
+        self.command_queue: Queue = Queue()
+        # number of trees currently assigned to this scheduler, for load balancing
+        self.n_trees = Value(c_uint, 0)
+
+    def stop_work(self):
+        if self.do_work.value:
+            # wake the work loop, which sleeps until a command or deadline
+            self.command_queue.put(None)
+        super().stop_work()
+
+    # Command hooks, these may be called from any process
+
+    def add_tree(self, tree_id: str, filepath: str, state: TreeState) -> None:
+        with self.n_trees.get_lock():
+            self.n_trees.value += 1
+        self.command_queue.put((CommandType.LOAD_NEW_TREE, tree_id, (filepath, state)))
+
+    def remove_tree(self, tree_id: str) -> None:
+        with self.n_trees.get_lock():
+            self.n_trees.value = max(self.n_trees.value - 1, 0)
+        self.command_queue.put((CommandType.UNLOAD_TREE, tree_id, ()))
+
+    def start_tree(self, tree_id: str) -> None:
+        self.command_queue.put((CommandType.START_TREE, tree_id, ()))
+
+    def pause_tree(self, tree_id: str) -> None:
+        self.command_queue.put((CommandType.PAUSE_TREE, tree_id, ()))
+
+    def command_tick(self, tree_id: str) -> None:
+        self.command_queue.put((CommandType.TICK_TREE, tree_id, ()))
+
+    def acknowledge_node(self, tree_id: str, node_name: str, user_name: str) -> None:
+        self.command_queue.put((CommandType.ACK_NODE, tree_id, (node_name, user_name)))
+
+    def reload_tree(self, tree_id: str, filepath: str) -> None:
+        self.command_queue.put((CommandType.RELOAD_TREE, tree_id, (filepath,)))
+
+    def change_tick_rate(self, tree_id: str, tick_delay_ms: int) -> None:
+        self.command_queue.put(
+            (CommandType.CHANGE_TICK_RATE_OF_TREE, tree_id, (tick_delay_ms,))
+        )
+
+    def change_tick_configuration(
+        self,
+        tree_id: str,
+        tick_config: TickConfiguration,
+        tick_delay_ms: Optional[int] = None,
+        tick_timing: Optional[TickTiming] = None,
+    ) -> None:
+        self.command_queue.put((CommandType.CHANGE_TICK_CONFIGURATION, tree_id,
+                                (tick_config, tick_delay_ms, tick_timing)))
+
+    # Work process internals
+
+    def work_func(self):
+        self.trees: Dict[str, ScheduledTree] = {}
+        # (deadline, tiebreaker, tree_id).  Deadlines are time.monotonic() values
+        self.deadlines: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+
+        while self.do_work.value:
+            # with no tree to tick, sleep until a command arrives
+            timeout = None
+            if self.deadlines:
+                timeout = max(self.deadlines[0][0] - time.monotonic(), 0)
+
+            try:
+                command = self.command_queue.get(timeout=timeout)
+            except queue.Empty:
+                pass
+            else:
+                if command is None:
+                    break
+                try:
+                    self.handle_command(command)
+                except Exception:
+                    logger.exception(f"Scheduler failed to handle command: {command}")
+
+            self.run_due_trees()
+
+        for tree_id in list(self.trees):
+            self._unload(tree_id)
+        logger.debug(f"{self.proc_name} work_func exited")
+
+    def handle_command(self, command: SchedulerCommand) -> None:
+        command_t, tree_id, args = command
+        if command_t == CommandType.LOAD_NEW_TREE:
+            self._load(tree_id, *args)
+            return
+
+        sched_tree = self.trees.get(tree_id)
+        if sched_tree is None:
+            logger.error(f"Scheduler has no tree with id: {tree_id}")
+            return
+
+        if command_t in TICKER_HOOKS:
+            getattr(sched_tree.ticker, TICKER_HOOKS[command_t])(*args)
+            if command_t in RESCHEDULING_COMMANDS:
+                self._schedule(tree_id, sched_tree, reschedule=True)
+        elif command_t == CommandType.UNLOAD_TREE:
+            self._unload(tree_id)
+        elif command_t == CommandType.START_TREE:
+            self._start(tree_id, sched_tree)
+        elif command_t == CommandType.TICK_TREE:
+            logger.debug(f"Tree: {sched_tree.ticker.tree.root.name} got command to tick")
+            sched_tree.pending_ticks += 1
+            self._schedule(tree_id, sched_tree)
+        elif command_t == CommandType.RELOAD_TREE:
+            # trees are ticked by this process, so this is between ticks
+            sched_tree.ticker.rebuild_tree(*args, set_up=sched_tree.is_set_up)
+
+    def run_due_trees(self) -> None:
+        """Tick every tree whose deadline has passed, rescheduling as needed"""
+        now = time.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, _, tree_id = heapq.heappop(self.deadlines)
+            sched_tree = self.trees.get(tree_id)
+            # unloaded or rescheduled since this deadline was set
+            if sched_tree is None or sched_tree.next_deadline != deadline:
+                continue
+            sched_tree.next_deadline = None
+
+            state = sched_tree.ticker.state
+            if state.get_pause_tree():
+                # paused trees drop out of the heap, START_TREE reschedules them
+                sched_tree.on_clock = False
+                continue
+
+            interactive = state.get_tick_config() == TickConfiguration.INTERACTIVE
+            if interactive and sched_tree.pending_ticks <= 0:
+                continue
+
+            try:
+                start = time.monotonic()
+                if not sched_tree.ticker.tick_and_publish():
+                    # paused since the check above
+                    sched_tree.on_clock = False
+                    continue
+                if interactive:
+                    sched_tree.pending_ticks -= 1
+                    state.set_tree_status(TreeStatus.WAITING_ACK)
+                else:
+                    sched_tree.clock.record_tick(start, time.monotonic())
+                    state.set_tick_statistics(sched_tree.clock.get_statistics())
+            except Exception as ex:
+                # Leave the tree unscheduled, mirroring a crashed TreeTicker
+                state.set_tree_status(TreeStatus.ERROR)
+                logger.exception(ex)
+                continue
+
+            self._schedule(tree_id, sched_tree)
+
+    def _schedule(
+        self,
+        tree_id: str,
+        sched_tree: ScheduledTree,
+        reschedule: bool = False
+    ) -> None:
+        """
+        Place the tree's next deadline in the heap.  Does nothing if a deadline
+        is already pending, unless ``reschedule`` is requested.
+        """
+        if sched_tree.next_deadline is not None and not reschedule:
+            return
+        # invalidates any deadline already in the heap
+        sched_tree.next_deadline = None
+
+        state = sched_tree.ticker.state
+        now = time.monotonic()
+        if state.get_tick_config() == TickConfiguration.INTERACTIVE:
+            sched_tree.on_clock = False
+            if sched_tree.pending_ticks <= 0:
+                return
+            # interactive ticks happen as soon as they are requested
+            deadline = now
+        else:
+            clock = sched_tree.clock
+            clock.set_period(state.get_tick_delay_ms() / 1000)
+            clock.set_tick_timing(state.get_tick_timing())
+            if not sched_tree.on_clock:
+                clock.reset(now)
+                sched_tree.on_clock = True
+            deadline = clock.next_deadline
+
+        heapq.heappush(self.deadlines, (deadline, next(self._counter), tree_id))
+        sched_tree.next_deadline = deadline
+
+    def _load(self, tree_id: str, filepath: str, state: TreeState) -> None:
+        try:
+            ticker = TreeTicker(filepath=filepath, init_tree_state=state)
+        except Exception as ex:
+            state.set_tree_status(TreeStatus.ERROR)
+            logger.exception(ex)
+            state.close()
+            return
+        ticker.add_tree_visitors()
+        self.trees[tree_id] = ScheduledTree(ticker=ticker, clock=ticker.clock)
+        logger.debug(f"Scheduler loaded tree ({tree_id}) from filepath: {filepath}")
+
+    def _start(self, tree_id: str, sched_tree: ScheduledTree) -> None:
+        ticker = sched_tree.ticker
+        if not ticker.state.get_pause_tree():
+            logger.error(f"Tree of name {ticker.tree.root.name} is already unpaused")
+            return
+        if not sched_tree.is_set_up:
+            ticker.tree.setup()
+            sync_action_worker_pool()
+            sched_tree.is_set_up = True
+
+        ticker.state.set_pause_tree(False)
+        if ticker.state.get_tick_config() == TickConfiguration.INTERACTIVE:
+            ticker.state.set_tree_status(TreeStatus.WAITING_ACK)
+            ticker.publish_tree_state()
+        self._schedule(tree_id, sched_tree)
+
+    def _unload(self, tree_id: str) -> None:
+        sched_tree = self.trees.pop(tree_id)
+        # stale heap entries are skipped once the tree is gone
+        if sched_tree.is_set_up:
+            sched_tree.ticker.shutdown()
+        else:
+            sched_tree.ticker.release()
+        logger.debug(f"Scheduler unloaded tree ({tree_id})")
+
+
+class ScheduledTreeTicker:
+    """
+    Handle to a tree that is ticked by a TreeScheduler.
+
+    Mirrors the TreeTicker methods used by the BEAMS service, so instances can
+    live in the same TreeRegistry as regular TreeTickers.
+    The tree is picked up by the least loaded of the provided ``schedulers``.
+    """
+    def __init__(
+        self,
+        filepath: str,
+        init_tree_state: Optional[TreeState] = None,
+        schedulers: Sequence[TreeScheduler] = (),
+    ):
+        if not schedulers:
+            raise ValueError("At least one TreeScheduler must be provided")
+
+        fp = Path(filepath).resolve()
+        if not fp.is_file():
+            logging.error(f"Provided filepath: {filepath} is not a file")
+            raise ValueError("Provided filepath is not a file")
+
+        self.fp = filepath
+        self.tree_id = str(uuid4())
+        self.state = init_tree_state if init_tree_state is not None else TreeState()
+        self.scheduler = min(schedulers, key=lambda sched: sched.n_trees.value)
+        self.is_loaded = True
+        self.scheduler.add_tree(self.tree_id, self.fp, self.state)
+        # attached once the scheduler has loaded the tree, and again whenever
+        # it reloads the tree
+        self.published: Optional[PublishedTree] = None
+        # replaced by the last reattachment, closed by the next so readers
+        # that were still using it can finish
+        self.previous_published: Optional[PublishedTree] = None
+
+    def shutdown(self):
+        if self.is_loaded:
+            self.scheduler.remove_tree(self.tree_id)
+            self.is_loaded = False
+        for published in (self.published, self.previous_published):
+            if published is not None:
+                published.status_table.close()
+        self.published = None
+        self.previous_published = None
+        self.state.close()
+
+    def stop_work(self):
+        # the work process belongs to the scheduler, and is stopped with it.
+        # The tree stops ticking once removed from the scheduler by shutdown
+        pass
+
+    def get_tree_state(self):
+        return self.state
+
+    def wait_loaded(self, poll_interval_sec: float = 0.01) -> bool:
+        """
+        Wait for the scheduler to finish loading the tree.  Returns False if
+        the tree failed to load, or the scheduler stopped before loading it
+        """
+        while (self.state.get_tree_status() == TreeStatus.LOADING
+               and self.scheduler.do_work.value):
+            time.sleep(poll_interval_sec)
+        return self.state.get_tree_status() not in (TreeStatus.LOADING, TreeStatus.ERROR)
+
+    def get_behavior_tree_update(self) -> BehaviorTreeUpdateMessage:
+        return get_behavior_tree_update_from_state(
+            self.state, self._get_root_id(self._attach_status_table())
+        )
+
+    def _get_root_id(self, published: Optional[PublishedTree]) -> NodeId:
+        """
+        Identifies the tree by its root node, as TreeTicker does.  Until the
+        scheduler has loaded the tree, by its file and scheduler id instead
+        """
+        if published is None or not published.structure.nodes:
+            return NodeId(name=Path(self.fp).stem, uuid=self.tree_id)
+        root_id = NodeId()
+        root_id.CopyFrom(published.structure.nodes[0].id)
+        return root_id
+
+    def _attach_status_table(self) -> Optional[PublishedTree]:
+        """
+        Attach to the tree's NodeStatusTable, reattaching if the scheduler has
+        reloaded the tree since.  Returns None if the scheduler has not loaded
+        the tree yet
+        """
+        published = self.published
+        version = self.state.get_structure_version()
+        if published is not None and published.structure.structure_version == version:
+            return published
+        structure, table_name = self.state.get_published_tree()
+        if not table_name:
+            logger.debug(f"Tree ({self.tree_id}) has not been loaded by its scheduler")
+            return None
+        try:
+            status_table = NodeStatusTable(name=table_name)
+        except FileNotFoundError:
+            # reloaded again since, a later call attaches to the newer table
+            return published
+        if structure.nodes:
+            structure.tree_id.CopyFrom(structure.nodes[0].id)
+        if self.previous_published is not None:
+            self.previous_published.status_table.close()
+        self.previous_published = published
+        self.published = PublishedTree(
+            structure=structure,
+            skeleton=skeleton_from_structure(structure),
+            status_table=status_table,
+        )
+        return self.published
+
+    def get_detailed_update(self) -> TreeDetails:
+        published = self._attach_status_table()
+        if published is None:
+            return TreeDetails(tree_status=self.state.get_tree_status())
+        return get_detailed_update_from_state(self.state, published.skeleton,
+                                              published.read())
+
+    def get_tree_structure(self) -> TreeStructure:
+        published = self._attach_status_table()
+        if published is None:
+            return TreeStructure(tree_id=self._get_root_id(published))
+        return published.structure
+
+    def get_status_snapshot(self) -> TreeStatusDelta:
+        """All node statuses, as a full TreeStatusDelta"""
+        published = self._attach_status_table()
+        tree_id = self._get_root_id(published)
+        if published is None:
+            return full_status_delta(tree_id, 0, b"", self.state.get_tree_status())
+        sequence, statuses = published.read_with_sequence()
+        return full_status_delta(tree_id, sequence, statuses,
+                                 self.state.get_tree_status(),
+                                 published.structure.structure_version)
+
+    # Hooks for CommandMessages
+
+    def start_tree(self):
+        self.scheduler.start_tree(self.tree_id)
+
+    def pause_tree(self):
+        self.scheduler.pause_tree(self.tree_id)
+
+    def command_tick(self):
+        self.scheduler.command_tick(self.tree_id)
+
+    def acknowledge_node(self, node_name: str, user_name: str):
+        self.scheduler.acknowledge_node(self.tree_id, node_name, user_name)
+
+    def reload_tree(self, filepath: str):
+        self.scheduler.reload_tree(self.tree_id, filepath)
+
+    def change_tick_rate(self, tick_delay_ms: int):
+        self.scheduler.change_tick_rate(self.tree_id, tick_delay_ms)
+
+    def change_tick_configuration(
+        self,
+        tick_config: TickConfiguration,
+        tick_delay_ms: Optional[int] = None,
+        tick_timing: Optional[TickTiming] = None,
+    ):
+        self.scheduler.change_tick_configuration(
+            self.tree_id, tick_config, tick_delay_ms, tick_timing
+        )
@@ -0,0 +1,288 @@
+"""
+Fan-out of tree updates to streaming subscribers.
+
+A single ``UpdateBroadcaster`` thread gathers the state of every tree once per
+poll period, and hands the trees that changed to each interested
+``Subscriber``.  The cost of gathering updates does not depend on the number
+of subscribers, and the trees' tickers are never involved.
+
+Each ``Subscriber`` keeps only the latest undelivered update of each kind per
+tree.  A slow subscriber therefore never holds up the broadcaster or other
+subscribers: it simply receives fewer, more recent, updates.  Undelivered
+status deltas are merged rather than replaced, so none of their changes are
+lost.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId, TreeDetails, TreeStatusDelta,
+    TreeStructure)
+from beams.service.remote_calls.heartbeat_pb2 import (TreeUpdate,
+                                                      TreeUpdateSubscription)
+from beams.service.tree_deltas import diff_status_delta, merge_status_deltas
+
+logger = logging.getLogger(__name__)
+
+
+def matches_tree_id(tree_id: NodeId, pattern: NodeId) -> bool:
+    """
+    Whether ``tree_id`` is identified by ``pattern``, by (partial) uuid or
+    name.  Partial uuids must be at least 5 characters, as with TreeIdKey.
+    """
+    if len(pattern.uuid) >= 5 and tree_id.uuid.startswith(pattern.uuid):
+        return True
+    return bool(pattern.name) and tree_id.name == pattern.name
+
+
+class Subscriber:
+    """
+    Pending updates for one streaming client.
+
+    ``offer`` is called by the broadcaster, and ``next_updates`` by the thread
+    serving the client's stream.
+    """
+    def __init__(self, subscription: TreeUpdateSubscription):
+        self.tree_ids = list(subscription.tree_ids)
+        self.min_interval_sec = subscription.min_interval_ms / 1000
+        self.include_details = subscription.include_details
+        self.include_status_deltas = subscription.include_status_deltas
+        # whether this subscriber has been sent the current state of all trees
+        self.primed = False
+        self.closed = False
+
+        self.cond = threading.Condition()
+        # (tree uuid, update kind) -> latest undelivered update
+        self.pending: Dict[Tuple[str, str], TreeUpdate] = {}
+        # tree uuid -> time.monotonic() of the last update sent for that tree
+        self.last_sent: Dict[str, float] = {}
+
+    def wants(self, tree_id: NodeId) -> bool:
+        if not self.tree_ids:
+            return True
+        return any(matches_tree_id(tree_id, pattern) for pattern in self.tree_ids)
+
+    def offer(self, tree_uuid: str, update: TreeUpdate) -> None:
+        """
+        Queue ``update``, replacing any undelivered update of the same kind.
+        Status deltas are merged into any undelivered delta instead.
+        """
+        kind = update.WhichOneof("update")
+        key = (tree_uuid, kind)
+        with self.cond:
+            if kind == "tree_removed":
+                # nothing else about a removed tree is worth sending
+                for stale in [stale for stale in self.pending if stale[0] == tree_uuid]:
+                    del self.pending[stale]
+            elif kind == "tree_structure":
+                # a new structure is always followed by a full status delta
+                self.pending.pop((tree_uuid, "status_delta"), None)
+            elif kind == "status_delta" and key in self.pending:
+                merged = merge_status_deltas(self.pending[key].status_delta,
+                                             update.status_delta)
+                if merged is not None:
+                    update = TreeUpdate(status_delta=merged)
+            self.pending[key] = update
+            self.cond.notify()
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def _time_until_ready(self, key: Tuple[str, str], now: float) -> float:
+        if key[1] == "tree_removed":
+            return 0
+        last_sent = self.last_sent.get(key[0])
+        if last_sent is None:
+            return 0
+        return max(last_sent + self.min_interval_sec - now, 0)
+
+    def next_updates(self, timeout: float) -> List[TreeUpdate]:
+        """
+        Wait up to ``timeout`` seconds for updates that may be sent without
+        exceeding the rate limit, and return them.  Returns an empty list on
+        timeout or once closed.
+        """
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while not self.closed:
+                now = time.monotonic()
+                waits = {key: self._time_until_ready(key, now) for key in self.pending}
+                ready = [key for key, wait in waits.items() if wait <= 0]
+                if ready:
+                    updates = [self.pending.pop(key) for key in ready]
+                    for tree_uuid, _ in ready:
+                        self.last_sent[tree_uuid] = now
+                    return updates
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    break
+                self.cond.wait(min([remaining, *waits.values()]))
+        return []
+
+
+class UpdateBroadcaster:
+    """
+    Polls tree updates on a background thread while there are subscribers,
+    offering each change to the subscribers watching that tree.
+
+    Parameters
+    ----------
+    get_updates : Callable[[], List[BehaviorTreeUpdateMessage]]
+        Returns the current update of every loaded tree
+    get_details : Callable[[NodeId], TreeDetails]
+        Returns the details of the identified tree
+    poll_period_sec : float, optional
+        How often trees are checked for changes, by default 0.05
+    max_subscribers : int, optional
+        The maximum number of concurrent subscribers, by default 64
+    get_structure : Optional[Callable[[NodeId], TreeStructure]], optional
+        Returns the structure of the identified tree.  Status deltas are only
+        sent if this and ``get_statuses`` are provided.
+    get_statuses : Optional[Callable[[NodeId], TreeStatusDelta]], optional
+        Returns a full snapshot of the identified tree's node statuses
+    """
+    def __init__(
+        self,
+        get_updates: Callable[[], List[BehaviorTreeUpdateMessage]],
+        get_details: Callable[[NodeId], TreeDetails],
+        poll_period_sec: float = 0.05,
+        max_subscribers: int = 64,
+        get_structure: Optional[Callable[[NodeId], TreeStructure]] = None,
+        get_statuses: Optional[Callable[[NodeId], TreeStatusDelta]] = None,
+    ):
+        self.get_updates = get_updates
+        self.get_details = get_details
+        self.get_structure = get_structure
+        self.get_statuses = get_statuses
+        self.poll_period_sec = poll_period_sec
+        self.max_subscribers = max_subscribers
+
+        self.lock = threading.Lock()
+        self.subscribers: List[Subscriber] = []
+        self.thread: Optional[threading.Thread] = None
+        # tree uuid -> the last update / details seen for that tree
+        self.last_updates: Dict[str, BehaviorTreeUpdateMessage] = {}
+        self.last_details: Dict[str, TreeDetails] = {}
+        # tree uuid -> the tree's structure / last full status snapshot
+        self.structures: Dict[str, TreeStructure] = {}
+        self.last_statuses: Dict[str, TreeStatusDelta] = {}
+
+    def subscribe(self, subscription: TreeUpdateSubscription) -> Optional[Subscriber]:
+        """Add a subscriber, returns None if there are too many already"""
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(subscription)
+            self.subscribers.append(subscriber)
+            if self.thread is None:
+                # start from a clean slate, nothing was tracked while idle
+                self.last_updates.clear()
+                self.last_details.clear()
+                self.structures.clear()
+                self.last_statuses.clear()
+                self.thread = threading.Thread(
+                    target=self.run, name="UpdateBroadcaster", daemon=True
+                )
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscriber.close()
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def run(self) -> None:
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.thread = None
+                    return
+                subscribers = list(self.subscribers)
+            try:
+                self.poll(subscribers)
+            except Exception as ex:
+                logger.exception(ex)
+            time.sleep(self.poll_period_sec)
+
+    def poll(self, subscribers: List[Subscriber]) -> None:
+        """Offer every change since the last poll to ``subscribers``"""
+        current = set()
+        for update in self.get_updates():
+            tree_uuid = update.tree_id.uuid
+            current.add(tree_uuid)
+            changed = self.last_updates.get(tree_uuid) != update
+            self.last_updates[tree_uuid] = update
+
+            watchers = [sub for sub in subscribers if sub.wants(update.tree_id)]
+            targets = [sub for sub in watchers if changed or not sub.primed]
+            for sub in targets:
+                sub.offer(tree_uuid, TreeUpdate(behavior_tree_update=update))
+
+            detail_targets = [sub for sub in targets if sub.include_details]
+            if detail_targets:
+                self.offer_details(update.tree_id, detail_targets)
+
+            # node statuses can change without the tree's update changing
+            delta_targets = [sub for sub in watchers if sub.include_status_deltas]
+            if delta_targets and self.get_statuses is not None:
+                self.offer_status_deltas(update.tree_id, delta_targets)
+
+        for tree_uuid in set(self.last_updates) - current:
+            tree_id = self.last_updates.pop(tree_uuid).tree_id
+            self.last_details.pop(tree_uuid, None)
+            self.structures.pop(tree_uuid, None)
+            self.last_statuses.pop(tree_uuid, None)
+            for sub in subscribers:
+                if sub.wants(tree_id):
+                    sub.offer(tree_uuid, TreeUpdate(tree_removed=tree_id))
+
+        for sub in subscribers:
+            sub.primed = True
+
+    def offer_details(self, tree_id: NodeId, subscribers: List[Subscriber]) -> None:
+        # details are fetched once, however many subscribers want them
+        details = self.get_details(tree_id)
+        changed = self.last_details.get(tree_id.uuid) != details
+        self.last_details[tree_id.uuid] = details
+        for sub in subscribers:
+            if changed or not sub.primed:
+                sub.offer(tree_id.uuid, TreeUpdate(tree_details=details))
+
+    def offer_status_deltas(self, tree_id: NodeId, subscribers: List[Subscriber]) -> None:
+        """
+        Offer the node statuses that changed since the last poll.  Subscribers
+        new to the tree are sent its structure and a full snapshot instead, as
+        are all subscribers once the tree is reloaded.
+        """
+        tree_uuid = tree_id.uuid
+        snapshot = self.get_statuses(tree_id)
+        structure = self.structures.get(tree_uuid)
+        if structure is None or structure.structure_version != snapshot.structure_version:
+            structure = self.get_structure(tree_id)
+            if not structure.nodes or structure.structure_version != snapshot.structure_version:
+                # the tree has not finished loading, or is being reloaded
+                return
+            self.structures[tree_uuid] = structure
+            self.last_statuses.pop(tree_uuid, None)
+
+        last = self.last_statuses.get(tree_uuid)
+        self.last_statuses[tree_uuid] = snapshot
+        delta = None
+        if last is not None and (last.sequence != snapshot.sequence
+                                 or last.tree_status != snapshot.tree_status):
+            delta = TreeUpdate(status_delta=diff_status_delta(last, snapshot))
+
+        for sub in subscribers:
+            if last is None or not sub.primed:
+                sub.offer(tree_uuid, TreeUpdate(tree_structure=self.structures[tree_uuid]))
+                sub.offer(tree_uuid, TreeUpdate(status_delta=snapshot))
+            elif delta is not None:
+                sub.offer(tree_uuid, delta)
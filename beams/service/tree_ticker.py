@@ -5,13 +5,18 @@ from __future__ import annotations
 
 import logging
 import os
+import threading
 import time
-from ctypes import c_bool, c_char_p, c_uint
+from contextlib import contextmanager
+from ctypes import (Structure, c_bool, c_char, c_double, c_uint8, c_uint32,
+                    c_uint64, sizeof)
+from dataclasses import dataclass
 from functools import partial
-from multiprocessing import Queue, Semaphore, Value
-from multiprocessing.managers import BaseManager
+from multiprocessing import Event, Lock, Semaphore, SimpleQueue
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
-from typing import Optional, Union
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Tuple,
+                    TypeVar, Union)
 from uuid import UUID
 
 from py_trees.behaviour import Behaviour
@@ -21,17 +26,35 @@ from py_trees.display import unicode_blackboard, unicode_tree
 from py_trees.trees import BehaviourTree
 from py_trees.visitors import SnapshotVisitor
 
+from beams.behavior_tree.action_pool import sync_action_worker_pool
 from beams.behavior_tree.condition_node import AckConditionNode
 from beams.logging import LoggingVisitor
+from beams.service.helpers.status_table import NodeStatusTable
+from beams.service.helpers.tick_clock import TickClock
 from beams.service.helpers.worker import Worker
 from beams.service.remote_calls.behavior_tree_pb2 import (
-    BehaviorTreeUpdateMessage, NodeId, NodeInfo, TickConfiguration, TickStatus,
-    TreeDetails, TreeStatus)
+    BehaviorTreeUpdateMessage, LoadTimings, NodeId, NodeInfo,
+    TickConfiguration, TickStatistics, TickStatus, TickTiming, TreeDetails,
+    TreeStatus, TreeStatusDelta, TreeStructure)
+from beams.service.remote_calls.command_pb2 import CommandType
 from beams.service.remote_calls.generic_message_pb2 import MessageType
-from beams.tree_config import get_tree_from_path
+from beams.service.tree_deltas import (full_status_delta,
+                                       skeleton_from_structure)
+from beams.service.tree_reload import ReloadPlan, apply_reload, plan_reload
+from beams.tree_config import get_tree_from_path, get_tree_item_from_path
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# how long a reload, or stopping the tree, waits for the current tick to finish
+RELOAD_STOP_TIMEOUT_SEC = 10.0
+# how long a TreeState write may stay unfinished before readers abandon it,
+# its writer having been terminated mid-write
+STATE_WRITE_TIMEOUT_SEC = 1.0
+# the pause between a reader's retries, once the writer is not finishing
+STATE_READ_RETRY_SEC = 0.001
+
 
 def snapshot_post_tick_handler(
     snapshot_visitor: SnapshotVisitor,
@@ -112,68 +135,300 @@ def run_from_file_tree_tick_work_func(
                 break
 
 
+# Sizes of the fixed-width string fields of TreeStateFields.  Longer strings
+# are truncated
+NODE_NAME_SIZE = 128
+UUID_SIZE = 36
+SHM_NAME_SIZE = 64
+
+
+class TreeStateFields(Structure):
+    """Layout of the shared memory block behind a TreeState"""
+    _fields_ = [
+        # seqlock sequence, odd while a write is in progress
+        ("seq", c_uint64),
+        # protobuf enums are stored by value
+        ("tree_status", c_uint8),  # TreeStatus
+        ("root_status", c_uint8),  # TickStatus
+        ("tick_config", c_uint8),  # TickConfiguration
+        ("tick_timing", c_uint8),  # TickTiming
+        ("tick_current_tree", c_bool),
+        ("tick_delay_ms", c_uint32),
+        ("node_name", c_char * NODE_NAME_SIZE),
+        ("node_uuid", c_char * UUID_SIZE),
+        ("status_table_name", c_char * SHM_NAME_SIZE),
+        # the serialized TreeStructure, see TreeState.set_tree_structure
+        ("structure_name", c_char * SHM_NAME_SIZE),
+        ("structure_size", c_uint32),
+        ("structure_version", c_uint32),
+        # Constitutes a TickStatistics message
+        ("tick_count", c_uint64),
+        ("overruns", c_uint64),
+        ("missed_deadlines", c_uint64),
+        ("durations_ms", c_double * 4),  # p50, p90, p99, max
+        # time.monotonic() when the state was created, i.e. the load began
+        ("load_started", c_double),
+        # Constitutes a LoadTimings message
+        ("load_durations_ms", c_double * 4),  # read, build, publish, total
+        ("load_node_counts", c_uint32 * 2),  # built, kept
+    ]
+
+
+def encode_fixed(value: str, size: int) -> bytes:
+    """Encode ``value`` to fit a fixed-width field of ``size`` bytes"""
+    return value.encode()[:size]
+
+
+def decode_fixed(value: bytes) -> str:
+    # truncation may have split a multi-byte character
+    return value.decode(errors="ignore")
+
+
 class TreeState():
+    """
+    State of a loaded tree, shared between the service and the process that
+    ticks the tree.
+
+    Fields are held in a single ``TreeStateFields`` block of named shared
+    memory.  Writers are serialized by a lock, and bracket their writes with a
+    seqlock sequence.  Readers take no lock: single fields are plain loads, and
+    groups of fields are re-read if a write happened meanwhile.
+
+    Processes forked after the state is created share its lock.  A TreeState
+    pickled to another process (e.g. a TreeScheduler) attaches to the same
+    block by name, but with a lock of its own.  Doing so hands over the state:
+    from then on only the receiving process may write to it.
+
+    Every instance must be released with ``close``.  The block is freed when
+    the instance that created it is closed.
+    """
     def __init__(
         self,
         tick_delay_ms: int = 1000,
-        tick_config: TickConfiguration = TickConfiguration.CONTINUOUS
+        tick_config: TickConfiguration = TickConfiguration.CONTINUOUS,
+        tick_timing: TickTiming = TickTiming.FIXED_DELAY,
     ):
         # Trees are ticked in worker subprocess, must pass relevant information
         # to the Ticker worker
-        self.current_node = Value(c_char_p, b"")
-        self.current_node_uuid = Value(c_char_p, b"")
-        self.current_status = Value(c_char_p, b"INVALID")  # TickStatus enum name
+        self.shm = SharedMemory(create=True, size=sizeof(TreeStateFields))
+        self.fields = TreeStateFields.from_buffer(self.shm.buf)
+        self.write_lock = Lock()
+        self.is_owner = True
+        # the block holding the structure set by this instance, if any
+        self.structure_block: Optional[SharedMemory] = None
 
+        self.fields.root_status = TickStatus.INVALID
         # Consitutes a TickConfigurationMessage
-        self.tick_delay_ms = Value(c_uint, tick_delay_ms)
-        # don't forget protobuf enums are just int wrappers
-        self.tick_config = Value(c_uint, tick_config)
+        self.fields.tick_delay_ms = tick_delay_ms
+        self.fields.tick_config = tick_config
+        self.fields.tick_timing = tick_timing
 
         # Control Flow Variables of Should I and How Should I tick this tree
         # setting False will allow, stop_work / unloading
-        self.tick_current_tree = Value(c_bool, True)
-        self.tree_status = Value(c_char_p, b"IDLE")  # start in paused state
+        self.fields.tick_current_tree = True
+        self.fields.tree_status = TreeStatus.IDLE  # start in paused state
+        self.fields.load_started = time.monotonic()
 
-        self.details_q = Queue(maxsize=1)
-        self.details_q.put(TreeDetails())
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"name": self.shm.name}
 
-    def get_node_name(self) -> Optional[NodeId]:
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.shm = SharedMemory(name=state["name"])
+        self.fields = TreeStateFields.from_buffer(self.shm.buf)
+        self.write_lock = threading.Lock()
+        self.is_owner = False
+        self.structure_block = None
+
+    def close(self) -> None:
+        """
+        Release this instance, freeing the state if this instance created it
+        and the structure if this instance set it
+        """
+        self._free_structure_block()
+        if not hasattr(self, "fields"):
+            return
+        # the block cannot be closed while fields points into it
+        del self.fields
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+
+    def _free_structure_block(self) -> None:
+        if self.structure_block is None:
+            return
+        self.structure_block.close()
+        try:
+            self.structure_block.unlink()
+        except FileNotFoundError:
+            # freed by a process that published a structure since
+            logger.debug(f"Structure {self.structure_block.name} was already unlinked")
+        self.structure_block = None
+
+    def take_structure(self) -> None:
+        """
+        Free the published structure once this instance is closed, in place
+        of the structure this instance set.  For structures published by
+        another process sharing the state, which is gone
+        """
+        name = decode_fixed(self._read(lambda fields: fields.structure_name))
+        if self.structure_block is not None and self.structure_block.name == name:
+            return
+        self._free_structure_block()
+        if name:
+            self.structure_block = SharedMemory(name=name)
+
+    @contextmanager
+    def _write(self):
+        """Hold the write lock, marking the fields as being written"""
+        with self.write_lock:
+            self.fields.seq += 1
+            try:
+                yield self.fields
+            finally:
+                self.fields.seq += 1
+
+    def _read(self, reader: Callable[[TreeStateFields], T]) -> T:
+        """
+        Return ``reader(fields)``, retrying until no write overlapped it.
+        A write unfinished for STATE_WRITE_TIMEOUT_SEC is abandoned
+        """
+        attempts = 0
+        # (seq, time) at which an unfinished write was first seen
+        stalled: Optional[Tuple[int, float]] = None
+        while True:
+            seq = self.fields.seq
+            if seq % 2 == 0:
+                result = reader(self.fields)
+                if self.fields.seq == seq:
+                    return result
+            attempts += 1
+            if attempts % 100 != 0:
+                continue
+            if attempts < 1000:
+                # the writer was likely descheduled mid-write, let it finish
+                time.sleep(0)
+                continue
+
+            time.sleep(STATE_READ_RETRY_SEC)
+            if stalled is None or stalled[0] != seq:
+                stalled = (seq, time.monotonic())
+            elif seq % 2 and time.monotonic() - stalled[1] > STATE_WRITE_TIMEOUT_SEC:
+                self._abandon_write(seq)
+
+    def _abandon_write(self, seq: int) -> None:
+        """End the write begun at ``seq``, whose writer never finished it"""
+        with self.write_lock:
+            if self.fields.seq == seq:
+                logger.error(f"Tree state write unfinished after "
+                             f"{STATE_WRITE_TIMEOUT_SEC}s, its writer was "
+                             "likely terminated.  Abandoning it")
+                self.fields.seq = seq + 1
+
+    def get_version(self) -> int:
+        """
+        The number of writes made to the state, a write in progress included.
+        Changes whenever any field may have, e.g. after every tick
+        """
+        return (self.fields.seq + 1) // 2
+
+    def get_node_name(self) -> NodeId:
         """
         Returns the name of the node that ended the current tick.  This will
         be the "tip" of the tree, provided by py_trees
         """
-        if ((self.current_node.value is not None) and
-            (self.current_node_uuid.value is not None)):
-            return NodeId(
-                name=self.current_node.value.decode(),
-                uuid=self.current_node_uuid.value.decode(),
-            )
-
-    def set_node_name(self, name: str, uuid: Union[UUID, str]) -> None:
-        self.current_node.value = name.encode()
-        self.current_node_uuid.value = str(uuid).encode()
+        name, uuid = self._read(lambda fields: (fields.node_name, fields.node_uuid))
+        return NodeId(name=decode_fixed(name), uuid=decode_fixed(uuid))
 
     def get_root_status(self) -> TickStatus:
-        status_name = getattr(self.current_status, "value", b"INVALID").decode()
-        status = getattr(TickStatus, status_name)
-        return status
+        return self.fields.root_status
 
-    def set_root_status(self, status: Status) -> None:
-        self.current_status.value = status.name.encode()
+    def set_tick_result(self, name: str, uuid: Union[UUID, str], status: Status) -> None:
+        """Record the tip node and root status of a tick in a single write"""
+        with self._write() as fields:
+            fields.node_name = encode_fixed(name, NODE_NAME_SIZE)
+            fields.node_uuid = encode_fixed(str(uuid), UUID_SIZE)
+            fields.root_status = getattr(TickStatus, status.name)
 
     def get_tick_config(self) -> TickConfiguration:
-        return getattr(TickConfiguration, TickConfiguration.Name(self.tick_config.value))
+        return self.fields.tick_config
+
+    def set_tick_config(self, tick_config: TickConfiguration) -> None:
+        with self._write() as fields:
+            fields.tick_config = tick_config
 
     def get_tick_delay_ms(self) -> int:
-        return int(self.tick_delay_ms.value)
+        return self.fields.tick_delay_ms
+
+    def set_tick_delay_ms(self, tick_delay_ms: int) -> None:
+        with self._write() as fields:
+            fields.tick_delay_ms = tick_delay_ms
+
+    def get_tick_timing(self) -> TickTiming:
+        return self.fields.tick_timing
+
+    def set_tick_timing(self, tick_timing: TickTiming) -> None:
+        with self._write() as fields:
+            fields.tick_timing = tick_timing
+
+    def get_tick_statistics(self) -> TickStatistics:
+        return self._read(lambda fields: TickStatistics(
+            tick_timing=fields.tick_timing,
+            tick_count=fields.tick_count,
+            overruns=fields.overruns,
+            missed_deadlines=fields.missed_deadlines,
+            duration_p50_ms=fields.durations_ms[0],
+            duration_p90_ms=fields.durations_ms[1],
+            duration_p99_ms=fields.durations_ms[2],
+            duration_max_ms=fields.durations_ms[3],
+        ))
+
+    def set_tick_statistics(self, stats: TickStatistics) -> None:
+        with self._write() as fields:
+            fields.tick_count = stats.tick_count
+            fields.overruns = stats.overruns
+            fields.missed_deadlines = stats.missed_deadlines
+            fields.durations_ms[:] = [stats.duration_p50_ms, stats.duration_p90_ms,
+                                      stats.duration_p99_ms, stats.duration_max_ms]
+
+    def get_load_timings(self) -> LoadTimings:
+        """How long loading the tree took, all zero until it has loaded"""
+        return self._read(lambda fields: LoadTimings(
+            read_ms=fields.load_durations_ms[0],
+            build_ms=fields.load_durations_ms[1],
+            publish_ms=fields.load_durations_ms[2],
+            total_ms=fields.load_durations_ms[3],
+            nodes_built=fields.load_node_counts[0],
+            nodes_kept=fields.load_node_counts[1],
+        ))
+
+    def set_load_timings(
+        self,
+        read_ms: float,
+        build_ms: float,
+        publish_ms: float,
+        nodes_built: int = 0,
+        nodes_kept: int = 0,
+        started: Optional[float] = None,
+    ) -> None:
+        """
+        Record the duration of each load phase.  The total is measured from
+        ``started`` (a time.monotonic() value), by default the creation of the
+        state, so includes any time spent before loading began (e.g. waiting
+        on a TreeScheduler)
+        """
+        with self._write() as fields:
+            if started is None:
+                started = fields.load_started
+            total_ms = (time.monotonic() - started) * 1000
+            fields.load_durations_ms[:] = [read_ms, build_ms, publish_ms, total_ms]
+            fields.load_node_counts[:] = [nodes_built, nodes_kept]
 
     def get_tree_status(self) -> TreeStatus:
-        tree_status_name = getattr(self.tree_status, "value", b"ERROR").decode()
-        status = getattr(TreeStatus, tree_status_name)
-        return status
+        return self.fields.tree_status
 
     def set_tree_status(self, status: TreeStatus) -> None:
-        self.tree_status.value = TreeStatus.Name(status).encode()
+        with self._write() as fields:
+            fields.tree_status = status
 
     def set_pause_tree(self, value: bool):
         logger.debug(f"setting pause tree on thread: {os.getpid()}")
@@ -182,29 +437,243 @@ class TreeState():
         else:
             self.set_tree_status(TreeStatus.TICKING)
 
+    def set_ticking(self) -> bool:
+        """
+        Mark the tree as TICKING, unless it has been paused.  Checked and set
+        together so a pause arriving just before a tick is not overwritten.
+        Returns False if the tree is paused.
+        """
+        with self._write() as fields:
+            if fields.tree_status == TreeStatus.IDLE:
+                return False
+            fields.tree_status = TreeStatus.TICKING
+            return True
+
     def get_pause_tree(self) -> bool:
         logger.debug(f"checking pause tree on thread: {os.getpid()}")
         tree_status = self.get_tree_status()
         return tree_status == TreeStatus.IDLE
 
     def get_tick_current_tree(self) -> bool:
-        return self.tick_current_tree.value
+        return self.fields.tick_current_tree
+
+    def set_tick_current_tree(self, value: bool) -> None:
+        with self._write() as fields:
+            fields.tick_current_tree = value
+
+    def get_tree_structure(self) -> TreeStructure:
+        """
+        The static structure of the tree, empty until the tree is loaded.
+        Node statuses are held separately, in the NodeStatusTable named in
+        the state
+        """
+        return self.get_published_tree()[0]
+
+    def get_published_tree(self) -> Tuple[TreeStructure, str]:
+        """
+        The structure of the tree and the name of its NodeStatusTable, which
+        are replaced together when the tree is reloaded
+        """
+        last_name = None
+        while True:
+            name, size, table_name = self._read(lambda fields: (
+                fields.structure_name, fields.structure_size, fields.status_table_name
+            ))
+            structure = TreeStructure()
+            if not name:
+                return structure, decode_fixed(table_name)
+            try:
+                block = SharedMemory(name=decode_fixed(name))
+            except FileNotFoundError:
+                if name == last_name:
+                    raise
+                # freed by a reload since it was read
+                last_name = name
+                continue
+            try:
+                structure.ParseFromString(bytes(block.buf[:size]))
+            finally:
+                block.close()
+            return structure, decode_fixed(table_name)
+
+    def get_structure_version(self) -> int:
+        """The number of structures published, see TreeStructure.structure_version"""
+        return self.fields.structure_version
+
+    def set_tree_structure(
+        self,
+        structure: TreeStructure,
+        status_table_name: Optional[str] = None,
+    ) -> None:
+        """
+        Publish ``structure`` in a new shared memory block, which lives until
+        this instance is closed or publishes another structure.  The
+        structure's version is set to the next version.  ``status_table_name``,
+        if provided, is published along with the structure
+        """
+        # this instance is the only writer of the structure
+        structure.structure_version = self.fields.structure_version + 1
+        data = structure.SerializeToString()
+        # SharedMemory refuses zero-sized blocks
+        block = SharedMemory(create=True, size=max(len(data), 1))
+        block.buf[:len(data)] = data
+        with self._write() as fields:
+            fields.structure_name = encode_fixed(block.name, SHM_NAME_SIZE)
+            fields.structure_size = len(data)
+            fields.structure_version = structure.structure_version
+            if status_table_name is not None:
+                fields.status_table_name = encode_fixed(status_table_name, SHM_NAME_SIZE)
 
-    def get_details(self) -> TreeDetails:
-        details = self.details_q.get()
-        # replace so we can get as may times as we like
-        self.details_q.put(details)
-        return details
+        self._free_structure_block()
+        self.structure_block = block
 
-    def set_details(self, details: TreeDetails) -> None:
-        self.details_q.get()
-        self.details_q.put(details)
+    def get_status_table_name(self) -> str:
+        return decode_fixed(self.fields.status_table_name)
+
+
+def get_behavior_tree_update_from_state(
+    state: TreeState,
+    tree_id: NodeId,
+) -> BehaviorTreeUpdateMessage:
+    """
+    Build a BehaviorTreeUpdateMessage from the information held in ``state``.
+
+    Parameters
+    ----------
+    state : TreeState
+        The (possibly proxied) shared state of the tree
+    tree_id : NodeId
+        The identification to attach to the message
+
+    Returns
+    -------
+    BehaviorTreeUpdateMessage
+    """
+    return BehaviorTreeUpdateMessage(
+        mess_t=MessageType.MESSAGE_TYPE_BEHAVIOR_TREE_MESSAGE,
+        tree_id=tree_id,
+        tick_status=state.get_root_status(),
+        node_id=state.get_node_name(),
+        tick_config=state.get_tick_config(),
+        tick_delay_ms=state.get_tick_delay_ms(),
+        tree_status=state.get_tree_status(),
+        tick_stats=state.get_tick_statistics(),
+    )
+
+
+def fill_node_statuses(node_info: NodeInfo, statuses: bytes) -> None:
+    """
+    Set the status of every node under ``node_info`` from ``statuses``, which
+    is indexed by each node's pre-order position
+    """
+    stack = [node_info]
+    ordinal = 0
+    while stack:
+        info = stack.pop()
+        info.status = statuses[ordinal]
+        ordinal += 1
+        stack.extend(reversed(info.children))
+
+
+def get_detailed_update_from_state(
+    state: TreeState,
+    skeleton: TreeDetails,
+    statuses: bytes,
+) -> TreeDetails:
+    """
+    Combine the tree's static ``skeleton`` with the node ``statuses`` read
+    from its NodeStatusTable
+    """
+    det = TreeDetails()
+    det.CopyFrom(skeleton)
+    fill_node_statuses(det.node_info, statuses)
+    # update tick status, details only update after tick, not on pause
+    det.tree_status = state.get_tree_status()
+    load_timings = state.get_load_timings()
+    if load_timings.total_ms:
+        det.load_timings.CopyFrom(load_timings)
+    return det
+
+
+class TreeStatusWriter:
+    """
+    Publishes the node statuses of ``tree`` to a new NodeStatusTable.
+
+    The structure of a tree only changes if it is reloaded, which replaces its
+    TreeStatusWriter.  It is held both in ``skeleton``, a TreeDetails without
+    statuses, and in the flat ``structure``.  Each node's status is stored at
+    the node's pre-order position (ordinal), which is also its index in
+    ``structure.nodes``.
+
+    Only nodes visited by a tick, or by the tick before it, can have changed
+    status.  Those are passed to ``update`` and are the only statuses written.
+    """
+    def __init__(self, tree: BehaviourTree):
+        self.skeleton = TreeDetails()
+        self.structure = TreeStructure()
+        # behaviour id -> (behaviour, its ordinal in the status table)
+        self.nodes: Dict[UUID, Tuple[Behaviour, int]] = {}
+        self._add_node(tree.root, self.skeleton.node_info)
+
+        self.table = NodeStatusTable(n_nodes=len(self.nodes))
+        self.table.write(
+            (ordinal, getattr(TickStatus, node.status.name))
+            for node, ordinal in self.nodes.values()
+        )
+
+    def _add_node(self, node: Behaviour, info: NodeInfo) -> None:
+        info.id.name = node.name
+        info.id.uuid = str(node.id)
+        self.nodes[node.id] = (node, len(self.nodes))
+        self.structure.nodes.add(
+            id=info.id, node_type=type(node).__name__, n_children=len(node.children)
+        )
+        for child in node.children:
+            self._add_node(child, info.children.add())
+
+    def update(self, node_ids: Iterable[UUID]) -> None:
+        """Write the statuses of the nodes with the provided ids"""
+        updates = []
+        for node_id in node_ids:
+            node, ordinal = self.nodes.get(node_id, (None, None))
+            if node is None:
+                continue
+            if node.status == Status.INVALID:
+                # stopping a node also stops its children, visited or not
+                updates.extend((self.nodes[sub_node.id][1], TickStatus.INVALID)
+                               for sub_node in node.iterate())
+            else:
+                updates.append((ordinal, getattr(TickStatus, node.status.name)))
+        self.table.write(updates)
+
+    def read(self) -> bytes:
+        return self.table.read()
+
+    def read_with_sequence(self) -> Tuple[int, bytes]:
+        return self.table.read_with_sequence()
+
+
+@dataclass
+class PublishedTree:
+    """
+    A tree's structure and NodeStatusTable, as published through its
+    TreeState by the process ticking the tree
+    """
+    structure: TreeStructure
+    skeleton: TreeDetails
+    status_table: NodeStatusTable
+
+    def read(self) -> bytes:
+        # the table may be larger than the tree, see NodeStatusTable
+        return self.status_table.read(len(self.structure.nodes))
+
+    def read_with_sequence(self) -> Tuple[int, bytes]:
+        return self.status_table.read_with_sequence(len(self.structure.nodes))
 
 
 class TreeTicker(Worker):
     def __init__(self, filepath: str,
-                 init_tree_state: Optional[TreeState] = None,
-                 sync_man: Optional[BaseManager] = None):
+                 init_tree_state: Optional[TreeState] = None):
         super().__init__("TreeTicker")
         self.fp = filepath
 
@@ -216,117 +685,344 @@ class TreeTicker(Worker):
             logging.error(f"Provided filepath: {self.fp} is not a file")
             raise ValueError("Provided filepath is not a file")
 
-        self.tree = get_tree_from_path(fp)
-
-        # TODO: fix.  This is actually not always equivalent to the passed in
-        # init_tree_state, which can be an AutoProxy member of a SyncManager itself
         if init_tree_state is None:
             self.state = TreeState()
         else:
             self.state = init_tree_state
 
-        # don't forget to null check this
-        # This is currently not used.  Presumably we would need to expose
-        # the port and address for clients to connect to this.
-        self.sync_man = sync_man
+        start = time.monotonic()
+        # kept to diff against when the tree is reloaded
+        self.tree_item = get_tree_item_from_path(fp)
+        read_done = time.monotonic()
+        self.tree = self.tree_item.get_tree()
+        build_done = time.monotonic()
 
         self.tick_sem = Semaphore(value=0)
+        # Set by every command that may change how or whether the tree ticks.
+        # The work process sleeps on this rather than polling
+        self.wakeup = Event()
+        # (command, arguments) for the work process, which holds the ticking
+        # copy of the tree.  Run between ticks, see ``run_commands``
+        self.commands = SimpleQueue()
+        # set once the work process has run a RELOAD_TREE command
+        self.reloaded = Event()
+        # node statuses are shared with readers through shared memory
+        self.status_writer = TreeStatusWriter(self.tree)
+        # replaced by the last reload, freed by the next so readers that were
+        # still using it can finish
+        self.previous_status_writer: Optional[TreeStatusWriter] = None
+        # the structure and statuses published by the work process once it
+        # reloads the tree, as attached to by this process.  The previous one
+        # is closed by the next attachment, as for status_writer
+        self.published: Optional[PublishedTree] = None
+        self.previous_published: Optional[PublishedTree] = None
+        # the behaviours built by the work process's reloads, which only that
+        # process can shut down
+        self.reload_built: List[Behaviour] = []
+        self.state.set_tree_structure(self.status_writer.structure,
+                                      self.status_writer.table.name)
+        publish_done = time.monotonic()
+        self.state.set_load_timings(
+            read_ms=(read_done - start) * 1000,
+            build_ms=(build_done - read_done) * 1000,
+            publish_ms=(publish_done - build_done) * 1000,
+            nodes_built=len(self.status_writer.nodes),
+        )
+        # loaded trees are paused until START_TREE
+        self.state.set_tree_status(TreeStatus.IDLE)
+        self.log_load_timings("Loaded")
+        self.snapshot_visitor = SnapshotVisitor()
+        # only used within the work process, for continuous ticking
+        self.clock = TickClock(
+            period_sec=self.state.get_tick_delay_ms() / 1000,
+            tick_timing=self.state.get_tick_timing(),
+        )
+
+    def log_load_timings(self, action: str) -> None:
+        timings = self.state.get_load_timings()
+        logger.info(f"{action} tree at {self.fp} in {timings.total_ms:.1f} ms (read: "
+                    f"{timings.read_ms:.1f} ms, build: {timings.build_ms:.1f} ms, "
+                    f"publish: {timings.publish_ms:.1f} ms, nodes built: "
+                    f"{timings.nodes_built}, kept: {timings.nodes_kept})")
+
+    def notify(self) -> None:
+        """Wake the work process so it re-evaluates the tree's TreeState"""
+        self.wakeup.set()
+
+    def stop_work(self):
+        self.state.set_tick_current_tree(False)
+        self.notify()
+        if self.do_work.value:
+            # let the work process finish its tick, and shut down the
+            # behaviours it built
+            self.work_proc.join(timeout=RELOAD_STOP_TIMEOUT_SEC)
+        super().stop_work()
 
     def shutdown(self):
         self.tree.shutdown()
+        self.release()
+
+    def release(self) -> None:
+        """Free the shared memory of a tree that is no longer needed"""
+        self.status_writer.table.unlink()
+        if self.previous_status_writer is not None:
+            self.previous_status_writer.table.unlink()
+        if self.get_published() is not self.status_writer:
+            # published by the work process, which is gone
+            self.published.status_table.unlink()
+            self.state.take_structure()
+        if self.previous_published is not None:
+            self.previous_published.status_table.close()
+        self.state.close()
 
     def get_tree_state(self):
         return self.state
 
+    def rebuild_tree(self, filepath: str, set_up: bool) -> ReloadPlan:
+        """
+        Reload the tree from ``filepath``, rebuilding only the nodes that
+        changed, see ``beams.service.tree_reload``.  New nodes are set up if
+        ``set_up``.  Must be called by the process ticking the tree, between
+        ticks.  The loaded tree is left unchanged if the new tree fails to load.
+        Returns the plan applied.
+        """
+        logger.info(f"Reloading tree at {self.fp} from {filepath}")
+        start = time.monotonic()
+        new_item = get_tree_item_from_path(Path(filepath).resolve())
+        read_done = time.monotonic()
+        plan = plan_reload(self.tree_item, self.tree, new_item)
+        apply_reload(self.tree, plan, set_up=set_up)
+        if set_up:
+            sync_action_worker_pool()
+        self.tree_item = new_item
+        self.fp = filepath
+        build_done = time.monotonic()
+
+        status_writer = TreeStatusWriter(self.tree)
+        self.state.set_tree_structure(status_writer.structure, status_writer.table.name)
+        if self.previous_status_writer is not None:
+            self.previous_status_writer.table.unlink()
+        self.previous_status_writer, self.status_writer = self.status_writer, status_writer
+        publish_done = time.monotonic()
+
+        nodes_built = plan.count_built()
+        self.state.set_load_timings(
+            read_ms=(read_done - start) * 1000,
+            build_ms=(build_done - read_done) * 1000,
+            publish_ms=(publish_done - build_done) * 1000,
+            nodes_built=nodes_built,
+            nodes_kept=len(status_writer.nodes) - nodes_built,
+            started=start,
+        )
+        self.log_load_timings("Reloaded")
+        return plan
+
+    def reload_tree(self, filepath: str) -> None:
+        """
+        Reload the tree from ``filepath``, see ``rebuild_tree``.
+
+        Once the tree is ticking, the work process holds the copy of the tree
+        that is ticked, so rebuilds it between ticks.  Unchanged nodes keep
+        their state, and their ActionNodes' workers keep running.  Waits for
+        the current tick to finish, up to ``RELOAD_STOP_TIMEOUT_SEC``.
+        """
+        if not self.do_work.value:
+            self.rebuild_tree(filepath, set_up=False)
+            return
+        self.reloaded.clear()
+        self.send_command(CommandType.RELOAD_TREE, filepath)
+        if not self.reloaded.wait(timeout=RELOAD_STOP_TIMEOUT_SEC):
+            logger.warning(f"Tree at {self.fp} is still ticking, it is reloaded "
+                           f"from {filepath} once its current tick finishes")
+
+    def send_command(self, command: CommandType, *args: Any) -> None:
+        """Have the work process run ``command`` before its next tick"""
+        self.commands.put((command, args))
+        self.notify()
+
+    def run_commands(self) -> None:
+        """Run the commands sent by ``send_command``, in the work process"""
+        while not self.commands.empty():
+            command, args = self.commands.get()
+            if command == CommandType.RELOAD_TREE:
+                try:
+                    plan = self.rebuild_tree(*args, set_up=True)
+                    self.reload_built.extend(plan.shells + plan.built)
+                except Exception:
+                    logger.exception(f"Failed to reload tree at {self.fp} from {args[0]}")
+                finally:
+                    self.reloaded.set()
+            elif command == CommandType.ACK_NODE:
+                self.find_and_acknowledge(*args)
+
+    def shutdown_reload_built(self) -> None:
+        """Shut down the behaviours built by reloads in the work process"""
+        for node in self.reload_built:
+            for sub_node in node.iterate():
+                sub_node.shutdown()
+        self.reload_built.clear()
+
+    def wait_loaded(self) -> bool:
+        """TreeTickers are loaded once constructed, see ScheduledTreeTicker"""
+        return True
+
     def update_tree_state(self, new_state: TreeState):
         self.state = new_state
 
-    def get_behavior_tree_update(self) -> BehaviorTreeUpdateMessage:
-        mess = BehaviorTreeUpdateMessage(
-                mess_t=MessageType.MESSAGE_TYPE_BEHAVIOR_TREE_MESSAGE,
-                tree_id=NodeId(name=self.tree.root.name,
-                               uuid=str(self.tree.root.id)),
-                tick_status=self.state.get_root_status(),
-                node_id=self.state.get_node_name(),
-                tick_config=self.state.get_tick_config(),
-                tick_delay_ms=self.state.get_tick_delay_ms(),
-                tree_status=self.state.get_tree_status(),
-            )
+    def get_published(self) -> Union[TreeStatusWriter, PublishedTree]:
+        """
+        The structure and node statuses of the tree as last published.  Once
+        the work process has reloaded the tree, those it published, attached
+        to (again, if reloaded since) by this process.
+        """
+        published = self.published or self.status_writer
+        version = self.state.get_structure_version()
+        if published.structure.structure_version == version:
+            return published
+        structure, table_name = self.state.get_published_tree()
+        try:
+            status_table = NodeStatusTable(name=table_name)
+        except FileNotFoundError:
+            # reloaded again since, a later call attaches to the newer table
+            return published
+        if self.previous_published is not None:
+            self.previous_published.status_table.close()
+        self.previous_published = self.published
+        self.published = PublishedTree(
+            structure=structure,
+            skeleton=skeleton_from_structure(structure),
+            status_table=status_table,
+        )
+        return self.published
 
-        return mess
+    def get_behavior_tree_update(self) -> BehaviorTreeUpdateMessage:
+        # identified by the root node, which a reload may have rebuilt
+        tree_id = NodeId()
+        tree_id.CopyFrom(self.get_published().structure.nodes[0].id)
+        return get_behavior_tree_update_from_state(self.state, tree_id)
 
     def get_detailed_update(self) -> TreeDetails:
-        det = self.state.get_details()
-        # update tick status, details only update after tick, not on pause
-        det.tree_status = self.state.get_tree_status()
-        return det
-
-    def get_tree_details(self, tree: BehaviourTree) -> TreeDetails:
-        """get the details for this tree in particular"""
-        def _get_node_info(node: Behaviour) -> NodeInfo:
-            child_info = [_get_node_info(child) for child in node.children]
-            return NodeInfo(
-                id=NodeId(name=node.name, uuid=str(node.id)),
-                status=getattr(TickStatus, node.status.name),
-                children=child_info,
-            )
+        published = self.get_published()
+        return get_detailed_update_from_state(
+            self.state, published.skeleton, published.read()
+        )
+
+    def get_tree_structure(self) -> TreeStructure:
+        structure = TreeStructure()
+        structure.CopyFrom(self.get_published().structure)
+        structure.tree_id.CopyFrom(structure.nodes[0].id)
+        return structure
 
-        details = TreeDetails(
-            node_info=_get_node_info(tree.root),
-            tree_status=getattr(TickStatus, tree.root.status.name),
+    def get_status_snapshot(self) -> TreeStatusDelta:
+        """All node statuses, as a full TreeStatusDelta"""
+        # replaced when the tree is reloaded
+        published = self.get_published()
+        sequence, statuses = published.read_with_sequence()
+        return full_status_delta(
+            published.structure.nodes[0].id, sequence, statuses,
+            self.state.get_tree_status(), published.structure.structure_version,
         )
-        return details
+
+    def add_tree_visitors(self) -> None:
+        """Attach the logging and snapshot visitors used while ticking"""
+        self.tree.visitors.append(LoggingVisitor(print_status=True))
+        # records the nodes visited each tick, for updating status_writer
+        self.tree.visitors.append(self.snapshot_visitor)
+        self.tree.add_post_tick_handler(
+            partial(snapshot_post_tick_handler,
+                    self.snapshot_visitor,
+                    True,
+                    False)
+        )
+
+    def publish_tree_state(self) -> None:
+        """Push the results of the most recent tick to the shared TreeState"""
+        # grab the last node before traversal reversal
+        self.state.set_tick_result(
+            name=getattr(self.tree.tip(), "name", ""),
+            uuid=getattr(self.tree.tip(), "id", ""),
+            status=self.tree.root.status,
+        )
+        # write only the statuses this tick could have changed
+        self.status_writer.update(self.snapshot_visitor.visited.keys()
+                                  | self.snapshot_visitor.previously_visited.keys())
+
+    def tick_and_publish(self) -> bool:
+        """
+        Tick the tree once and publish the results.  Returns False without
+        ticking if the tree has been paused.
+        """
+        if not self.state.set_ticking():
+            return False
+        self.tree.tick()
+        self.publish_tree_state()
+        return True
+
+    def take_interactive_tick(self) -> bool:
+        """
+        Perform a tick requested by TICK_TREE, returning False if none is
+        pending.  A tick taken while the tree is being paused is kept, and
+        performed once the tree is started again.
+        """
+        # each TICK_TREE command releases the semaphore once
+        if not self.tick_sem.acquire(block=False):
+            return False
+        if not self.tick_and_publish():
+            self.tick_sem.release()
+        return True
+
+    def tick_on_clock(self) -> None:
+        """Tick the tree once, recording the tick against ``self.clock``"""
+        start = time.monotonic()
+        if self.tick_and_publish():
+            self.clock.record_tick(start, time.monotonic())
+            self.state.set_tick_statistics(self.clock.get_statistics())
 
     def work_func(self):
-        while (self.do_work.value):
-            self.tree.visitors.append(LoggingVisitor(print_status=True))
-
-            snapshot_visitor = SnapshotVisitor()
-            self.tree.add_post_tick_handler(
-                partial(snapshot_post_tick_handler,
-                        snapshot_visitor,
-                        True,
-                        False)
-            )
+        self.add_tree_visitors()
+        # whether the previous iteration was ticking continuously, the clock
+        # restarts whenever continuous ticking (re)starts
+        on_clock = False
+        while (self.do_work.value and self.state.get_tick_current_tree()):
+            # clear before inspecting state, so no notification is missed
+            self.wakeup.clear()
             try:
-                while (self.state.get_tick_current_tree()):
-                    while (self.state.get_pause_tree()):
-                        # reusing this here.... could use a semaphore...
-                        self.state.set_tree_status(TreeStatus.IDLE)
-                        time.sleep(self.state.get_tick_delay_ms() / 1000)
-
-                    # If we are in interactive mode
-                    if self.state.get_tick_config() == TickConfiguration.INTERACTIVE:
-                        # wait till the semaphore gets incremented, this is the IPC
-                        # method to communicate a tick_interactive
-                        got_tick = self.tick_sem.acquire(timeout=0.2)
-
-                        # because of the timeout (makes cleaning up thread easier)
-                        # we need to check how it timed out
-                        if got_tick:
-                            self.state.set_tree_status(TreeStatus.TICKING)
-                            self.tree.tick()
-                        else:
-                            self.state.set_tree_status(TreeStatus.WAITING_ACK)
-                    # otherwise we are in continous mode, tick the tree as normal!
+                self.run_commands()
+                if self.state.get_pause_tree():
+                    self.state.set_tree_status(TreeStatus.IDLE)
+                    # idle until a command arrives
+                    on_clock = False
+                    self.wakeup.wait()
+                    continue
+
+                # If we are in interactive mode
+                if self.state.get_tick_config() == TickConfiguration.INTERACTIVE:
+                    on_clock = False
+                    if not self.take_interactive_tick():
+                        self.state.set_tree_status(TreeStatus.WAITING_ACK)
+                        self.publish_tree_state()
+                        self.wakeup.wait()
+                # otherwise we are in continous mode, tick the tree as normal!
+                else:
+                    # pick up changes to the tick settings on every wake
+                    self.clock.set_period(self.state.get_tick_delay_ms() / 1000)
+                    self.clock.set_tick_timing(self.state.get_tick_timing())
+                    now = time.monotonic()
+                    if not on_clock:
+                        self.clock.reset(now)
+                        on_clock = True
+                    remaining = self.clock.time_until_next(now)
+                    if remaining > 0:
+                        # re-evaluate the tree state once woken, commands may
+                        # have paused or reconfigured the tree meanwhile
+                        self.wakeup.wait(timeout=remaining)
                     else:
-                        self.state.set_tree_status(TreeStatus.TICKING)
-                        self.tree.tick()
-
-                    # grab the last node before traversal reversal
-                    self.state.set_node_name(
-                        name=getattr(self.tree.tip(), "name", ""),
-                        uuid=getattr(self.tree.tip(), "id", ""),
-                    )
-                    self.state.set_root_status(self.tree.root.status)
-                    # update tree details
-                    new_details = self.get_tree_details(self.tree)
-                    self.state.set_details(new_details)
-
-                    time.sleep(self.state.get_tick_delay_ms() / 1000)
+                        self.tick_on_clock()
             except Exception as ex:
                 self.state.set_tree_status(TreeStatus.ERROR)
                 logger.exception(ex)
+                self.wakeup.wait(timeout=self.state.get_tick_delay_ms() / 1000)
+        self.shutdown_reload_built()
 
     # Hooks for CommandMessages
 
@@ -336,10 +1032,13 @@ class TreeTicker(Worker):
             logging.error(f"Tree of name {self.tree.root.name} is already unpaused")
             return
         self.state.set_pause_tree(False)
+        self.notify()
         # NOTE: this was moved here as the os.getpid() of the owning Process object
         # was instantiated within the sync manager pid, this ensures we start()
         # from the same pid we created the object in. Is this flawless, no. Move at your own risk
         self.tree.setup()
+        # pooled ActionNodes are run by workers forked from this process
+        sync_action_worker_pool()
         self.start_work()
 
     def pause_tree(self):
@@ -347,13 +1046,42 @@ class TreeTicker(Worker):
         if (self.state.get_pause_tree()):
             logging.error(f"Tree of name {self.tree.root.name} is already paused!!")
         self.state.set_pause_tree(True)
+        self.notify()
         logger.debug(f"Pausing tree of name {self.tree.root.name}")
 
     def command_tick(self):
         logger.debug(f"Tree: {self.tree.root.name} got command to tick")
         self.tick_sem.release()
+        self.notify()
+
+    def change_tick_rate(self, tick_delay_ms: int):
+        logger.debug(f"Tree: {self.tree.root.name} changing tick delay to {tick_delay_ms} ms")
+        self.state.set_tick_delay_ms(tick_delay_ms)
+        self.notify()
+
+    def change_tick_configuration(
+        self,
+        tick_config: TickConfiguration,
+        tick_delay_ms: Optional[int] = None,
+        tick_timing: Optional[TickTiming] = None,
+    ):
+        logger.debug(f"Tree: {self.tree.root.name} changing tick configuration to "
+                     f"{TickConfiguration.Name(tick_config)}")
+        self.state.set_tick_config(tick_config)
+        if tick_delay_ms is not None:
+            self.state.set_tick_delay_ms(tick_delay_ms)
+        if tick_timing is not None:
+            self.state.set_tick_timing(tick_timing)
+        self.notify()
 
     def acknowledge_node(self, node_name: str, user_name: str):
+        if self.do_work.value:
+            # nodes built by a reload only exist in the work process
+            self.send_command(CommandType.ACK_NODE, node_name, user_name)
+        else:
+            self.find_and_acknowledge(node_name, user_name)
+
+    def find_and_acknowledge(self, node_name: str, user_name: str) -> None:
         logger.debug(f"Tree: {self.tree.root.name} got command to ack node: {node_name} from user: {user_name}")
         # find Node
         node = None
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 import logging
 import os
 import pathlib
@@ -149,7 +150,9 @@ def rpc_client(rpc_server):
     # I actually don't know what to wait on, but too fast gives 111 errors
     wait_until(try_get_heartbeat)
 
-    return client
+    yield client
+
+    client.close()
 
 
 def wait_until(condition: Callable[[], bool], timeout=5, polling_period=0.5):
@@ -192,6 +195,22 @@ if not ETERNAL_GUARD_PATH.exists():
     raise FileNotFoundError("Eternal Guard Behavior Tree file missing: "
                             f"{ETERNAL_GUARD_PATH}")
 
+# path to a file that fails to load as a bt
+BAD_TREE_PATH = Path(__file__).parent / "artifacts" / "bad_egg3.json"
+
+
+def write_edited_eternal_guard(directory: Path) -> Path:
+    """
+    Write a copy of the Eternal Guard tree to ``directory``, with its last
+    worker ("Worker 2") always succeeding instead of running
+    """
+    tree = json.loads(ETERNAL_GUARD_PATH.read_text())
+    task_sequence = tree["root"]["SequenceItem"]["children"][2]["SequenceItem"]
+    task_sequence["children"][1] = {"SuccessItem": {"name": "Worker 2", "description": ""}}
+    path = directory / "eternal_guard_edited.json"
+    path.write_text(json.dumps(tree))
+    return path
+
 
 def test_configs() -> list[pathlib.Path]:
     """all valid tree configs"""
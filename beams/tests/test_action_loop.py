@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, List
+
+import pytest
+from py_trees.common import Status
+
+from beams.behavior_tree.action_loop import (AsyncActionWorker,
+                                             get_action_event_loop)
+from beams.behavior_tree.action_node import (ActionExecution, ActionNode,
+                                             wrapped_action_work,
+                                             wrapped_async_action_work)
+from beams.behavior_tree.action_worker import ThreadActionWorker
+from beams.tree_config.action import SetPVActionItem
+
+
+def make_counting_node(name: str, target: int, execution: ActionExecution,
+                       sleep_sec: float = 0.0) -> ActionNode:
+    count = 0
+
+    @wrapped_async_action_work(loop_period_sec=0.001)
+    async def work_func(comp_condition: Callable[[], Awaitable[bool]]) -> Status:
+        nonlocal count
+        await asyncio.sleep(sleep_sec)
+        count += 1
+        return Status.SUCCESS if await comp_condition() else Status.RUNNING
+
+    def comp_cond():
+        return count >= target
+
+    node = ActionNode(name=name, work_func=work_func, completion_condition=comp_cond,
+                      execution=execution)
+    node.get_count = lambda: count
+    return node
+
+
+def run_to_completion(nodes: List[ActionNode], timeout: float = 5.0) -> None:
+    start = time.monotonic()
+    while any(node.status not in (Status.SUCCESS, Status.FAILURE) for node in nodes):
+        assert time.monotonic() - start < timeout
+        for node in nodes:
+            if node.status not in (Status.SUCCESS, Status.FAILURE):
+                node.tick_once()
+        time.sleep(0.005)
+
+
+@pytest.fixture(scope="function")
+def event_loop_cleaner():
+    yield
+    get_action_event_loop().stop()
+
+
+def test_async_action_node(bt_cleaner, event_loop_cleaner):
+    node = make_counting_node("action", target=10, execution=ActionExecution.ASYNC)
+    assert isinstance(node.worker, AsyncActionWorker)
+    bt_cleaner.register(node)
+    node.setup()
+    run_to_completion([node])
+    assert node.status == Status.SUCCESS
+    assert node.get_count() == 10
+
+
+def test_async_actions_share_loop(bt_cleaner, event_loop_cleaner):
+    get_action_event_loop()
+    n_threads = threading.active_count()
+    nodes = [make_counting_node(f"action{idx}", target=5, sleep_sec=0.02,
+                                execution=ActionExecution.ASYNC)
+             for idx in range(50)]
+    for node in nodes:
+        bt_cleaner.register(node)
+        node.setup()
+
+    # the actions wait on the loop concurrently, rather than one at a time
+    start = time.monotonic()
+    run_to_completion(nodes)
+    assert time.monotonic() - start < 50 * 5 * 0.02
+    assert all(node.status == Status.SUCCESS for node in nodes)
+    # at most the loop's executor threads were started
+    assert threading.active_count() <= n_threads + 4
+
+
+def test_async_work_in_thread(bt_cleaner, event_loop_cleaner):
+    # each activation runs on the process's loop, waited on by the thread
+    node = make_counting_node("action", target=5, execution=ActionExecution.THREAD)
+    assert isinstance(node.worker, ThreadActionWorker)
+    bt_cleaner.register(node)
+    node.setup()
+    run_to_completion([node])
+    assert node.status == Status.SUCCESS
+
+
+def test_sync_work_func_not_async():
+    @wrapped_action_work()
+    def work_func(comp_condition: Callable) -> Status:
+        return Status.SUCCESS
+
+    node = ActionNode(name="action", work_func=work_func,
+                      completion_condition=lambda: True,
+                      execution=ActionExecution.ASYNC)
+    assert node.execution == ActionExecution.PROCESS
+
+
+def test_item_async_work_func():
+    node = SetPVActionItem(name="set", execution=ActionExecution.ASYNC).get_tree()
+    assert isinstance(node.worker, AsyncActionWorker)
+    assert asyncio.iscoroutinefunction(node.work_func.run_async)
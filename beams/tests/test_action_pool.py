@@ -0,0 +1,141 @@
+import time
+from multiprocessing import Event, Process, Value
+from typing import Callable, List
+
+import pytest
+from py_trees.common import Status
+
+from beams.behavior_tree.action_node import (ActionExecution, ActionNode,
+                                             wrapped_action_work)
+from beams.behavior_tree.action_pool import (POOL_POLL_SEC, ActionWorkerPool,
+                                             PooledActionWorker)
+from beams.behavior_tree.volatile_status import VolatileStatus
+from beams.tests.conftest import wait_until
+
+
+def make_counting_work(counter, target: int):
+    @wrapped_action_work(loop_period_sec=0.001)
+    def work_func(comp_condition: Callable) -> Status:
+        with counter.get_lock():
+            counter.value += 1
+        return Status.SUCCESS if comp_condition() else Status.RUNNING
+
+    def comp_cond():
+        return counter.value >= target
+
+    return work_func, comp_cond
+
+
+@pytest.fixture(scope="function")
+def pool():
+    pool = ActionWorkerPool(n_workers=2)
+    yield pool
+    pool.shutdown()
+    assert pool.get_process_count() == 0
+
+
+def test_pooled_workers(pool: ActionWorkerPool):
+    counters = [Value("i", 0) for _ in range(5)]
+    workers: List[PooledActionWorker] = []
+    for idx, counter in enumerate(counters):
+        work_func, comp_cond = make_counting_work(counter, target=10)
+        worker = PooledActionWorker(f"action{idx}", VolatileStatus(), work_func,
+                                    comp_cond, pool=pool)
+        worker.start_work()
+        workers.append(worker)
+
+    # five actions share the pool's two processes
+    pool.sync()
+    assert pool.get_process_count() == 2
+    for worker in workers:
+        worker.release_work()
+    wait_until(lambda: all(worker.job.volatile_status.get_value() == Status.SUCCESS
+                           for worker in workers), polling_period=0.01)
+    assert [counter.value for counter in counters] == [10] * 5
+    assert pool.get_process_count() == 2
+
+
+def test_pool_picks_up_new_jobs(pool: ActionWorkerPool):
+    first_counter, second_counter = Value("i", 0), Value("i", 0)
+    first = PooledActionWorker("first", VolatileStatus(),
+                               *make_counting_work(first_counter, target=5), pool=pool)
+    first.start_work()
+    first.release_work()
+    wait_until(lambda: first_counter.value == 5, polling_period=0.01)
+
+    # the workers are forked again to know of the new job, the old ones exit
+    second = PooledActionWorker("second", VolatileStatus(),
+                                *make_counting_work(second_counter, target=5), pool=pool)
+    second.start_work()
+    second.release_work()
+    wait_until(lambda: second_counter.value == 5, polling_period=0.01)
+    wait_until(lambda: pool.get_process_count() == 2, polling_period=0.05)
+
+    # stopped workers leave the pool
+    first.stop_work()
+    assert first.job_id is None
+    assert list(pool.jobs.values()) == [second.job]
+
+
+def test_pool_serves_earlier_forks(pool: ActionWorkerPool):
+    # as with trees loaded one after the other, each ticked by a process forked
+    # once its tree is set up
+    first_counter, second_counter = Value("i", 0), Value("i", 0)
+    first = PooledActionWorker("first", VolatileStatus(),
+                               *make_counting_work(first_counter, target=5), pool=pool)
+    first.start_work()
+    pool.sync()
+    release = Event()
+
+    def tick_first():
+        release.wait()
+        first.release_work()
+
+    first_ticker = Process(target=tick_first, daemon=True)
+    first_ticker.start()
+
+    second = PooledActionWorker("second", VolatileStatus(),
+                                *make_counting_work(second_counter, target=5), pool=pool)
+    second.start_work()
+    pool.sync()
+    second.release_work()
+    wait_until(lambda: second_counter.value == 5, polling_period=0.01)
+    # the workers known to the first ticker have retired
+    time.sleep(POOL_POLL_SEC * 2)
+    wait_until(lambda: pool.get_process_count() == 2, polling_period=0.05)
+
+    release.set()
+    first_ticker.join(timeout=5)
+    wait_until(lambda: first.job.volatile_status.get_value() == Status.SUCCESS,
+               polling_period=0.01)
+    assert first_counter.value == 5
+    assert not first.job.queued.value
+
+
+def test_pooled_action_node(bt_cleaner):
+    counter = Value("i", 0)
+    work_func, comp_cond = make_counting_work(counter, target=10)
+    action = ActionNode(name="action", work_func=work_func,
+                        completion_condition=comp_cond,
+                        execution=ActionExecution.POOL)
+    assert isinstance(action.worker, PooledActionWorker)
+    bt_cleaner.register(action)
+    action.setup()
+
+    while action.status not in (Status.SUCCESS, Status.FAILURE):
+        time.sleep(0.01)
+        action.tick_once()
+    assert action.status == Status.SUCCESS
+    assert counter.value == 10
+    action.shutdown()
+    action.worker.pool.shutdown()
+
+
+def test_unpoolable_work_func():
+    def work_loop(*args):
+        ...
+
+    action = ActionNode(name="action", work_func=work_loop,
+                        completion_condition=lambda: True,
+                        execution=ActionExecution.POOL)
+    assert action.execution == ActionExecution.PROCESS
@@ -0,0 +1,77 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from beams.service.async_rpc_client import AsyncRPCClient
+from beams.service.remote_calls.behavior_tree_pb2 import TreeStatus
+from beams.service.remote_calls.heartbeat_pb2 import TreeUpdate
+from beams.service.rpc_client import RPCClient
+from beams.tests.conftest import ETERNAL_GUARD_PATH
+
+
+async def wait_for_status(client: AsyncRPCClient, status: TreeStatus, timeout=5):
+    async def poll():
+        while True:
+            heartbeat = await client.get_heartbeat()
+            if any(update.tree_status == status
+                   for update in heartbeat.behavior_tree_update):
+                return
+            await asyncio.sleep(0.05)
+
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_async_client(rpc_client: RPCClient):
+    async def run():
+        async with AsyncRPCClient() as client:
+            received: List[TreeUpdate] = []
+            stream = client.subscribe_tree_updates(tree_names=["my_tree"])
+
+            async def consume():
+                async for update in stream:
+                    received.append(update)
+
+            consumer = asyncio.create_task(consume())
+
+            await client.load_new_tree(
+                new_tree_filepath=str(ETERNAL_GUARD_PATH),
+                tick_config="CONTINUOUS",
+                tick_delay_ms=50,
+                tree_name="my_tree",
+            )
+            await wait_for_status(client, TreeStatus.IDLE)
+            await client.start_tree(tree_name="my_tree")
+            await wait_for_status(client, TreeStatus.TICKING)
+
+            # many requests in flight at once, on a single loop and channel
+            heartbeats = await asyncio.gather(
+                *(client.get_heartbeat() for _ in range(200))
+            )
+            assert all(len(hb.behavior_tree_update) == 1 for hb in heartbeats)
+            details = await client.get_detailed_update(tree_name="my_tree")
+            assert details.node_info.id.name == "Eternal Guard"
+
+            await client.unload_tree(tree_name="my_tree")
+            await asyncio.wait_for(
+                wait_for_removal(received), timeout=5
+            )
+            stream.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await consumer
+
+    asyncio.run(run())
+
+
+async def wait_for_removal(received: List[TreeUpdate]):
+    while not any(update.HasField("tree_removed") for update in received):
+        await asyncio.sleep(0.05)
+
+
+def test_async_client_requires_tree_id():
+    async def run():
+        async with AsyncRPCClient() as client:
+            with pytest.raises(ValueError):
+                await client.start_tree()
+
+    asyncio.run(run())
@@ -0,0 +1,183 @@
+import threading
+from typing import List
+from uuid import UUID
+
+from beams.service.command_dispatcher import (CommandDispatcher,
+                                              CommandSequencer,
+                                              coalesce_commands,
+                                              get_command_priority)
+from beams.service.remote_calls.command_pb2 import (CommandMessage,
+                                                    CommandPriority,
+                                                    CommandType)
+from beams.service.remote_calls.generic_message_pb2 import MessageType
+from beams.service.rpc_handler import RPCHandler
+from beams.service.tree_registry import TreeIdKey
+
+
+def command(command_t: CommandType, tree_name: str, **kwargs) -> CommandMessage:
+    return CommandMessage(mess_t=MessageType.MESSAGE_TYPE_COMMAND_MESSAGE,
+                          command_t=command_t, tree_name=tree_name, **kwargs)
+
+
+def test_command_priority():
+    assert get_command_priority(
+        command(CommandType.PAUSE_TREE, "a")
+    ) == CommandPriority.PRIORITY_HIGH
+    assert get_command_priority(
+        command(CommandType.LOAD_NEW_TREE, "a")
+    ) == CommandPriority.PRIORITY_LOW
+    assert get_command_priority(
+        command(CommandType.LOAD_NEW_TREE, "a", priority=CommandPriority.PRIORITY_HIGH)
+    ) == CommandPriority.PRIORITY_HIGH
+
+
+def test_urgent_commands_first():
+    handler = RPCHandler(tree_host=None)
+    for request in (
+        command(CommandType.LOAD_NEW_TREE, "a"),
+        command(CommandType.START_TREE, "a"),
+        command(CommandType.PAUSE_TREE, "b"),
+    ):
+        handler.enqueue_command(request, None)
+
+    popped = [handler.incoming_command_queue.pop() for _ in range(3)]
+    handler.incoming_command_queue.unlink()
+    # the loaded tree is keyed on the uuid it is given
+    uuid_a = popped[2][-1].tree_uuid
+    assert [(key, position, request.command_t) for key, position, request in popped] == [
+        ("b", 0, CommandType.PAUSE_TREE),
+        (uuid_a, 1, CommandType.START_TREE),
+        (uuid_a, 0, CommandType.LOAD_NEW_TREE),
+    ]
+
+
+def test_tree_keyed_on_uuid():
+    tree_key = TreeIdKey(name="a")
+    uuid = str(tree_key.uuid)
+
+    def resolve(name: str, uuid: str):
+        if name == "a" or (uuid and str(tree_key.uuid).startswith(uuid)):
+            return tree_key
+        return None
+
+    sequencer = CommandSequencer(resolve=resolve)
+    # by name, uuid and partial uuid, the tree's commands are numbered together
+    assert sequencer.next(command(CommandType.START_TREE, "a"))[:2] == (uuid, 0)
+    assert sequencer.next(
+        command(CommandType.PAUSE_TREE, "", tree_uuid=uuid)
+    )[:2] == (uuid, 1)
+    assert sequencer.next(
+        command(CommandType.TICK_TREE, "", tree_uuid=uuid[:8])
+    )[:2] == (uuid, 2)
+    assert sequencer.next(command(CommandType.TICK_TREE, "c"))[:2] == ("c", 0)
+
+    # commands follow the load of a tree of the same name
+    key, position, load = sequencer.next(command(CommandType.LOAD_NEW_TREE, "a"))
+    assert key == load.tree_uuid != uuid
+    assert UUID(key)
+    assert position == 0
+    assert sequencer.next(command(CommandType.START_TREE, "a"))[:2] == (key, 1)
+
+
+def test_oversized_command_dropped():
+    handler = RPCHandler(tree_host=None)
+    queue = handler.incoming_command_queue
+    oversized = command(CommandType.START_TREE, "a")
+    oversized.ack_node.user_acking_node = "x" * queue.slot_size
+    try:
+        handler.enqueue_command(command(CommandType.TICK_TREE, "a"), None)
+        handler.enqueue_command(oversized, None)
+        handler.enqueue_command(command(CommandType.PAUSE_TREE, "a"), None)
+
+        popped = [queue.pop() for _ in range(2)]
+        assert queue.empty()
+    finally:
+        queue.unlink()
+
+    # the oversized command's position is taken by the next command
+    assert [(key, position, request.command_t) for key, position, request in popped] == [
+        ("a", 1, CommandType.PAUSE_TREE),
+        ("a", 0, CommandType.TICK_TREE),
+    ]
+    serviced: List[CommandMessage] = []
+    dispatcher = CommandDispatcher(service=serviced.append)
+    try:
+        dispatcher.dispatch_many(popped)
+    finally:
+        dispatcher.shutdown()
+    assert [request.command_t for request in serviced] == [CommandType.TICK_TREE,
+                                                           CommandType.PAUSE_TREE]
+
+
+def test_dispatch_order():
+    serviced: List[CommandMessage] = []
+    load_started = threading.Event()
+    finish_load = threading.Event()
+
+    def service(request: CommandMessage):
+        if request.command_t == CommandType.LOAD_NEW_TREE:
+            load_started.set()
+            finish_load.wait(timeout=5)
+        serviced.append(request)
+
+    dispatcher = CommandDispatcher(service=service)
+    sequencer = CommandSequencer()
+    load_a, start_a, pause_b = (
+        sequencer.next(command(CommandType.LOAD_NEW_TREE, "a")),
+        sequencer.next(command(CommandType.START_TREE, "a")),
+        sequencer.next(command(CommandType.PAUSE_TREE, "b")),
+    )
+    try:
+        # taken by priority, the start waits for the load to arrive
+        dispatcher.dispatch(start_a)
+        dispatcher.dispatch(pause_b)
+        assert serviced == [pause_b[-1]]
+
+        # loads are serviced on the executor, the start is chained behind it
+        dispatcher.dispatch(load_a)
+        assert load_started.wait(timeout=5)
+        assert serviced == [pause_b[-1]]
+
+        finish_load.set()
+    finally:
+        dispatcher.shutdown()
+    assert serviced == [pause_b[-1], load_a[-1], start_a[-1]]
+
+
+def test_coalesce_commands():
+    tick, start, pause, load, reload = (
+        command(CommandType.TICK_TREE, "a"),
+        command(CommandType.START_TREE, "a"),
+        command(CommandType.PAUSE_TREE, "a"),
+        command(CommandType.LOAD_NEW_TREE, "a"),
+        command(CommandType.RELOAD_TREE, "a"),
+    )
+    assert coalesce_commands([tick, tick, tick]) == [tick]
+    assert coalesce_commands([pause, start]) == [start]
+    assert coalesce_commands([start, pause, start, pause]) == [pause]
+    # only consecutive commands are coalesced
+    assert coalesce_commands([tick, load, tick]) == [tick, load, tick]
+    assert coalesce_commands([load, load]) == [load, load]
+    assert coalesce_commands([reload, tick, reload, reload]) == [reload, tick, reload]
+
+
+def test_dispatch_many_coalesces():
+    serviced: List[CommandMessage] = []
+    dispatcher = CommandDispatcher(service=serviced.append)
+    sequencer = CommandSequencer()
+    commands = [
+        sequencer.next(command(command_t, tree_name))
+        for command_t, tree_name in (
+            (CommandType.TICK_TREE, "a"),
+            (CommandType.PAUSE_TREE, "b"),
+            (CommandType.TICK_TREE, "a"),
+            (CommandType.START_TREE, "b"),
+        )
+    ]
+    try:
+        # taken by priority, as BeamsService would
+        dispatcher.dispatch_many([commands[1], commands[0], commands[2], commands[3]])
+    finally:
+        dispatcher.shutdown()
+    assert serviced == [commands[3][-1], commands[2][-1]]
+    assert dispatcher.coalesced_count == 2
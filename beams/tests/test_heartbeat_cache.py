@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import List
+
+from beams.service.heartbeat_cache import HeartbeatCache
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId)
+from beams.service.tree_host import HeartbeatSnapshot
+
+
+class FakeTreeHost:
+    """Serves snapshots as TreeHost.get_heartbeat does, counting requests"""
+    def __init__(self, delay: float = 0.0):
+        self.version = 1
+        self.updates = [BehaviorTreeUpdateMessage(tree_id=NodeId(name="tree"))]
+        self.delay = delay
+        self.requests: List[int] = []
+
+    def change(self, name: str) -> None:
+        self.version += 1
+        self.updates = [BehaviorTreeUpdateMessage(tree_id=NodeId(name=name))]
+
+    def get_heartbeat(self, since_version: int) -> HeartbeatSnapshot:
+        self.requests.append(since_version)
+        time.sleep(self.delay)
+        if since_version == self.version:
+            return HeartbeatSnapshot(self.version, None)
+        return HeartbeatSnapshot(self.version, list(self.updates))
+
+
+def test_heartbeat_cache_staleness():
+    host = FakeTreeHost()
+    cache = HeartbeatCache(host.get_heartbeat, max_staleness_ms=200)
+
+    first = cache.get()
+    assert first.version == 1
+    assert first.behavior_tree_update[0].tree_id.name == "tree"
+    # served from the cache while fresh, even if the trees changed
+    host.change("changed")
+    assert cache.get() is first
+    assert host.requests == [0]
+
+    time.sleep(0.25)
+    second = cache.get()
+    assert second.version == 2
+    assert second.behavior_tree_update[0].tree_id.name == "changed"
+    assert host.requests == [0, 1]
+
+    # unchanged snapshots reuse the updates, with a new timestamp
+    time.sleep(0.25)
+    third = cache.get()
+    assert host.requests == [0, 1, 2]
+    assert third.version == 2
+    assert third.behavior_tree_update == second.behavior_tree_update
+    assert third.reply_timestamp.ToNanoseconds() > second.reply_timestamp.ToNanoseconds()
+
+
+def test_heartbeat_cache_since_version():
+    host = FakeTreeHost()
+    cache = HeartbeatCache(host.get_heartbeat, max_staleness_ms=0)
+
+    reply = cache.get_since(0)
+    assert not reply.not_modified
+    unchanged = cache.get_since(reply.version)
+    assert unchanged.not_modified
+    assert unchanged.version == reply.version
+    assert len(unchanged.behavior_tree_update) == 0
+
+    host.change("changed")
+    changed = cache.get_since(reply.version)
+    assert not changed.not_modified
+    assert changed.version == host.version
+    assert changed.behavior_tree_update[0].tree_id.name == "changed"
+
+
+def test_heartbeat_cache_shares_refreshes():
+    # every request waits for a snapshot taken after it arrived, but
+    # requests arriving during a refresh share the next one
+    host = FakeTreeHost(delay=0.1)
+    cache = HeartbeatCache(host.get_heartbeat, max_staleness_ms=0)
+    start = threading.Barrier(20)
+
+    def request():
+        start.wait()
+        cache.get()
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert cache.request_count == 20
+    assert cache.refresh_count == len(host.requests) <= 3
@@ -5,7 +5,9 @@ from typing import Callable
 
 from py_trees.common import Status
 
-from beams.behavior_tree.action_node import ActionNode, wrapped_action_work
+from beams.behavior_tree.action_node import (ActionExecution, ActionNode,
+                                             wrapped_action_work)
+from beams.behavior_tree.action_worker import ThreadActionWorker
 from beams.behavior_tree.condition_node import ConditionNode
 
 logger = logging.getLogger(__name__)
@@ -66,6 +68,37 @@ def test_action_node_timeout(bt_cleaner):
     assert percentage_complete.value != 100
 
 
+def test_thread_action_node():
+    percentage_complete = Value("i", 0)
+
+    @wrapped_action_work(loop_period_sec=0.001)
+    def work_func(comp_condition: Callable) -> Status:
+        percentage_complete.value += 10
+        return Status.SUCCESS if comp_condition() else Status.RUNNING
+
+    def comp_cond():
+        return percentage_complete.value >= 100
+
+    action = ActionNode(name="action", work_func=work_func,
+                        completion_condition=comp_cond,
+                        execution=ActionExecution.THREAD)
+    assert isinstance(action.worker, ThreadActionWorker)
+    action.setup()
+    # the thread starts with the first activation
+    assert action.worker.thread is None
+
+    while action.status not in (Status.SUCCESS, Status.FAILURE):
+        time.sleep(0.01)
+        action.tick_once()
+    assert action.status == Status.SUCCESS
+    assert percentage_complete.value == 100
+
+    thread = action.worker.thread
+    assert thread.is_alive()
+    action.shutdown()
+    assert not thread.is_alive()
+
+
 def test_condition_node(bt_cleaner):
     def condition_fn():
         return True
@@ -1,4 +1,10 @@
+import time
 from enum import IntEnum
+from multiprocessing import Process
+from queue import Empty, Full
+from typing import Any, List, Tuple
+
+import pytest
 
 from beams.service.helpers.queue import PriorityQueue
 
@@ -9,10 +15,41 @@ class Color(IntEnum):
     GREEN = 2
 
 
+PRIORITY_DICT = {Color.RED: 0, Color.YELLOW: 1, Color.GREEN: 2}
+
+
+@pytest.fixture
+def queue():
+    p = PriorityQueue(PRIORITY_DICT, capacity=4, slot_size=64)
+    yield p
+    p.unlink()
+
+
+def put_entries(p: PriorityQueue, n_entries: int):
+    for i in range(n_entries):
+        p.put(i, Color(i % 3))
+
+
+def put_tagged_entries(p: PriorityQueue, tag: int, n_entries: int):
+    for i in range(n_entries):
+        p.put((tag, i), Color(i % 3))
+
+
+def time_put_get(p: PriorityQueue, n_ops: int) -> Tuple[float, List[Any]]:
+    """
+    Seconds per put (of the least urgent entries) and per get at the queue's
+    current depth, and the entries gotten
+    """
+    start = time.perf_counter()
+    for i in range(n_ops):
+        p.put((-1, i), Color.GREEN)
+    gotten = [p.get() for _ in range(n_ops)]
+    return (time.perf_counter() - start) / n_ops, gotten
+
+
 class TestTask:
-    def test_1(self):
-        priority_dict = {Color.RED: 0, Color.YELLOW: 1, Color.GREEN: 2}
-        p = PriorityQueue(priority_dict)
+    def test_1(self, queue: PriorityQueue):
+        p = queue
 
         p.put("egg", Color.YELLOW)
         p.put("josh", Color.GREEN)
@@ -23,3 +60,91 @@ class TestTask:
         assert p.pop() == "egg"
         assert p.pop() == "will"
         assert p.pop() == "josh"
+
+    def test_bounds(self, queue: PriorityQueue):
+        with pytest.raises(Empty):
+            queue.get_nowait()
+        with pytest.raises(Empty):
+            queue.get(timeout=0.01)
+
+        for i in range(queue.capacity):
+            queue.put_nowait(i, Color.RED)
+        assert queue.full()
+        with pytest.raises(Full):
+            queue.put_nowait(4, Color.RED)
+        with pytest.raises(Full):
+            queue.put(4, Color.RED, timeout=0.01)
+
+        # slots are reused once freed
+        assert queue.get() == 0
+        queue.put_nowait(4, Color.RED)
+        assert [queue.get() for _ in range(queue.capacity)] == [1, 2, 3, 4]
+        assert queue.empty()
+
+    def test_entry_too_large(self, queue: PriorityQueue):
+        with pytest.raises(ValueError):
+            queue.put("x" * queue.slot_size, Color.RED)
+        with pytest.raises(KeyError):
+            queue.put("x", "BLUE")
+        assert queue.empty()
+
+    def test_get_many(self, queue: PriorityQueue):
+        queue.put("egg", Color.GREEN)
+        queue.put("hyuh", Color.RED)
+        queue.put("will", Color.YELLOW)
+
+        assert queue.get_many(2) == ["hyuh", "will"]
+        assert queue.get_many(2) == ["egg"]
+        with pytest.raises(Empty):
+            queue.get_many(2, timeout=0.01)
+
+    def test_across_processes(self):
+        n_entries = 3000
+        p = PriorityQueue(PRIORITY_DICT, capacity=n_entries, slot_size=16)
+        try:
+            proc = Process(target=put_entries, args=(p, n_entries))
+            proc.start()
+            proc.join()
+            assert proc.exitcode == 0
+            assert p.qsize() == n_entries
+
+            # by priority, then in the order they were put
+            expected = sorted(range(n_entries), key=lambda i: (i % 3, i))
+            assert p.get_many(n_entries) == expected
+        finally:
+            p.unlink()
+
+    def test_deep_fill_across_processes(self):
+        n_procs, n_entries = 4, 25000
+        depth = n_procs * n_entries
+        p = PriorityQueue(PRIORITY_DICT, capacity=depth + 1000, slot_size=32)
+        try:
+            shallow, _ = time_put_get(p, 1000)
+            procs = [Process(target=put_tagged_entries, args=(p, tag, n_entries))
+                     for tag in range(n_procs)]
+            for proc in procs:
+                proc.start()
+            for proc in procs:
+                proc.join()
+            assert [proc.exitcode for proc in procs] == [0] * n_procs
+            assert p.qsize() == depth
+
+            # operations stay O(log n) with the queue filled deeply, an O(n)
+            # queue would be hundreds of times slower
+            deep, entries = time_put_get(p, 1000)
+            assert deep < 10 * shallow
+
+            entries += p.get_many(depth)
+            assert p.empty()
+        finally:
+            p.unlink()
+
+        # by priority, then in the order each process put them
+        assert entries[-1000:] == [(-1, i) for i in range(1000)]
+        entries = entries[:-1000]
+        assert len(entries) == depth
+        priorities = [i % 3 for _, i in entries]
+        assert priorities == sorted(priorities)
+        for tag in range(n_procs):
+            put = [i for entry_tag, i in entries if entry_tag == tag]
+            assert put == sorted(range(n_entries), key=lambda i: (i % 3, i))
@@ -0,0 +1,128 @@
+import threading
+import time
+
+from caproto.tests.conftest import run_example_ioc
+from epics import caput
+
+from beams.behavior_tree.action_worker import wait_for_completion
+from beams.tests.conftest import wait_until
+from beams.tree_config.composite import SequenceConditionItem
+from beams.tree_config.condition import (BinaryConditionItem,
+                                         BoundedConditionItem)
+from beams.tree_config.pv_monitor import (MonitoredCondition, PVCache,
+                                          get_pv_cache, get_pv_monitor,
+                                          monitored_condition)
+from beams.tree_config.value import EPICSValue, FixedValue, ProcessIntValue
+
+
+def simulate_update(pv_name: str) -> None:
+    """As if a monitor update of ``pv_name`` arrived"""
+    get_pv_monitor(pv_name)._on_value(value=0)
+
+
+def test_condition_evaluated_on_change():
+    evaluations = []
+
+    def evaluate():
+        evaluations.append(None)
+        return len(evaluations) > 1
+
+    cond = monitored_condition(evaluate, ["TST:MON:CHANGE"])
+    assert isinstance(cond, MonitoredCondition)
+    assert not cond()
+    assert not cond()
+    assert len(evaluations) == 1
+
+    simulate_update("TST:MON:CHANGE")
+    assert cond()
+    assert len(evaluations) == 2
+
+
+def test_wait_for_change():
+    cond = MonitoredCondition(lambda: True, ["TST:MON:WAIT"])
+    version = cond.get_version()
+    assert not cond.wait_for_change(version, timeout=0.01)
+
+    timer = threading.Timer(0.05, simulate_update, args=("TST:MON:WAIT",))
+    timer.start()
+    assert cond.wait_for_change(version, timeout=5)
+    assert cond.get_version() != version
+
+
+def test_wait_for_completion_wakes():
+    done = False
+
+    def complete():
+        nonlocal done
+        done = True
+        simulate_update("TST:MON:COMPLETE")
+
+    cond = MonitoredCondition(lambda: done, ["TST:MON:COMPLETE"])
+    assert not cond()
+    # an unrelated change does not end the wait, completing it does
+    threading.Timer(0.02, simulate_update, args=("TST:MON:COMPLETE",)).start()
+    threading.Timer(0.1, complete).start()
+    start = time.monotonic()
+    wait_for_completion(cond, period_sec=5)
+    assert 0.1 <= time.monotonic() - start < 1
+
+
+def test_conditions_monitored():
+    pv_value = EPICSValue(pv_name="TST:MON:ITEM")
+    binary = BinaryConditionItem(left_value=pv_value, right_value=FixedValue(1))
+    bounded = BoundedConditionItem(value=EPICSValue(pv_name="TST:MON:OTHER"))
+    assert binary.get_condition_function().pv_names == ["TST:MON:ITEM"]
+
+    sequence = SequenceConditionItem(children=[binary, bounded])
+    assert sequence.get_condition_function().pv_names == ["TST:MON:ITEM",
+                                                          "TST:MON:OTHER"]
+
+    # values that change without a PV changing are polled as before
+    process = BinaryConditionItem(left_value=ProcessIntValue(), right_value=pv_value)
+    assert not isinstance(process.get_condition_function(), MonitoredCondition)
+    fixed = BinaryConditionItem(left_value=FixedValue(1), right_value=FixedValue(1))
+    assert not isinstance(fixed.get_condition_function(), MonitoredCondition)
+
+
+def test_pv_cache_max_age():
+    cache = PVCache(max_age_sec=10)
+    monitor = cache.get_monitor("TST:CACHE:AGE")
+    assert cache.find_monitor("TST:CACHE:AGE") is monitor
+    # stands in for the IOC
+    monitor.get_value = lambda as_string=False: "monitored"
+    monitor.read = lambda as_string=False: "read"
+
+    # a monitor without a value yet is read through
+    assert cache.read("TST:CACHE:AGE") == "read"
+    monitor._on_value(value=0)
+    assert cache.read("TST:CACHE:AGE") == "monitored"
+    assert cache.read("TST:CACHE:AGE", max_age_sec=0) == "read"
+    monitor.updated -= 11
+    assert cache.read("TST:CACHE:AGE") == "read"
+
+    stats = cache.get_stats()
+    assert (stats.hits, stats.misses, stats.connections) == (1, 3, 1)
+
+
+def test_pv_cache_serves_reads(request):
+    run_example_ioc(
+        "beams.tests.mock_iocs.SelfTestIOC",
+        request=request,
+        pv_to_check="PERC:COMP",
+    )
+    value = EPICSValue(pv_name="PERC:COMP")
+    cache = get_pv_cache()
+    wait_until(lambda: value.get_value() == 1, timeout=10, polling_period=0.1)
+    wait_until(lambda: cache.get_monitor("PERC:COMP").has_value, timeout=10,
+               polling_period=0.1)
+
+    # every read is served by the monitor, which follows the PV
+    before = cache.get_stats()
+    for _ in range(100):
+        assert value.get_value() == 1
+    caput("PERC:COMP", 42, wait=True)
+    wait_until(lambda: value.get_value() == 42, timeout=10, polling_period=0.1)
+    after = cache.get_stats()
+    assert after.misses == before.misses
+    assert after.hits > before.hits + 100
+    assert after.connections == before.connections
@@ -83,6 +83,9 @@ def test_heartbeat(client: RPCClient):
     ("LOAD_NEW_TREE", {"tree_name": "my_tree", "new_tree_filepath": "a/b/c",
                        "tick_config": "CONTINUOUS", "tick_delay_ms": 42}),
     ("ACK_NODE", {"tree_name": "my_tree", "node_name": "that_node", "user": "me"}),
+    ("CHANGE_TICK_RATE_OF_TREE", {"tree_name": "my_tree", "tick_delay_ms": 42}),
+    ("CHANGE_TICK_CONFIGURATION", {"tree_name": "my_tree",
+                                   "tick_config": "INTERACTIVE"}),
 ])
 def test_command_no_stub(client: RPCClient, command: str, kwargs):
     method = getattr(client, f"{command.lower()}")
@@ -100,6 +103,9 @@ def test_command_no_stub(client: RPCClient, command: str, kwargs):
     ("LOAD_NEW_TREE", {"tree_name": "my_tree", "new_tree_filepath": "a/b/c",
                        "tick_config": "CONTINUOUS", "tick_delay_ms": 42}),
     ("ACK_NODE", {"tree_name": "my_tree", "node_name": "that_node", "user": "me"}),
+    ("CHANGE_TICK_RATE_OF_TREE", {"tree_name": "my_tree", "tick_delay_ms": 42}),
+    ("CHANGE_TICK_CONFIGURATION", {"tree_name": "my_tree",
+                                   "tick_config": "INTERACTIVE"}),
 ])
 def test_command_with_stub(client: RPCClient, command: str, kwargs):
     method = getattr(client, f"{command.lower()}")
@@ -107,3 +113,23 @@ def test_command_with_stub(client: RPCClient, command: str, kwargs):
     method(stub=stub, **kwargs)
     assert "queued" in client.last_response
     assert "command" in client.last_response
+
+
+@patch("beams.service.rpc_client.BEAMS_rpcStub", MockStub)
+def test_channel_reused(client: RPCClient):
+    with patch("beams.service.rpc_client.grpc.insecure_channel") as insecure_channel:
+        stub = client.get_stub()
+        client.get_heartbeat()
+        client.start_tree(tree_name="my_tree")
+        assert client.get_stub() is stub
+        insecure_channel.assert_called_once()
+
+        # closing releases the channel, a new one is opened on next use
+        client.close()
+        insecure_channel.return_value.close.assert_called_once()
+        client.get_heartbeat()
+        assert insecure_channel.call_count == 2
+
+        with client:
+            client.get_heartbeat()
+        assert insecure_channel.return_value.close.call_count == 2
@@ -6,8 +6,10 @@ import pytest
 
 from beams.bin.main import main
 from beams.service.remote_calls.behavior_tree_pb2 import (TickStatus,
+                                                          TickTiming,
                                                           TreeDetails,
                                                           TreeStatus)
+from beams.service.remote_calls.command_pb2 import CommandType
 from beams.service.remote_calls.generic_message_pb2 import MessageType
 from beams.service.remote_calls.heartbeat_pb2 import HeartBeatReply
 from beams.service.rpc_client import RPCClient
@@ -26,6 +28,26 @@ def test_heartbeat(rpc_client: RPCClient):
     assert resp.mess_t == MessageType.MESSAGE_TYPE_HEARTBEAT
 
 
+def test_heartbeat_since_version(rpc_client: RPCClient):
+    empty = rpc_client.get_heartbeat()
+    assert empty.version > 0
+    wait_until(lambda: rpc_client.get_heartbeat(since_version=empty.version).not_modified)
+
+    rpc_client.load_new_tree(str(ETERNAL_GUARD_PATH), "my_tree", "", "INTERACTIVE", 100)
+
+    def loaded() -> bool:
+        reply = rpc_client.get_heartbeat(since_version=empty.version)
+        return not reply.not_modified and len(reply.behavior_tree_update) == 1
+
+    wait_until(loaded)
+    reply = rpc_client.get_heartbeat()
+    assert reply.version > empty.version
+    unchanged = rpc_client.get_heartbeat(since_version=reply.version)
+    assert unchanged.not_modified
+    assert unchanged.version == reply.version
+    assert len(unchanged.behavior_tree_update) == 0
+
+
 # Tree interaction fixtures.  The intent here is to provide fixtures that
 # interact with the service in different ways with the same content.
 # This way we can mix and match interaction modes while asserting the end result
@@ -189,11 +211,13 @@ def assert_tree_loaded(rpc_client: RPCClient, rpc_server: BeamsService):
         resp0 = rpc_client.get_heartbeat()
         assert resp0.behavior_tree_update[0].tree_status == TreeStatus.IDLE
 
-        tree_dict = rpc_server.sync_man.get_tree_dict()
-        assert len(tree_dict.keys()) == 1
-        assert list(tree_dict.keys())[0].name == "my_tree"
+        tree_host = rpc_server.tree_host_client
+        keys = tree_host.get_tree_keys()
+        assert len(keys) == 1
+        assert keys[0].name == "my_tree"
         tree_uuid = resp0.behavior_tree_update[0].tree_id.uuid
-        assert str(list(tree_dict.keys())[0].uuid) == tree_uuid
+        assert str(keys[0].uuid) == tree_uuid
+        assert tree_host.get_tree_update(uuid=tree_uuid[:8]).tree_id.name == "my_tree"
 
     return inner_assert
 
@@ -373,3 +397,113 @@ def test_uuid_matching(rpc_client: RPCClient):
         assert isinstance(name_details, TreeDetails)
         assert isinstance(uuid_details, TreeDetails)
         assert name_details == uuid_details
+
+
+def get_update_for_name(rpc_client: RPCClient, name: str):
+    for update in rpc_client.get_heartbeat().behavior_tree_update:
+        if update.tree_id.name == name:
+            return update
+    raise ValueError(f"unable to find name ({name}) in heartbeat")
+
+
+def test_commands_wake_ticker(rpc_client: RPCClient):
+    # With a 30s delay, commands must not wait for the ticker to finish sleeping
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=30000,
+        tree_name="my_tree"
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+
+    rpc_client.change_tick_rate_of_tree(tree_name="my_tree", tick_delay_ms=100)
+    wait_until(
+        lambda: get_update_for_name(rpc_client, "my_tree").tick_delay_ms == 100
+    )
+
+    rpc_client.pause_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+
+
+def test_fixed_rate_tick_stats(rpc_client: RPCClient):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=20,
+        tick_timing="FIXED_RATE_SKIP",
+        tree_name="my_tree"
+    )
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(
+        lambda: get_update_for_name(rpc_client, "my_tree").tick_stats.tick_count >= 3
+    )
+
+    stats = get_update_for_name(rpc_client, "my_tree").tick_stats
+    assert stats.tick_timing == TickTiming.FIXED_RATE_SKIP
+    assert stats.duration_max_ms > 0
+    assert stats.duration_p50_ms <= stats.duration_max_ms
+
+    rpc_client.pause_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+
+
+def test_interactive_tick_wakes_ticker(rpc_client: RPCClient):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="INTERACTIVE",
+        tick_delay_ms=30000,
+        tree_name="my_tree"
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree",
+                       TreeStatus.WAITING_ACK))
+
+    rpc_client.tick_tree(tree_name="my_tree")
+    wait_until(partial(assert_valid_tick_status_at_idx, rpc_client, 0))
+
+    rpc_client.change_tick_configuration(tree_name="my_tree",
+                                         tick_config="CONTINUOUS")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+
+
+def test_unload_tree(rpc_client: RPCClient):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=100,
+        tree_name="my_tree"
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+
+    rpc_client.unload_tree(tree_name="my_tree")
+    wait_until(partial(assert_heartbeat_has_n_trees, rpc_client, 0))
+
+
+def test_enqueue_commands(rpc_client: RPCClient):
+    tree_names = [f"my_tree{i}" for i in range(3)]
+    for name in tree_names:
+        rpc_client.load_new_tree(
+            new_tree_filepath=str(ETERNAL_GUARD_PATH),
+            tick_config="CONTINUOUS",
+            tick_delay_ms=100,
+            tree_name=name
+        )
+    wait_until(partial(assert_heartbeat_has_n_trees, rpc_client, 3))
+
+    def batch(command: CommandType) -> HeartBeatReply:
+        return rpc_client.enqueue_commands([
+            rpc_client.construct_base_msg(command, name, "") for name in tree_names
+        ])
+
+    resp = batch(CommandType.START_TREE)
+    # one update for each tree named in the batch
+    assert sorted(update.tree_id.name for update in resp.behavior_tree_update) == tree_names
+    for name in tree_names:
+        wait_until(partial(assert_test_status, rpc_client, name, TreeStatus.TICKING))
+
+    batch(CommandType.PAUSE_TREE)
+    for name in tree_names:
+        wait_until(partial(assert_test_status, rpc_client, name, TreeStatus.IDLE))
@@ -0,0 +1,129 @@
+import threading
+from typing import Generator
+
+import grpc
+import pytest
+
+from beams.service.remote_calls.heartbeat_pb2 import HeartBeatRequest
+from beams.service.rpc_client import RPCClient
+from beams.service.rpc_handler import BeamsService
+from beams.service.server_metrics import (MeteredThreadPoolExecutor,
+                                          ServerMetricsRecorder)
+from beams.service.server_options import ServerOptions
+from beams.tests.conftest import wait_until
+
+
+def test_server_options():
+    assert ServerOptions().get_channel_options() == []
+    options = ServerOptions(keepalive_time_ms=1000, max_receive_message_length=10,
+                            keepalive_permit_without_calls=True)
+    assert options.get_channel_options() == [
+        ("grpc.keepalive_time_ms", 1000),
+        ("grpc.max_receive_message_length", 10),
+        ("grpc.keepalive_permit_without_calls", 1),
+    ]
+    with pytest.raises(ValueError):
+        ServerOptions(max_workers=0)
+    with pytest.raises(ValueError):
+        ServerOptions(maximum_concurrent_rpcs=0)
+
+
+def test_metered_executor():
+    release = threading.Event()
+    executor = MeteredThreadPoolExecutor(max_workers=1)
+    try:
+        running = executor.submit(release.wait, 5)
+        queued = executor.submit(lambda: None)
+        wait_until(lambda: executor.active == 1, timeout=5, polling_period=0.01)
+        assert executor.queued == 1
+        release.set()
+        queued.result(timeout=5)
+        assert running.result()
+        assert (executor.queued, executor.active) == (0, 0)
+    finally:
+        executor.shutdown()
+
+
+def test_recorder():
+    recorder = ServerMetricsRecorder()
+    ok = grpc.unary_unary_rpc_method_handler(lambda request, context: request)
+
+    def fail(request, context):
+        raise RuntimeError
+
+    handler = recorder.wrap_handler(ok, "/svc/ok")
+    # wrapped once per handler
+    assert recorder.wrap_handler(ok, "/svc/ok") is handler
+    assert handler.unary_unary(1, None) == 1
+    with pytest.raises(RuntimeError):
+        recorder.wrap_handler(
+            grpc.unary_unary_rpc_method_handler(fail), "/svc/fail"
+        ).unary_unary(1, None)
+
+    fail_metrics, ok_metrics = recorder.get_method_metrics()
+    assert fail_metrics.method == "/svc/fail"
+    assert (fail_metrics.call_count, fail_metrics.error_count) == (1, 1)
+    assert ok_metrics.method == "/svc/ok"
+    assert (ok_metrics.call_count, ok_metrics.error_count) == (1, 0)
+    assert ok_metrics.in_flight == 0
+    assert ok_metrics.latency_max_ms >= ok_metrics.latency_p50_ms > 0
+
+
+@pytest.fixture(params=[False, True], ids=["sync", "aio"])
+def rpc_server(request) -> Generator[BeamsService, None, None]:
+    # Overrides the conftest fixture, with a single concurrent RPC
+    handler = BeamsService(server_options=ServerOptions(
+        max_workers=2, maximum_concurrent_rpcs=1, use_aio=request.param,
+    ))
+    handler.start_work()
+
+    yield handler
+
+    handler.join_all_trees()
+    handler.stop_work()
+
+
+def test_server_metrics(rpc_client: RPCClient):
+    for _ in range(3):
+        rpc_client.get_heartbeat()
+
+    metrics = rpc_client.get_server_metrics()
+    methods = {method.method: method for method in metrics.methods}
+    heartbeat = methods["/BEAMS_rpc/request_heartbeat"]
+    assert heartbeat.call_count >= 3
+    assert heartbeat.error_count == 0
+    assert heartbeat.latency_max_ms > 0
+    # this call is the one in flight
+    assert methods["/BEAMS_rpc/request_server_metrics"].in_flight == 1
+    assert metrics.executor_max_workers == 2 + 64
+    assert metrics.executor_active == 1
+    assert metrics.command_queue_depth == 0
+
+    # a subscription is the one RPC allowed, others are refused
+    stream = rpc_client.subscribe_tree_updates()
+    try:
+        wait_until(lambda: _is_refused(rpc_client), timeout=5, polling_period=0.1)
+    finally:
+        stream.cancel()
+    wait_until(lambda: not _is_refused(rpc_client), timeout=5, polling_period=0.1)
+
+    # the cancelled subscription has ended on the server.  It is only
+    # recorded once its stream is first read, which cancelling may preempt
+    def subscription_ended() -> bool:
+        methods = {method.method: method
+                   for method in rpc_client.get_server_metrics().methods}
+        subscription = methods.get("/BEAMS_rpc/subscribe_tree_updates")
+        if subscription is None:
+            return True
+        return subscription.in_flight == 0 and subscription.error_count == 0
+
+    wait_until(subscription_ended, timeout=5, polling_period=0.1)
+
+
+def _is_refused(client: RPCClient) -> bool:
+    try:
+        client.get_stub().request_heartbeat(HeartBeatRequest())
+    except grpc.RpcError as ex:
+        assert ex.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        return True
+    return False
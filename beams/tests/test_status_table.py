@@ -0,0 +1,68 @@
+import time
+from multiprocessing import Process, Value
+
+from beams.service.helpers import status_table
+from beams.service.helpers.status_table import NodeStatusTable
+
+N_NODES = 500
+
+
+def write_generations(table_name: str, done: Value):
+    table = NodeStatusTable(name=table_name)
+    for generation in range(1, 2000):
+        table.write((ordinal, generation % 256) for ordinal in range(N_NODES))
+    table.close()
+    done.value = True
+
+
+def test_write_read():
+    table = NodeStatusTable(n_nodes=4)
+    try:
+        assert table.read() == bytes(4)
+        table.write([(1, 2), (3, 1)])
+        assert table.read() == bytes([0, 2, 0, 1])
+
+        other = NodeStatusTable(name=table.name)
+        assert other.read()[:4] == bytes([0, 2, 0, 1])
+        other.close()
+    finally:
+        table.unlink()
+
+
+def test_consistent_snapshots():
+    # every write sets all nodes to the same value, so a torn read would show
+    # a mix of values
+    table = NodeStatusTable(n_nodes=N_NODES)
+    done = Value("b", False)
+    writer = Process(target=write_generations, args=(table.name, done))
+    try:
+        writer.start()
+        n_reads = 0
+        while not done.value:
+            statuses = table.read()
+            assert len(set(statuses)) == 1
+            n_reads += 1
+        writer.join()
+        assert n_reads > 0
+        assert table.read() == bytes([1999 % 256] * N_NODES)
+    finally:
+        writer.join()
+        table.unlink()
+
+
+def test_abandoned_write(monkeypatch):
+    monkeypatch.setattr(status_table, "WRITE_TIMEOUT_SEC", 0.1)
+    table = NodeStatusTable(n_nodes=2)
+    try:
+        table.write([(1, 2)])
+        # as if the writer was terminated mid-write
+        table._set_seq(table._get_seq() + 1)
+
+        start = time.monotonic()
+        assert table.read_with_sequence() == (2, bytes([0, 2]))
+        assert 0.1 < time.monotonic() - start < 2
+        # later writes carry on from the abandoned one
+        table.write([(0, 1)])
+        assert table.read_with_sequence() == (3, bytes([1, 2]))
+    finally:
+        table.unlink()
@@ -0,0 +1,91 @@
+import pytest
+
+from beams.service.helpers.tick_clock import TickClock, percentile
+from beams.service.remote_calls.behavior_tree_pb2 import TickTiming
+
+
+def test_fixed_delay():
+    clock = TickClock(period_sec=1.0)
+    clock.reset(0.0)
+    assert clock.time_until_next(0.0) == 0
+
+    # a long tick pushes the next deadline back
+    clock.record_tick(0.0, 2.5)
+    assert clock.next_deadline == pytest.approx(3.5)
+    assert clock.overruns == 1
+    assert clock.missed_deadlines == 0
+
+
+def test_fixed_rate_no_drift():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_SKIP)
+    clock.reset(0.0)
+    # tick start jitter and duration do not accumulate into the deadlines
+    for i in range(10):
+        start = clock.next_deadline + 0.05
+        clock.record_tick(start, start + 0.3)
+        assert clock.next_deadline == pytest.approx(i + 1)
+
+    assert clock.tick_count == 10
+    assert clock.overruns == 0
+    assert clock.missed_deadlines == 0
+
+
+def test_fixed_rate_skip():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_SKIP)
+    clock.reset(0.0)
+    # deadlines at 1 and 2 pass during this tick, and are skipped
+    clock.record_tick(0.0, 2.5)
+    assert clock.next_deadline == pytest.approx(3.0)
+    assert clock.overruns == 1
+    assert clock.missed_deadlines == 2
+
+
+def test_fixed_rate_catch_up():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_CATCH_UP)
+    clock.reset(0.0)
+    clock.record_tick(0.0, 2.5)
+    # the deadline at 1 is run late rather than skipped
+    assert clock.next_deadline == pytest.approx(1.0)
+    assert clock.missed_deadlines == 0
+
+    # starting a full period late counts as a miss
+    clock.record_tick(2.5, 2.6)
+    assert clock.missed_deadlines == 1
+    assert clock.next_deadline == pytest.approx(2.0)
+
+    clock.record_tick(2.6, 2.7)
+    assert clock.missed_deadlines == 1
+    assert clock.next_deadline == pytest.approx(3.0)
+
+
+def test_catch_up_backlog_is_bounded():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_CATCH_UP,
+                      max_catch_up=3)
+    clock.reset(0.0)
+    # 10 deadlines pass, only the most recent 3 are caught up on
+    clock.record_tick(0.0, 10.5)
+    assert clock.missed_deadlines == 7
+    assert clock.next_deadline == pytest.approx(8.0)
+
+
+def test_set_period_moves_deadline():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_SKIP)
+    clock.reset(0.0)
+    clock.record_tick(0.0, 0.1)
+    clock.set_period(0.5)
+    assert clock.next_deadline == pytest.approx(0.5)
+
+
+def test_statistics():
+    clock = TickClock(period_sec=1.0, tick_timing=TickTiming.FIXED_RATE_SKIP)
+    clock.reset(0.0)
+    for i in range(100):
+        clock.record_tick(float(i), i + (i + 1) / 1000)
+
+    stats = clock.get_statistics()
+    assert stats.tick_timing == TickTiming.FIXED_RATE_SKIP
+    assert stats.tick_count == 100
+    assert stats.duration_p50_ms == pytest.approx(51, abs=1)
+    assert stats.duration_p99_ms == pytest.approx(99, abs=1)
+    assert stats.duration_max_ms == pytest.approx(100)
+    assert percentile([], 50) == 0
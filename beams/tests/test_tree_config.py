@@ -1,3 +1,4 @@
+import threading
 from itertools import combinations, combinations_with_replacement
 
 import apischema
@@ -13,12 +14,13 @@ from py_trees.behaviours import (BlackboardToStatus,
                                  WaitForBlackboardVariableValue)
 from py_trees.composites import Parallel, Selector, Sequence
 
-from beams.behavior_tree.action_node import ActionNode
+from beams.behavior_tree.action_node import (ActionExecution, ActionNode,
+                                             get_default_action_execution)
 from beams.behavior_tree.check_and_do import CheckAndDo
 from beams.behavior_tree.condition_node import AckConditionNode, ConditionNode
 from beams.serialization import get_all_subclasses, is_tagged_union
 from beams.tree_config.action import IncPVActionItem, SetPVActionItem
-from beams.tree_config.base import BaseItem
+from beams.tree_config.base import BaseItem, BehaviorTreeItem
 from beams.tree_config.composite import (ParallelItem, SelectorItem,
                                          SequenceConditionItem, SequenceItem)
 from beams.tree_config.condition import (AcknowledgeConditionItem,
@@ -175,3 +177,51 @@ def test_check_and_do_item_no_termination_check():
     # These should both run a copy of the dummy fail check
     assert not check_condition()
     assert not do_condition()
+
+
+def test_action_execution():
+    item = BehaviorTreeItem(
+        root=SequenceItem(children=[
+            SetPVActionItem(name="tree_default"),
+            IncPVActionItem(name="own", execution=ActionExecution.PROCESS),
+        ]),
+        action_execution=ActionExecution.THREAD,
+    )
+    ser = apischema.serialize(BehaviorTreeItem, item)
+    assert apischema.deserialize(BehaviorTreeItem, ser) == item
+
+    default = get_default_action_execution()
+    tree = item.get_tree()
+    tree_default, own = tree.root.children
+    assert tree_default.execution == ActionExecution.THREAD
+    assert own.execution == ActionExecution.PROCESS
+    # the tree's setting only applies while it is built
+    assert get_default_action_execution() == default
+    assert SetPVActionItem().get_tree().execution == default
+
+
+def test_action_execution_per_thread(monkeypatch):
+    # both trees are mid-build when their actions are made
+    barrier = threading.Barrier(2)
+    get_tree = SetPVActionItem.get_tree
+
+    def get_tree_together(self):
+        barrier.wait(timeout=5)
+        return get_tree(self)
+
+    monkeypatch.setattr(SetPVActionItem, "get_tree", get_tree_together)
+    executions = {}
+
+    def build(execution: ActionExecution):
+        item = BehaviorTreeItem(root=SetPVActionItem(name="action"),
+                                action_execution=execution)
+        executions[execution] = item.get_tree().root.execution
+
+    threads = [threading.Thread(target=build, args=(execution,))
+               for execution in (ActionExecution.THREAD, ActionExecution.POOL)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert executions == {ActionExecution.THREAD: ActionExecution.THREAD,
+                          ActionExecution.POOL: ActionExecution.POOL}
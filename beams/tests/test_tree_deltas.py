@@ -0,0 +1,167 @@
+import py_trees
+import pytest
+from py_trees.visitors import SnapshotVisitor
+
+from beams.service.remote_calls.behavior_tree_pb2 import (NodeId, TickStatus,
+                                                          TreeStatus,
+                                                          TreeStatusDelta,
+                                                          TreeStructure)
+from beams.service.tree_deltas import (TreeStatusMirror, diff_status_delta,
+                                       full_status_delta, merge_status_deltas,
+                                       skeleton_from_structure)
+from beams.service.tree_ticker import (TreeState, TreeStatusWriter,
+                                       get_detailed_update_from_state)
+
+TREE_ID = NodeId(name="big_tree", uuid="cccccccc-0000")
+
+
+@pytest.fixture(scope="function")
+def big_tree() -> py_trees.trees.BehaviourTree:
+    # 1000 leaves that succeed once, then a node that changes every tick
+    branches = [
+        py_trees.composites.Sequence(
+            f"branch_{i}", memory=True,
+            children=[py_trees.behaviours.Success(f"leaf_{i}_{j}") for j in range(20)]
+        )
+        for i in range(50)
+    ]
+    flip = py_trees.behaviours.Periodic("flip", n=1)
+    root = py_trees.composites.Sequence("root", memory=True, children=[*branches, flip])
+    return py_trees.trees.BehaviourTree(root)
+
+
+def snapshot(writer: TreeStatusWriter, state: TreeState) -> TreeStatusDelta:
+    sequence, statuses = writer.read_with_sequence()
+    return full_status_delta(TREE_ID, sequence, statuses, state.get_tree_status())
+
+
+def test_delta_smaller_than_details(big_tree: py_trees.trees.BehaviourTree):
+    snapshot_visitor = SnapshotVisitor()
+    big_tree.visitors.append(snapshot_visitor)
+    writer = TreeStatusWriter(big_tree)
+    state = TreeState()
+
+    def tick():
+        big_tree.tick()
+        writer.update(snapshot_visitor.visited.keys()
+                      | snapshot_visitor.previously_visited.keys())
+
+    try:
+        tick()
+        first = snapshot(writer, state)
+        mirror = TreeStatusMirror(writer.structure)
+        assert mirror.apply(first)
+
+        tick()
+        second = snapshot(writer, state)
+        delta = diff_status_delta(first, second)
+        # only the root and "flip" changed
+        assert list(delta.ordinals) == [0, len(writer.nodes) - 1]
+
+        details = get_detailed_update_from_state(state, writer.skeleton, writer.read())
+        assert delta.ByteSize() * 10 < details.ByteSize()
+
+        assert mirror.apply(delta)
+        mirrored = mirror.to_details()
+        mirrored.ClearField("tree_id")
+        assert mirrored == details
+    finally:
+        writer.table.unlink()
+        state.close()
+
+
+def test_skeleton_from_structure(big_tree: py_trees.trees.BehaviourTree):
+    writer = TreeStatusWriter(big_tree)
+    try:
+        assert len(writer.structure.nodes) == 1 + 50 * 21 + 1
+        assert writer.structure.nodes[1].node_type == "Sequence"
+        assert writer.structure.nodes[1].n_children == 20
+        assert skeleton_from_structure(writer.structure) == writer.skeleton
+    finally:
+        writer.table.unlink()
+
+
+def make_delta(
+    base: int, sequence: int, changes: dict, structure_version: int = 0
+) -> TreeStatusDelta:
+    ordinals = sorted(changes)
+    return TreeStatusDelta(
+        tree_id=TREE_ID, sequence=sequence, base_sequence=base,
+        ordinals=ordinals, statuses=bytes(changes[o] for o in ordinals),
+        tree_status=TreeStatus.TICKING, structure_version=structure_version,
+    )
+
+
+def test_merge_status_deltas():
+    older = make_delta(1, 2, {0: TickStatus.RUNNING, 3: TickStatus.RUNNING})
+    newer = make_delta(2, 3, {3: TickStatus.SUCCESS, 4: TickStatus.FAILURE})
+    merged = merge_status_deltas(older, newer)
+    assert merged == make_delta(1, 3, {0: TickStatus.RUNNING, 3: TickStatus.SUCCESS,
+                                       4: TickStatus.FAILURE})
+
+    # merging into a full snapshot gives a full snapshot
+    full = full_status_delta(TREE_ID, 2, bytes(5), TreeStatus.IDLE)
+    merged = merge_status_deltas(full, newer)
+    assert merged.full
+    assert merged.sequence == 3
+    assert merged.statuses == bytes([0, 0, 0, TickStatus.SUCCESS, TickStatus.FAILURE])
+
+    # a gap cannot be merged
+    assert merge_status_deltas(older, make_delta(3, 4, {})) is None
+
+
+def test_mirror_resync():
+    structure = TreeStructure(tree_id=TREE_ID)
+    structure.nodes.add(id=NodeId(name="root"), n_children=1)
+    structure.nodes.add(id=NodeId(name="leaf"))
+    mirror = TreeStatusMirror(structure)
+
+    # deltas are refused until synchronized
+    assert not mirror.apply(make_delta(0, 1, {0: TickStatus.RUNNING}))
+    assert mirror.apply(full_status_delta(TREE_ID, 1, bytes(2), TreeStatus.IDLE))
+    assert mirror.apply(make_delta(1, 2, {1: TickStatus.SUCCESS}))
+    # stale deltas are ignored
+    assert mirror.apply(make_delta(0, 1, {1: TickStatus.FAILURE}))
+    assert mirror.statuses == bytes([0, TickStatus.SUCCESS])
+
+    # missing sequence 3 requires a resync
+    assert not mirror.apply(make_delta(3, 4, {0: TickStatus.RUNNING}))
+    assert mirror.apply(full_status_delta(
+        TREE_ID, 4, bytes([TickStatus.RUNNING, TickStatus.RUNNING]), TreeStatus.TICKING
+    ))
+    details = mirror.to_details()
+    assert details.tree_status == TreeStatus.TICKING
+    assert details.node_info.children[0].status == TickStatus.RUNNING
+
+
+def test_mirror_structure_version():
+    structure = TreeStructure(tree_id=TREE_ID)
+    structure.nodes.add(id=NodeId(name="root"), n_children=1)
+    structure.nodes.add(id=NodeId(name="leaf"))
+    mirror = TreeStatusMirror(structure)
+    assert mirror.apply(full_status_delta(TREE_ID, 1, bytes(2), TreeStatus.IDLE))
+
+    # the statuses keep the structure's length
+    assert mirror.apply(full_status_delta(TREE_ID, 2, bytes(1), TreeStatus.IDLE))
+    assert len(mirror.statuses) == 2
+    assert mirror.apply(full_status_delta(TREE_ID, 3, bytes(3), TreeStatus.IDLE))
+    assert len(mirror.statuses) == 2
+    # ordinals past the structure's end require a resync
+    assert not mirror.apply(make_delta(3, 4, {2: TickStatus.RUNNING}))
+    assert not mirror.synced
+
+    # after a reload, deltas are refused until the new structure is fetched
+    assert mirror.apply(full_status_delta(TREE_ID, 4, bytes(2), TreeStatus.IDLE))
+    reloaded = full_status_delta(TREE_ID, 5, bytes(3), TreeStatus.IDLE,
+                                 structure_version=1)
+    assert not mirror.apply(reloaded)
+    assert not mirror.synced
+
+    new_structure = TreeStructure(tree_id=TREE_ID, structure_version=1)
+    new_structure.nodes.add(id=NodeId(name="root"), n_children=2)
+    new_structure.nodes.add(id=NodeId(name="leaf"))
+    new_structure.nodes.add(id=NodeId(name="leaf2"))
+    mirror.set_structure(new_structure)
+    assert mirror.apply(reloaded)
+    assert mirror.apply(make_delta(5, 6, {2: TickStatus.SUCCESS}, structure_version=1))
+    assert mirror.to_details().node_info.children[1].status == TickStatus.SUCCESS
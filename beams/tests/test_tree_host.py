@@ -0,0 +1,224 @@
+import threading
+from typing import Generator
+
+import pytest
+
+from beams.service import tree_host as tree_host_module
+from beams.service.remote_calls.behavior_tree_pb2 import (TickConfiguration,
+                                                          TickStatus,
+                                                          TreeStatus)
+from beams.service.remote_calls.command_pb2 import CommandType
+from beams.service.rpc_client import RPCClient
+from beams.service.tree_host import TreeHost
+from beams.service.tree_registry import TreeRegistry
+from beams.service.tree_ticker import TreeTicker
+from beams.tests.conftest import (BAD_TREE_PATH, ETERNAL_GUARD_PATH,
+                                  wait_until, write_edited_eternal_guard)
+
+
+@pytest.fixture(scope="function")
+def tree_host() -> Generator[TreeHost, None, None]:
+    host = TreeHost()
+    host.start_work()
+
+    yield host
+
+    host.get_client().shutdown_trees()
+    host.stop_work()
+
+
+def test_tree_host_requests(tree_host: TreeHost):
+    client = tree_host.get_client()
+    # only used to build CommandMessages
+    messages = RPCClient()
+    assert client.get_tree_updates() == []
+
+    client.send_command(messages.construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", "", "INTERACTIVE", 100, "FIXED_DELAY"
+    ))
+    # commands have been serviced once sent
+    keys = client.get_tree_keys()
+    assert [key.name for key in keys] == ["my_tree"]
+    assert client.lookup_key(name="my_tree") == keys[0]
+    assert client.lookup_key(uuid=str(keys[0].uuid)[:8]) == keys[0]
+    assert client.lookup_key(name="other_tree") is None
+
+    update = client.get_tree_update(name="my_tree")
+    assert update.tree_id.uuid == str(keys[0].uuid)
+    assert update.tick_config == TickConfiguration.INTERACTIVE
+    assert client.get_tree_updates() == [update]
+
+    details = client.get_tree_details(uuid=keys[0].uuid)
+    assert details.tree_id == update.tree_id
+    assert details.node_info.id.name == "Eternal Guard"
+    structure = client.get_tree_structure(name="my_tree")
+    statuses = client.get_tree_statuses(name="my_tree")
+    assert structure.tree_id == statuses.tree_id == update.tree_id
+    assert len(structure.nodes) == len(statuses.statuses)
+
+    client.send_command(messages.construct_tick_configuration_msg(
+        "CONTINUOUS", 50, None, "my_tree", ""
+    ))
+    assert client.get_tree_update(name="my_tree").tick_delay_ms == 50
+    client.send_command(
+        messages.construct_base_msg(CommandType.START_TREE, "my_tree", "")
+    )
+    wait_until(lambda: client.get_tree_update(name="my_tree").tree_status
+               == TreeStatus.TICKING)
+
+    # errors raised in the host are raised by the client
+    with pytest.raises(ValueError):
+        client.get_tree_update(uuid="abc")
+
+    client.send_command(
+        messages.construct_base_msg(CommandType.UNLOAD_TREE, "my_tree", "")
+    )
+    assert client.get_tree_keys() == []
+    assert client.get_tree_update(name="my_tree") is None
+
+
+def test_load_tree_with_uuid(tree_host: TreeHost):
+    client = tree_host.get_client()
+    uuid = "8f0b5f2c-7b3e-4f43-9a44-51a4c1e9d0a1"
+    client.send_command(RPCClient().construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", uuid, "INTERACTIVE", 100, "FIXED_DELAY"
+    ))
+    # the uuid given by the CommandSequencer names the new tree
+    [key] = client.get_tree_keys()
+    assert str(key.uuid) == uuid
+
+
+def test_tree_host_heartbeat_versions(tree_host: TreeHost):
+    client = tree_host.get_client()
+    messages = RPCClient()
+
+    empty = client.get_heartbeat()
+    assert empty.version > 0
+    assert empty.updates == []
+    assert client.get_heartbeat(empty.version).updates is None
+
+    client.send_command(messages.construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", "", "INTERACTIVE", 100, "FIXED_DELAY"
+    ))
+    loaded = client.get_heartbeat(empty.version)
+    assert loaded.version > empty.version
+    assert loaded.updates == client.get_tree_updates()
+    # unchanged trees are not gathered again
+    assert client.get_heartbeat(loaded.version) == (loaded.version, None)
+    # clients behind the current version are sent it
+    assert client.get_heartbeat(empty.version) == loaded
+
+    client.send_command(messages.construct_tick_configuration_msg(
+        "INTERACTIVE", 50, None, "my_tree", ""
+    ))
+    changed = client.get_heartbeat(loaded.version)
+    assert changed.version > loaded.version
+    assert changed.updates[0].tick_delay_ms == 50
+
+
+def test_tree_host_reports_loading(monkeypatch):
+    release = threading.Event()
+
+    class SlowTreeTicker(TreeTicker):
+        def __init__(self, *args, **kwargs):
+            release.wait(timeout=5)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(tree_host_module, "TreeTicker", SlowTreeTicker)
+    # serve requests from this process, without starting the host
+    host = TreeHost()
+    host.registry = TreeRegistry()
+    host.registry_lock = threading.Lock()
+    messages = RPCClient()
+    loader = threading.Thread(target=host.load_new_tree, args=(
+        messages.construct_load_new_tree_msg(
+            str(ETERNAL_GUARD_PATH), "my_tree", "", "INTERACTIVE", 100, "FIXED_DELAY"
+        ),
+    ))
+    loader.start()
+    try:
+        wait_until(lambda: host.get_tree_update(name="my_tree") is not None,
+                   polling_period=0.01)
+        assert host.get_tree_update(name="my_tree").tree_status == TreeStatus.LOADING
+        assert host.get_tree_details(name="my_tree").tree_status == TreeStatus.LOADING
+        assert len(host.get_tree_structure(name="my_tree").nodes) == 0
+        # refused until loaded
+        host.start_tree(messages.construct_base_msg(CommandType.START_TREE, "my_tree", ""))
+    finally:
+        release.set()
+        loader.join()
+
+    details = host.get_tree_details(name="my_tree")
+    assert details.tree_status == TreeStatus.IDLE
+    assert details.node_info.id.name == "Eternal Guard"
+    timings = details.load_timings
+    assert timings.read_ms > 0 and timings.build_ms > 0 and timings.publish_ms > 0
+    assert timings.total_ms >= timings.read_ms + timings.build_ms + timings.publish_ms
+    host.shutdown_trees()
+    host.listener.close()
+
+
+def test_tree_host_replace(tree_host: TreeHost):
+    client = tree_host.get_client()
+    messages = RPCClient()
+    client.send_command(messages.construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", "", "CONTINUOUS", 50, "FIXED_DELAY"
+    ))
+    client.send_command(
+        messages.construct_base_msg(CommandType.START_TREE, "my_tree", "")
+    )
+    [old_key] = client.get_tree_keys()
+
+    # the new tree takes the old tree's place, and is started as it was
+    client.send_command(messages.construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", "", "CONTINUOUS", 50, "FIXED_DELAY",
+        replace=True,
+    ))
+    [new_key] = client.get_tree_keys()
+    assert new_key.name == "my_tree"
+    assert new_key.uuid != old_key.uuid
+    wait_until(lambda: client.get_tree_update(name="my_tree").tree_status
+               == TreeStatus.TICKING, polling_period=0.05)
+
+    # trees failing to load replace nothing
+    with pytest.raises(Exception):
+        client.send_command(messages.construct_load_new_tree_msg(
+            str(BAD_TREE_PATH), "my_tree", "", "CONTINUOUS", 50, "FIXED_DELAY",
+            replace=True,
+        ))
+    assert client.get_tree_keys() == [new_key]
+    assert client.get_tree_update(name="my_tree").tree_status == TreeStatus.TICKING
+
+
+def test_tree_host_reload(tree_host: TreeHost, tmp_path):
+    client = tree_host.get_client()
+    messages = RPCClient()
+    client.send_command(messages.construct_load_new_tree_msg(
+        str(ETERNAL_GUARD_PATH), "my_tree", "", "CONTINUOUS", 50, "FIXED_DELAY"
+    ))
+    client.send_command(
+        messages.construct_base_msg(CommandType.START_TREE, "my_tree", "")
+    )
+    wait_until(lambda: client.get_tree_update(name="my_tree").tree_status
+               == TreeStatus.TICKING, polling_period=0.05)
+    [key] = client.get_tree_keys()
+    before = client.get_tree_structure(name="my_tree")
+
+    client.send_command(messages.construct_reload_tree_msg(
+        str(write_edited_eternal_guard(tmp_path)), "my_tree", ""
+    ))
+    # the tree is reloaded in place, only the edited node is rebuilt
+    assert client.get_tree_keys() == [key]
+    after = client.get_tree_structure(name="my_tree")
+    assert after.structure_version == before.structure_version + 1
+    changed = [(old.id.name, old.node_type, new.node_type)
+               for old, new in zip(before.nodes, after.nodes) if old.id != new.id]
+    assert changed == [("Worker 2", "Running", "Success")]
+    timings = client.get_tree_details(name="my_tree").load_timings
+    assert (timings.nodes_built, timings.nodes_kept) == (1, 5)
+
+    # and keeps running, with the new node
+    wait_until(lambda: client.get_tree_details(name="my_tree").node_info
+               .children[2].children[1].status == TickStatus.SUCCESS,
+               polling_period=0.05)
+    assert client.get_tree_update(name="my_tree").tree_status == TreeStatus.TICKING
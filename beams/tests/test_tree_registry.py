@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+from uuid import UUID
+
+import pytest
+
+from beams.service.remote_calls.behavior_tree_pb2 import NodeId, TreeStatus
+from beams.service.tree_registry import TreeIdKey, TreeRegistry
+from beams.service.tree_ticker import TreeState
+
+KEY_1 = TreeIdKey(name="tree1", uuid=UUID("9218d74e-b6c5-4fa3-8249-4ac45abc09fb"))
+KEY_2 = TreeIdKey(name="tree1", uuid=UUID("50c82a04-7ce6-4656-bf2d-e26b08d8addf"))
+KEY_3 = TreeIdKey(name="tree3", uuid=UUID("94b74b64-ad96-41dd-8489-1162032804a8"))
+
+
+@pytest.fixture
+def registry() -> TreeRegistry:
+    registry = TreeRegistry()
+    for value, key in enumerate((KEY_1, KEY_2, KEY_3), start=1):
+        registry.add(key, value)
+    return registry
+
+
+@pytest.mark.parametrize("name, uuid, expected", [
+    (None, KEY_2.uuid, 2),
+    (None, str(KEY_3.uuid), 3),
+    (None, "50c82a", 2),
+    # first tree loaded wins for duplicate names
+    ("tree1", None, 1),
+    ("tree3", "", 3),
+    # uuid takes priority over name
+    ("tree1", "94b74", 3),
+    # falls back to the name if the uuid doesn't match
+    ("tree3", "aaaaaaa", 3),
+    ("tree4", "aaaaaaa", None),
+    # prefixes of another uuid do not match
+    (None, "9218d74f", None),
+])
+def test_registry_lookup(registry: TreeRegistry, name, uuid, expected):
+    key, value = registry.lookup(name=name, uuid=uuid)
+    assert value == expected
+    if expected is not None:
+        assert key == (KEY_1, KEY_2, KEY_3)[expected - 1]
+
+
+def test_registry_lookup_errors(registry: TreeRegistry):
+    with pytest.raises(ValueError):
+        registry.lookup()
+    with pytest.raises(ValueError):
+        registry.lookup(uuid="9218")
+
+
+def test_registry_remove(registry: TreeRegistry):
+    assert registry.remove(KEY_1) == 1
+    assert registry.remove(KEY_1) is None
+    # the next tree of the same name is found instead
+    assert registry.lookup(name="tree1") == (KEY_2, 2)
+    assert registry.lookup(uuid="9218d") == (None, None)
+    assert registry.keys() == [KEY_2, KEY_3]
+
+    registry.remove(KEY_2)
+    assert registry.lookup(name="tree1") == (None, None)
+    assert registry.items() == [(KEY_3, 3)]
+
+
+def test_registry_tree_updates(registry: TreeRegistry):
+    state = TreeState(tick_delay_ms=250)
+    try:
+        state.set_tree_status(TreeStatus.TICKING)
+        registry.add(KEY_3, SimpleNamespace(get_tree_state=lambda: state))
+
+        update = registry.get_tree_update(name="tree3")
+        assert update.tree_id == NodeId(name=KEY_3.name, uuid=str(KEY_3.uuid))
+        assert update.tick_delay_ms == 250
+        assert update.tree_status == TreeStatus.TICKING
+        assert registry.get_tree_update(name="tree4") is None
+
+        registry.remove(KEY_1)
+        registry.remove(KEY_2)
+        assert registry.get_tree_updates() == [update]
+        # each tree once, skipping unknown and invalid ids
+        assert registry.get_tree_updates(tree_ids=[
+            ("tree3", ""), ("", str(KEY_3.uuid)), ("tree4", ""), ("", "94b"),
+        ]) == [update]
+
+        registry.remove(KEY_3)
+        assert registry.get_tree_updates() == []
+    finally:
+        state.close()
+
+
+def test_registry_replace(registry: TreeRegistry):
+    assert registry.replace(KEY_1, 4)
+    assert registry.lookup(uuid=KEY_1.uuid) == (KEY_1, 4)
+    # keeps its place among trees of the same name
+    assert registry.lookup(name="tree1") == (KEY_1, 4)
+
+    unknown = TreeIdKey(name="tree1")
+    assert not registry.replace(unknown, 5)
+    assert registry.lookup(uuid=unknown.uuid) == (None, None)
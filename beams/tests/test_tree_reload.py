@@ -0,0 +1,170 @@
+from dataclasses import dataclass, replace
+from typing import List
+
+import py_trees
+from py_trees.behaviour import Behaviour
+from py_trees.common import Status
+
+from beams.behavior_tree.action_node import ActionExecution
+from beams.service.tree_reload import apply_reload, plan_reload
+from beams.tree_config.base import BaseItem, BehaviorTreeItem
+from beams.tree_config.composite import SelectorItem, SequenceItem
+from beams.tree_config.py_trees import RunningItem, SuccessItem
+
+
+class RecordingBehaviour(Behaviour):
+    """Records when it is set up and shut down, like an ActionNode's worker"""
+    events: List[str] = []
+
+    def setup(self, **kwargs) -> None:
+        self.events.append(f"setup {self.name}")
+
+    def shutdown(self) -> None:
+        self.events.append(f"shutdown {self.name}")
+
+    def update(self) -> Status:
+        return Status.RUNNING
+
+
+@dataclass
+class RecordingItem(BaseItem):
+    def get_tree(self) -> RecordingBehaviour:
+        return RecordingBehaviour(name=self.name)
+
+
+def make_item(*children: BaseItem, memory: bool = True) -> BehaviorTreeItem:
+    return BehaviorTreeItem(root=SequenceItem(
+        name="root",
+        memory=memory,
+        children=[
+            RecordingItem(name="first"),
+            SelectorItem(name="choice", children=[
+                RecordingItem(name="a"), RecordingItem(name="b"),
+            ]),
+            *children,
+        ],
+    ))
+
+
+def names(node: Behaviour) -> List[str]:
+    """Node names in pre-order"""
+    return [node.name] + [name for child in node.children for name in names(child)]
+
+
+def test_reload_unchanged():
+    item = make_item(RunningItem(name="last"))
+    tree = item.get_tree()
+    nodes = list(tree.root.iterate())
+
+    plan = plan_reload(item, tree, make_item(RunningItem(name="last")))
+    assert plan.root is tree.root
+    assert plan.count_built() == 0
+    assert not (plan.relinks or plan.removed or plan.replaced)
+
+    apply_reload(tree, plan, set_up=True)
+    assert list(tree.root.iterate()) == nodes
+
+
+def test_reload_changed_leaf():
+    item = make_item(RunningItem(name="last"))
+    tree = item.get_tree()
+    root = tree.root
+    first, choice, last = root.children
+    RecordingBehaviour.events = []
+
+    # only the changed node is built, its parent is relinked
+    new_item = make_item(SuccessItem(name="last"))
+    plan = plan_reload(item, tree, new_item)
+    assert plan.count_built() == 1
+    assert tree.root.children[-1] is last
+
+    apply_reload(tree, plan, set_up=True)
+    assert tree.root is root
+    assert tree.root.children[:-1] == [first, choice]
+    assert tree.root.children[-1] is not last
+    assert tree.root.children[-1].parent is tree.root
+    assert names(tree.root) == ["root", "first", "choice", "a", "b", "last"]
+    assert isinstance(tree.root.children[-1], py_trees.behaviours.Success)
+    assert RecordingBehaviour.events == []
+
+
+def test_reload_added_and_removed():
+    item = make_item()
+    tree = item.get_tree()
+    tree.setup()
+    choice = tree.root.children[1]
+    RecordingBehaviour.events = []
+
+    new_item = make_item()
+    new_item.root.children[1].children = [RecordingItem(name="c"), RecordingItem(name="a")]
+    plan = plan_reload(item, tree, new_item)
+    apply_reload(tree, plan, set_up=True)
+
+    # "a" is kept, "b" removed and "c" added
+    assert tree.root.children[1] is choice
+    assert names(choice) == ["choice", "c", "a"]
+    assert sorted(RecordingBehaviour.events) == ["setup c", "shutdown b"]
+    assert plan.count_built() == 1
+
+
+def test_reload_changed_composite():
+    item = make_item(RunningItem(name="last"))
+    tree = item.get_tree()
+    old_root = tree.root
+    kept = old_root.children[:]
+    tree.tick()
+    assert old_root.status == Status.RUNNING
+
+    # the composite is replaced, its children are moved over
+    new_item = make_item(RunningItem(name="last"), memory=False)
+    plan = plan_reload(item, tree, new_item)
+    apply_reload(tree, plan, set_up=True)
+    assert tree.root is not old_root
+    assert not tree.root.memory
+    assert tree.root.children == kept
+    assert all(child.parent is tree.root for child in kept)
+    assert old_root.status == Status.INVALID
+    assert plan.count_built() == 1
+
+    tree.tick()
+    assert tree.root.status == Status.RUNNING
+
+
+def test_reload_not_set_up():
+    item = make_item()
+    tree = item.get_tree()
+    RecordingBehaviour.events = []
+
+    new_item = make_item()
+    new_item.root.children[0] = RecordingItem(name="first", description="edited")
+    apply_reload(tree, plan_reload(item, tree, new_item), set_up=False)
+    # nodes are set up when the tree is started
+    assert RecordingBehaviour.events == ["shutdown first"]
+
+
+def test_reload_replaced_root():
+    item = make_item()
+    tree = item.get_tree()
+
+    new_item = BehaviorTreeItem(root=replace(item.root.children[0]))
+    plan = plan_reload(item, tree, new_item)
+    apply_reload(tree, plan, set_up=False)
+    assert isinstance(tree.root, RecordingBehaviour)
+    assert tree.root.parent is None
+    assert plan.removed and not plan.relinks
+    assert names(tree.root) == ["first"]
+
+
+def test_reload_changed_action_execution():
+    item = make_item()
+    tree = item.get_tree()
+    old_root = tree.root
+
+    # every node may run differently, so the whole tree is rebuilt
+    new_item = make_item()
+    new_item.action_execution = ActionExecution.THREAD
+    plan = plan_reload(item, tree, new_item)
+    apply_reload(tree, plan, set_up=False)
+    assert tree.root is not old_root
+    assert plan.removed == [old_root]
+    assert plan.count_built() == len(names(tree.root))
@@ -0,0 +1,206 @@
+from functools import partial
+from typing import Generator
+
+import pytest
+
+from beams.service.remote_calls.behavior_tree_pb2 import TickStatus, TreeStatus
+from beams.service.rpc_client import RPCClient
+from beams.service.rpc_handler import BeamsService
+from beams.service.tree_scheduler import ScheduledTreeTicker, TreeScheduler
+from beams.service.tree_ticker import TreeState, TreeTicker
+from beams.tests.conftest import (BAD_TREE_PATH, ETERNAL_GUARD_PATH,
+                                  assert_test_status, wait_until,
+                                  write_edited_eternal_guard)
+
+
+@pytest.fixture(scope="function")
+def rpc_server() -> Generator[BeamsService, None, None]:
+    # Overrides the conftest fixture, so rpc_client talks to a scheduled service
+    handler = BeamsService(scheduler_workers=2)
+    handler.start_work()
+
+    yield handler
+
+    handler.join_all_trees()
+    handler.stop_work()
+
+
+def tick_status_of(client: RPCClient, name: str) -> TickStatus:
+    for update in client.get_heartbeat().behavior_tree_update:
+        if update.tree_id.name == name:
+            return update.tick_status
+    return TickStatus.INVALID
+
+
+def test_scheduled_continuous(rpc_client: RPCClient):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+    wait_until(lambda: tick_status_of(rpc_client, "my_tree") != TickStatus.INVALID)
+
+    # scheduled trees keep tick statistics too
+    def tick_count():
+        for update in rpc_client.get_heartbeat().behavior_tree_update:
+            if update.tree_id.name == "my_tree":
+                return update.tick_stats.tick_count
+        return 0
+
+    wait_until(lambda: tick_count() >= 2)
+
+    rpc_client.pause_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+
+
+def test_scheduled_interactive(rpc_client: RPCClient):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="INTERACTIVE",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree",
+                       TreeStatus.WAITING_ACK))
+    # no ticks have been requested yet
+    assert tick_status_of(rpc_client, "my_tree") == TickStatus.INVALID
+
+    rpc_client.tick_tree(tree_name="my_tree")
+    wait_until(lambda: tick_status_of(rpc_client, "my_tree") != TickStatus.INVALID)
+    wait_until(partial(assert_test_status, rpc_client, "my_tree",
+                       TreeStatus.WAITING_ACK))
+
+    details = rpc_client.get_detailed_update(tree_name="my_tree")
+    assert details.tree_id.name == "my_tree"
+    assert details.node_info.id.name == "Eternal Guard"
+    assert len(details.node_info.children) == 3
+
+
+def test_scheduled_many_trees(rpc_client: RPCClient, rpc_server: BeamsService):
+    names = [f"tree_{i}" for i in range(4)]
+    for name in names:
+        rpc_client.load_new_tree(
+            new_tree_filepath=str(ETERNAL_GUARD_PATH),
+            tick_config="CONTINUOUS",
+            tick_delay_ms=20,
+            tree_name=name,
+        )
+        rpc_client.start_tree(tree_name=name)
+
+    for name in names:
+        wait_until(partial(assert_test_status, rpc_client, name, TreeStatus.TICKING))
+
+    # trees are spread across the available schedulers
+    assert [sched.n_trees.value for sched in rpc_server.schedulers] == [2, 2]
+
+
+def test_scheduled_reschedule_and_unload(rpc_client: RPCClient, rpc_server: BeamsService):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="INTERACTIVE",
+        tick_delay_ms=30000,
+        tree_name="my_tree",
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree",
+                       TreeStatus.WAITING_ACK))
+
+    rpc_client.change_tick_configuration(tree_name="my_tree",
+                                         tick_config="CONTINUOUS",
+                                         tick_delay_ms=20)
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+    wait_until(lambda: tick_status_of(rpc_client, "my_tree") != TickStatus.INVALID)
+
+    rpc_client.unload_tree(tree_name="my_tree")
+    wait_until(lambda: len(rpc_client.get_heartbeat().behavior_tree_update) == 0)
+    assert sum(sched.n_trees.value for sched in rpc_server.schedulers) == 0
+
+
+def test_scheduled_replace(rpc_client: RPCClient):
+    def tree_uuids():
+        return [update.tree_id.uuid
+                for update in rpc_client.get_heartbeat().behavior_tree_update]
+
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+    [old_uuid] = tree_uuids()
+
+    # scheduled trees are validated by their scheduler before the swap
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(BAD_TREE_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+        replace=True,
+    )
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+        replace=True,
+    )
+    wait_until(lambda: len(tree_uuids()) == 1 and tree_uuids() != [old_uuid])
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+
+
+def test_scheduled_reload(rpc_client: RPCClient, tmp_path):
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+    before = rpc_client.get_tree_structure(tree_name="my_tree")
+
+    rpc_client.reload_tree(new_tree_filepath=str(write_edited_eternal_guard(tmp_path)),
+                           tree_name="my_tree")
+    # reloaded by the scheduler, the host reattaches to the new structure
+    wait_until(lambda: rpc_client.get_tree_structure(tree_name="my_tree")
+               .structure_version == before.structure_version + 1)
+    after = rpc_client.get_tree_structure(tree_name="my_tree")
+    assert after.tree_id == before.tree_id
+    changed = [old.id.name for old, new in zip(before.nodes, after.nodes) if old.id != new.id]
+    assert changed == ["Worker 2"]
+    details = rpc_client.get_detailed_update(tree_name="my_tree")
+    assert (details.load_timings.nodes_built, details.load_timings.nodes_kept) == (1, 5)
+    wait_until(lambda: rpc_client.get_detailed_update(tree_name="my_tree").node_info
+               .children[2].children[1].status == TickStatus.SUCCESS)
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.TICKING))
+
+
+def test_scheduled_tree_identity():
+    scheduler = TreeScheduler()
+    scheduler.start_work()
+    # as loaded by a TreeHost
+    state = TreeState()
+    state.set_tree_status(TreeStatus.LOADING)
+    scheduled = ScheduledTreeTicker(filepath=str(ETERNAL_GUARD_PATH),
+                                    init_tree_state=state, schedulers=[scheduler])
+    ticker = TreeTicker(filepath=str(ETERNAL_GUARD_PATH))
+    try:
+        assert scheduled.wait_loaded()
+        # identified by the root node, as a TreeTicker is
+        tree_id = scheduled.get_behavior_tree_update().tree_id
+        assert tree_id.name == ticker.get_behavior_tree_update().tree_id.name
+        assert tree_id == scheduled.get_tree_structure().nodes[0].id
+        assert tree_id == scheduled.get_tree_structure().tree_id
+        assert tree_id == scheduled.get_status_snapshot().tree_id
+    finally:
+        scheduled.shutdown()
+        ticker.shutdown()
+        scheduler.stop_work()
@@ -0,0 +1,255 @@
+import threading
+from functools import partial
+from typing import List
+
+from beams.service.remote_calls.behavior_tree_pb2 import (
+    BehaviorTreeUpdateMessage, NodeId, TickStatus, TreeDetails, TreeStatus,
+    TreeStatusDelta, TreeStructure)
+from beams.service.remote_calls.heartbeat_pb2 import (TreeUpdate,
+                                                      TreeUpdateSubscription)
+from beams.service.rpc_client import RPCClient
+from beams.service.tree_deltas import TreeStatusMirror, full_status_delta
+from beams.service.tree_subscriptions import Subscriber, UpdateBroadcaster
+from beams.tests.conftest import (ETERNAL_GUARD_PATH, assert_test_status,
+                                  wait_until)
+
+TREE_A = NodeId(name="tree_a", uuid="aaaaaaaa-0000")
+TREE_B = NodeId(name="tree_b", uuid="bbbbbbbb-0000")
+
+
+def make_update(tree_id: NodeId, status: TickStatus) -> TreeUpdate:
+    return TreeUpdate(behavior_tree_update=BehaviorTreeUpdateMessage(
+        tree_id=tree_id, tick_status=status,
+    ))
+
+
+def test_subscriber_coalesces():
+    sub = Subscriber(TreeUpdateSubscription())
+    sub.offer(TREE_A.uuid, make_update(TREE_A, TickStatus.RUNNING))
+    sub.offer(TREE_A.uuid, make_update(TREE_A, TickStatus.SUCCESS))
+    sub.offer(TREE_B.uuid, make_update(TREE_B, TickStatus.FAILURE))
+
+    updates = sub.next_updates(timeout=0.1)
+    statuses = {u.behavior_tree_update.tree_id.name: u.behavior_tree_update.tick_status
+                for u in updates}
+    # only the latest update for tree_a remains
+    assert statuses == {"tree_a": TickStatus.SUCCESS, "tree_b": TickStatus.FAILURE}
+    assert sub.next_updates(timeout=0.01) == []
+
+
+def test_subscriber_rate_limit():
+    sub = Subscriber(TreeUpdateSubscription(min_interval_ms=200))
+    sub.offer(TREE_A.uuid, make_update(TREE_A, TickStatus.RUNNING))
+    assert len(sub.next_updates(timeout=0.1)) == 1
+
+    sub.offer(TREE_A.uuid, make_update(TREE_A, TickStatus.SUCCESS))
+    # held back until the interval passes
+    assert sub.next_updates(timeout=0.05) == []
+    updates = sub.next_updates(timeout=0.5)
+    assert [u.behavior_tree_update.tick_status for u in updates] == [TickStatus.SUCCESS]
+
+    # removals are never held back, and supersede pending updates
+    sub.offer(TREE_A.uuid, make_update(TREE_A, TickStatus.FAILURE))
+    sub.offer(TREE_A.uuid, TreeUpdate(tree_removed=TREE_A))
+    updates = sub.next_updates(timeout=0.05)
+    assert [u.WhichOneof("update") for u in updates] == ["tree_removed"]
+
+
+def test_subscriber_merges_status_deltas():
+    sub = Subscriber(TreeUpdateSubscription(include_status_deltas=True))
+    sub.offer(TREE_A.uuid, TreeUpdate(status_delta=full_status_delta(
+        TREE_A, 1, bytes(3), TreeStatus.TICKING
+    )))
+    sub.offer(TREE_A.uuid, TreeUpdate(status_delta=TreeStatusDelta(
+        tree_id=TREE_A, sequence=2, base_sequence=1, ordinals=[2],
+        statuses=bytes([TickStatus.RUNNING]), tree_status=TreeStatus.TICKING,
+    )))
+    updates = sub.next_updates(timeout=0.1)
+    # the change is not lost by coalescing
+    assert len(updates) == 1
+    assert updates[0].status_delta.full
+    assert updates[0].status_delta.sequence == 2
+    assert updates[0].status_delta.statuses == bytes([0, 0, TickStatus.RUNNING])
+
+
+def test_subscriber_filter():
+    sub = Subscriber(TreeUpdateSubscription(
+        tree_ids=[NodeId(name="tree_a"), NodeId(uuid="bbbbb")]
+    ))
+    assert sub.wants(TREE_A)
+    assert sub.wants(TREE_B)
+    assert not sub.wants(NodeId(name="tree_c", uuid="cccccccc-0000"))
+    # partial uuids must be at least 5 characters
+    assert not Subscriber(
+        TreeUpdateSubscription(tree_ids=[NodeId(uuid="bbbb")])
+    ).wants(TREE_B)
+
+
+def test_broadcaster_fetches_once_per_poll():
+    trees: List[BehaviorTreeUpdateMessage] = [
+        make_update(TREE_A, TickStatus.RUNNING).behavior_tree_update,
+    ]
+    n_details = 0
+
+    def get_updates():
+        return list(trees)
+
+    def get_details(tree_id: NodeId):
+        nonlocal n_details
+        n_details += 1
+        return TreeDetails(tree_id=tree_id)
+
+    broadcaster = UpdateBroadcaster(get_updates, get_details, poll_period_sec=60)
+    # drive polls by hand, the thread would race the subscriptions
+    broadcaster.run = lambda: None
+    subs = [broadcaster.subscribe(TreeUpdateSubscription(include_details=True))
+            for _ in range(10)]
+    broadcaster.poll(subs)
+    assert n_details == 1
+    for sub in subs:
+        kinds = sorted(u.WhichOneof("update") for u in sub.next_updates(timeout=0.1))
+        assert kinds == ["behavior_tree_update", "tree_details"]
+
+    # nothing changed, nothing sent
+    broadcaster.poll(subs)
+    assert all(sub.next_updates(timeout=0.01) == [] for sub in subs)
+
+    trees.clear()
+    broadcaster.poll(subs)
+    for sub in subs:
+        updates = sub.next_updates(timeout=0.1)
+        assert [u.tree_removed for u in updates] == [TREE_A]
+
+    for sub in subs:
+        broadcaster.unsubscribe(sub)
+
+
+def test_broadcaster_resends_reloaded_structure():
+    version = 1
+
+    def get_structure(tree_id: NodeId) -> TreeStructure:
+        structure = TreeStructure(tree_id=tree_id, structure_version=version)
+        for name in ("root", f"child {version}"):
+            structure.nodes.add(id=NodeId(name=name))
+        return structure
+
+    def get_statuses(tree_id: NodeId) -> TreeStatusDelta:
+        return full_status_delta(tree_id, 1, bytes(2), TreeStatus.IDLE, version)
+
+    tree = make_update(TREE_A, TickStatus.RUNNING).behavior_tree_update
+    broadcaster = UpdateBroadcaster(lambda: [tree], lambda tree_id: TreeDetails(),
+                                    poll_period_sec=60, get_structure=get_structure,
+                                    get_statuses=get_statuses)
+    # drive polls by hand, the thread would race them
+    broadcaster.run = lambda: None
+    sub = broadcaster.subscribe(TreeUpdateSubscription(include_status_deltas=True))
+    broadcaster.poll([sub])
+    kinds = [u.WhichOneof("update") for u in sub.next_updates(timeout=0.1)]
+    assert kinds == ["behavior_tree_update", "tree_structure", "status_delta"]
+    broadcaster.poll([sub])
+    assert sub.next_updates(timeout=0.01) == []
+
+    # reloading the tree publishes a new structure, which is sent again
+    version = 2
+    broadcaster.poll([sub])
+    updates = sub.next_updates(timeout=0.1)
+    assert [u.WhichOneof("update") for u in updates] == ["tree_structure", "status_delta"]
+    assert updates[0].tree_structure.nodes[1].id.name == "child 2"
+    assert updates[1].status_delta.full
+    broadcaster.unsubscribe(sub)
+
+
+def test_broadcaster_max_subscribers():
+    broadcaster = UpdateBroadcaster(list, TreeDetails, max_subscribers=1)
+    sub = broadcaster.subscribe(TreeUpdateSubscription())
+    assert sub is not None
+    assert broadcaster.subscribe(TreeUpdateSubscription()) is None
+    broadcaster.unsubscribe(sub)
+    wait_until(lambda: broadcaster.thread is None, timeout=2, polling_period=0.05)
+
+
+def test_subscribe_tree_updates(rpc_client: RPCClient):
+    received: List[TreeUpdate] = []
+    stream = rpc_client.subscribe_tree_updates(tree_names=["my_tree"],
+                                               include_details=True)
+
+    def consume():
+        for update in stream:
+            received.append(update)
+
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+    rpc_client.start_tree(tree_name="my_tree")
+
+    def has_ticked():
+        return any(u.behavior_tree_update.tree_status == TreeStatus.TICKING
+                   and u.behavior_tree_update.tick_status != TickStatus.INVALID
+                   for u in received)
+
+    wait_until(has_ticked)
+    wait_until(lambda: any(u.HasField("tree_details")
+                           and u.tree_details.node_info.id.name == "Eternal Guard"
+                           for u in received))
+
+    rpc_client.unload_tree(tree_name="my_tree")
+    wait_until(lambda: any(u.HasField("tree_removed") for u in received))
+    assert all(u.behavior_tree_update.tree_id.name in ("", "my_tree") for u in received)
+
+    stream.cancel()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_subscribe_status_deltas(rpc_client: RPCClient):
+    received: List[TreeUpdate] = []
+    stream = rpc_client.subscribe_tree_updates(tree_names=["my_tree"],
+                                               include_status_deltas=True)
+    thread = threading.Thread(target=lambda: received.extend(stream), daemon=True)
+    thread.start()
+
+    rpc_client.load_new_tree(
+        new_tree_filepath=str(ETERNAL_GUARD_PATH),
+        tick_config="CONTINUOUS",
+        tick_delay_ms=50,
+        tree_name="my_tree",
+    )
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+    rpc_client.start_tree(tree_name="my_tree")
+    wait_until(lambda: sum(u.HasField("status_delta") for u in received) > 3)
+    rpc_client.pause_tree(tree_name="my_tree")
+    wait_until(partial(assert_test_status, rpc_client, "my_tree", TreeStatus.IDLE))
+
+    structure = rpc_client.get_tree_structure(tree_name="my_tree")
+    assert structure.nodes[0].id.name == "Eternal Guard"
+    # the structure is sent before any deltas, which rebuild the tree's details
+    kinds = [u.WhichOneof("update") for u in received]
+    assert kinds.index("tree_structure") < kinds.index("status_delta")
+    mirror = TreeStatusMirror(structure)
+    wait_until(lambda: mirror_matches(rpc_client, mirror, received))
+
+    stream.cancel()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    rpc_client.unload_tree(tree_name="my_tree")
+
+
+def mirror_matches(
+    rpc_client: RPCClient,
+    mirror: TreeStatusMirror,
+    received: List[TreeUpdate],
+) -> bool:
+    for update in list(received):
+        if update.HasField("status_delta"):
+            assert mirror.apply(update.status_delta)
+    received.clear()
+    return mirror.to_details().node_info == rpc_client.get_detailed_update(
+        tree_name="my_tree"
+    ).node_info
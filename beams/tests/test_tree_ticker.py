@@ -0,0 +1,238 @@
+import pickle
+import time
+from multiprocessing import Process
+from multiprocessing.shared_memory import SharedMemory
+from uuid import uuid4
+
+import py_trees
+import pytest
+from py_trees.common import Status
+from py_trees.visitors import SnapshotVisitor
+
+from beams.service import tree_ticker
+from beams.service.helpers.status_table import NodeStatusTable
+from beams.service.remote_calls.behavior_tree_pb2 import (NodeId, NodeInfo,
+                                                          TickConfiguration,
+                                                          TickStatus,
+                                                          TreeStatus,
+                                                          TreeStructure)
+from beams.service.tree_ticker import (NODE_NAME_SIZE, TreeState,
+                                       TreeStatusWriter, TreeTicker,
+                                       get_detailed_update_from_state)
+from beams.tests.conftest import (ETERNAL_GUARD_PATH, wait_until,
+                                  write_edited_eternal_guard)
+
+
+def node_statuses(info: NodeInfo):
+    statuses = {info.id.name: info.status}
+    for child in info.children:
+        statuses.update(node_statuses(child))
+    return statuses
+
+
+@pytest.fixture(scope="function")
+def interrupted_tree() -> py_trees.trees.BehaviourTree:
+    # "high" succeeds on the third tick, interrupting "seq" while "A" is not
+    # part of the ticked path (memory=True resumes at "B")
+    high = py_trees.behaviours.StatusQueue(
+        name="high", queue=[Status.FAILURE, Status.FAILURE], eventually=Status.SUCCESS
+    )
+    seq = py_trees.composites.Sequence(
+        "seq", memory=True,
+        children=[py_trees.behaviours.Success("A"), py_trees.behaviours.Running("B")]
+    )
+    root = py_trees.composites.Selector("root", memory=False, children=[high, seq])
+    return py_trees.trees.BehaviourTree(root)
+
+
+def test_status_writer_tracks_tree(interrupted_tree: py_trees.trees.BehaviourTree):
+    snapshot_visitor = SnapshotVisitor()
+    interrupted_tree.visitors.append(snapshot_visitor)
+    writer = TreeStatusWriter(interrupted_tree)
+    state = TreeState()
+
+    def get_statuses():
+        details = get_detailed_update_from_state(state, writer.skeleton, writer.read())
+        return node_statuses(details.node_info)
+
+    try:
+        assert set(get_statuses().values()) == {TickStatus.INVALID}
+
+        for _ in range(4):
+            interrupted_tree.tick()
+            writer.update(snapshot_visitor.visited.keys()
+                          | snapshot_visitor.previously_visited.keys())
+            expected = {
+                node.name: getattr(TickStatus, node.status.name)
+                for node in interrupted_tree.root.iterate()
+            }
+            assert get_statuses() == expected
+
+        # the interrupted branch was reset
+        assert get_statuses()["A"] == TickStatus.INVALID
+    finally:
+        writer.table.unlink()
+        state.close()
+
+
+def test_status_table_reader(interrupted_tree: py_trees.trees.BehaviourTree):
+    # readers in other processes attach by name, and only need the skeleton
+    writer = TreeStatusWriter(interrupted_tree)
+    reader = NodeStatusTable(name=writer.table.name)
+    state = TreeState()
+    try:
+        interrupted_tree.tick()
+        writer.update(node.id for node in interrupted_tree.root.iterate())
+        details = get_detailed_update_from_state(state, writer.skeleton,
+                                                 reader.read())
+        assert details.node_info.id.name == "root"
+        assert details.node_info.status == TickStatus.RUNNING
+        assert [child.status for child in details.node_info.children] == [
+            TickStatus.FAILURE, TickStatus.RUNNING
+        ]
+    finally:
+        reader.close()
+        writer.table.unlink()
+        state.close()
+
+
+def test_tree_state_fields():
+    state = TreeState(tick_delay_ms=250, tick_config=TickConfiguration.INTERACTIVE)
+    assert state.get_tree_status() == TreeStatus.IDLE
+    assert state.get_root_status() == TickStatus.INVALID
+    assert state.get_tick_config() == TickConfiguration.INTERACTIVE
+    assert state.get_tick_delay_ms() == 250
+
+    node_uuid = uuid4()
+    state.set_tick_result("tip", node_uuid, Status.RUNNING)
+    assert state.get_node_name() == NodeId(name="tip", uuid=str(node_uuid))
+    assert state.get_root_status() == TickStatus.RUNNING
+
+    # fixed-width fields truncate long strings
+    state.set_tick_result("n" * 500, node_uuid, Status.RUNNING)
+    assert state.get_node_name().name == "n" * NODE_NAME_SIZE
+
+    state.set_pause_tree(True)
+    assert not state.set_ticking()
+    state.set_pause_tree(False)
+    assert state.set_ticking()
+    assert state.get_tree_status() == TreeStatus.TICKING
+    state.close()
+
+
+def test_tree_state_attach(interrupted_tree: py_trees.trees.BehaviourTree):
+    # TreeStates sent to other processes attach to the same shared memory
+    state = TreeState(tick_delay_ms=250)
+    attached = pickle.loads(pickle.dumps(state))
+    try:
+        assert attached.get_tick_delay_ms() == 250
+        assert attached.get_tree_structure() == TreeStructure()
+
+        writer = TreeStatusWriter(interrupted_tree)
+        writer.table.unlink()
+        attached.set_tree_status(TreeStatus.TICKING)
+        attached.set_tree_structure(writer.structure)
+        assert state.get_tree_status() == TreeStatus.TICKING
+        assert state.get_tree_structure() == writer.structure
+        structure_name = attached.structure_block.name
+    finally:
+        attached.close()
+        state.close()
+    # the structure is freed with the instance that set it, and the state
+    # with the instance that created it
+    for name in (structure_name, state.shm.name):
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
+
+
+def write_tick_results(state: TreeState, n_writes: int):
+    for i in range(n_writes):
+        state.set_tick_result(f"node_{i}", f"uuid_{i}", Status.RUNNING)
+
+
+def test_tree_state_consistent_reads():
+    # the name and uuid are written together, and must be read together
+    state = TreeState()
+    writer = Process(target=write_tick_results, args=(state, 20000))
+    writer.start()
+    try:
+        while writer.is_alive():
+            node_id = state.get_node_name()
+            assert node_id.name.removeprefix("node_") == node_id.uuid.removeprefix("uuid_")
+    finally:
+        writer.join()
+    assert state.get_node_name() == NodeId(name="node_19999", uuid="uuid_19999")
+    state.close()
+
+
+def test_tree_state_abandoned_write(monkeypatch):
+    monkeypatch.setattr(tree_ticker, "STATE_WRITE_TIMEOUT_SEC", 0.1)
+    state = TreeState()
+    state.set_tick_result("node", "uuid", Status.RUNNING)
+    # as if the writer was terminated mid-write
+    state.fields.seq += 1
+
+    start = time.monotonic()
+    assert state.get_node_name() == NodeId(name="node", uuid="uuid")
+    assert 0.1 < time.monotonic() - start < 2
+    assert state.fields.seq % 2 == 0
+    state.close()
+
+
+def tick_interactively(ticker: TreeTicker) -> TickStatus:
+    """Tick the tree of a started, interactive TreeTicker once"""
+    # set WAITING_ACK again once the requested tick is done
+    ticker.state.set_tree_status(TreeStatus.TICKING)
+    ticker.command_tick()
+    wait_until(lambda: ticker.state.get_tree_status() == TreeStatus.WAITING_ACK,
+               polling_period=0.01)
+    return ticker.state.get_root_status()
+
+
+def test_reload_keeps_node_state(tmp_path):
+    # ticked by the TreeTicker's own work process, rather than a TreeScheduler
+    ticker = TreeTicker(filepath=str(ETERNAL_GUARD_PATH),
+                        init_tree_state=TreeState(tick_config=TickConfiguration.INTERACTIVE))
+    ticker.start_tree()
+    try:
+        wait_until(lambda: ticker.state.get_tree_status() == TreeStatus.WAITING_ACK,
+                   polling_period=0.01)
+        # the conditions fail once each, then keep succeeding
+        assert [tick_interactively(ticker) for _ in range(5)] == [
+            TickStatus.RUNNING, TickStatus.FAILURE, TickStatus.RUNNING,
+            TickStatus.FAILURE, TickStatus.RUNNING,
+        ]
+        before = ticker.get_tree_structure()
+
+        ticker.reload_tree(str(write_edited_eternal_guard(tmp_path)))
+        after = ticker.get_tree_structure()
+        assert after.structure_version == before.structure_version + 1
+        assert after.tree_id == before.tree_id
+        timings = ticker.get_detailed_update().load_timings
+        assert (timings.nodes_built, timings.nodes_kept) == (1, 5)
+        # the kept conditions do not start failing again
+        assert [tick_interactively(ticker) for _ in range(4)] == [TickStatus.SUCCESS] * 4
+        statuses = node_statuses(ticker.get_detailed_update().node_info)
+        assert statuses["Worker 2"] == TickStatus.SUCCESS
+    finally:
+        ticker.stop_work()
+        ticker.shutdown()
+
+
+def test_interactive_tick_kept_while_paused():
+    ticker = TreeTicker(filepath=str(ETERNAL_GUARD_PATH),
+                        init_tree_state=TreeState(tick_config=TickConfiguration.INTERACTIVE))
+    try:
+        assert not ticker.take_interactive_tick()
+        # a TICK_TREE taken as a pause lands is not lost
+        ticker.command_tick()
+        assert ticker.state.get_pause_tree()
+        assert ticker.take_interactive_tick()
+        assert ticker.state.get_root_status() == TickStatus.INVALID
+
+        ticker.state.set_pause_tree(False)
+        assert ticker.take_interactive_tick()
+        assert ticker.state.get_root_status() != TickStatus.INVALID
+        assert not ticker.take_interactive_tick()
+    finally:
+        ticker.shutdown()
@@ -1,4 +1,5 @@
 import json
+import threading
 from pathlib import Path
 from typing import Union
 
@@ -15,10 +16,15 @@ import beams.tree_config.prebuilt.wait_for_ack  # noqa: F401
 import beams.tree_config.py_trees  # noqa: F401
 from beams.tree_config.base import BaseItem, BehaviorTreeItem
 
+# apischema builds (and caches) its deserializers on first use, which fails
+# with a RecursionError if several threads do so at once
+_deserialize_lock = threading.Lock()
+
 
 def get_tree_item_from_path(path: Path) -> BehaviorTreeItem:
     with open(path, "r") as fd:
         deser = json.load(fd)
+    with _deserialize_lock:
         tree_item = deserialize(BehaviorTreeItem, deser)
 
     return tree_item
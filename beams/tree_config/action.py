@@ -1,23 +1,35 @@
 import logging
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Awaitable, Callable, Optional
 
 import py_trees
-from epics import caget, caput
+from epics import caput
 
-from beams.behavior_tree.action_node import ActionNode, wrapped_action_work
+from beams.behavior_tree.action_node import (ActionExecution, ActionNode,
+                                             get_default_action_execution,
+                                             wrapped_action_work,
+                                             wrapped_async_action_work)
+from beams.behavior_tree.async_ca import async_caget, async_caput
 from beams.tree_config.base import BaseItem
 from beams.tree_config.condition import BaseConditionItem, DummyConditionItem
+from beams.tree_config.pv_monitor import get_pv_cache
 from beams.typing_helper import Evaluatable
 
 logger = logging.getLogger(__name__)
 
 
+def _runs_async(execution: Optional[ActionExecution]) -> bool:
+    """Whether an item's ActionNode will run on the event loop"""
+    return (execution or get_default_action_execution()) == ActionExecution.ASYNC
+
+
 @dataclass
 class SetPVActionItem(BaseItem):
     pv: str = ""
     value: Any = 1
     loop_period_sec: float = 1.0
+    # where the work runs, the tree's (or service's) default if None
+    execution: Optional[ActionExecution] = None
 
     termination_check: BaseConditionItem = field(default_factory=DummyConditionItem)
 
@@ -27,9 +39,9 @@ class SetPVActionItem(BaseItem):
         def work_func(comp_condition: Evaluatable) -> py_trees.common.Status:
             try:
                 # Set to running
-                # double caget, this is uneeded as currently the comp_condition
-                # has caget baked in
-                value = caget(self.pv)
+                # double read, this is uneeded as currently the comp_condition
+                # reads the PV too.  Served by the process's PV cache
+                value = get_pv_cache().read(self.pv)
                 logger.debug(f" <<-- ({self.name}): caget({self.pv}) -> {value}")
 
                 if comp_condition():
@@ -43,12 +55,31 @@ class SetPVActionItem(BaseItem):
                 logger.warning(f" <<-- ({self.name}): work failed, {ex}")
                 return py_trees.common.Status.FAILURE
 
+        @wrapped_async_action_work(self.loop_period_sec)
+        async def async_work_func(
+            comp_condition: Callable[[], Awaitable[bool]]
+        ) -> py_trees.common.Status:
+            try:
+                value = await async_caget(self.pv)
+                logger.debug(f" <<-- ({self.name}): caget({self.pv}) -> {value}")
+
+                if await comp_condition():
+                    return py_trees.common.Status.SUCCESS
+
+                await async_caput(self.pv, self.value)
+                logger.debug(f" <<-- ({self.name}): caput({self.pv}, {self.value})")
+                return py_trees.common.Status.RUNNING
+            except Exception as ex:
+                logger.warning(f" <<-- ({self.name}): work failed, {ex}")
+                return py_trees.common.Status.FAILURE
+
         comp_cond = self.termination_check.get_condition_function()
 
         node = ActionNode(
             name=self.name,
-            work_func=work_func,
+            work_func=async_work_func if _runs_async(self.execution) else work_func,
             completion_condition=comp_cond,
+            execution=self.execution,
         )
 
         return node
@@ -59,6 +90,8 @@ class IncPVActionItem(BaseItem):
     pv: str = ""
     increment: float = 1
     loop_period_sec: float = 1.0
+    # where the work runs, the tree's (or service's) default if None
+    execution: Optional[ActionExecution] = None
 
     termination_check: BaseConditionItem = field(default_factory=DummyConditionItem)
 
@@ -71,7 +104,8 @@ class IncPVActionItem(BaseItem):
             Action node should take care of logging, reporting status
             """
             try:
-                value = caget(self.pv)
+                # a fresh read, as a stale value would repeat an increment
+                value = get_pv_cache().read(self.pv, max_age_sec=0)
                 logger.debug(f" <<-- ({self.name}): caget({self.pv}) -> {value}")
 
                 if comp_condition():
@@ -79,7 +113,25 @@ class IncPVActionItem(BaseItem):
 
                 # specific caput logic to IncPVActionItem
                 caput(self.pv, value + self.increment)
-                logger.debug(f" <<-- ({self.name}): caput({self.pv}, {value})")
+                logger.debug(f" <<-- ({self.name}): caput({self.pv}, {value + self.increment})")
+                return py_trees.common.Status.RUNNING
+            except Exception as ex:
+                logger.warning(f" <<-- ({self.name}): work failed, {ex}")
+                return py_trees.common.Status.FAILURE
+
+        @wrapped_async_action_work(self.loop_period_sec)
+        async def async_work_func(
+            comp_condition: Callable[[], Awaitable[bool]]
+        ) -> py_trees.common.Status:
+            try:
+                value = await async_caget(self.pv)
+                logger.debug(f" <<-- ({self.name}): caget({self.pv}) -> {value}")
+
+                if await comp_condition():
+                    return py_trees.common.Status.SUCCESS
+
+                await async_caput(self.pv, value + self.increment)
+                logger.debug(f" <<-- ({self.name}): caput({self.pv}, {value + self.increment})")
                 return py_trees.common.Status.RUNNING
             except Exception as ex:
                 logger.warning(f" <<-- ({self.name}): work failed, {ex}")
@@ -89,8 +141,9 @@ class IncPVActionItem(BaseItem):
 
         node = ActionNode(
             name=self.name,
-            work_func=work_func,
+            work_func=async_work_func if _runs_async(self.execution) else work_func,
             completion_condition=comp_cond,
+            execution=self.execution,
         )
 
         return node
@@ -1,9 +1,12 @@
 import logging
 from dataclasses import dataclass
+from typing import Optional
 
 import py_trees
 from py_trees.behaviour import Behaviour
 
+from beams.behavior_tree.action_node import (ActionExecution,
+                                             default_action_execution)
 from beams.serialization import as_tagged_union
 
 logger = logging.getLogger(__name__)
@@ -23,9 +26,12 @@ class BaseItem:
 @dataclass
 class BehaviorTreeItem:
     root: BaseItem
+    # where the tree's ActionNodes run, unless set per item
+    action_execution: Optional[ActionExecution] = None
 
     def get_tree(self) -> py_trees.trees.BehaviourTree:
-        return py_trees.trees.BehaviourTree(self.root.get_tree())
+        with default_action_execution(self.action_execution):
+            return py_trees.trees.BehaviourTree(self.root.get_tree())
 
 
 @dataclass
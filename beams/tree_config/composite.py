@@ -8,6 +8,8 @@ from py_trees.composites import Parallel, Selector, Sequence
 from beams.serialization import as_tagged_union
 from beams.tree_config.base import BaseItem
 from beams.tree_config.condition import BaseConditionItem
+from beams.tree_config.pv_monitor import (MonitoredCondition,
+                                          monitored_condition)
 from beams.typing_helper import Evaluatable
 
 
@@ -104,6 +106,11 @@ class SequenceConditionItem(BaseSequenceItem, BaseConditionItem):
                     break
             return ok
 
+        # monitored as a whole if every child is
+        if all(isinstance(cf, MonitoredCondition) for cf in child_funcs):
+            return monitored_condition(
+                cond_func, [name for cf in child_funcs for name in cf.pv_names]
+            )
         return cond_func
 
 
@@ -2,11 +2,12 @@ import logging
 import operator
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List
+from typing import List, Optional
 
 from beams.behavior_tree.condition_node import AckConditionNode, ConditionNode
 from beams.serialization import as_tagged_union
 from beams.tree_config.base import BaseItem
+from beams.tree_config.pv_monitor import monitored_condition
 from beams.tree_config.value import BaseValue, FixedValue
 from beams.typing_helper import Evaluatable
 
@@ -34,6 +35,17 @@ class DummyConditionItem(BaseConditionItem):
         return cond_func
 
 
+def _get_pv_names(values: List[BaseValue]) -> Optional[List[str]]:
+    """The PVs ``values`` are read from, None if any may change otherwise"""
+    pv_names = []
+    for value in values:
+        value_pv_names = value.get_pv_names()
+        if value_pv_names is None:
+            return None
+        pv_names.extend(value_pv_names)
+    return pv_names
+
+
 class ConditionOperator(Enum):
     equal = "eq"
     not_equal = "ne"
@@ -61,7 +73,9 @@ class BinaryConditionItem(BaseConditionItem):
             logger.debug(f"Evalling as lhs {lhs}, rhs {rhs}: {eval}")
             return eval
 
-        return cond_func
+        return monitored_condition(
+            cond_func, _get_pv_names([self.left_value, self.right_value])
+        )
 
 
 @dataclass
@@ -75,7 +89,9 @@ class BoundedConditionItem(BaseConditionItem):
         def cond_func():
             return self.lower_bound.get_value() < self.value.get_value() < self.upper_bound.get_value()
 
-        return cond_func
+        return monitored_condition(
+            cond_func, _get_pv_names([self.lower_bound, self.value, self.upper_bound])
+        )
 
 
 @dataclass
@@ -0,0 +1,293 @@
+"""
+Channel Access monitors, shared by the values and conditions of a process.
+
+A ``PVMonitor`` subscribes to a PV and keeps its latest value, so that reads
+of a monitored PV need no request to the IOC.  Listeners are called (from a
+Channel Access thread) whenever the value or connection changes, which lets
+conditions be re-evaluated only on change, and wake the ActionNode workers
+waiting on them.
+
+The monitors of a process are held by its ``PVCache``, which serves the
+reads of every ``EPICSValue`` in the process from them.  A PV is thus
+connected to once per process, and read from the IOC only when its monitor
+has no value yet, or (with a ``max_age_sec``) has not updated for a while.
+
+Channel Access contexts do not survive forking, and trees are often built
+in one process and evaluated in others.  Monitors are thus created lazily,
+by the first process to use them, and each process has its own cache.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from epics import PV
+
+logger = logging.getLogger(__name__)
+
+# called without arguments when a monitored PV changes
+MonitorListener = Callable[[], None]
+
+# as epics.caget, for reads that miss the cache
+CONNECTION_TIMEOUT_SEC = 5.0
+READ_TIMEOUT_SEC = 5.0
+
+
+class PVMonitor:
+    """A Channel Access monitor on ``pv_name``, and its latest value"""
+    def __init__(self, pv_name: str):
+        self.pv_name = pv_name
+        self.lock = threading.Lock()
+        self.listeners: List[MonitorListener] = []
+        # set once the first value has arrived, cleared on disconnection
+        self.has_value = False
+        # monotonic time of the latest value, monitored or read
+        self.updated = 0.0
+        self.pv = PV(pv_name, auto_monitor=True, callback=self._on_value,
+                     connection_callback=self._on_connection)
+
+    def add_listener(self, listener: MonitorListener) -> None:
+        with self.lock:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: MonitorListener) -> None:
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def get_value(self, as_string: bool = False) -> Any:
+        """The latest value received, None if there is none"""
+        if not self.has_value:
+            return None
+        return self.pv.get(as_string=as_string, use_monitor=True)
+
+    def read(self, as_string: bool = False) -> Any:
+        """Read the value from the IOC, None if it can not be"""
+        if not self.pv.wait_for_connection(timeout=CONNECTION_TIMEOUT_SEC):
+            logger.warning(f"Could not connect to {self.pv_name}")
+            return None
+        value = self.pv.get(as_string=as_string, use_monitor=False,
+                            timeout=READ_TIMEOUT_SEC)
+        if value is not None:
+            self.updated = time.monotonic()
+        return value
+
+    def _on_value(self, **kwargs) -> None:
+        self.updated = time.monotonic()
+        self.has_value = True
+        self._notify()
+
+    def _on_connection(self, conn: bool = False, **kwargs) -> None:
+        if not conn:
+            logger.debug(f"Monitored PV {self.pv_name} disconnected")
+            self.has_value = False
+            self._notify()
+
+    def _notify(self) -> None:
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener()
+            except Exception as ex:
+                logger.exception(f"Listener of {self.pv_name} failed: {ex}")
+
+
+@dataclass
+class PVCacheStats:
+    """Counts of a PVCache's reads and connections"""
+    # reads served from a monitor, and reads sent to the IOC
+    hits: int = 0
+    misses: int = 0
+    # PVs held by the cache, and those of them currently connected
+    connections: int = 0
+    connected: int = 0
+
+
+class PVCache:
+    """
+    The PV monitors of a process, serving reads from their latest values.
+    Values older than ``max_age_sec`` are read from the IOC again, over the
+    monitor's connection.  If ``max_age_sec`` is None (the default), monitored
+    values are trusted for as long as the PV stays connected.
+    """
+    def __init__(self, max_age_sec: Optional[float] = None):
+        self.max_age_sec = max_age_sec
+        self.monitors: Dict[str, PVMonitor] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_monitor(self, pv_name: str) -> PVMonitor:
+        """The monitor on ``pv_name``, created on first use"""
+        with self.lock:
+            monitor = self.monitors.get(pv_name)
+            if monitor is None:
+                monitor = self.monitors[pv_name] = PVMonitor(pv_name)
+            return monitor
+
+    def find_monitor(self, pv_name: str) -> Optional[PVMonitor]:
+        with self.lock:
+            return self.monitors.get(pv_name)
+
+    def read(
+        self,
+        pv_name: str,
+        as_string: bool = False,
+        max_age_sec: Optional[float] = None,
+    ) -> Any:
+        """
+        The value of ``pv_name``, from its monitor unless older than
+        ``max_age_sec`` (the cache's own if None).  None if it can not be read
+        """
+        monitor = self.get_monitor(pv_name)
+        if max_age_sec is None:
+            max_age_sec = self.max_age_sec
+        is_hit = monitor.has_value and (
+            max_age_sec is None or time.monotonic() - monitor.updated <= max_age_sec
+        )
+        with self.lock:
+            if is_hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if is_hit:
+            return monitor.get_value(as_string=as_string)
+        return monitor.read(as_string=as_string)
+
+    def get_stats(self) -> PVCacheStats:
+        with self.lock:
+            monitors = list(self.monitors.values())
+            hits, misses = self.hits, self.misses
+        return PVCacheStats(
+            hits=hits,
+            misses=misses,
+            connections=len(monitors),
+            connected=sum(monitor.pv.connected for monitor in monitors),
+        )
+
+
+_cache: Optional[PVCache] = None
+_cache_lock = threading.Lock()
+# the process the cache was created in
+_cache_pid: Optional[int] = None
+_max_age_sec: Optional[float] = None
+
+
+def configure_pv_cache(max_age_sec: Optional[float]) -> None:
+    """
+    Set the ``max_age_sec`` of this process's cache, and of the caches of
+    processes forked afterwards
+    """
+    global _max_age_sec
+    _max_age_sec = max_age_sec
+    with _cache_lock:
+        if _cache is not None:
+            _cache.max_age_sec = max_age_sec
+
+
+def get_pv_cache() -> PVCache:
+    """The PV cache of this process, created on first use"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            # monitors inherited from the parent process are not connected here
+            _cache = PVCache(max_age_sec=_max_age_sec)
+            _cache_pid = os.getpid()
+        return _cache
+
+
+def get_pv_monitor(pv_name: str) -> PVMonitor:
+    """The monitor on ``pv_name`` of this process, created on first use"""
+    return get_pv_cache().get_monitor(pv_name)
+
+
+class MonitoredCondition:
+    """
+    A condition function that is re-evaluated only when one of the PVs it
+    depends on changes, as reported by their monitors.  Called as the wrapped
+    ``evaluate``.
+
+    ActionNode workers wait on it with ``wait_for_change`` (or a listener),
+    and are thus woken as soon as a PV changes.
+    """
+    def __init__(self, evaluate: Callable[[], bool], pv_names: List[str]):
+        self.evaluate = evaluate
+        self.pv_names = pv_names
+        self.changed = threading.Condition()
+        self.version = 0
+        self.listeners: List[MonitorListener] = []
+        # (version, result) of the last evaluation
+        self.cached: Optional[tuple] = None
+        # the process the monitors were subscribed to in
+        self.pid: Optional[int] = None
+
+    def __call__(self) -> bool:
+        version = self.get_version()
+        cached = self.cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        result = self.evaluate()
+        self.cached = (version, result)
+        return result
+
+    def get_version(self) -> int:
+        """A count of the changes seen by this process"""
+        self._subscribe()
+        with self.changed:
+            return self.version
+
+    def wait_for_change(self, version: int, timeout: float) -> bool:
+        """
+        Wait up to ``timeout`` seconds for a change after ``version``,
+        returning whether there was one
+        """
+        self._subscribe()
+        with self.changed:
+            return self.changed.wait_for(lambda: self.version != version, timeout)
+
+    def add_listener(self, listener: MonitorListener) -> None:
+        self._subscribe()
+        with self.changed:
+            self.listeners.append(listener)
+
+    def remove_listener(self, listener: MonitorListener) -> None:
+        with self.changed:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def _subscribe(self) -> None:
+        if self.pid == os.getpid():
+            return
+        with self.changed:
+            if self.pid == os.getpid():
+                return
+            # results and listeners inherited from the parent are stale
+            self.pid = os.getpid()
+            self.cached = None
+            self.listeners = []
+        for pv_name in self.pv_names:
+            get_pv_monitor(pv_name).add_listener(self._on_change)
+
+    def _on_change(self) -> None:
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener()
+
+
+def monitored_condition(
+    evaluate: Callable[[], bool],
+    pv_names: Optional[List[str]],
+) -> Callable[[], bool]:
+    """
+    ``evaluate`` as a MonitoredCondition, if it only changes with
+    ``pv_names``.  Otherwise (``pv_names`` is None or empty), ``evaluate``
+    """
+    if not pv_names:
+        return evaluate
+    return MonitoredCondition(evaluate, sorted(set(pv_names)))
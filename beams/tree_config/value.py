@@ -2,11 +2,10 @@ import logging
 from ctypes import c_bool, c_int
 from dataclasses import dataclass
 from multiprocessing import Value
-from typing import Any
-
-from epics import caget
+from typing import Any, List, Optional
 
 from beams.serialization import as_tagged_union
+from beams.tree_config.pv_monitor import get_pv_cache
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +16,13 @@ class BaseValue:
     def get_value(self) -> Any:
         raise NotImplementedError
 
+    def get_pv_names(self) -> Optional[List[str]]:
+        """
+        The PVs this value is read from, or None if it may also change
+        otherwise.  Conditions on the value are monitored if it is known
+        """
+        return None
+
 
 @dataclass
 class FixedValue(BaseValue):
@@ -25,6 +31,9 @@ class FixedValue(BaseValue):
     def get_value(self) -> Any:
         return self.value
 
+    def get_pv_names(self) -> Optional[List[str]]:
+        return []
+
 
 @dataclass
 class EPICSValue(BaseValue):
@@ -32,10 +41,13 @@ class EPICSValue(BaseValue):
     as_string: bool = False
 
     def get_value(self) -> Any:
-        value = caget(self.pv_name, as_string=self.as_string)
-        logger.debug(f" <<-- (EPICSValue): caget({self.pv_name}) -> {value}")
+        value = get_pv_cache().read(self.pv_name, as_string=self.as_string)
+        logger.debug(f" <<-- (EPICSValue): read({self.pv_name}) -> {value}")
         return value
 
+    def get_pv_names(self) -> Optional[List[str]]:
+        return [self.pv_name]
+
 
 @dataclass
 class ProcessIntValue(BaseValue):
@@ -8,7 +8,7 @@ Hint at rational behind function handles as entrypoint for debugging / learning
 from multiprocessing import Queue
 from multiprocessing.sharedctypes import Synchronized  # type(Value)
 from multiprocessing.synchronize import Event as EventClass
-from typing import Callable
+from typing import Awaitable, Callable
 
 import py_trees
 
@@ -43,3 +43,12 @@ ActionNodeWorkLoop = Callable[[Synchronized, str, EventClass, VolatileStatus, Ev
 # Return Types:
 #   py_trees.common.Status: reflects return type from this node with respect to tree logic
 ActionNodeWorkFunction = Callable[[Evaluatable], py_trees.common.Status]
+
+# Coroutine work function, the async counterpart of ActionNodeWorkFunction
+# Parameter Types:
+#   Callable[[], Awaitable[bool]]: the completion condition, to be awaited
+# Return Types:
+#   py_trees.common.Status: reflects return type from this node with respect to tree logic
+AsyncActionNodeWorkFunction = Callable[
+    [Callable[[], Awaitable[bool]]], Awaitable[py_trees.common.Status]
+]
@@ -0,0 +1,83 @@
+"""
+Per-call cost of the TreeHost control plane, see beams.service.tree_host.
+
+Loads ``--trees`` interactive trees into a TreeHost, then times the queries
+the RPCHandler makes through its TreeHostClient:
+
+- heartbeat: the updates of every tree (GET_TREE_UPDATES)
+- tree update: a single tree's update (GET_TREE_UPDATE)
+- tree details: a single tree's node statuses (GET_TREE_DETAILS)
+
+Run from the repository root, with beams installed::
+
+    python benchmarks/tree_host.py --trees 20 --calls 1000
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from beams.service.rpc_client import RPCClient
+from beams.service.tree_host import TreeHost, TreeHostClient
+
+TREE_PATH = (Path(__file__).parent.parent / "beams" / "tests" / "artifacts"
+             / "eternal_guard.json")
+
+
+def time_call(func: Callable[[], object], n_calls: int) -> float:
+    """Mean seconds per call of ``func``"""
+    # connect, and warm up
+    func()
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        func()
+    return (time.perf_counter() - start) / n_calls
+
+
+def load_trees(client: TreeHostClient, n_trees: int) -> None:
+    # only used to build CommandMessages
+    messages = RPCClient()
+    for idx in range(n_trees):
+        client.send_command(messages.construct_load_new_tree_msg(
+            str(TREE_PATH), f"tree_{idx}", "", "INTERACTIVE", 100, "FIXED_DELAY"
+        ))
+
+
+def run_benchmark(n_trees: int, n_calls: int) -> Dict[str, float]:
+    """Mean seconds per call of each query, with ``n_trees`` trees loaded"""
+    host = TreeHost()
+    host.start_work()
+    client = host.get_client()
+    try:
+        load_trees(client, n_trees)
+        return {
+            "heartbeat (all trees)": time_call(client.get_tree_updates, n_calls),
+            "single tree update": time_call(
+                lambda: client.get_tree_update(name="tree_0"), n_calls
+            ),
+            "tree details": time_call(
+                lambda: client.get_tree_details(name="tree_0"), n_calls
+            ),
+        }
+    finally:
+        client.shutdown_trees()
+        client.close()
+        host.stop_work()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trees", type=int, default=20,
+                        help="The number of trees loaded, by default 20")
+    parser.add_argument("--calls", type=int, default=1000,
+                        help="The number of calls timed per query, by default 1000")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.trees, args.calls)
+    print(f"Per-call cost with {args.trees} interactive trees loaded:")
+    for name, seconds in results.items():
+        print(f"  {name + ':':24}{seconds * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()